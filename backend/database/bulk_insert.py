@@ -0,0 +1,31 @@
+from itertools import islice
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import insert
+
+# Rows per executed batch. SQLAlchemy sends each batch as multi-row
+# INSERT ... VALUES ... RETURNING statements on SQLite and Postgres (psycopg2).
+BULK_INSERT_BATCH_SIZE = 1000
+
+
+def bulk_insert_returning_ids(
+        db,
+        model,
+        rows: Iterable[Dict[str, Any]],
+        batch_size: int = BULK_INSERT_BATCH_SIZE
+) -> List[int]:
+    """
+    Insert rows of an ORM model without creating ORM objects and return their
+    generated ids in the order of the rows. rows may be a generator; only one
+    batch is held in memory. Column defaults apply; the caller commits.
+    """
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    rows = iter(rows)
+    ids: List[int] = []
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return ids
+
+        ids.extend(db.execute(statement, batch).scalars())
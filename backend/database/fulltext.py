@@ -0,0 +1,137 @@
+import re
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import Table, bindparam, event, text
+
+CHUNK_TABLE = "document_chunks"
+# SQLite: external-content FTS5 table over document_chunks.text, kept in sync by triggers
+SQLITE_FTS_TABLE = "document_chunks_fts"
+# Postgres: GIN index over the tsvector of document_chunks.text
+POSTGRES_FTS_INDEX = "ix_document_chunks_text_tsv"
+# Documents are German or English, so no language-specific stemming
+POSTGRES_TS_CONFIG = "simple"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        text, content='{CHUNK_TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON {CHUNK_TABLE} BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON {CHUNK_TABLE} BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF text ON {CHUNK_TABLE} BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+
+def ensure_chunk_fulltext_index(connection) -> None:
+    """
+    Create the full-text index of the chunk texts if it does not exist yet and
+    fill it from the stored chunks. Idempotent; a no-op on other databases.
+    """
+    dialect = connection.dialect.name
+
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": SQLITE_FTS_TABLE},
+        ).first()
+
+        for statement in _SQLITE_DDL:
+            connection.execute(text(statement))
+
+        if not exists:
+            connection.execute(text(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"))
+
+    elif dialect == "postgresql":
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_FTS_INDEX} ON {CHUNK_TABLE} "
+            f"USING GIN (to_tsvector('{POSTGRES_TS_CONFIG}', text))"
+        ))
+
+
+def drop_chunk_fulltext_index(connection) -> None:
+    # The triggers are dropped with the chunk table; the FTS5 table is not
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}"))
+
+
+def register_chunk_fulltext_index(table: Table) -> None:
+    """Create and drop the full-text index together with the chunk table in create_all / drop_all."""
+    event.listen(table, "after_create", lambda target, connection, **kw: ensure_chunk_fulltext_index(connection))
+    event.listen(table, "after_drop", lambda target, connection, **kw: drop_chunk_fulltext_index(connection))
+
+
+def search_terms(keywords: Sequence[str]) -> List[str]:
+    """Lowercased word terms of the keywords, without operators or punctuation, in order."""
+    return list(dict.fromkeys(term.lower() for keyword in keywords for term in _TERM.findall(keyword)))
+
+
+def rank_chunks_by_keywords(
+        db,
+        document_ids: Sequence[int],
+        keywords: Sequence[str],
+        limit: int
+) -> List[Tuple[int, float]]:
+    """
+    (chunk id, relevance) of the canonical chunks of the given documents that
+    contain any of the keywords as a word prefix, best first. Relevance is
+    the BM25 score on SQLite (FTS5) and ts_rank_cd on Postgres; higher is
+    better on both.
+    """
+    terms = search_terms(keywords)
+    if not terms or not document_ids:
+        return []
+
+    params = {"document_ids": list(document_ids), "limit": limit}
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        params["query"] = " OR ".join(f'"{term}"*' for term in terms)
+        # bm25() is lower for better matches
+        statement = text(
+            f"""
+            SELECT c.id, -bm25({SQLITE_FTS_TABLE}) AS relevance
+            FROM {SQLITE_FTS_TABLE}
+            JOIN {CHUNK_TABLE} AS c ON c.id = {SQLITE_FTS_TABLE}.rowid
+            WHERE {SQLITE_FTS_TABLE} MATCH :query
+              AND c.document_id IN :document_ids
+              AND c.duplicate_of_id IS NULL
+            ORDER BY bm25({SQLITE_FTS_TABLE})
+            LIMIT :limit
+            """
+        )
+
+    elif dialect == "postgresql":
+        params["query"] = " | ".join(f"{term}:*" for term in terms)
+        statement = text(
+            f"""
+            SELECT c.id, ts_rank_cd(to_tsvector('{POSTGRES_TS_CONFIG}', c.text), query) AS relevance
+            FROM {CHUNK_TABLE} AS c, to_tsquery('{POSTGRES_TS_CONFIG}', :query) AS query
+            WHERE to_tsvector('{POSTGRES_TS_CONFIG}', c.text) @@ query
+              AND c.document_id IN :document_ids
+              AND c.duplicate_of_id IS NULL
+            ORDER BY relevance DESC
+            LIMIT :limit
+            """
+        )
+
+    else:
+        raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+    statement = statement.bindparams(bindparam("document_ids", expanding=True))
+    return [(chunk_id, float(relevance)) for chunk_id, relevance in db.execute(statement, params)]
@@ -1,4 +1,6 @@
 from backend.database.database import engine, Base
+from backend.database.fulltext import ensure_chunk_fulltext_index
+from backend.database.schema_upgrades import ensure_added_columns
 from backend.models.document import Document
 from backend.models.user import User
 from backend.models.workspace import Workspace
@@ -9,5 +11,14 @@ from backend.models.document_chunk import DocumentChunk
 from backend.models.report import Report
 from backend.models.chat_conversation import ChatConversation
 from backend.models.chat_message import ChatMessage
+from backend.models.ingestion_job import IngestionJob
+from backend.models.pdf_page_cache import PdfPageCache
+from backend.models.document_content import DocumentContent
+from backend.models.document_checkpoint import DocumentCheckpoint
 
-Base.metadata.create_all(engine)
\ No newline at end of file
+Base.metadata.create_all(engine)
+
+# Existing tables get new columns and the chunk full-text index on the next start
+with engine.begin() as connection:
+    ensure_added_columns(connection)
+    ensure_chunk_fulltext_index(connection)
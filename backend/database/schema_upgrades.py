@@ -0,0 +1,39 @@
+from sqlalchemy import inspect, text
+
+# Columns added to tables after their first release: (table, column, column
+# definition, indexed). create_all only creates missing tables, so databases
+# created before get these columns from ensure_added_columns
+ADDED_COLUMNS = [
+    ("documents", "content_sha256", "VARCHAR(64)", True),
+    ("documents", "content_id", "INTEGER REFERENCES document_contents(id) ON DELETE SET NULL", True),
+    # Existing documents are their first version
+    ("documents", "version", "INTEGER NOT NULL DEFAULT 1", False),
+    # Chunks stored before are all canonical until their document is parsed again
+    ("document_chunks", "duplicate_of_id", "INTEGER REFERENCES document_chunks(id) ON DELETE SET NULL", True),
+    ("ingestion_jobs", "force_rebuild", "BOOLEAN NOT NULL DEFAULT FALSE", False),
+]
+
+
+def ensure_added_columns(connection) -> None:
+    """
+    Add the columns in ADDED_COLUMNS that existing tables are missing, with
+    their index. Idempotent; tables that do not exist yet are left to create_all.
+    """
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    columns = {}
+
+    for table, column, definition, indexed in ADDED_COLUMNS:
+        if table not in tables:
+            continue
+
+        if table not in columns:
+            columns[table] = {existing["name"] for existing in inspector.get_columns(table)}
+        if column in columns[table]:
+            continue
+
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+        if indexed:
+            # Same name as the index create_all creates for Column(index=True)
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
+        columns[table].add(column)
@@ -21,6 +21,13 @@ class Document(Base):
     csv_profile = Column(JSON, nullable=True)
     csv_summary = Column(JSON, nullable=True)
 
+    # Incremented for every new version uploaded for the document
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # SHA-256 of the uploaded bytes and the shared processed content, if any
+    content_sha256 = Column(String(64), nullable=True, index=True)
+    content_id = Column(Integer, ForeignKey("document_contents.id", ondelete="SET NULL"), nullable=True, index=True)
+
     # Documents belong to a workspace (personal or team)
     workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=False)
 
@@ -33,6 +40,8 @@ class Document(Base):
     workspace = relationship("Workspace", back_populates="documents")
     uploaded_by = relationship("User", foreign_keys=[uploaded_by_user_id], back_populates="documents")
 
+    content = relationship("DocumentContent", foreign_keys=[content_id])
+
     parses = relationship("DocumentParse", back_populates="document", cascade="all, delete-orphan")
     chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
     blocks = relationship("DocumentBlock", back_populates="document", cascade="all, delete-orphan")
@@ -43,3 +52,15 @@ class Document(Base):
         cascade="all, delete-orphan",
         passive_deletes=True,
     )
+    ingestion_jobs = relationship(
+        "IngestionJob",
+        back_populates="document",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    checkpoints = relationship(
+        "DocumentCheckpoint",
+        back_populates="document",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
@@ -0,0 +1,39 @@
+import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.orm import relationship
+
+from backend.database.database import Base
+
+
+class DocumentCheckpoint(Base):
+    """
+    Completed processing stage of a document with a fingerprint of the inputs
+    it ran on. Reprocessing skips a stage while its inputs are unchanged.
+    """
+    __tablename__ = "document_checkpoints"
+    __table_args__ = (
+        UniqueConstraint(
+            "document_id",
+            "stage",
+            name="uq_document_checkpoints_document_stage",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(
+        Integer,
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    # "parse" / "embed" / "blocks" / "structure" / "report"
+    stage = Column(String(32), nullable=False)
+
+    # SHA-256 of the stage inputs, see stage_checkpoints
+    fingerprint = Column(String(64), nullable=False)
+
+    completed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    document = relationship("Document", back_populates="checkpoints")
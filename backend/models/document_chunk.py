@@ -2,6 +2,7 @@ from datetime import datetime
 from sqlalchemy import Column, Integer, Text, ForeignKey, String, DateTime
 from sqlalchemy.orm import relationship
 from backend.database.database import Base
+from backend.database.fulltext import register_chunk_fulltext_index
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
@@ -23,7 +24,15 @@ class DocumentChunk(Base):
     topics = Column(Text, nullable=True)
     token_count = Column(Integer, nullable=False)
 
+    # Canonical chunk of a near duplicate (repeated headers, footers, disclaimers);
+    # duplicates are not embedded
+    duplicate_of_id = Column(Integer, ForeignKey("document_chunks.id", ondelete="SET NULL"), nullable=True, index=True)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     document = relationship("Document", back_populates="chunks")
-    parse = relationship("DocumentParse", back_populates="chunks")
\ No newline at end of file
+    parse = relationship("DocumentParse", back_populates="chunks")
+
+
+# Keyword search index over the chunk texts, maintained by the database on insert
+register_chunk_fulltext_index(DocumentChunk.__table__)
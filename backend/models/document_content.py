@@ -0,0 +1,36 @@
+import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+
+from backend.database.database import Base
+
+
+class DocumentContent(Base):
+    """
+    Immutable processed content shared by several documents: uploads of the
+    same bytes, language and pipeline version, and copies of a document in
+    other workspaces. The parse, chunks, blocks and vectors are stored once
+    under the owner document; all documents of the content reference it
+    through Document.content_id.
+    """
+    __tablename__ = "document_contents"
+    __table_args__ = (
+        Index("ix_document_contents_key", "sha256", "language", "pipeline_version"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # Unknown for documents uploaded before content hashing; such content is
+    # only shared by copies, never matched by uploads
+    sha256 = Column(String(64), nullable=True)
+    language = Column(String, nullable=False)
+    pipeline_version = Column(String(32), nullable=False)
+
+    # Document whose DocumentParse, DocumentChunk and DocumentBlock rows hold the content
+    owner_document_id = Column(
+        Integer,
+        ForeignKey("documents.id", ondelete="SET NULL", use_alter=True, name="fk_document_contents_owner"),
+        nullable=True,
+    )
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
@@ -0,0 +1,47 @@
+import datetime
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import relationship
+
+from backend.database.database import Base
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(
+        Integer,
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    # "queued" / "running" / "succeeded" / "failed"
+    status = Column(String(20), nullable=False, default="queued", index=True)
+
+    # Set while the job is queued or running, cleared once it is finished.
+    # The unique constraint makes enqueueing idempotent per document.
+    active_key = Column(String(64), nullable=True, unique=True)
+
+    # Rebuild every stage from scratch instead of reusing unchanged chunk
+    # vectors and structured blocks (POST /{id}/process?force=true)
+    force_rebuild = Column(Boolean, nullable=False, default=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)
+
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+    document = relationship("Document", back_populates="ingestion_jobs")
@@ -0,0 +1,31 @@
+import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Integer, String, UniqueConstraint
+
+from backend.database.database import Base
+
+
+class PdfPageCache(Base):
+    """
+    Converted result of a single OCRed PDF page, keyed by a hash of the page
+    content, so reprocessing a document never OCRs the same page twice.
+    """
+    __tablename__ = "pdf_page_cache"
+    __table_args__ = (
+        UniqueConstraint(
+            "page_hash",
+            "pipeline",
+            name="uq_pdf_page_cache_hash_pipeline",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    page_hash = Column(String(64), nullable=False, index=True)
+
+    # Converter settings the page was converted with, e.g. "docling-ocr"
+    pipeline = Column(String(64), nullable=False)
+
+    # DoclingDocument.export_to_dict() of the single-page conversion
+    document = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
@@ -1,18 +1,25 @@
-from backend.models.document_parse import DocumentParse
-from backend.database.database import SessionLocal
-
 from docling.document_converter import DocumentConverter
 from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling.document_converter import PdfFormatOption
+from docling.datamodel.base_models import InputFormat
+
+from docling_core.types.doc import DoclingDocument
 
+from dataclasses import dataclass
 from pathlib import Path
-from fastapi import HTTPException
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import fitz
+import time
+import hashlib
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Pages with fewer extractable characters are treated as scanned
+MIN_PAGE_TEXT_CHARS = 20
+
 
 def pdf_contains_text(pdf_path: str, pages_to_check: int = 3) -> bool:
     """
@@ -37,20 +44,23 @@ def pdf_contains_text(pdf_path: str, pages_to_check: int = 3) -> bool:
         return False
 
 
-def create_converter(pdf_path: str) -> DocumentConverter:
-    """Create a Docling converter with smart OCR detection."""
-
-    pipeline_options = PdfPipelineOptions()
-
+def _detect_ocr(pdf_path: str) -> bool:
     if pdf_contains_text(pdf_path):
-        pipeline_options.do_ocr = False
         logger.info("PDF contains text → OCR disabled")
-    else:
-        pipeline_options.do_ocr = True
-        logger.info("Scanned PDF detected → OCR enabled")
+        return False
+
+    logger.info("Scanned PDF detected → OCR enabled")
+    return True
+
+
+def build_converter(do_ocr: bool, do_table_structure: bool = False) -> DocumentConverter:
+    """Build a Docling PDF converter for the given pipeline options."""
+
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.do_ocr = do_ocr
 
     # performance optimizations
-    pipeline_options.do_table_structure = False
+    pipeline_options.do_table_structure = do_table_structure
     pipeline_options.do_picture_description = False
 
     return DocumentConverter(
@@ -62,51 +72,300 @@ def create_converter(pdf_path: str) -> DocumentConverter:
     )
 
 
-def parse_document(document_id: int, file_path: str):
+def create_converter(pdf_path: str, do_ocr: Optional[bool] = None) -> DocumentConverter:
     """
-    Parse a document using Docling and store the result in the database.
-    Returns BOTH the DB parse entry and the DoclingDocument.
+    Create a Docling converter with smart OCR detection.
+    Pass do_ocr to reuse a decision that was already made for the whole PDF.
     """
-    db = SessionLocal()
-    try:
-        path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"File {file_path} does not exist")
+    if do_ocr is None:
+        do_ocr = _detect_ocr(pdf_path)
+
+    return build_converter(do_ocr)
 
-        converter = create_converter(file_path)
 
-        result = converter.convert(file_path)
-        docling_doc = result.document
+# ------------- CONVERTER CACHE -------------
+# (do_ocr, do_table_structure)
+ConverterKey = Tuple[bool, bool]
+
+# Converters live for the lifetime of the process; building one and loading
+# its pipeline models costs seconds, converting a small PDF often less.
+_converters: Dict[ConverterKey, DocumentConverter] = {}
+_converter_init_seconds: Dict[ConverterKey, float] = {}
+_converter_lock = threading.Lock()
+
+
+def _add_stats(stats: Optional[Dict[str, float]], **values: float) -> None:
+    if stats is None:
+        return
+    for name, value in values.items():
+        stats[name] = stats.get(name, 0.0) + value
+
+
+def get_converter(
+        do_ocr: bool,
+        do_table_structure: bool = False,
+        stats: Optional[Dict[str, float]] = None
+) -> DocumentConverter:
+    """
+    Return the cached converter for the given pipeline options. The first call
+    builds it and loads the pipeline models, later calls reuse it.
+
+    If stats is given it receives converter_init_seconds for a cold start, or
+    converter_reuses and converter_saved_seconds (the init cost avoided).
+    """
+    key = (do_ocr, do_table_structure)
+
+    with _converter_lock:
+        converter = _converters.get(key)
+
+        if converter is None:
+            started = time.perf_counter()
+            converter = build_converter(do_ocr, do_table_structure)
+            converter.initialize_pipeline(InputFormat.PDF)
+            init_seconds = time.perf_counter() - started
+
+            _converters[key] = converter
+            _converter_init_seconds[key] = init_seconds
+
+            logger.info(
+                f"Initialized Docling converter (ocr={do_ocr}, tables={do_table_structure}) "
+                f"in {init_seconds:.2f}s"
+            )
+            _add_stats(stats, converter_inits=1, converter_init_seconds=init_seconds)
+            return converter
+
+    _add_stats(stats, converter_reuses=1, converter_saved_seconds=_converter_init_seconds[key])
+    return converter
+
+
+def warm_up_converters(option_sets: Sequence[ConverterKey]) -> None:
+    """Load the converters for the given (do_ocr, do_table_structure) options now."""
+    for do_ocr, do_table_structure in option_sets:
+        get_converter(do_ocr, do_table_structure)
+
+
+def clear_converter_cache() -> None:
+    with _converter_lock:
+        _converters.clear()
+        _converter_init_seconds.clear()
+
+
+def convert_pdf(
+        file_path: str,
+        do_ocr: Optional[bool] = None,
+        stats: Optional[Dict[str, float]] = None,
+        do_table_structure: bool = False
+):
+    """
+    Convert a PDF with Docling without touching the database.
+    Returns the DoclingDocument and whether OCR was enabled for it.
+    Timings are added to stats if given.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"File {file_path} does not exist")
+
+    if do_ocr is None:
+        do_ocr = _detect_ocr(str(file_path))
+
+    converter = get_converter(do_ocr, do_table_structure, stats=stats)
+    used_ocr = do_ocr
+
+    started = time.perf_counter()
+    result = converter.convert(str(file_path))
+    _add_stats(stats, convert_seconds=time.perf_counter() - started)
+
+    return result.document, used_ocr
+
+
+# ------------- PAGE RANGES -------------
+@dataclass(frozen=True)
+class PdfPageInfo:
+    page_no: int
+    needs_ocr: bool
+    content_hash: str
+    has_tables: bool = False
+
+
+@dataclass(frozen=True)
+class PageRange:
+    """
+    Consecutive 1-based pages converted together, with or without OCR and
+    table structure recognition.
+    """
+    start: int
+    end: int
+    ocr: bool = False
+    tables: bool = False
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def page_needs_ocr(page) -> bool:
+    """A page without a usable text layer is a scanned page."""
+    return len(page.get_text().strip()) < MIN_PAGE_TEXT_CHARS
+
+
+def page_has_tables(page) -> bool:
+    """
+    PyMuPDF table detection on the page's vector lines. Pages without any
+    drawings cannot contain a ruled table and are skipped cheaply.
+    """
+    if not page.get_cdrawings():
+        return False
+
+    return bool(page.find_tables().tables)
+
+
+def page_content_hash(doc, page) -> str:
+    """
+    Hash of everything that is drawn on a page: its content streams, the raw
+    streams of the images it uses, and its rotation and page boxes, which
+    change what OCR sees. Identical pages in different files share the hash.
+    """
+    digest = hashlib.sha256(page.read_contents())
+    digest.update(f"{page.rotation}|{tuple(page.mediabox)}|{tuple(page.cropbox)}".encode())
+
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+
+    return digest.hexdigest()
+
+
+def analyze_pdf_pages(pdf_path: str) -> List[PdfPageInfo]:
+    """
+    Classify every page as text layer or scanned, detect tables on text
+    pages and hash the page content.
+    """
+    pages = []
+
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            needs_ocr = page_needs_ocr(page)
+            pages.append(
+                PdfPageInfo(
+                    page_no=page.number + 1,
+                    needs_ocr=needs_ocr,
+                    content_hash=page_content_hash(doc, page),
+                    has_tables=not needs_ocr and page_has_tables(page),
+                )
+            )
+
+    return pages
+
+
+def plan_conversion_ranges(
+        pages: Sequence[PdfPageInfo],
+        pages_per_range: int,
+        force_ocr: bool = False
+) -> List[PageRange]:
+    """
+    Group pages into conversion ranges. Consecutive text pages are converted
+    together without OCR, up to pages_per_range pages per range. Every page
+    that needs OCR becomes its own range, so scanned pages are OCRed in
+    parallel and can be cached page by page. Text pages with tables become
+    their own ranges as well, so table structure recognition only runs on
+    those pages.
+    """
+    if pages_per_range <= 0:
+        raise ValueError("pages_per_range must be positive")
+
+    ranges: List[PageRange] = []
+    text_start = None
+
+    def close_text_range(end: int):
+        for start, range_end in plan_page_ranges(end - text_start + 1, pages_per_range):
+            ranges.append(PageRange(text_start + start - 1, text_start + range_end - 1))
+
+    for page in pages:
+        ocr = force_ocr or page.needs_ocr
+        if ocr or page.has_tables:
+            if text_start is not None:
+                close_text_range(page.page_no - 1)
+                text_start = None
+            ranges.append(PageRange(page.page_no, page.page_no, ocr=ocr, tables=not ocr))
+        elif text_start is None:
+            text_start = page.page_no
+
+    if text_start is not None:
+        close_text_range(pages[-1].page_no)
+
+    return ranges
+
+
+def docling_page_ranges(pages: Sequence[PdfPageInfo]) -> List[PageRange]:
+    """
+    Single-page ranges of the pages the text layer fast path cannot read:
+    pages without a text layer are OCRed, text pages with a table get table
+    structure recognition.
+    """
+    return [
+        PageRange(page.page_no, page.page_no, ocr=page.needs_ocr, tables=not page.needs_ocr)
+        for page in pages
+        if page.needs_ocr or page.has_tables
+    ]
+
+
+def plan_page_ranges(page_count: int, pages_per_range: int) -> List[Tuple[int, int]]:
+    """
+    Split 1-based page numbers into consecutive inclusive (start, end) ranges.
+    """
+    if pages_per_range <= 0:
+        raise ValueError("pages_per_range must be positive")
+
+    return [
+        (start, min(start + pages_per_range - 1, page_count))
+        for start in range(1, page_count + 1, pages_per_range)
+    ]
+
+
+def split_pdf(pdf_path: str, page_ranges: Sequence[Tuple[int, int]], output_dir: str) -> List[str]:
+    """
+    Write every page range of a PDF to its own file and return the file paths
+    in range order.
+    """
+    paths = []
+
+    with fitz.open(pdf_path) as source:
+        for start, end in page_ranges:
+            part_path = Path(output_dir) / f"pages_{start:05d}_{end:05d}.pdf"
+
+            with fitz.open() as part:
+                part.insert_pdf(source, from_page=start - 1, to_page=end - 1)
+                part.save(str(part_path))
+
+            paths.append(str(part_path))
+
+    return paths
+
+
+def merge_docling_documents(documents: Sequence[DoclingDocument]) -> DoclingDocument:
+    """
+    Merge the documents of consecutive page ranges into one document.
+
+    Items keep their reading order and page numbers are shifted so that they
+    continue across ranges, so chunking the merged document gives the same
+    heading context as converting the whole PDF at once.
+    """
+    if len(documents) == 1:
+        return documents[0]
+
+    return DoclingDocument.concatenate(documents)
+
+
+def describe_docling_document(docling_doc, used_ocr: bool = False) -> dict:
+    """
+    Collect the DocumentParse fields of a converted PDF.
+    """
+    warnings = getattr(docling_doc, "warnings", None)
 
+    return {
         # Extract full text (Markdown for structure)
-        full_text = docling_doc.export_to_markdown()
-        page_count = len(docling_doc.pages)
-        used_ocr = getattr(docling_doc, "ocr_used", False)
-        warnings = getattr(docling_doc, "warnings", None)
-
-        # Database entry
-        doc_parse = DocumentParse(
-            document_id=document_id,
-            success=True,
-            full_text=full_text,
-            page_count=page_count,
-            used_ocr=used_ocr,
-            warnings=str(warnings) if warnings else None
-        )
-
-        db.add(doc_parse)
-        db.commit()
-        db.refresh(doc_parse)
-
-        return doc_parse, docling_doc
-
-    except FileNotFoundError as e:
-        db.rollback()
-        raise HTTPException(status_code=404, detail=str(e))
-
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Document parsing failed: {str(e)}")
-
-    finally:
-        db.close()
+        "full_text": docling_doc.export_to_markdown(),
+        "page_count": len(docling_doc.pages),
+        "used_ocr": bool(used_ocr),
+        "warnings": str(warnings) if warnings else None,
+    }
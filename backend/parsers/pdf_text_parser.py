@@ -0,0 +1,188 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, List, Optional, Tuple
+
+import fitz
+
+# A block is a heading when its font is at least this much larger than the body text
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_CHARS = 160
+HEADING_MAX_LINES = 3
+MAX_HEADING_LEVEL = 6
+
+_BOLD_FLAG = 16
+_WHITESPACE_RE = re.compile(r"[ \t]+")
+
+
+@dataclass(frozen=True)
+class PdfTextBlock:
+    """
+    A paragraph of a born-digital PDF together with the headings it belongs to.
+    """
+    text: str
+    page_no: int
+    heading_path: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class _RawBlock:
+    text: str
+    page_no: int
+    font_size: float
+    bold: bool
+    line_count: int
+
+
+def _round_size(size: float) -> float:
+    return round(size * 2) / 2
+
+
+def _read_blocks(doc, skip_pages: Collection[int] = ()) -> List[_RawBlock]:
+    """
+    Read text blocks in reading order with their dominant font size.
+    """
+    blocks = []
+
+    for page_index, page in enumerate(doc):
+        if page_index + 1 in skip_pages:
+            continue
+
+        page_dict = page.get_text("dict", sort=True)
+
+        for block in page_dict.get("blocks", []):
+            if block.get("type") != 0:
+                continue
+
+            lines = []
+            size_chars: Counter = Counter()
+            bold_chars = 0
+            total_chars = 0
+
+            for line in block.get("lines", []):
+                line_text = "".join(span.get("text", "") for span in line.get("spans", []))
+                line_text = _WHITESPACE_RE.sub(" ", line_text).strip()
+                if line_text:
+                    lines.append(line_text)
+
+                for span in line.get("spans", []):
+                    chars = len(span.get("text", "").strip())
+                    size_chars[_round_size(span.get("size", 0.0))] += chars
+                    total_chars += chars
+                    if span.get("flags", 0) & _BOLD_FLAG:
+                        bold_chars += chars
+
+            if not lines or total_chars == 0:
+                continue
+
+            blocks.append(
+                _RawBlock(
+                    text=" ".join(lines),
+                    page_no=page_index + 1,
+                    font_size=size_chars.most_common(1)[0][0],
+                    bold=bold_chars == total_chars,
+                    line_count=len(lines),
+                )
+            )
+
+    return blocks
+
+
+def _body_font_size(blocks: List[_RawBlock]) -> float:
+    """
+    The font size covering the most characters is taken as body text.
+    """
+    size_chars: Counter = Counter()
+    for block in blocks:
+        size_chars[block.font_size] += len(block.text)
+
+    return size_chars.most_common(1)[0][0] if size_chars else 0.0
+
+
+def _is_heading_candidate(block: _RawBlock, body_size: float) -> bool:
+    if len(block.text) > HEADING_MAX_CHARS or block.line_count > HEADING_MAX_LINES:
+        return False
+
+    if block.font_size >= body_size * HEADING_SIZE_RATIO:
+        return True
+
+    # Bold lines in body size, e.g. "1. Definitions" in contracts
+    return block.bold and block.font_size >= body_size and not block.text.endswith((".", ":", ","))
+
+
+def extract_pdf_text_blocks(pdf_path: str, skip_pages: Collection[int] = ()) -> Tuple[List[PdfTextBlock], int]:
+    """
+    Extract paragraphs from the text layer of a PDF with PyMuPDF and recover
+    the heading hierarchy from font sizes: larger fonts are higher levels,
+    bold body-size lines are the lowest heading level. Pages in skip_pages
+    (1-based) are left out, e.g. those converted by Docling instead.
+
+    Returns the paragraphs in reading order and the page count.
+    """
+    path = Path(pdf_path)
+    if not path.exists():
+        raise FileNotFoundError(f"File {pdf_path} does not exist")
+
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+        raw_blocks = _read_blocks(doc, skip_pages)
+
+    body_size = _body_font_size(raw_blocks)
+    heading_sizes = sorted(
+        {block.font_size for block in raw_blocks if _is_heading_candidate(block, body_size)},
+        reverse=True,
+    )
+
+    def heading_level(block: _RawBlock) -> Optional[int]:
+        if not _is_heading_candidate(block, body_size):
+            return None
+        return min(heading_sizes.index(block.font_size) + 1, MAX_HEADING_LEVEL)
+
+    blocks: List[PdfTextBlock] = []
+    heading_stack: List[Tuple[int, str]] = []
+
+    for raw in raw_blocks:
+        level = heading_level(raw)
+
+        if level is not None:
+            while heading_stack and heading_stack[-1][0] >= level:
+                heading_stack.pop()
+            heading_stack.append((level, raw.text))
+            continue
+
+        blocks.append(
+            PdfTextBlock(
+                text=raw.text,
+                page_no=raw.page_no,
+                heading_path=tuple(title for _, title in heading_stack),
+            )
+        )
+
+    return blocks, page_count
+
+
+def pdf_text_blocks_to_markdown(blocks: List[PdfTextBlock]) -> str:
+    """
+    Render extracted paragraphs as Markdown, emitting each heading once.
+    """
+    parts = []
+    current_path: Tuple[str, ...] = ()
+
+    for block in blocks:
+        if block.heading_path != current_path:
+            shared = 0
+            while (
+                shared < min(len(current_path), len(block.heading_path))
+                and current_path[shared] == block.heading_path[shared]
+            ):
+                shared += 1
+
+            for level, title in enumerate(block.heading_path[shared:], start=shared + 1):
+                parts.append(f"{'#' * min(level, MAX_HEADING_LEVEL)} {title}")
+
+            current_path = block.heading_path
+
+        parts.append(block.text)
+
+    return "\n\n".join(parts)
@@ -1,17 +1,16 @@
-from fastapi import APIRouter, UploadFile, HTTPException, Body, BackgroundTasks, File, Form, Depends
+from fastapi import APIRouter, UploadFile, HTTPException, Body, File, Form, Depends
+import time
+import asyncio
 import logging
 from pydantic import BaseModel
 
+from backend.database.bulk_insert import bulk_insert_returning_ids
 from backend.database.database import SessionLocal
 from backend.models.document import Document
 from backend.models.report import Report
 from backend.models.document_chunk import DocumentChunk
-from backend.models.document_parse import DocumentParse
 from backend.models.document_block import DocumentBlock
 
-from backend.parsers.txt_parser import parse_txt
-from backend.parsers.docx_parser import parse_docx
-
 from backend.services.csv.csv_storage_service import create_and_upload_parquet_from_csv_file
 from backend.services.csv.csv_profile_service import build_csv_profile_from_file
 from backend.services.csv.csv_report_service import generate_csv_report
@@ -19,10 +18,37 @@ from backend.services.csv.csv_report_service import generate_csv_report
 from backend.services.storage.r2_storage import upload_file, download_to_temp_file, delete_file, copy_file
 from backend.services.storage.upload_validation import (
     UploadValidationError,
+    document_file_kind,
     read_upload_with_limit,
     validate_upload,
 )
 
+from backend.services.ingestion.job_queue import enqueue_document_job, get_active_job
+from backend.services.ingestion.content_dedup import (
+    artifact_document_id,
+    compute_content_sha256,
+    content_references,
+    find_reusable_content,
+    register_document_content,
+    release_document_content,
+    share_document_content,
+)
+from backend.services.ingestion.stage_checkpoints import (
+    blocks_fingerprint,
+    checkpoint_matches,
+    chunks_fingerprint,
+    clear_checkpoints,
+    has_stored_chunks,
+    latest_parse_id,
+    parse_fingerprint,
+    save_checkpoint,
+    stage_fingerprint,
+)
+from backend.services.ingestion.stage_graph import Stage, run_stage_graph
+from backend.services.ingestion.stage_limits import stage_slot
+from backend.services.observability import metrics
+from backend.services.llm.embedding_cache import hit_ratio as embedding_cache_hit_ratio
+
 from backend.services.auth.deps import get_current_user
 from backend.models.user import User
 from backend.services.workspaces.workspace_service import WorkspaceService
@@ -31,6 +57,9 @@ from backend.models.workspace_member import WorkspaceMember
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Chunks read from SQL, embedded and upserted per step of the vector stage
+VECTOR_BATCH_SIZE = 512
+
 
 class DocumentTransferIn(BaseModel):
     target_workspace_id: int
@@ -38,13 +67,9 @@ class DocumentTransferIn(BaseModel):
 
 
 # -------------------- LAZY IMPORT HELPERS --------------------
-def get_chunking_services():
-    from backend.services.ingestion.chunking_service import (
-        chunk_text_from_text,
-        chunk_pdf,
-        MAX_TOKENS,
-    )
-    return chunk_text_from_text, chunk_pdf, MAX_TOKENS
+def get_parsing_services():
+    from backend.services.ingestion.parse_pool import parse_in_pool, store_parsed_document
+    return parse_in_pool, store_parsed_document
 
 
 def get_block_services():
@@ -58,6 +83,16 @@ def get_vector_services():
     return upsert_document_chunks, delete_document_chunks
 
 
+def get_vector_diff_services():
+    from backend.services.vector.vector_store import delete_chunk_points, update_chunk_positions
+    return delete_chunk_points, update_chunk_positions
+
+
+def get_vector_reference_service():
+    from backend.services.vector.vector_store import set_document_references
+    return set_document_references
+
+
 def get_report_service():
     from backend.services.reporting.report_service import generate_report_for_document
     return generate_report_for_document
@@ -85,6 +120,54 @@ def set_status(db, document, status: str):
     db.refresh(document)
 
 
+def upsert_document_vectors(document_id: int, diff=None):
+    """
+    Bring the vectors of a document up to date with its chunks, with a session
+    of its own for use in a worker thread. If chunks of the previous version
+    were kept (diff.incremental), only the changed chunks are embedded; without
+    a diff all points are replaced.
+    """
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).one()
+        if diff is not None and diff.incremental:
+            apply_chunk_diff_to_vectorstore(db, document, diff)
+        else:
+            upsert_chunks_to_vectorstore(db, document)
+    finally:
+        db.close()
+
+
+def store_parsed_in_own_session(store_parsed_document, document_id: int, parsed):
+    """
+    Store and commit the chunks of a parsed document with a session of its
+    own for use in a worker thread. Returns the parse id and the chunk diff.
+    """
+    db = SessionLocal()
+    try:
+        result = store_parsed_document(db, document_id, parsed)
+        db.commit()
+        return result
+    finally:
+        db.close()
+
+
+def record_stage_timings(document_id: int, timings: dict, total_seconds: float):
+    """
+    Log the seconds every stage of a document took, with the embedding cache
+    hit ratio of the process, and add the timings to the metrics.
+    """
+    metrics.record(timings, prefix="ingestion.stage_seconds.")
+    metrics.increment("ingestion.completed_documents")
+    metrics.increment("ingestion.seconds_to_completed", total_seconds)
+
+    stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+    logger.info(
+        f"Document {document_id} completed in {total_seconds:.2f}s ({stages}), "
+        f"embedding cache hit ratio {embedding_cache_hit_ratio():.2f}"
+    )
+
+
 def is_csv_file(document: Document) -> bool:
     """Checks whether the uploaded document is a CSV file."""
     return document.file_type in ("text/csv", "application/csv") or document.filename.lower().endswith(".csv")
@@ -98,43 +181,161 @@ def cleanup_failed_upload(storage_key: str):
         logger.exception(f"Failed to clean up R2 object after upload error: {storage_key}")
 
 
+def iter_chunk_payloads(db, document_id: int, batch_size: int = VECTOR_BATCH_SIZE, chunk_ids=None):
+    """
+    Yield the vector store payload of every canonical chunk of a document, or
+    of the given chunk ids only, reading the rows from SQL in batches instead
+    of loading all of them at once. Near duplicates are skipped; retrieval
+    reaches them through their canonical chunk.
+    """
+    query = (
+        db.query(
+            DocumentChunk.id,
+            DocumentChunk.text,
+            DocumentChunk.token_count,
+            DocumentChunk.chunk_index,
+            DocumentChunk.page_start,
+            DocumentChunk.page_end,
+            DocumentChunk.section_title,
+            DocumentChunk.keywords,
+        )
+        .filter(
+            DocumentChunk.document_id == document_id,
+            DocumentChunk.duplicate_of_id.is_(None),
+        )
+    )
+    if chunk_ids is not None:
+        query = query.filter(DocumentChunk.id.in_(chunk_ids))
+
+    for row in query.order_by(DocumentChunk.chunk_index).yield_per(batch_size):
+        yield {
+            "id": row.id,
+            "text": row.text,
+            "token_count": row.token_count,
+            "metadata": {
+                "chunk_index": row.chunk_index,
+                "page_start": row.page_start,
+                "page_end": row.page_end,
+                "section_title": row.section_title,
+            },
+            "keywords": row.keywords or [],
+        }
+
+
 def upsert_chunks_to_vectorstore(db, document):
     """
-    Loads text-based document chunks from the database and inserts them into Qdrant.
+    Streams text-based document chunks from the database into Qdrant, one
+    batch at a time, so memory use depends on the batch size and not on the
+    size of the document.
     Used for PDF, TXT and DOCX files after chunking and embedding.
     CSV files use a separate structured processing flow.
     """
     upsert_document_chunks, _ = get_vector_services()
 
-    chunks = (
-        db.query(DocumentChunk)
-        .filter(DocumentChunk.document_id == document.id)
-        .order_by(DocumentChunk.chunk_index)
-        .all()
+    upsert_document_chunks(
+        document_id=document.id,
+        workspace_id=document.workspace_id,
+        chunks=iter_chunk_payloads(db, document.id),
+        batch_size=VECTOR_BATCH_SIZE,
+        references=content_references(db, document.id)[1:],
+        file_kind=document_file_kind(document.file_type, document.filename),
     )
 
-    payload = []
-    for chunk in chunks:
-        payload.append({
-            "id": chunk.id,
-            "text": chunk.text,
-            "metadata": {
-                "chunk_index": chunk.chunk_index,
-                "page_start": getattr(chunk, "page_start", None),
-                "page_end": getattr(chunk, "page_end", None),
-                "section_title": getattr(chunk, "section_title", None),
-            },
-            "keywords": (chunk.keywords or []) if hasattr(chunk, "keywords") else [],
-        })
 
-    if payload:
-        upsert_document_chunks(document_id=document.id, workspace_id=document.workspace_id, chunks=payload)
+def apply_chunk_diff_to_vectorstore(db, document, diff):
+    """
+    Update the vectors of a new document version in place: points of deleted
+    chunks are removed by id, kept chunks that moved get their new position
+    in the payload, and only new or changed chunks are embedded and upserted.
+    """
+    upsert_document_chunks, _ = get_vector_services()
+    delete_chunk_points, update_chunk_positions = get_vector_diff_services()
+
+    delete_chunk_points(document.id, diff.stale_ids)
+
+    if diff.moved_ids:
+        update_chunk_positions(document.id, iter_chunk_payloads(db, document.id, chunk_ids=diff.moved_ids))
+
+    if diff.upsert_ids:
+        upsert_document_chunks(
+            document_id=document.id,
+            workspace_id=document.workspace_id,
+            chunks=iter_chunk_payloads(db, document.id, chunk_ids=diff.upsert_ids),
+            batch_size=VECTOR_BATCH_SIZE,
+            references=content_references(db, document.id)[1:],
+            replace=False,
+            file_kind=document_file_kind(document.file_type, document.filename),
+        )
+
+
+def has_current_report(db, document_id: int, fingerprint: str) -> bool:
+    """True if the document has a report generated from the inputs behind fingerprint."""
+    if not db.query(Report.id).filter(Report.document_id == document_id).first():
+        return False
+    return checkpoint_matches(db, document_id, "report", fingerprint)
+
+
+def replace_document_report(db, document_id: int, content: dict):
+    """Swap the reports of a document for a new one in one commit; the old report stays readable until then."""
+    db.query(Report).filter(Report.document_id == document_id).delete()
+    db.add(Report(document_id=document_id, content=content))
+    db.commit()
+
+
+def clear_document_chunks(db, document_id: int):
+    """Delete the chunks, blocks and vectors of a document, e.g. when a new version is empty."""
+    _, delete_document_chunks = get_vector_services()
+
+    db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
+    db.query(DocumentBlock).filter(DocumentBlock.document_id == document_id).delete()
+    db.commit()
+
+    delete_document_chunks(document_id)
+
+
+def sync_vector_references(db, owner_document_id: int):
+    """Point the shared vectors of an owner document at every document that uses them."""
+    set_document_references = get_vector_reference_service()
+    set_document_references(owner_document_id, content_references(db, owner_document_id))
+
+
+def reuse_document_content(db, document, owner_document_id: int) -> bool:
+    """
+    Complete a deduplicated document with the processed content of its owner:
+    the shared vectors get the document's ids and the owner's latest report
+    is copied. Returns False if the owner is not completed (anymore), in which
+    case the document is detached and processed on its own.
+    """
+    owner = db.query(Document).filter(Document.id == owner_document_id).first()
+
+    if owner is None or owner.file_status != "completed":
+        document.content_id = None
+        db.add(document)
+        db.commit()
+        return False
+
+    sync_vector_references(db, owner.id)
+
+    if not db.query(Report.id).filter(Report.document_id == document.id).first():
+        owner_report = (
+            db.query(Report)
+            .filter(Report.document_id == owner.id)
+            .order_by(Report.created_at.desc())
+            .first()
+        )
+        if owner_report:
+            db.add(Report(document_id=document.id, content=owner_report.content))
+
+    set_status(db, document, "completed")
+
+    logger.info(f"Document {document.id} reuses the processed content of document {owner.id}")
+    return True
 
 
 # -------------------- PROCESS LOGIC --------------------
-async def process_document_logic(document_id: int):
+async def process_document_logic(document_id: int, raise_errors: bool = False, force_rebuild: bool = False):
     """
-    Main background processing pipeline for uploaded documents.
+    Main processing pipeline for uploaded documents, executed by the ingestion worker.
 
     PDF, TXT and DOCX files follow the text-based pipeline:
     1. Parse the document
@@ -149,9 +350,36 @@ async def process_document_logic(document_id: int):
     2. Build schema, profile and summary metadata
     3. Store the structured CSV metadata on the document
     4. Generate a CSV report from the structured metadata
+
+    Uploads whose content was already processed for another document (same bytes,
+    language and pipeline version) reuse its parse, chunks, blocks, vectors and
+    report and skip all stages.
+
+    Reprocessing a document, e.g. a new version, diffs the new chunks against
+    the stored ones by content hash: unchanged chunks keep their vectors, only
+    new chunks are embedded, stale vectors are deleted by id, and only blocks
+    whose chunks changed are structured again.
+
+    Stages 3 and 4-5 only depend on the stored chunks and run concurrently; the
+    report starts once both are done. Stage timings are logged and recorded
+    in the metrics.
+
+    Every completed stage stores a checkpoint with a fingerprint of its inputs
+    (document_checkpoints). A retry or a new processing run skips the stages
+    whose inputs did not change, e.g. a failed report is generated again
+    without parsing or embedding the document again. POST /{id}/process?force=true
+    clears the checkpoints and queues the job with force_rebuild, so every stage
+    runs and rebuilds from scratch: all chunks are embedded again with their
+    previous points replaced, and every block is recreated and structured again.
+
+    Every stage waits for a slot of its stage limit (parse, embed, structure, report).
+    Parsing and chunking run in the parser process pool and other blocking work runs
+    in a thread, so one worker can process several documents concurrently.
+    With raise_errors=True a failure is re-raised after the document was marked
+    as failed, so the job queue can schedule a retry.
     """
 
-    chunk_text_from_text, chunk_pdf, MAX_TOKENS = get_chunking_services()
+    parse_in_pool, store_parsed_document = get_parsing_services()
     create_blocks_from_chunks, structure_blocks = get_block_services()
     generate_report_for_document = get_report_service()
     upsert_document_chunks, delete_document_chunks = get_vector_services()
@@ -168,64 +396,77 @@ async def process_document_logic(document_id: int):
             logger.error(f"Document {document_id} not found")
             return
 
-        local_file = download_to_temp_file(document.storage_path)
-
-        db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete()
-        db.commit()
-
-        delete_document_chunks(document.id)
+        owner_document_id = artifact_document_id(db, document)
+        if owner_document_id != document.id:
+            if await asyncio.to_thread(reuse_document_content, db, document, owner_document_id):
+                return
 
-        db.query(Report).filter(Report.document_id == document.id).delete()
-        db.commit()
+        parse_fp = parse_fingerprint(document)
+        parse_id = None
+        chunk_diff = None
 
         set_status(db, document, "processing")
 
-        parse_id = None
-
         if is_csv_file(document):
-            set_status(db, document, "parsing")
-
-            logger.info(f"Structured CSV processing started for document {document.id}")
-
-            parquet_key = create_and_upload_parquet_from_csv_file(
-                csv_file_path=str(local_file),
-                original_filename=document.filename,
-            )
-
-            csv_metadata = build_csv_profile_from_file(
-                csv_file_path=str(local_file),
-                filename=document.filename,
-            )
-
-            document.parquet_key = parquet_key
-            document.csv_schema = csv_metadata.get("schema")
-            document.csv_profile = csv_metadata.get("profile")
-            document.csv_summary = csv_metadata.get("summary")
-
-            db.add(document)
-            db.commit()
-            db.refresh(document)
-
-            set_status(db, document, "report_generating")
-
-            csv_report_data = generate_csv_report(
-                filename=document.filename,
-                csv_schema=document.csv_schema or [],
-                csv_profile=document.csv_profile or {},
-                csv_summary=document.csv_summary or {},
-                language=document.language or "de",
-                base_meta={
-                    "document_id": document.id,
-                    "workspace_id": document.workspace_id,
-                    "filename": document.filename,
-                    "report_mode": "csv_structured",
-                },
-            )
-
-            report = Report(document_id=document.id, content=csv_report_data)
-            db.add(report)
-            db.commit()
-            db.refresh(report)
+            if not (document.parquet_key and checkpoint_matches(db, document.id, "parse", parse_fp)):
+                local_file = await asyncio.to_thread(download_to_temp_file, document.storage_path)
+
+                db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete()
+                db.commit()
+
+                await asyncio.to_thread(delete_document_chunks, document.id)
+
+                async with stage_slot("parse"):
+                    set_status(db, document, "parsing")
+
+                    logger.info(f"Structured CSV processing started for document {document.id}")
+
+                    parquet_key = await asyncio.to_thread(
+                        create_and_upload_parquet_from_csv_file,
+                        csv_file_path=str(local_file),
+                        original_filename=document.filename,
+                    )
+
+                    csv_metadata = await asyncio.to_thread(
+                        build_csv_profile_from_file,
+                        csv_file_path=str(local_file),
+                        filename=document.filename,
+                    )
+
+                document.parquet_key = parquet_key
+                document.csv_schema = csv_metadata.get("schema")
+                document.csv_profile = csv_metadata.get("profile")
+                document.csv_summary = csv_metadata.get("summary")
+
+                db.add(document)
+                db.commit()
+                db.refresh(document)
+
+                save_checkpoint(db, document.id, "parse", parse_fp)
+
+            report_fp = stage_fingerprint("report", parse_fp, document.language, document.filename)
+
+            if not has_current_report(db, document.id, report_fp):
+                async with stage_slot("report"):
+                    set_status(db, document, "report_generating")
+
+                    csv_report_data = await asyncio.to_thread(
+                        generate_csv_report,
+                        filename=document.filename,
+                        csv_schema=document.csv_schema or [],
+                        csv_profile=document.csv_profile or {},
+                        csv_summary=document.csv_summary or {},
+                        language=document.language or "de",
+                        base_meta={
+                            "document_id": document.id,
+                            "workspace_id": document.workspace_id,
+                            "filename": document.filename,
+                            "report_mode": "csv_structured",
+                        },
+                    )
+
+                replace_document_report(db, document.id, csv_report_data)
+                save_checkpoint(db, document.id, "report", report_fp)
 
             set_status(db, document, "completed")
 
@@ -233,108 +474,131 @@ async def process_document_logic(document_id: int):
 
             return
 
-        elif document.file_type in ("text/plain", "text/markdown"):
-            set_status(db, document, "parsing")
+        timings = {}
+        started = time.perf_counter()
 
-            full_text = parse_txt(local_file)
-
-            if not full_text.strip():
-                set_status(db, document, "parsed_empty")
-                return
-
-            set_status(db, document, "chunking")
-
-            chunk_text_from_text(
-                db=db,
-                document_id=document.id,
-                parse_id=None,
-                text=full_text,
-                max_tokens=MAX_TOKENS,
-                split_markdown_headings=document.file_type == "text/markdown",
-            )
-            db.commit()
-
-            set_status(db, document, "embedding")
-            upsert_chunks_to_vectorstore(db, document)
-
-            set_status(db, document, "blocking")
-
-            create_blocks_from_chunks(
-                document_id=document.id,
-                parse_id=None,
-            )
-
-        elif document.file_type in (
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        ):
-            set_status(db, document, "parsing")
-
-            full_text = parse_docx(local_file)
-
-            if not full_text.strip():
-                set_status(db, document, "parsed_empty")
-                return
-
-            set_status(db, document, "chunking")
-
-            chunk_text_from_text(
-                db=db,
-                document_id=document.id,
-                parse_id=None,
-                text=full_text,
-                max_tokens=MAX_TOKENS,
-                split_markdown_headings=True,
-            )
-            db.commit()
-
-            set_status(db, document, "embedding")
-            upsert_chunks_to_vectorstore(db, document)
-
-            set_status(db, document, "blocking")
-
-            create_blocks_from_chunks(
-                document_id=document.id,
-                parse_id=None,
-            )
+        parse_current = checkpoint_matches(db, document.id, "parse", parse_fp) and has_stored_chunks(db, document.id)
 
+        if parse_current:
+            # None for TXT, DOCX and Markdown, which have no DocumentParse row
+            parse_id = latest_parse_id(db, document.id)
         else:
-            set_status(db, document, "parsing")
-
-            parse_id, total_chunks = chunk_pdf(
-                document_id=document.id,
-                pdf_path=local_file,
+            # Chunks, blocks and vectors stay until the new parse is diffed against them
+            local_file = await asyncio.to_thread(download_to_temp_file, document.storage_path)
+
+            async with stage_slot("parse"):
+                set_status(db, document, "parsing")
+
+                # PDF, DOCX, TXT and Markdown are parsed and chunked in a parser process
+                parsed = await parse_in_pool(str(local_file), document.file_type)
+
+                if not parsed.is_pdf and not parsed.full_text.strip():
+                    await asyncio.to_thread(clear_document_chunks, db, document.id)
+                    set_status(db, document, "parsed_empty")
+                    return
+
+                set_status(db, document, "chunking")
+
+                # Hashing, diffing and inserting thousands of chunks must not block the event loop
+                parse_id, chunk_diff = await asyncio.to_thread(
+                    store_parsed_in_own_session, store_parsed_document, document.id, parsed
+                )
+
+            save_checkpoint(db, document.id, "parse", parse_fp)
+            logger.info(f"Chunking completed for document ID {document.id} ({len(parsed.chunks)} chunks)")
+
+            # The chunks are stored; do not keep the parsed text alive during the later stages
+            del parsed
+
+        timings["parse"] = time.perf_counter() - started
+
+        chunks_fp = chunks_fingerprint(db, document.id)
+        embed_fp = stage_fingerprint("embed", chunks_fp)
+        blocks_fp = stage_fingerprint("blocks", chunks_fp)
+
+        # The embed and structure stages run concurrently, so each one reads and
+        # writes its checkpoints with a session of its own and neither touches
+        # db or document; the status covers both of them
+        async def embed_stage():
+            stage_db = SessionLocal()
+            try:
+                if checkpoint_matches(stage_db, document_id, "embed", embed_fp):
+                    return
+
+                async with stage_slot("embed"):
+                    await asyncio.to_thread(
+                        upsert_document_vectors, document_id, None if force_rebuild else chunk_diff
+                    )
+
+                save_checkpoint(stage_db, document_id, "embed", embed_fp)
+            finally:
+                stage_db.close()
+
+        structure_fp = None
+
+        async def structure_stage():
+            nonlocal structure_fp
+
+            stage_db = SessionLocal()
+            try:
+                if not checkpoint_matches(stage_db, document_id, "blocks", blocks_fp):
+                    async with stage_slot("structure"):
+                        await asyncio.to_thread(
+                            create_blocks_from_chunks,
+                            document_id=document_id,
+                            parse_id=parse_id,
+                            reuse_structured=not force_rebuild,
+                        )
+
+                    save_checkpoint(stage_db, document_id, "blocks", blocks_fp)
+
+                structure_fp = stage_fingerprint("structure", blocks_fingerprint(stage_db, document_id))
+
+                if not checkpoint_matches(stage_db, document_id, "structure", structure_fp):
+                    async with stage_slot("structure"):
+                        await structure_blocks(
+                            document_id=document_id,
+                            parse_id=parse_id,
+                        )
+
+                    save_checkpoint(stage_db, document_id, "structure", structure_fp)
+            finally:
+                stage_db.close()
+
+        async def report_stage():
+            # The report reads the embedded chunks and the structured blocks
+            report_fp = stage_fingerprint(
+                "report", embed_fp, structure_fp, document.language, document.filename
             )
+            if has_current_report(db, document.id, report_fp):
+                return
 
-            set_status(db, document, "embedding")
-            upsert_chunks_to_vectorstore(db, document)
-
-            logger.info(f"Embedding completed for document ID {document.id} ({total_chunks} chunks)")
-
-            set_status(db, document, "blocking")
+            async with stage_slot("report"):
+                set_status(db, document, "report_generating")
+                report_data = await generate_report_for_document(db, document_id)
 
-            create_blocks_from_chunks(
-                document_id=document.id,
-                parse_id=parse_id,
-            )
+            replace_document_report(db, document.id, report_data)
+            save_checkpoint(db, document.id, "report", report_fp)
 
-        set_status(db, document, "structuring")
+        set_status(db, document, "indexing")
 
-        await structure_blocks(
-            document_id=document.id,
-            parse_id=parse_id,
+        # Embedding and block structuring only need the committed chunks
+        await run_stage_graph(
+            [
+                Stage("embed", embed_stage),
+                Stage("structure", structure_stage),
+                Stage("report", report_stage, after=("embed", "structure")),
+            ],
+            timings,
         )
 
-        set_status(db, document, "report_generating")
-
-        report_data = await generate_report_for_document(db, document_id)
+        set_status(db, document, "completed")
 
-        report = Report(document_id=document.id, content=report_data)
-        db.add(report)
+        # Later uploads of the same bytes reuse this document's content
+        register_document_content(db, document)
         db.commit()
-        db.refresh(report)
-
-        set_status(db, document, "completed")
 
+        record_stage_timings(document.id, timings, time.perf_counter() - started)
         logger.info(f"Report created for document {document.id}")
 
     except Exception as e:
@@ -345,6 +609,9 @@ async def process_document_logic(document_id: int):
 
         logger.exception(f"Document {document_id} processing failed: {e}")
 
+        if raise_errors:
+            raise
+
     finally:
         if local_file and local_file.exists():
             local_file.unlink()
@@ -377,6 +644,7 @@ def get_documents(workspace_id: int | None = None, current_user: User = Depends(
                 "file_type": document.file_type,
                 "file_status": document.file_status,
                 "language": document.language,
+                "version": document.version,
                 "created_at": document.created_at,
                 "workspace_id": document.workspace_id,
             }
@@ -393,7 +661,6 @@ def get_documents(workspace_id: int | None = None, current_user: User = Depends(
 
 @router.post("/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     language: str = Form("de"),
     workspace_id: int | None = Form(default=None),
@@ -427,10 +694,20 @@ async def upload_document(
             language=(language or "de").strip(),
             workspace_id=workspace_id,
             uploaded_by_user_id=current_user.id,
+            content_sha256=compute_content_sha256(file_bytes),
         )
 
+        # CSV files keep their structured metadata on the document itself
+        reused_content = None
+        if not is_csv_file(document):
+            reused_content = find_reusable_content(db, document.content_sha256, document.language)
+            document.content_id = reused_content.id if reused_content else None
+
         db.add(document)
-        db.commit()
+        db.flush()
+
+        # Commits the document together with its processing job
+        enqueue_document_job(db, document.id)
         storage_cleanup_required = False
         db.refresh(document)
 
@@ -438,14 +715,13 @@ async def upload_document(
             f"Uploaded file '{validated_upload.filename}' as document ID {document.id}"
         )
 
-        background_tasks.add_task(process_document_logic, document.id)
-
         return {
-            "message": "Document uploaded successfully and processing started",
+            "message": "Document uploaded successfully and processing queued",
             "document_id": document.id,
             "status": document.file_status,
             "language": document.language,
             "workspace_id": document.workspace_id,
+            "reused_content": reused_content is not None,
         }
 
     except HTTPException:
@@ -462,9 +738,24 @@ async def upload_document(
         db.close()
 
 
-@router.post("/{id}/process")
-async def process_document_route(id: int, current_user: User = Depends(get_current_user)):
+@router.post("/{id}/versions")
+async def upload_document_version(
+    id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Replace the file of a document with a new version and queue it for
+    processing. The new chunks are diffed against the stored ones, so only
+    changed chunks are embedded and only changed blocks are structured again.
+    Rejected with 409 while a processing job of the document is queued or
+    running.
+    """
     db = SessionLocal()
+    storage_key = None
+    storage_cleanup_required = False
+    synced_owner_id = None
+    previous_owner_id = None
 
     try:
         document = db.query(Document).filter(Document.id == id).first()
@@ -475,12 +766,119 @@ async def process_document_route(id: int, current_user: User = Depends(get_curre
         if not user_has_access_to_document(db, current_user.id, document):
             raise HTTPException(status_code=403, detail="Forbidden")
 
+        # Enqueueing is idempotent per document: while a job is active, the new
+        # version would be attached to it and possibly never be processed
+        if get_active_job(db, document.id):
+            raise HTTPException(
+                status_code=409,
+                detail="Document is still being processed; upload the new version when it is done",
+            )
+
+        try:
+            file_bytes = await read_upload_with_limit(file)
+            validated_upload = validate_upload(file.filename, file_bytes)
+        except UploadValidationError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+
+        storage_key = upload_file(file_bytes, validated_upload.filename)
+        storage_cleanup_required = True
+        previous_storage_path = document.storage_path
+
+        # Documents sharing the previous content keep it; this document gets its own
+        previous_owner_id = artifact_document_id(db, document)
+        owner_document_id = release_document_content(db, document)
+
+        document.filename = validated_upload.filename
+        document.file_type = validated_upload.content_type
+        document.storage_path = storage_key
+        document.content_sha256 = compute_content_sha256(file_bytes)
+        document.version = (document.version or 1) + 1
+        document.file_status = "uploaded"
+        db.add(document)
+        db.flush()
+
+        # The shared vectors must stop listing this document before its job is
+        # committed: the job replaces this document's points, which would delete
+        # the vectors of the documents that keep the content. If Qdrant fails,
+        # nothing is committed.
+        if owner_document_id is not None:
+            sync_vector_references(db, owner_document_id)
+            synced_owner_id = owner_document_id
+
+        # Commits the new version together with its processing job
+        enqueue_document_job(db, document.id)
+        synced_owner_id = None
+        storage_cleanup_required = False
+        db.refresh(document)
+
+        try:
+            delete_file(previous_storage_path)
+        except Exception:
+            logger.exception(f"Failed to delete the previous version of document {document.id}: {previous_storage_path}")
+
+        logger.info(f"Uploaded version {document.version} of document ID {document.id}")
+
+        return {
+            "message": "New document version uploaded and processing queued",
+            "document_id": document.id,
+            "version": document.version,
+            "status": document.file_status,
+        }
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Version upload failed: {e}")
+
+        if synced_owner_id is not None:
+            # The version was not committed, so the shared vectors list this document again
+            try:
+                set_document_references = get_vector_reference_service()
+                set_document_references(synced_owner_id, content_references(db, previous_owner_id))
+            except Exception:
+                logger.exception(f"Failed to restore the vector references of document {id}")
+
+        raise HTTPException(status_code=500, detail="Document version upload failed")
     finally:
+        if storage_cleanup_required and storage_key:
+            cleanup_failed_upload(storage_key)
+        await file.close()
         db.close()
 
-    await process_document_logic(id)
 
-    return {"message": f"Processing started for document {id}"}
+@router.post("/{id}/process")
+def process_document_route(id: int, force: bool = False, current_user: User = Depends(get_current_user)):
+    """
+    Queue processing of a document. Stages whose inputs did not change since
+    they last completed are skipped; force=true rebuilds all of them.
+    """
+    db = SessionLocal()
+
+    try:
+        document = db.query(Document).filter(Document.id == id).first()
+
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        if not user_has_access_to_document(db, current_user.id, document):
+            raise HTTPException(status_code=403, detail="Forbidden")
+
+        if force:
+            clear_checkpoints(db, document.id)
+
+        job = enqueue_document_job(db, document.id, force_rebuild=force)
+
+        return {
+            "message": f"Processing queued for document {id}",
+            "document_id": document.id,
+            "job_id": job.id,
+            "job_status": job.status,
+        }
+
+    finally:
+        db.close()
 
 
 @router.get("/{id}")
@@ -502,6 +900,7 @@ def get_document(id: int, current_user: User = Depends(get_current_user)):
             "file_type": document.file_type,
             "file_status": document.file_status,
             "language": document.language,
+            "version": document.version,
             "created_at": document.created_at,
             "workspace_id": document.workspace_id,
         }
@@ -580,18 +979,14 @@ def transfer_document(id: int, payload: DocumentTransferIn, current_user: User =
         if source.workspace_id == payload.target_workspace_id:
             raise HTTPException(status_code=400, detail="Document is already in this workspace")
 
-        _, delete_document_chunks = get_vector_services()
-
         if payload.mode == "move":
-            delete_document_chunks(source.id)
-
             source.workspace_id = payload.target_workspace_id
             db.add(source)
             db.commit()
             db.refresh(source)
 
-            if source.file_status == "completed":
-                upsert_chunks_to_vectorstore(db, source)
+            # The vectors stay; only the workspace ids in their payload change
+            sync_vector_references(db, artifact_document_id(db, source))
 
             return {
                 "message": "Document moved successfully",
@@ -615,97 +1010,41 @@ def transfer_document(id: int, payload: DocumentTransferIn, current_user: User =
             csv_profile=source.csv_profile,
             csv_summary=source.csv_summary,
 
+            content_sha256=source.content_sha256,
+
             workspace_id=payload.target_workspace_id,
             uploaded_by_user_id=current_user.id,
         )
 
+        # The copy references the source's processed content (parse, chunks,
+        # blocks, vectors) instead of duplicating it; CSV files keep their
+        # processed metadata on the document row
+        content = None
+        if not is_csv_file(source):
+            content = share_document_content(db, source)
+            copied.content_id = content.id
+
         db.add(copied)
         db.flush()
 
-        parse_id_map: dict[int, int] = {}
-
-        source_parses = (
-            db.query(DocumentParse)
-            .filter(DocumentParse.document_id == source.id)
-            .all()
-        )
-
-        for parse in source_parses:
-            copied_parse = DocumentParse(
-                document_id=copied.id,
-                success=parse.success,
-                full_text=parse.full_text,
-                page_count=parse.page_count,
-                used_ocr=parse.used_ocr,
-                warnings=parse.warnings,
-            )
-
-            db.add(copied_parse)
-            db.flush()
-
-            parse_id_map[parse.id] = copied_parse.id
-
-        source_chunks = (
-            db.query(DocumentChunk)
-            .filter(DocumentChunk.document_id == source.id)
-            .all()
-        )
-
-        for chunk in source_chunks:
-            copied_chunk = DocumentChunk(
-                document_id=copied.id,
-                parse_id=parse_id_map.get(chunk.parse_id) if chunk.parse_id else None,
-                chunk_index=chunk.chunk_index,
-                section_title=chunk.section_title,
-                section_level=chunk.section_level,
-                page_start=chunk.page_start,
-                page_end=chunk.page_end,
-                text=chunk.text,
-                summary=chunk.summary,
-                keywords=chunk.keywords,
-                topics=chunk.topics,
-                token_count=chunk.token_count,
-            )
-
-            db.add(copied_chunk)
-
-        source_blocks = (
-            db.query(DocumentBlock)
-            .filter(DocumentBlock.document_id == source.id)
-            .all()
-        )
-
-        for block in source_blocks:
-            copied_block = DocumentBlock(
-                document_id=copied.id,
-                parse_id=parse_id_map.get(block.parse_id) if block.parse_id else None,
-                block_index=block.block_index,
-                block_type=block.block_type,
-                semantic_label=block.semantic_label,
-                title=block.title,
-                content=block.content,
-                summary=block.summary,
-                confidence=block.confidence,
-            )
-
-            db.add(copied_block)
-
-        source_reports = (
-            db.query(Report)
+        report_contents = (
+            db.query(Report.content)
             .filter(Report.document_id == source.id)
+            .order_by(Report.id)
             .all()
         )
 
-        for report in source_reports:
-            copied_report = Report(document_id=copied.id, content=report.content)
-
-            db.add(copied_report)
+        bulk_insert_returning_ids(
+            db,
+            Report,
+            ({"document_id": copied.id, "content": report_content} for (report_content,) in report_contents),
+        )
 
         db.commit()
         db.refresh(copied)
 
-        if copied.file_status == "completed":
-            upsert_chunks_to_vectorstore(db, copied)
+        if content is not None and copied.file_status == "completed":
+            sync_vector_references(db, content.owner_document_id)
 
         return {
             "message": "Document copied successfully",
@@ -740,7 +1079,14 @@ def delete_document(id: int, current_user: User = Depends(get_current_user)):
 
         _, delete_document_chunks = get_vector_services()
 
-        delete_document_chunks(id)
+        # Content shared with other documents stays, only this document's ids are removed
+        owner_document_id = release_document_content(db, document)
+
+        if owner_document_id is None:
+            delete_document_chunks(id)
+        else:
+            sync_vector_references(db, owner_document_id)
+
         delete_file(document.storage_path)
 
         if document.parquet_key:
@@ -10,7 +10,7 @@ from backend.database.database import SessionLocal
 from backend.models.document import Document
 
 from backend.services.csv.csv_chat_service import answer_csv_question
-from backend.services.vector.retrieval_service import search_chunks
+from backend.services.vector.retrieval_service import search_chunks_async
 from backend.services.observability.langfuse_client import langfuse
 from backend.services.observability.langfuse_helpers import (
     langfuse_span,
@@ -243,7 +243,7 @@ async def generate_chat_response(
         return "No workspace selected."
 
     retrieval_query = build_retrieval_query(message, history)
-    chunks = search_chunks(
+    chunks = await search_chunks_async(
         query=retrieval_query,
         workspace_id=workspace_id,
         document_id=document_id,
@@ -254,27 +254,37 @@ async def generate_chat_response(
 
     context_parts = []
     sources = set()
-    db = SessionLocal()
 
-    try:
-        for c in chunks:
-            if c["text"]:
-                context_parts.append(c["text"])
+    # search_chunks_async returns the filenames; look up the rest in one query
+    filenames = {c["document_id"]: c["filename"] for c in chunks if c.get("filename")}
+    missing_ids = {c["document_id"] for c in chunks} - filenames.keys()
 
-            doc = db.query(Document).filter(Document.id == c["document_id"]).first()
+    if missing_ids:
+        db = SessionLocal()
+        try:
+            filenames.update(
+                db.query(Document.id, Document.filename).filter(Document.id.in_(missing_ids)).all()
+            )
+        finally:
+            db.close()
+
+    for c in chunks:
+        if c["text"]:
+            context_parts.append(c["text"])
 
-            if not doc:
-                continue
+        if c["document_id"] not in filenames:
+            continue
 
-            src = doc.filename
+        src = filenames[c["document_id"]]
 
-            if c["page"]:
-                src += f" – page {c['page']}"
+        pages = c.get("pages") or ([c["page"]] if c["page"] else [])
 
-            sources.add(src)
+        if len(pages) > 1:
+            src += f" – pages {', '.join(str(page) for page in pages)}"
+        elif pages:
+            src += f" – page {pages[0]}"
 
-    finally:
-        db.close()
+        sources.add(src)
 
     context = "\n\n".join(context_parts)
 
@@ -0,0 +1,152 @@
+import re
+import zlib
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import update
+
+from backend.models.document_chunk import DocumentChunk
+from backend.services.observability import metrics
+
+logger = logging.getLogger(__name__)
+
+# Chunks whose estimated Jaccard similarity of word shingles reaches this
+# threshold are linked to the first such chunk of their document
+NEAR_DUPLICATE_THRESHOLD = 0.85
+SHINGLE_WORDS = 3
+MINHASH_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs from a similarity of about 0.7 become candidates
+LSH_BANDS = 16
+
+# Shingle hashes and both coefficients are reduced below this prime, so
+# a * h + b fits into uint64 and (a * h + b) mod p is a proper universal hash
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+# Fixed seed, so signatures are stable across processes
+_PERMUTATION_A, _PERMUTATION_B = np.random.default_rng(1).integers(
+    1, (1 << 31) - 1, size=(2, MINHASH_PERMUTATIONS), dtype=np.uint64
+)
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+# Page references of headers and footers ("page 3", "Seite 3 von 40", "p. 3")
+_PAGE_REFERENCE = re.compile(
+    r"\b(?:page|seite|p\.|s\.)\s*\d+(?:\s*(?:of|von|/)\s*\d+)?",
+    re.IGNORECASE,
+)
+
+
+def _normalized(text: str) -> str:
+    # Only page references are folded, so repeated headers and footers match
+    # while paragraphs with different figures (e.g. FY2023 and FY2024) do not
+    return _PAGE_REFERENCE.sub("page", text.lower())
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    """Numbers of a text outside its page references, in order."""
+    return tuple(_NUMBER.findall(_normalized(text)))
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(_normalized(text))
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of the word shingles of text, None for text without words."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    ) % _MERSENNE_PRIME
+    permuted = (np.outer(hashes, _PERMUTATION_A) + _PERMUTATION_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def find_near_duplicates(
+        texts: Iterable[str],
+        threshold: float = NEAR_DUPLICATE_THRESHOLD
+) -> List[Optional[int]]:
+    """
+    For every text, the position of the earlier text it nearly duplicates, or
+    None. Candidates come from LSH buckets of the MinHash signatures and are
+    confirmed by their estimated similarity and identical numbers, apart
+    from page references. Duplicates always point at a
+    canonical text, never at another duplicate.
+    """
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    signatures: Dict[int, np.ndarray] = {}
+    numbers: Dict[int, Tuple[str, ...]] = {}
+    canonical: List[Optional[int]] = []
+
+    for position, text in enumerate(texts):
+        signature = minhash_signature(text)
+        if signature is None:
+            canonical.append(None)
+            continue
+
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+        candidates = sorted({candidate for key in keys for candidate in buckets.get(key, ())})
+        text_numbers = _numbers(text)
+
+        # A duplicate is never embedded, so texts whose figures differ are
+        # always kept, however similar their wording is
+        match = next(
+            (
+                candidate for candidate in candidates
+                if numbers[candidate] == text_numbers
+                and np.mean(signatures[candidate] == signature) >= threshold
+            ),
+            None,
+        )
+        canonical.append(match)
+
+        if match is None:
+            signatures[position] = signature
+            numbers[position] = text_numbers
+            for key in keys:
+                buckets.setdefault(key, []).append(position)
+
+    return canonical
+
+
+def link_near_duplicate_chunks(
+        db,
+        document_id: int,
+        chunk_ids: Sequence[int],
+        texts: Sequence[str]
+) -> Dict[int, int]:
+    """
+    Point every near-duplicate chunk of a document at its canonical chunk via
+    duplicate_of_id, so it is not embedded. Logs the dedup ratio of the
+    document and returns {duplicate chunk id: canonical chunk id}; the caller commits.
+    """
+    canonical = find_near_duplicates(texts)
+    links = {
+        chunk_ids[position]: chunk_ids[match]
+        for position, match in enumerate(canonical)
+        if match is not None
+    }
+
+    if links:
+        db.execute(
+            update(DocumentChunk),
+            [{"id": chunk_id, "duplicate_of_id": canonical_id} for chunk_id, canonical_id in links.items()],
+        )
+
+    metrics.increment("chunk_dedup.chunks", len(chunk_ids))
+    metrics.increment("chunk_dedup.duplicates", len(links))
+
+    ratio = len(links) / len(chunk_ids) if chunk_ids else 0.0
+    logger.info(
+        f"Document {document_id}: {len(links)} of {len(chunk_ids)} chunks are near duplicates "
+        f"(dedup ratio {ratio:.1%})"
+    )
+    return links
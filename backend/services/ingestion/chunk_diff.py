@@ -0,0 +1,153 @@
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import update
+
+from backend.models.document_chunk import DocumentChunk
+from backend.services.ingestion.chunk_dedup import link_near_duplicate_chunks
+from backend.services.ingestion.chunking_service import ChunkRecord, insert_chunk_records
+from backend.services.observability import metrics
+
+logger = logging.getLogger(__name__)
+
+# Chunk ids per DELETE ... WHERE id IN (...)
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass
+class ChunkDiff:
+    """
+    How the stored chunks of a document changed when it was parsed again.
+    Vector work is listed by chunk id: chunks to embed and upsert, points to
+    delete, and points whose position payload (chunk index, pages, section)
+    changed.
+    """
+    kept: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    upsert_ids: List[int] = field(default_factory=list)
+    stale_ids: List[int] = field(default_factory=list)
+    moved_ids: List[int] = field(default_factory=list)
+
+    @property
+    def incremental(self) -> bool:
+        """True if chunks of the previous version were kept with their vectors."""
+        return self.kept > 0
+
+
+def chunk_text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def replace_document_chunks(
+        db,
+        document_id: int,
+        parse_id: Optional[int],
+        records: Sequence[ChunkRecord]
+) -> ChunkDiff:
+    """
+    Store the chunks of a new parse of a document by diffing them against the
+    stored chunks by content hash. A stored chunk with the same text keeps its
+    row, id and vector and only gets the new position; chunks that are gone
+    are deleted and new ones inserted. Near-duplicate links are rebuilt for
+    the whole document. The caller commits.
+    """
+    old_rows = (
+        db.query(
+            DocumentChunk.id,
+            DocumentChunk.text,
+            DocumentChunk.chunk_index,
+            DocumentChunk.page_start,
+            DocumentChunk.page_end,
+            DocumentChunk.section_title,
+            DocumentChunk.duplicate_of_id,
+        )
+        .filter(DocumentChunk.document_id == document_id)
+        .order_by(DocumentChunk.chunk_index)
+        .all()
+    )
+
+    # Stored chunks by text hash, in document order, so repeated texts match in order
+    by_hash: Dict[str, List] = {}
+    for row in old_rows:
+        by_hash.setdefault(chunk_text_sha256(row.text), []).append(row)
+    for rows in by_hash.values():
+        rows.reverse()
+
+    matches = []
+    for record in records:
+        candidates = by_hash.get(chunk_text_sha256(record.text))
+        matches.append(candidates.pop() if candidates else None)
+
+    kept_ids = {row.id for row in matches if row is not None}
+    deleted_rows = [row for row in old_rows if row.id not in kept_ids]
+
+    for start in range(0, len(deleted_rows), DELETE_BATCH_SIZE):
+        batch = [row.id for row in deleted_rows[start:start + DELETE_BATCH_SIZE]]
+        db.query(DocumentChunk).filter(DocumentChunk.id.in_(batch)).delete(synchronize_session=False)
+
+    kept_updates = [
+        {
+            "id": row.id,
+            "parse_id": parse_id,
+            "chunk_index": record.chunk_index,
+            "token_count": record.token_count,
+            "section_title": record.section_title,
+            "section_level": record.section_level,
+            "page_start": record.page_start,
+            "page_end": record.page_end,
+            # Rebuilt below for the new chunk sequence
+            "duplicate_of_id": None,
+        }
+        for record, row in zip(records, matches)
+        if row is not None
+    ]
+    if kept_updates:
+        db.execute(update(DocumentChunk), kept_updates)
+
+    new_ids = iter(
+        insert_chunk_records(db, document_id, parse_id, [
+            record for record, row in zip(records, matches) if row is None
+        ])
+    )
+    chunk_ids = [row.id if row is not None else next(new_ids) for row in matches]
+
+    links = link_near_duplicate_chunks(db, document_id, chunk_ids, [record.text for record in records])
+
+    diff = ChunkDiff(
+        kept=len(kept_ids),
+        inserted=len(records) - len(kept_ids),
+        deleted=len(deleted_rows),
+        stale_ids=[row.id for row in deleted_rows if row.duplicate_of_id is None],
+    )
+
+    for record, row, chunk_id in zip(records, matches, chunk_ids):
+        indexed = chunk_id not in links
+
+        if row is None:
+            if indexed:
+                diff.upsert_ids.append(chunk_id)
+            continue
+
+        was_indexed = row.duplicate_of_id is None
+        if indexed and not was_indexed:
+            diff.upsert_ids.append(chunk_id)
+        elif was_indexed and not indexed:
+            diff.stale_ids.append(chunk_id)
+        elif indexed and (row.chunk_index, row.page_start, row.page_end, row.section_title) != (
+            record.chunk_index, record.page_start, record.page_end, record.section_title
+        ):
+            diff.moved_ids.append(chunk_id)
+
+    metrics.increment("ingestion.chunks_kept", diff.kept)
+    metrics.increment("ingestion.chunks_inserted", diff.inserted)
+    metrics.increment("ingestion.chunks_deleted", diff.deleted)
+
+    if old_rows:
+        logger.info(
+            f"Document {document_id}: kept {diff.kept}, inserted {diff.inserted} and deleted "
+            f"{diff.deleted} chunks; {len(diff.upsert_ids)} to embed"
+        )
+    return diff
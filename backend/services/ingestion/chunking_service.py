@@ -1,18 +1,29 @@
 import re
-from typing import Iterator, List, Optional, Tuple
+from dataclasses import dataclass
+from itertools import groupby, islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-from backend.database.database import SessionLocal
+from backend.database.bulk_insert import bulk_insert_returning_ids
 from backend.models.document_chunk import DocumentChunk
-from backend.parsers.pdf_parser import parse_document
+from backend.parsers.pdf_text_parser import PdfTextBlock
+from backend.services.llm.tokenizer import get_embedding_encoding
 
-import tiktoken
 from docling.chunking import HybridChunker
+from docling_core.transforms.chunker.hierarchical_chunker import ChunkingDocSerializer, ChunkingSerializerProvider
 from docling_core.transforms.chunker.tokenizer.openai import OpenAITokenizer
+from docling_core.transforms.serializer.markdown import MarkdownTableSerializer
 
-ENCODING = tiktoken.encoding_for_model("gpt-4o-mini")
+# Chunks are sized with the embedding model's tokenizer, so their stored
+# token counts are the ones embedding requests are packed by
+ENCODING = get_embedding_encoding()
 MAX_TOKENS = 800
 CHUNK_OVERLAP_TOKENS = 80
 
+# Chunk rows per bulk INSERT
+CHUNK_INSERT_BATCH_SIZE = 1000
+# PDF sections per tiktoken encode_batch call
+PDF_ENCODE_BATCH_SIZE = 64
+
 MARKDOWN_ATX_HEADING = re.compile(
     r"^[ \t]{0,3}(#{1,6})(?:[ \t]+|$)(.*?)(?:\r?\n)?$"
 )
@@ -21,9 +32,34 @@ MARKDOWN_SETEXT_HEADING = re.compile(
 )
 MARKDOWN_FENCE = re.compile(r"^[ \t]{0,3}(`{3,}|~{3,})")
 
+
+class MarkdownTableSerializerProvider(ChunkingSerializerProvider):
+    """Serialize tables as Markdown tables instead of row/column triplets."""
+
+    def get_serializer(self, doc):
+        return ChunkingDocSerializer(doc=doc, table_serializer=MarkdownTableSerializer())
+
+
 # Initialize PDF chunker once
 TOKENIZER = OpenAITokenizer(tokenizer=ENCODING, max_tokens=MAX_TOKENS)
-PDF_CHUNKER = HybridChunker(tokenizer=TOKENIZER)
+PDF_CHUNKER = HybridChunker(tokenizer=TOKENIZER, serializer_provider=MarkdownTableSerializerProvider())
+
+
+@dataclass(frozen=True)
+class ChunkRecord:
+    """
+    A chunk that has not been stored yet.
+
+    Plain and picklable, so chunks can be produced in parser worker processes
+    and persisted by the caller.
+    """
+    chunk_index: int
+    text: str
+    token_count: int
+    section_title: Optional[str] = None
+    section_level: Optional[int] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
 
 
 # ------------- TEXT CHUNKING -------------
@@ -120,13 +156,26 @@ def _split_markdown_sections(
     return sections
 
 
+def _encode_texts(texts: List[str]) -> List[List[int]]:
+    """
+    Token ids of several texts, encoded in parallel by tiktoken when there is
+    more than one.
+    """
+    if len(texts) > 1:
+        return ENCODING.encode_batch(texts)
+    return [ENCODING.encode(text) for text in texts]
+
+
 def _split_tokens(
+        text: str,
         tokens: List[int],
         max_tokens: int,
         overlap_tokens: int
-) -> Iterator[List[int]]:
+) -> Iterator[Tuple[str, int]]:
     """
-    Split tokens into overlapping windows without breaking Unicode characters.
+    Split the tokens of text into overlapping windows without breaking Unicode
+    characters. Yields (window text, token count); text that fits into one
+    window is yielded as is, without decoding.
     """
     if max_tokens <= 0:
         raise ValueError("max_tokens must be greater than zero")
@@ -137,47 +186,40 @@ def _split_tokens(
     if not tokens:
         return
 
-    _, text_offsets = ENCODING.decode_with_offsets(tokens)
+    if len(tokens) <= max_tokens:
+        yield text, len(tokens)
+        return
+
+    token_bytes = ENCODING.decode_tokens_bytes(tokens)
+    # Windows may only start at tokens that do not begin with a UTF-8 continuation byte
+    starts_character = [not 0x80 <= token[0] < 0xC0 for token in token_bytes]
     total_tokens = len(tokens)
     start = 0
 
     while start < total_tokens:
         end = min(start + max_tokens, total_tokens)
 
-        while (
-            end > start
-            and end < total_tokens
-            and text_offsets[end] == text_offsets[end - 1]
-        ):
+        while end > start and end < total_tokens and not starts_character[end]:
             end -= 1
 
         if end == start:
             end = min(start + max_tokens, total_tokens)
-            while (
-                end < total_tokens
-                and text_offsets[end] == text_offsets[end - 1]
-            ):
+            while end < total_tokens and not starts_character[end]:
                 end += 1
 
-        yield tokens[start:end]
+        yield b"".join(token_bytes[start:end]).decode("utf-8", errors="replace"), end - start
 
         if end >= total_tokens:
             break
 
         next_start = max(start + 1, end - overlap_tokens)
-        while (
-            next_start < end
-            and text_offsets[next_start] == text_offsets[next_start - 1]
-        ):
+        while next_start < end and not starts_character[next_start]:
             next_start += 1
 
         start = next_start
 
 
-def chunk_text_from_text(
-        db,
-        document_id: int,
-        parse_id: Optional[int],
+def build_text_chunks(
         text: str,
         max_tokens: int = MAX_TOKENS,
         overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
@@ -186,104 +228,283 @@ def chunk_text_from_text(
         page_start: Optional[int] = None,
         page_end: Optional[int] = None,
         start_index: int = 0,
-        split_markdown_headings: bool = False
-) -> Tuple[int, int]:
+        split_markdown_headings: bool = False,
+        tokens: Optional[List[int]] = None
+) -> List[ChunkRecord]:
     """
-    Split text into overlapping token chunks and store them in DocumentChunk.
+    Split text into overlapping token chunks without touching the database.
+    tokens are the token ids of text when the caller already encoded it.
     """
 
     if not text or not text.strip():
-        return 0, start_index
+        return []
 
-    created = 0
+    records: List[ChunkRecord] = []
     sections = [(section_title, section_level, text)]
 
     if split_markdown_headings:
+        if tokens is not None:
+            raise ValueError("tokens cannot be reused when splitting Markdown headings")
         sections = _split_markdown_sections(text)
 
-    for current_title, current_level, section_text in sections:
-        if not section_text or not section_text.strip():
-            continue
-
-        tokens = ENCODING.encode(section_text)
-
-        for token_chunk in _split_tokens(tokens, max_tokens, overlap_tokens):
-            db_chunk = DocumentChunk(
-                document_id=document_id,
-                parse_id=parse_id,
-                chunk_index=start_index + created,
-                token_count=len(token_chunk),
-                text=ENCODING.decode(token_chunk),
-                section_title=current_title,
-                section_level=current_level,
-                page_start=page_start,
-                page_end=page_end,
-                summary=None,
-                keywords=None,
-                topics=None,
+    sections = [section for section in sections if section[2] and section[2].strip()]
+    section_tokens = [tokens] if tokens is not None else _encode_texts([section[2] for section in sections])
+
+    for (current_title, current_level, section_text), current_tokens in zip(sections, section_tokens):
+        for chunk_text, token_count in _split_tokens(section_text, current_tokens, max_tokens, overlap_tokens):
+            records.append(
+                ChunkRecord(
+                    chunk_index=start_index + len(records),
+                    text=chunk_text,
+                    token_count=token_count,
+                    section_title=current_title,
+                    section_level=current_level,
+                    page_start=page_start,
+                    page_end=page_end,
+                )
             )
-            db.add(db_chunk)
-            created += 1
 
+    return records
+
+
+def insert_chunk_records(
+        db,
+        document_id: int,
+        parse_id: Optional[int],
+        records: Iterable[ChunkRecord],
+        batch_size: int = CHUNK_INSERT_BATCH_SIZE
+) -> List[int]:
+    """
+    Bulk insert chunk records as DocumentChunk rows and return their ids in
+    record order (the ids become the Qdrant point ids). A generator of
+    records is inserted with memory bounded by the batch size. The caller commits.
+    """
+    rows = (
+        {
+            "document_id": document_id,
+            "parse_id": parse_id,
+            "chunk_index": record.chunk_index,
+            "token_count": record.token_count,
+            "text": record.text,
+            "section_title": record.section_title,
+            "section_level": record.section_level,
+            "page_start": record.page_start,
+            "page_end": record.page_end,
+        }
+        for record in records
+    )
+
+    return bulk_insert_returning_ids(db, DocumentChunk, rows, batch_size=batch_size)
+
+
+def store_chunk_records(
+        db,
+        document_id: int,
+        parse_id: Optional[int],
+        records: Iterable[ChunkRecord]
+) -> int:
+    """
+    Insert chunk records as DocumentChunk rows. Returns the number of rows;
+    the caller commits.
+    """
+    return len(insert_chunk_records(db, document_id, parse_id, records))
+
+
+def chunk_text_from_text(
+        db,
+        document_id: int,
+        parse_id: Optional[int],
+        text: str,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        section_title: Optional[str] = None,
+        section_level: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        start_index: int = 0,
+        split_markdown_headings: bool = False,
+        tokens: Optional[List[int]] = None
+) -> Tuple[int, int]:
+    """
+    Split text into overlapping token chunks and store them in DocumentChunk.
+    """
+    records = build_text_chunks(
+        text,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        section_title=section_title,
+        section_level=section_level,
+        page_start=page_start,
+        page_end=page_end,
+        start_index=start_index,
+        split_markdown_headings=split_markdown_headings,
+        tokens=tokens,
+    )
+
+    created = store_chunk_records(db, document_id, parse_id, records)
     next_index = start_index + created
     return created, next_index
 
 
 # ------------- PDF CHUNKING -------------
-def chunk_pdf(
-        document_id: int,
-        pdf_path: str,
-        max_tokens: int = MAX_TOKENS,
-        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
-) -> Tuple[Optional[int], int]:
+def iter_pdf_sections(docling_doc) -> Iterator[Tuple[str, Optional[str], Optional[int], Optional[int]]]:
     """
-    Parses a PDF using Docling and create chunks using HybridChunker.
+    Yield (contextualized text, section title, page start, page end) for every
+    HybridChunker chunk of a Docling document.
     """
-    db = SessionLocal()
-    parse_id: Optional[int] = None
+    for chunk in PDF_CHUNKER.chunk(dl_doc=docling_doc):
+        # Get text enriched with context from headings
+        enriched_text = PDF_CHUNKER.contextualize(chunk)
 
-    try:
-        doc_parse, docling_doc = parse_document(document_id, pdf_path)
-        parse_id = doc_parse.id
+        section_title = _docling_section_title(chunk.meta)
+        page_start, page_end = _docling_page_span(chunk.meta)
 
-        total_chunks = 0
-        global_index = 0
+        yield enriched_text, section_title, page_start, page_end
 
-        doc_chunks = PDF_CHUNKER.chunk(dl_doc=docling_doc)
 
-        for chunk in doc_chunks:
-            # Get text enriched with context from headings
-            enriched_text = PDF_CHUNKER.contextualize(chunk)
+def iter_encoded_pdf_sections(
+        docling_doc
+) -> Iterator[Tuple[Tuple[str, Optional[str], Optional[int], Optional[int]], List[int]]]:
+    """
+    Yield every section of iter_pdf_sections with the token ids of its text.
+    Sections are encoded PDF_ENCODE_BATCH_SIZE at a time with encode_batch, and
+    the ids are reused for windowing and token counts.
+    """
+    sections = iter_pdf_sections(docling_doc)
 
-            # Extract section metadata from heading context
-            section_title = None
-            if hasattr(chunk.meta, "heading_context") and chunk.meta.heading_context:
-                section_title = " > ".join(
-                    h.title for h in chunk.meta.heading_context
-                    if getattr(h, "title", None)
-                )
+    while True:
+        batch = list(islice(sections, PDF_ENCODE_BATCH_SIZE))
+        if not batch:
+            return
+
+        yield from zip(batch, _encode_texts([section[0] for section in batch]))
+
+
+def _docling_section_title(meta) -> Optional[str]:
+    """
+    Section title from the chunk headings. Older Docling versions exposed
+    heading_context objects, current versions a list of heading strings.
+    """
+    titles = []
+
+    if getattr(meta, "heading_context", None):
+        titles = [h.title for h in meta.heading_context if getattr(h, "title", None)]
+    elif getattr(meta, "headings", None):
+        titles = [heading for heading in meta.headings if heading]
+
+    return " > ".join(titles) if titles else None
+
+
+def _docling_page_span(meta) -> Tuple[Optional[int], Optional[int]]:
+    """
+    First and last page of a chunk, from explicit metadata or the provenance
+    of its document items.
+    """
+    page_start = getattr(meta, "page_start", None)
+    page_end = getattr(meta, "page_end", None)
 
-            # Page start/end if available
-            page_start = getattr(chunk.meta, "page_start", None)
-            page_end = getattr(chunk.meta, "page_end", None)
+    if page_start is None and page_end is None:
+        pages = [
+            prov.page_no
+            for item in getattr(meta, "doc_items", None) or []
+            for prov in getattr(item, "prov", None) or []
+            if getattr(prov, "page_no", None) is not None
+        ]
+        if pages:
+            page_start, page_end = min(pages), max(pages)
 
-            created, global_index = chunk_text_from_text(
-                db=db,
-                document_id=document_id,
-                parse_id=parse_id,
-                text=enriched_text,
+    return page_start, page_end
+
+
+def iter_pdf_chunks(
+        docling_doc,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> Iterator[ChunkRecord]:
+    """
+    Yield the chunk records of a converted PDF section by section, without
+    touching the database.
+    """
+    next_index = 0
+
+    for section, tokens in iter_encoded_pdf_sections(docling_doc):
+        enriched_text, section_title, page_start, page_end = section
+        records = build_text_chunks(
+            enriched_text,
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            section_title=section_title,
+            page_start=page_start,
+            page_end=page_end,
+            start_index=next_index,
+            tokens=tokens,
+        )
+        next_index += len(records)
+        yield from records
+
+
+def build_pdf_chunks(
+        docling_doc,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[ChunkRecord]:
+    """
+    Create chunk records for a converted PDF without touching the database.
+    """
+    return list(iter_pdf_chunks(docling_doc, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+
+
+def build_pdf_text_chunks(
+        blocks: Iterable[PdfTextBlock],
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[ChunkRecord]:
+    """
+    Create chunk records from paragraphs of the PyMuPDF fast path.
+
+    Mirrors what HybridChunker does for Docling documents: consecutive
+    paragraphs under the same headings are merged up to max_tokens and the
+    text is prefixed with its headings, so both extractors produce the same
+    chunk text and metadata shape.
+    """
+    records: List[ChunkRecord] = []
+    # Block texts are stripped, so joining their token ids with the newline's
+    # gives the tokens of the joined window text without encoding it again
+    newline_tokens = ENCODING.encode("\n")
+
+    def flush(heading_path: Tuple[str, ...], pending: List[PdfTextBlock], tokens: List[int]):
+        records.extend(
+            build_text_chunks(
+                "\n".join([*heading_path, *(block.text for block in pending)]),
                 max_tokens=max_tokens,
                 overlap_tokens=overlap_tokens,
-                section_title=section_title,
-                page_start=page_start,
-                page_end=page_end,
-                start_index=global_index
+                section_title=" > ".join(heading_path) or None,
+                page_start=pending[0].page_no,
+                page_end=pending[-1].page_no,
+                start_index=len(records),
+                tokens=tokens,
             )
+        )
+
+    for heading_path, group in groupby(blocks, key=lambda block: block.heading_path):
+        heading_tokens = ENCODING.encode("\n".join(heading_path)) if heading_path else []
+        group = list(group)
+        pending: List[PdfTextBlock] = []
+        pending_tokens = list(heading_tokens)
+
+        for block, block_tokens in zip(group, _encode_texts([block.text for block in group])):
+
+            if pending and len(pending_tokens) + len(newline_tokens) + len(block_tokens) > max_tokens:
+                flush(heading_path, pending, pending_tokens)
+                pending = []
+                pending_tokens = list(heading_tokens)
 
-            total_chunks += created
+            if pending or heading_path:
+                pending_tokens.extend(newline_tokens)
+            pending.append(block)
+            pending_tokens.extend(block_tokens)
 
-        db.commit()
-        return parse_id, total_chunks
+        if pending:
+            flush(heading_path, pending, pending_tokens)
 
-    finally:
-        db.close()
+    return records
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.models.document import Document
+from backend.models.document_block import DocumentBlock
+from backend.models.document_chunk import DocumentChunk
+from backend.models.document_content import DocumentContent
+from backend.models.document_parse import DocumentParse
+from backend.services.observability import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever parsing, chunking, embedding or structuring output changes,
+# so new uploads stop reusing content processed by the old pipeline
+PIPELINE_VERSION = "3"
+
+# Tables whose rows hold the processed content of a document
+CONTENT_MODELS = (DocumentParse, DocumentChunk, DocumentBlock)
+
+
+def compute_content_sha256(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def find_reusable_content(db, content_sha256: str, language: str) -> Optional[DocumentContent]:
+    """
+    Return the content of a completed document with the same bytes, language
+    and pipeline version, and count the lookup as a dedup hit or miss.
+    """
+    content = (
+        db.query(DocumentContent)
+        .join(Document, Document.id == DocumentContent.owner_document_id)
+        .filter(
+            DocumentContent.sha256 == content_sha256,
+            DocumentContent.language == language,
+            DocumentContent.pipeline_version == PIPELINE_VERSION,
+            Document.file_status == "completed",
+        )
+        .first()
+    )
+
+    metrics.increment("dedup.hits" if content else "dedup.misses")
+    return content
+
+
+def artifact_document_id(db, document: Document) -> int:
+    """Id of the document whose parse, chunks, blocks and vectors this document uses."""
+    if document.content_id is None:
+        return document.id
+
+    owner_id = (
+        db.query(DocumentContent.owner_document_id)
+        .filter(DocumentContent.id == document.content_id)
+        .scalar()
+    )
+    return owner_id or document.id
+
+
+def map_artifact_documents(db, documents: Iterable[Tuple[int, Optional[int]]]) -> Dict[int, int]:
+    """
+    Map the artifact document id of every (document id, content id) pair to
+    the document id. Documents sharing content in one workspace map to the
+    first of them.
+    """
+    documents = list(documents)
+    content_ids = {content_id for _, content_id in documents if content_id is not None}
+
+    owners = {}
+    if content_ids:
+        owners = dict(
+            db.query(DocumentContent.id, DocumentContent.owner_document_id)
+            .filter(DocumentContent.id.in_(content_ids))
+            .all()
+        )
+
+    mapping: Dict[int, int] = {}
+    for document_id, content_id in sorted(documents):
+        artifact_id = owners.get(content_id) or document_id
+        mapping.setdefault(artifact_id, document_id)
+
+    return mapping
+
+
+def content_references(db, owner_document_id: int) -> List[Tuple[int, int]]:
+    """
+    (document id, workspace id) of every document that uses the processed
+    content of the given owner document, the owner first.
+    """
+    owner = db.query(Document).filter(Document.id == owner_document_id).first()
+    if owner is None:
+        return []
+
+    references = [(owner.id, owner.workspace_id)]
+
+    if owner.content_id is not None:
+        references.extend(
+            db.query(Document.id, Document.workspace_id)
+            .filter(Document.content_id == owner.content_id, Document.id != owner.id)
+            .order_by(Document.id)
+            .all()
+        )
+
+    return references
+
+
+def register_document_content(db, document: Document) -> None:
+    """
+    Publish the processed content of a completed document for reuse. If a
+    completed document already owns the same content, the document keeps its
+    own copy and nothing changes. The caller commits.
+    """
+    if not document.content_sha256:
+        return
+
+    key = dict(
+        sha256=document.content_sha256,
+        language=document.language,
+        pipeline_version=PIPELINE_VERSION,
+    )
+    content = db.query(DocumentContent).filter_by(**key).first()
+
+    if content is None:
+        # Two workers finishing the same bytes at once both register; either is reused
+        content = DocumentContent(owner_document_id=document.id, **key)
+        db.add(content)
+        db.flush()
+
+    elif content.owner_document_id not in (None, document.id):
+        return
+
+    content.owner_document_id = document.id
+    document.content_id = content.id
+    db.flush()
+
+
+def share_document_content(db, document: Document) -> DocumentContent:
+    """
+    Return the content a document uses, registering the document's own
+    processed content first if it is not shared yet. The caller commits.
+    """
+    if document.content_id is not None:
+        content = db.query(DocumentContent).filter(DocumentContent.id == document.content_id).first()
+        if content is not None and content.owner_document_id is not None:
+            return content
+
+    content = DocumentContent(
+        sha256=document.content_sha256,
+        language=document.language,
+        pipeline_version=PIPELINE_VERSION,
+        owner_document_id=document.id,
+    )
+    db.add(content)
+    db.flush()
+
+    document.content_id = content.id
+    db.flush()
+    return content
+
+
+def release_document_content(db, document: Document) -> Optional[int]:
+    """
+    Detach a document from its shared content, e.g. before it is deleted.
+    If other documents use content owned by this document, its parse, chunk
+    and block rows move to the next of them.
+
+    Returns the id of the document that owns the content afterwards, or None
+    if no other document uses it. The caller commits.
+    """
+    if document.content_id is None:
+        return None
+
+    content = db.query(DocumentContent).filter(DocumentContent.id == document.content_id).first()
+    document.content_id = None
+
+    if content is None:
+        db.flush()
+        return None
+
+    remaining = [
+        document_id for (document_id,) in
+        db.query(Document.id)
+        .filter(Document.content_id == content.id, Document.id != document.id)
+        .order_by(Document.id)
+        .all()
+    ]
+
+    if not remaining:
+        db.delete(content)
+        db.flush()
+        return None
+
+    if content.owner_document_id in (None, document.id):
+        heir_id = remaining[0]
+        for model in CONTENT_MODELS:
+            (
+                db.query(model)
+                .filter(model.document_id == document.id)
+                .update({model.document_id: heir_id}, synchronize_session=False)
+            )
+        content.owner_document_id = heir_id
+        logger.info(f"Document {heir_id} took over the processed content of document {document.id}")
+
+    db.flush()
+    return content.owner_document_id
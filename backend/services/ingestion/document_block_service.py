@@ -1,50 +1,140 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import update
+
+from backend.database.bulk_insert import bulk_insert_returning_ids
 from backend.database.database import SessionLocal
 from backend.models.document_chunk import DocumentChunk
 from backend.models.document_block import DocumentBlock
 
 CHUNKS_PER_BLOCK = 5
+BLOCK_SEPARATOR = "\n\n"
+
+
+def plan_blocks(
+        texts: Sequence[str],
+        structured: Dict[str, List[int]]
+) -> List[Tuple[int, int, Optional[int]]]:
+    """
+    Group chunk texts into blocks of at most CHUNKS_PER_BLOCK chunks as
+    (start, end, reused block id). A span of chunks whose combined text equals
+    an already structured block reuses that block, so after an edit only the
+    blocks around the changed chunks are new. structured maps block content to
+    block ids; reused ids are removed from it.
+    """
+    lengths = {len(content) for content in structured}
+    spans: List[Tuple[int, int, Optional[int]]] = []
+    pending_start = 0
+    position = 0
+
+    def flush_pending(end: int):
+        for start in range(pending_start, end, CHUNKS_PER_BLOCK):
+            spans.append((start, min(start + CHUNKS_PER_BLOCK, end), None))
+
+    while position < len(texts):
+        reused = None
+        length = -len(BLOCK_SEPARATOR)
+
+        for end in range(position + 1, min(position + CHUNKS_PER_BLOCK, len(texts)) + 1):
+            length += len(BLOCK_SEPARATOR) + len(texts[end - 1])
+            # Only join the texts when an old block has the same length
+            if length in lengths:
+                block_ids = structured.get(BLOCK_SEPARATOR.join(texts[position:end]))
+                if block_ids:
+                    reused = (end, block_ids.pop(0))
+                    break
+
+        if reused is None:
+            position += 1
+            if position - pending_start == CHUNKS_PER_BLOCK:
+                flush_pending(position)
+                pending_start = position
+            continue
 
-def create_blocks_from_chunks(document_id: int, parse_id: int):
+        flush_pending(position)
+        end, block_id = reused
+        spans.append((position, end, block_id))
+        position = pending_start = end
+
+    flush_pending(len(texts))
+    return spans
+
+
+def create_blocks_from_chunks(document_id: int, parse_id: int, reuse_structured: bool = True):
+    """
+    Create the blocks of a parse from its chunks. Structured blocks of the
+    document whose chunks did not change are kept with their structure, the
+    other previous blocks are deleted; without reuse_structured all previous
+    blocks are deleted, so every block is structured again. Returns the
+    number of blocks.
+    """
     db = SessionLocal()
 
     try:
-        chunks = (
-            db.query(DocumentChunk)
+        texts = [
+            text for (text,) in
+            db.query(DocumentChunk.text)
             .filter(
                 DocumentChunk.document_id == document_id,
                 DocumentChunk.parse_id == parse_id
             )
             .order_by(DocumentChunk.chunk_index)
             .all()
-        )
-
-        if not chunks:
-            return 0
+        ]
 
-        blocks_created = 0
+        structured: Dict[str, List[int]] = {}
+        previous_ids = []
+        for block_id, content, semantic_label in (
+            db.query(DocumentBlock.id, DocumentBlock.content, DocumentBlock.semantic_label)
+            .filter(DocumentBlock.document_id == document_id)
+            .order_by(DocumentBlock.block_index)
+        ):
+            previous_ids.append(block_id)
+            if reuse_structured and semantic_label is not None:
+                structured.setdefault(content, []).append(block_id)
 
-        for i in range(0, len(chunks), CHUNKS_PER_BLOCK):
-            group = chunks[i:i + CHUNKS_PER_BLOCK]
+        spans = plan_blocks(texts, structured)
+        reused_ids = {block_id for _, _, block_id in spans if block_id is not None}
 
-            combined_text = "\n\n".join(c.text for c in group)
+        stale_ids = [block_id for block_id in previous_ids if block_id not in reused_ids]
+        if stale_ids:
+            db.query(DocumentBlock).filter(DocumentBlock.id.in_(stale_ids)).delete(synchronize_session=False)
 
-            block = DocumentBlock(
-                document_id=document_id,
-                parse_id=parse_id,
-                block_index=blocks_created,
-                block_type="section",
-                semantic_label=None,
-                title=None,
-                content=combined_text,
-                summary=combined_text[:500],
-                confidence=None
+        if reused_ids:
+            db.execute(
+                update(DocumentBlock),
+                [
+                    {"id": block_id, "parse_id": parse_id, "block_index": block_index}
+                    for block_index, (_, _, block_id) in enumerate(spans)
+                    if block_id is not None
+                ],
             )
 
-            db.add(block)
-            blocks_created += 1
+        rows = []
+
+        for block_index, (start, end, block_id) in enumerate(spans):
+            if block_id is not None:
+                continue
+
+            combined_text = BLOCK_SEPARATOR.join(texts[start:end])
+
+            rows.append({
+                "document_id": document_id,
+                "parse_id": parse_id,
+                "block_index": block_index,
+                "block_type": "section",
+                "semantic_label": None,
+                "title": None,
+                "content": combined_text,
+                "summary": combined_text[:500],
+                "confidence": None,
+            })
+
+        # One bulk INSERT instead of an ORM object per block
+        bulk_insert_returning_ids(db, DocumentBlock, rows)
 
         db.commit()
-        return blocks_created
+        return len(spans)
 
     finally:
         db.close()
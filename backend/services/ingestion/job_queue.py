@@ -0,0 +1,227 @@
+import os
+import datetime
+import logging
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.models.document import Document
+from backend.models.ingestion_job import IngestionJob
+
+logger = logging.getLogger(__name__)
+
+
+def load_positive_int_setting(name: str, default: int) -> int:
+    raw_value = os.getenv(name, str(default))
+    try:
+        value = int(raw_value)
+    except ValueError as exc:
+        raise RuntimeError(f"{name} must be a positive integer") from exc
+
+    if value <= 0:
+        raise RuntimeError(f"{name} must be a positive integer")
+
+    return value
+
+
+# -------------------- CONFIG --------------------
+MAX_ATTEMPTS = load_positive_int_setting("INGESTION_JOB_MAX_ATTEMPTS", 3)
+RETRY_BASE_SECONDS = load_positive_int_setting("INGESTION_JOB_RETRY_BASE_SECONDS", 30)
+RETRY_MAX_SECONDS = load_positive_int_setting("INGESTION_JOB_RETRY_MAX_SECONDS", 900)
+
+# A running job whose worker stopped sending heartbeats for this long is
+# considered abandoned (e.g. the worker process was restarted) and is reclaimed.
+LEASE_SECONDS = load_positive_int_setting("INGESTION_JOB_LEASE_SECONDS", 600)
+
+ERROR_MAX_CHARS = 2000
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _active_key(document_id: int) -> str:
+    return f"document:{document_id}"
+
+
+def retry_delay_seconds(attempts: int) -> int:
+    """Exponential backoff for the given number of failed attempts."""
+    return min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+
+def get_active_job(db, document_id: int) -> Optional[IngestionJob]:
+    return (
+        db.query(IngestionJob)
+        .filter(IngestionJob.active_key == _active_key(document_id))
+        .first()
+    )
+
+
+def enqueue_document_job(db, document_id: int, force_rebuild: bool = False) -> IngestionJob:
+    """
+    Queue a processing job for a document and commit the current transaction.
+
+    Enqueueing is idempotent: while a job for the document is queued or running,
+    the existing job is returned instead of creating a second one. With
+    force_rebuild the job, or the existing one, rebuilds every stage without
+    reusing unchanged vectors or blocks.
+    """
+    existing = get_active_job(db, document_id)
+    if existing:
+        if force_rebuild and not existing.force_rebuild:
+            existing.force_rebuild = True
+            db.commit()
+        return existing
+
+    job = IngestionJob(
+        document_id=document_id,
+        status="queued",
+        active_key=_active_key(document_id),
+        force_rebuild=force_rebuild,
+        attempts=0,
+        max_attempts=MAX_ATTEMPTS,
+        run_after=_utcnow(),
+    )
+    db.add(job)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request queued the same document first.
+        db.rollback()
+        existing = get_active_job(db, document_id)
+        if existing:
+            return existing
+        raise
+
+    db.refresh(job)
+    logger.info(f"Queued ingestion job {job.id} for document {document_id}")
+    return job
+
+
+def _claimable_condition(now: datetime.datetime):
+    stale_before = now - datetime.timedelta(seconds=LEASE_SECONDS)
+    return or_(
+        and_(IngestionJob.status == "queued", IngestionJob.run_after <= now),
+        and_(IngestionJob.status == "running", IngestionJob.locked_at < stale_before),
+    )
+
+
+def claim_next_job(db, worker_id: str) -> Optional[IngestionJob]:
+    """
+    Atomically claim the next due job for a worker.
+
+    Claims use a conditional UPDATE so that concurrent workers never run the same
+    job, on SQLite as well as on PostgreSQL. Abandoned running jobs are reclaimed
+    once their lease expired.
+    """
+    now = _utcnow()
+
+    candidate_ids = [
+        job_id
+        for (job_id,) in (
+            db.query(IngestionJob.id)
+            .filter(_claimable_condition(now))
+            .order_by(IngestionJob.run_after, IngestionJob.id)
+            .limit(10)
+            .all()
+        )
+    ]
+
+    for job_id in candidate_ids:
+        result = db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, _claimable_condition(now))
+            .values(
+                status="running",
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=IngestionJob.attempts + 1,
+                updated_at=now,
+            )
+        )
+        db.commit()
+
+        if result.rowcount != 1:
+            continue
+
+        job = db.query(IngestionJob).filter(IngestionJob.id == job_id).one()
+
+        if job.attempts > job.max_attempts:
+            # The job was reclaimed after its last attempt crashed the worker,
+            # which left the document at the stage it crashed in
+            (
+                db.query(Document)
+                .filter(Document.id == job.document_id)
+                .update({Document.file_status: "failed"}, synchronize_session=False)
+            )
+            _finish(db, job, "failed", "Worker lease expired on the final attempt")
+            logger.error(
+                f"Ingestion job {job.id} for document {job.document_id} failed: "
+                f"worker lease expired on the final attempt"
+            )
+            continue
+
+        return job
+
+    return None
+
+
+def heartbeat_job(db, job_id: int, worker_id: str) -> None:
+    """Extend the lease of a running job owned by this worker."""
+    now = _utcnow()
+    db.execute(
+        update(IngestionJob)
+        .where(
+            IngestionJob.id == job_id,
+            IngestionJob.status == "running",
+            IngestionJob.locked_by == worker_id,
+        )
+        .values(locked_at=now, updated_at=now)
+    )
+    db.commit()
+
+
+def _finish(db, job: IngestionJob, status: str, error: Optional[str] = None) -> None:
+    job.status = status
+    job.active_key = None
+    job.locked_by = None
+    job.locked_at = None
+    job.last_error = error[:ERROR_MAX_CHARS] if error else None
+    db.add(job)
+    db.commit()
+
+
+def complete_job(db, job: IngestionJob) -> None:
+    _finish(db, job, "succeeded")
+    logger.info(f"Ingestion job {job.id} for document {job.document_id} succeeded")
+
+
+def fail_job(db, job: IngestionJob, error: str) -> None:
+    """
+    Record a failed attempt and either schedule a retry with exponential
+    backoff or mark the job as permanently failed.
+    """
+    if job.attempts >= job.max_attempts:
+        _finish(db, job, "failed", error)
+        logger.error(
+            f"Ingestion job {job.id} for document {job.document_id} failed "
+            f"after {job.attempts} attempts"
+        )
+        return
+
+    delay = retry_delay_seconds(job.attempts)
+
+    job.status = "queued"
+    job.locked_by = None
+    job.locked_at = None
+    job.last_error = error[:ERROR_MAX_CHARS] if error else None
+    job.run_after = _utcnow() + datetime.timedelta(seconds=delay)
+    db.add(job)
+    db.commit()
+
+    logger.warning(
+        f"Ingestion job {job.id} for document {job.document_id} failed "
+        f"(attempt {job.attempts}/{job.max_attempts}), retrying in {delay}s"
+    )
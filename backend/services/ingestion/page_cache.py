@@ -0,0 +1,63 @@
+import logging
+from importlib.metadata import PackageNotFoundError, version
+from typing import Dict, Iterable
+
+from sqlalchemy.exc import IntegrityError
+
+from backend.database.database import SessionLocal
+from backend.models.pdf_page_cache import PdfPageCache
+
+logger = logging.getLogger(__name__)
+
+
+def _docling_version() -> str:
+    try:
+        return version("docling")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+# Cached pages are only reused by the same converter version and settings
+OCR_PIPELINE = f"docling-{_docling_version()}-ocr"
+
+
+def load_cached_pages(page_hashes: Iterable[str], pipeline: str = OCR_PIPELINE) -> Dict[str, dict]:
+    """Return the cached page documents for the given hashes."""
+    page_hashes = list(set(page_hashes))
+    if not page_hashes:
+        return {}
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(PdfPageCache.page_hash, PdfPageCache.document)
+            .filter(
+                PdfPageCache.pipeline == pipeline,
+                PdfPageCache.page_hash.in_(page_hashes),
+            )
+            .all()
+        )
+        return {page_hash: document for page_hash, document in rows}
+    finally:
+        db.close()
+
+
+def store_cached_pages(pages: Dict[str, dict], pipeline: str = OCR_PIPELINE) -> None:
+    """Store converted page documents; pages cached concurrently are skipped."""
+    if not pages:
+        return
+
+    db = SessionLocal()
+    try:
+        for page_hash, document in pages.items():
+            db.add(PdfPageCache(page_hash=page_hash, pipeline=pipeline, document=document))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker cached the same page first
+                db.rollback()
+    except Exception:
+        db.rollback()
+        logger.exception("Storing OCR page cache entries failed")
+    finally:
+        db.close()
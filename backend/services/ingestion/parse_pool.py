@@ -0,0 +1,635 @@
+import os
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from backend.models.document_block import DocumentBlock
+from backend.models.document_parse import DocumentParse
+from backend.services.ingestion.chunking_service import (
+    CHUNK_OVERLAP_TOKENS,
+    MAX_TOKENS,
+    ChunkRecord,
+)
+from backend.services.ingestion.chunk_diff import ChunkDiff, replace_document_chunks
+from backend.services.ingestion.job_queue import load_positive_int_setting
+from backend.services.observability import metrics
+
+logger = logging.getLogger(__name__)
+
+TEXT_FILE_TYPES = ("text/plain", "text/markdown")
+DOCX_FILE_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _load_parse_pool_size() -> int:
+    raw_value = os.getenv("PARSE_POOL_SIZE", "2")
+    try:
+        size = int(raw_value)
+    except ValueError as exc:
+        raise RuntimeError("PARSE_POOL_SIZE must be a non-negative integer") from exc
+
+    if size < 0:
+        raise RuntimeError("PARSE_POOL_SIZE must be a non-negative integer")
+
+    return size
+
+
+# Number of warm parser processes. 0 parses in a thread of the calling process.
+PARSE_POOL_SIZE = _load_parse_pool_size()
+
+# Text pages of PDFs with at least this many pages are split into page ranges
+# that are converted in parallel parser processes (requires PARSE_POOL_SIZE > 1).
+PDF_SPLIT_MIN_PAGES = load_positive_int_setting("PDF_SPLIT_MIN_PAGES", 100)
+PDF_PAGES_PER_RANGE = load_positive_int_setting("PDF_PAGES_PER_RANGE", 25)
+
+# Docling pipeline options loaded when a parser process starts
+CONVERTER_WARMUP_OPTIONS = {"text": (False, False), "ocr": (True, False)}
+
+
+def _load_converter_warmup() -> List[Tuple[bool, bool]]:
+    raw_value = os.getenv("PDF_CONVERTER_WARMUP", "text")
+    names = [name.strip().lower() for name in raw_value.split(",") if name.strip()]
+
+    unknown = [name for name in names if name not in CONVERTER_WARMUP_OPTIONS]
+    if unknown:
+        allowed = ", ".join(sorted(CONVERTER_WARMUP_OPTIONS))
+        raise RuntimeError(f"PDF_CONVERTER_WARMUP must be a comma separated list of: {allowed}")
+
+    return [CONVERTER_WARMUP_OPTIONS[name] for name in dict.fromkeys(names)]
+
+
+PDF_CONVERTER_WARMUP = _load_converter_warmup()
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass(frozen=True)
+class ParsedDocument:
+    """
+    Picklable result of parsing and chunking one document in a parser process.
+    PDF results also carry the fields of their DocumentParse row.
+    """
+    full_text: str
+    chunks: List[ChunkRecord] = field(default_factory=list)
+    is_pdf: bool = False
+    page_count: int = 0
+    used_ocr: bool = False
+    warnings: Optional[str] = None
+    # Docling converter timings, e.g. converter_saved_seconds
+    stats: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class PdfPagePlan:
+    """
+    Picklable result of analyzing a PDF in a parser process: the extractor and,
+    for the Docling and mixed extractors, the page ranges Docling converts.
+    Docling extractors without page ranges convert the whole file at once.
+    """
+    extractor: str
+    page_count: int = 0
+    page_ranges: List["PageRange"] = field(default_factory=list)
+    # Content hash of every OCR range by its page, the key of its cached result
+    ocr_hashes: Dict[int, str] = field(default_factory=dict)
+
+
+# -------------------- PARSER PROCESS --------------------
+def _warm_parser_process():
+    """
+    Runs once per parser process. Importing the parsers and the chunking service
+    loads Docling, the tokenizer and the HybridChunker; the Docling converters
+    of PDF_CONVERTER_WARMUP are built as well. All of them stay resident for
+    every document the process handles.
+    """
+    import backend.parsers.pdf_parser  # noqa: F401
+    import backend.parsers.docx_parser  # noqa: F401
+    import backend.services.ingestion.pdf_extractors  # noqa: F401
+
+    warm_up_pdf_converters()
+
+    logger.info(f"Parser process {os.getpid()} ready")
+
+
+def warm_up_pdf_converters():
+    from backend.parsers.pdf_parser import warm_up_converters
+
+    try:
+        warm_up_converters(PDF_CONVERTER_WARMUP)
+    except Exception:
+        # Converters are built on first use instead
+        logger.warning("Docling converter warm-up failed", exc_info=True)
+
+
+def _parser_ready() -> int:
+    return os.getpid()
+
+
+def parse_and_chunk_document(
+        file_path: str,
+        file_type: str,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        pdf_extractor: Optional[str] = None
+) -> ParsedDocument:
+    """
+    Parse a PDF, DOCX, TXT or Markdown file and split it into chunk records.
+    PDFs use the given extractor or one chosen from the document layout.
+    CPU-bound; runs inside a parser process.
+    """
+    from backend.services.ingestion.chunking_service import build_text_chunks
+
+    if file_type in TEXT_FILE_TYPES:
+        from backend.parsers.txt_parser import parse_txt
+
+        full_text = parse_txt(file_path)
+        chunks = build_text_chunks(
+            full_text,
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            split_markdown_headings=file_type == "text/markdown",
+        )
+        return ParsedDocument(full_text=full_text, chunks=chunks)
+
+    if file_type == DOCX_FILE_TYPE:
+        from backend.parsers.docx_parser import parse_docx
+
+        full_text = parse_docx(file_path)
+        chunks = build_text_chunks(
+            full_text,
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            split_markdown_headings=True,
+        )
+        return ParsedDocument(full_text=full_text, chunks=chunks)
+
+    from backend.services.ingestion.pdf_extractors import PDF_EXTRACTORS, select_pdf_extractor
+
+    extractor = PDF_EXTRACTORS[pdf_extractor or select_pdf_extractor(file_path)]
+    return extractor(file_path, max_tokens, overlap_tokens)
+
+
+def plan_pdf_pages(
+        file_path: str,
+        pdf_extractor: Optional[str] = None,
+        split_text: bool = False,
+        pages_per_range: Optional[int] = None
+) -> PdfPagePlan:
+    """
+    Analyze the pages of a PDF once, pick the extractor unless one is given
+    and plan the page ranges Docling converts. Text pages are split into
+    ranges of PDF_PAGES_PER_RANGE if split_text and the PDF is large enough.
+    Table detection and page hashing are CPU-bound; runs inside a parser
+    process, which only sends the plan back.
+    """
+    from backend.parsers.pdf_parser import analyze_pdf_pages, docling_page_ranges, plan_conversion_ranges
+    from backend.services.ingestion.pdf_extractors import (
+        DOCLING_EXTRACTORS_OCR,
+        MIXED_EXTRACTOR,
+        select_pdf_extractor,
+    )
+
+    try:
+        pages = analyze_pdf_pages(file_path)
+    except Exception:
+        logger.warning(f"Page analysis failed for {file_path}, converting the whole file", exc_info=True)
+        pages = []
+
+    extractor = pdf_extractor or select_pdf_extractor(file_path, pages)
+
+    if extractor not in DOCLING_EXTRACTORS_OCR and extractor != MIXED_EXTRACTOR:
+        return PdfPagePlan(extractor, len(pages))
+
+    if not pages:
+        # PyMuPDF cannot read the file; Docling's own PDF backend converts it with OCR
+        return PdfPagePlan("docling_ocr")
+
+    if extractor == MIXED_EXTRACTOR:
+        page_ranges = docling_page_ranges(pages)
+    else:
+        if pages_per_range is None:
+            split = split_text and len(pages) >= PDF_SPLIT_MIN_PAGES
+            pages_per_range = PDF_PAGES_PER_RANGE if split else len(pages)
+
+        page_ranges = plan_conversion_ranges(pages, pages_per_range, force_ocr=DOCLING_EXTRACTORS_OCR[extractor])
+        if len(page_ranges) == 1 and not (page_ranges[0].ocr or page_ranges[0].tables):
+            page_ranges = []
+
+    return PdfPagePlan(
+        extractor,
+        len(pages),
+        page_ranges,
+        {page_range.start: pages[page_range.start - 1].content_hash for page_range in page_ranges if page_range.ocr},
+    )
+
+
+def chunk_docling_document(
+        docling_doc,
+        used_ocr: bool,
+        max_tokens: int,
+        overlap_tokens: int,
+        stats: Optional[Dict[str, float]] = None
+) -> ParsedDocument:
+    from backend.parsers.pdf_parser import describe_docling_document
+    from backend.services.ingestion.chunking_service import build_pdf_chunks
+
+    parse_fields = describe_docling_document(docling_doc, used_ocr)
+    chunks = build_pdf_chunks(docling_doc, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+    return ParsedDocument(chunks=chunks, is_pdf=True, stats=dict(stats or {}), **parse_fields)
+
+
+def convert_pdf_range(
+        file_path: str,
+        do_ocr: bool,
+        do_table_structure: bool = False
+) -> Tuple[dict, Dict[str, float]]:
+    """
+    Convert one page range file. The DoclingDocument is returned as a plain
+    dict so it can be sent back to the parent process, together with the
+    converter timings.
+    """
+    from backend.parsers.pdf_parser import convert_pdf
+
+    stats: Dict[str, float] = {}
+    docling_doc, _ = convert_pdf(file_path, do_ocr=do_ocr, stats=stats, do_table_structure=do_table_structure)
+    return docling_doc.export_to_dict(), stats
+
+
+def merge_and_chunk_pdf_ranges(
+        range_documents: List[dict],
+        used_ocr: bool,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        stats: Optional[Dict[str, float]] = None
+) -> ParsedDocument:
+    """
+    Merge the converted page ranges of one PDF in page order and chunk the
+    result as a single document.
+    """
+    from docling_core.types.doc import DoclingDocument
+    from backend.parsers.pdf_parser import merge_docling_documents
+
+    docling_doc = merge_docling_documents(
+        [DoclingDocument.model_validate(document) for document in range_documents]
+    )
+    return chunk_docling_document(docling_doc, used_ocr, max_tokens, overlap_tokens, stats=stats)
+
+
+def chunk_pdf_by_pages(
+        file_path: str,
+        page_documents: Dict[int, dict],
+        used_ocr: bool,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        stats: Optional[Dict[str, float]] = None
+) -> ParsedDocument:
+    """
+    Chunk a PDF whose pages in page_documents (1-based page number to the
+    exported single-page DoclingDocument) were converted by Docling and
+    whose other pages are read from the PyMuPDF text layer. Runs of text
+    pages and converted pages are chunked in page order; chunk_index
+    continues across them.
+    """
+    from docling_core.types.doc import DoclingDocument
+    from backend.parsers.pdf_text_parser import extract_pdf_text_blocks, pdf_text_blocks_to_markdown
+    from backend.services.ingestion.chunking_service import build_pdf_chunks, build_pdf_text_chunks
+
+    blocks, page_count = extract_pdf_text_blocks(file_path, skip_pages=page_documents)
+    chunks: List[ChunkRecord] = []
+    texts: List[str] = []
+
+    def add_chunks(records: List[ChunkRecord], page_offset: int = 0):
+        for record in records:
+            chunks.append(
+                replace(
+                    record,
+                    chunk_index=len(chunks),
+                    page_start=None if record.page_start is None else record.page_start + page_offset,
+                    page_end=None if record.page_end is None else record.page_end + page_offset,
+                )
+            )
+
+    def add_text_run(run_blocks):
+        if run_blocks:
+            add_chunks(build_pdf_text_chunks(run_blocks, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+            texts.append(pdf_text_blocks_to_markdown(run_blocks))
+
+    run_start = 0
+    for page_no in sorted(page_documents):
+        run_end = run_start
+        while run_end < len(blocks) and blocks[run_end].page_no < page_no:
+            run_end += 1
+        add_text_run(blocks[run_start:run_end])
+        run_start = run_end
+
+        # Single-page documents number their page 1
+        docling_doc = DoclingDocument.model_validate(page_documents[page_no])
+        add_chunks(build_pdf_chunks(docling_doc, max_tokens=max_tokens, overlap_tokens=overlap_tokens), page_no - 1)
+        texts.append(docling_doc.export_to_markdown())
+
+    add_text_run(blocks[run_start:])
+
+    return ParsedDocument(
+        full_text="\n\n".join(text for text in texts if text),
+        chunks=chunks,
+        is_pdf=True,
+        page_count=page_count,
+        used_ocr=used_ocr,
+        stats=dict(stats or {}),
+    )
+
+
+def _sum_stats(all_stats: List[Dict[str, float]]) -> Dict[str, float]:
+    total: Dict[str, float] = {}
+    for stats in all_stats:
+        for name, value in stats.items():
+            total[name] = total.get(name, 0.0) + value
+    return total
+
+
+def is_pdf_file_type(file_type: str) -> bool:
+    # Everything that is not a text or DOCX upload goes through the PDF pipeline
+    return file_type not in TEXT_FILE_TYPES and file_type != DOCX_FILE_TYPE
+
+
+# -------------------- POOL --------------------
+def get_parse_executor() -> ProcessPoolExecutor:
+    """
+    Lazily start the parser process pool. Processes are spawned rather than
+    forked so they never inherit database connections or event loop state.
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=PARSE_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_parser_process,
+        )
+        logger.info(f"Started parser pool with {PARSE_POOL_SIZE} processes")
+
+    return _executor
+
+
+def shutdown_parse_pool():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def warm_parse_pool():
+    """
+    Start every parser process now, so the Docling converters are loaded
+    before the first job instead of during it.
+    """
+    if PARSE_POOL_SIZE == 0:
+        await asyncio.to_thread(warm_up_pdf_converters)
+        return
+
+    # Each submission without an idle process spawns a new one
+    loop = asyncio.get_running_loop()
+    executor = get_parse_executor()
+    pids = await asyncio.gather(
+        *(loop.run_in_executor(executor, _parser_ready) for _ in range(PARSE_POOL_SIZE))
+    )
+    logger.info(f"Parser pool warm ({len(set(pids))} processes)")
+
+
+def record_parse_metrics(file_path: str, parsed: ParsedDocument):
+    """Add the converter timings of one document to the process metrics."""
+    metrics.increment("parse.documents")
+    metrics.record(parsed.stats, prefix="parse.")
+
+    saved = parsed.stats.get("converter_saved_seconds", 0.0)
+    if saved:
+        logger.info(f"Reused warm Docling converter for {file_path}, saved {saved:.2f}s of initialization")
+
+
+async def _run_in_parser(func, *args):
+    """Run CPU-bound parser work in the pool, or in a thread without a pool."""
+    if PARSE_POOL_SIZE == 0:
+        return await asyncio.to_thread(func, *args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_executor(), func, *args)
+
+
+async def parse_in_pool(
+        file_path: str,
+        file_type: str,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> ParsedDocument:
+    """
+    Parse and chunk a document without blocking the event loop.
+    PDF pages are analyzed once in a parser process; the plan picks the
+    extractor and drives the per-page conversion.
+    """
+    from backend.services.ingestion.pdf_extractors import DOCLING_EXTRACTORS_OCR, MIXED_EXTRACTOR
+
+    plan = None
+    if is_pdf_file_type(file_type):
+        # Text pages are only split when several parser processes can convert them
+        plan = await _run_in_parser(plan_pdf_pages, file_path, None, PARSE_POOL_SIZE > 1)
+
+    if plan is not None and plan.extractor in DOCLING_EXTRACTORS_OCR:
+        parsed = await parse_pdf_with_docling(file_path, max_tokens, overlap_tokens, plan=plan)
+    elif plan is not None and plan.extractor == MIXED_EXTRACTOR:
+        parsed = await parse_pdf_by_pages(file_path, plan, max_tokens, overlap_tokens)
+    else:
+        parsed = await _run_in_parser(
+            parse_and_chunk_document,
+            file_path,
+            file_type,
+            max_tokens,
+            overlap_tokens,
+            plan.extractor if plan is not None else None,
+        )
+
+    record_parse_metrics(file_path, parsed)
+    return parsed
+
+
+async def _convert_page_ranges(file_path: str, plan: PdfPagePlan) -> Tuple[List[dict], List[Dict[str, float]]]:
+    """
+    Convert the page ranges of a plan in parallel parser processes. OCR ranges
+    are single pages whose result is cached by page content hash, so
+    reprocessing never OCRs the same page again. Returns the exported
+    DoclingDocument of every range in range order and the converter timings
+    of the converted ones.
+    """
+    from backend.parsers.pdf_parser import split_pdf
+    from backend.services.ingestion.page_cache import load_cached_pages, store_cached_pages
+
+    page_ranges = plan.page_ranges
+    page_hashes = plan.ocr_hashes
+    cached = await asyncio.to_thread(load_cached_pages, page_hashes.values())
+
+    to_convert = [
+        page_range for page_range in page_ranges
+        if not (page_range.ocr and page_hashes[page_range.start] in cached)
+    ]
+
+    logger.info(
+        f"Converting {len(page_ranges)} ranges of {plan.page_count} PDF pages "
+        f"({len(page_hashes)} OCR pages, {len(page_ranges) - len(to_convert)} from cache, "
+        f"{sum(page_range.tables for page_range in page_ranges)} table pages)"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="insightai_pages_") as tmp_dir:
+        part_paths = await _run_in_parser(
+            split_pdf,
+            file_path,
+            [(page_range.start, page_range.end) for page_range in to_convert],
+            tmp_dir,
+        )
+
+        # At most one range per parser process; without a pool the ranges would
+        # share one cached Docling converter, so they are converted one by one
+        semaphore = asyncio.Semaphore(max(PARSE_POOL_SIZE, 1))
+
+        async def convert(part_path: str, page_range: "PageRange"):
+            async with semaphore:
+                return await _run_in_parser(convert_pdf_range, part_path, page_range.ocr, page_range.tables)
+
+        converted_results = await asyncio.gather(
+            *(convert(part_path, page_range) for part_path, page_range in zip(part_paths, to_convert))
+        )
+
+    converted = {
+        page_range.start: document
+        for page_range, (document, _) in zip(to_convert, converted_results)
+    }
+
+    await asyncio.to_thread(
+        store_cached_pages,
+        {
+            page_hashes[page_range.start]: converted[page_range.start]
+            for page_range in to_convert
+            if page_range.ocr
+        },
+    )
+
+    range_documents = [
+        converted[page_range.start] if page_range.start in converted else cached[page_hashes[page_range.start]]
+        for page_range in page_ranges
+    ]
+    return range_documents, [stats for _, stats in converted_results]
+
+
+async def parse_pdf_with_docling(
+        file_path: str,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        force_ocr: bool = False,
+        pages_per_range: Optional[int] = None,
+        plan: Optional[PdfPagePlan] = None
+) -> ParsedDocument:
+    """
+    Convert a PDF with Docling following a per-page plan:
+
+    - text pages are converted without OCR; large PDFs are split into page
+      ranges that are converted in parallel parser processes
+    - table structure recognition only runs on the text pages where
+      PyMuPDF detected a table, each converted on its own
+    - every page without a text layer is OCRed on its own, in parallel, and
+      the result is cached by page content hash, so reprocessing never
+      OCRs the same page again
+
+    The converted ranges are merged in page order and chunked as one
+    document, so heading context and chunk_index continue across ranges.
+    plan is the result of plan_pdf_pages, if the caller has it already.
+    """
+    if plan is None:
+        plan = await _run_in_parser(
+            plan_pdf_pages,
+            file_path,
+            "docling_ocr" if force_ocr else "docling",
+            PARSE_POOL_SIZE > 1,
+            pages_per_range,
+        )
+
+    if not plan.page_ranges:
+        return await _run_in_parser(
+            parse_and_chunk_document, file_path, "application/pdf", max_tokens, overlap_tokens, plan.extractor
+        )
+
+    range_documents, converter_stats = await _convert_page_ranges(file_path, plan)
+
+    return await _run_in_parser(
+        merge_and_chunk_pdf_ranges,
+        range_documents,
+        any(page_range.ocr for page_range in plan.page_ranges),
+        max_tokens,
+        overlap_tokens,
+        _sum_stats(converter_stats),
+    )
+
+
+async def parse_pdf_by_pages(
+        file_path: str,
+        plan: PdfPagePlan,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> ParsedDocument:
+    """
+    Read the text pages of a PDF with the PyMuPDF fast path and convert only
+    the pages of the plan that need OCR or contain a table with Docling, each
+    on its own and in parallel; OCR pages are cached like in parse_pdf_with_docling.
+    """
+    range_documents, converter_stats = await _convert_page_ranges(file_path, plan)
+
+    return await _run_in_parser(
+        chunk_pdf_by_pages,
+        file_path,
+        {page_range.start: document for page_range, document in zip(plan.page_ranges, range_documents)},
+        any(page_range.ocr for page_range in plan.page_ranges),
+        max_tokens,
+        overlap_tokens,
+        _sum_stats(converter_stats),
+    )
+
+
+# -------------------- PERSISTENCE --------------------
+def store_parsed_document(db, document_id: int, parsed: ParsedDocument) -> Tuple[Optional[int], ChunkDiff]:
+    """
+    Add the DocumentParse row (PDF only) and the chunks of a parsed document
+    to the session. Chunks of a previous parse are diffed by content hash:
+    unchanged chunks keep their rows and vectors. The blocks of the previous
+    parse move to the new one, so unchanged blocks can be reused, and the
+    previous parse rows are deleted.
+    Returns the parse id and the chunk diff; the caller commits.
+    """
+    parse_id = None
+
+    if parsed.is_pdf:
+        doc_parse = DocumentParse(
+            document_id=document_id,
+            success=True,
+            full_text=parsed.full_text,
+            page_count=parsed.page_count,
+            used_ocr=parsed.used_ocr,
+            warnings=parsed.warnings,
+        )
+        db.add(doc_parse)
+        db.flush()
+        parse_id = doc_parse.id
+
+    diff = replace_document_chunks(db, document_id, parse_id, parsed.chunks)
+
+    (
+        db.query(DocumentBlock)
+        .filter(DocumentBlock.document_id == document_id)
+        .update({DocumentBlock.parse_id: parse_id}, synchronize_session=False)
+    )
+    previous_parses = db.query(DocumentParse).filter(DocumentParse.document_id == document_id)
+    if parse_id is not None:
+        previous_parses = previous_parses.filter(DocumentParse.id != parse_id)
+    previous_parses.delete(synchronize_session=False)
+
+    return parse_id, diff
@@ -0,0 +1,205 @@
+import os
+import logging
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+import fitz
+
+from backend.services.ingestion.chunking_service import CHUNK_OVERLAP_TOKENS, MAX_TOKENS
+
+logger = logging.getLogger(__name__)
+
+AUTO_EXTRACTOR = "auto"
+
+# Layout heuristics evaluated on the first pages
+LAYOUT_PAGES_TO_CHECK = 3
+MAX_IMAGE_COVERAGE = 0.3
+MAX_DRAWINGS_PER_PAGE = 40
+MIN_COLUMN_BLOCKS = 4
+
+# Extractor: (file_path, max_tokens, overlap_tokens) -> ParsedDocument
+PdfExtractor = Callable[[str, int, int], "ParsedDocument"]
+
+PDF_EXTRACTORS: Dict[str, PdfExtractor] = {}
+
+
+def register_pdf_extractor(name: str):
+    """Register a PDF extractor under a name usable in PDF_EXTRACTOR."""
+
+    def decorator(extractor: PdfExtractor) -> PdfExtractor:
+        PDF_EXTRACTORS[name] = extractor
+        return extractor
+
+    return decorator
+
+
+# -------------------- EXTRACTORS --------------------
+@register_pdf_extractor("fast")
+def extract_with_pymupdf(file_path: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """Text layer only; headings are recovered from font sizes."""
+    from backend.parsers.pdf_text_parser import extract_pdf_text_blocks, pdf_text_blocks_to_markdown
+    from backend.services.ingestion.chunking_service import build_pdf_text_chunks
+    from backend.services.ingestion.parse_pool import ParsedDocument
+
+    blocks, page_count = extract_pdf_text_blocks(file_path)
+
+    return ParsedDocument(
+        full_text=pdf_text_blocks_to_markdown(blocks),
+        chunks=build_pdf_text_chunks(blocks, max_tokens=max_tokens, overlap_tokens=overlap_tokens),
+        is_pdf=True,
+        page_count=page_count,
+    )
+
+
+def _extract_with_docling(file_path: str, do_ocr: bool, max_tokens: int, overlap_tokens: int):
+    from backend.parsers.pdf_parser import convert_pdf
+    from backend.services.ingestion.parse_pool import chunk_docling_document
+
+    stats: Dict[str, float] = {}
+    docling_doc, used_ocr = convert_pdf(file_path, do_ocr=do_ocr, stats=stats)
+    return chunk_docling_document(docling_doc, used_ocr, max_tokens, overlap_tokens, stats=stats)
+
+
+@register_pdf_extractor("docling")
+def extract_with_docling(file_path: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """
+    Full Docling layout analysis on the text layer. The async parse path
+    (parse_pool.parse_pdf_with_docling) additionally OCRs scanned pages.
+    """
+    return _extract_with_docling(file_path, False, max_tokens, overlap_tokens)
+
+
+@register_pdf_extractor("docling_ocr")
+def extract_with_docling_ocr(file_path: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """Docling layout analysis with OCR on every page."""
+    return _extract_with_docling(file_path, True, max_tokens, overlap_tokens)
+
+
+@register_pdf_extractor("mixed")
+def extract_with_pymupdf_and_docling(
+        file_path: str,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+):
+    """
+    Text layer for plain pages; only pages without a text layer (OCR) or with
+    a table are converted by Docling, one after the other. The async parse
+    path (parse_pool.parse_pdf_by_pages) converts them in parallel and
+    caches OCR pages.
+    """
+    from backend.parsers.pdf_parser import analyze_pdf_pages, docling_page_ranges, split_pdf
+    from backend.services.ingestion.parse_pool import chunk_pdf_by_pages, convert_pdf_range
+
+    page_ranges = docling_page_ranges(analyze_pdf_pages(file_path))
+
+    with tempfile.TemporaryDirectory(prefix="insightai_pages_") as tmp_dir:
+        part_paths = split_pdf(file_path, [(page_range.start, page_range.end) for page_range in page_ranges], tmp_dir)
+        page_documents = {
+            page_range.start: convert_pdf_range(part_path, page_range.ocr, page_range.tables)[0]
+            for part_path, page_range in zip(part_paths, page_ranges)
+        }
+
+    used_ocr = any(page_range.ocr for page_range in page_ranges)
+    return chunk_pdf_by_pages(file_path, page_documents, used_ocr, max_tokens, overlap_tokens)
+
+
+# Docling extractors and whether they force OCR on every page; parse_in_pool
+# converts them with a per-page plan
+DOCLING_EXTRACTORS_OCR = {"docling": False, "docling_ocr": True}
+# Fast path with Docling for the OCR and table pages only; parse_in_pool
+# converts those pages in parallel
+MIXED_EXTRACTOR = "mixed"
+
+
+# -------------------- SELECTION --------------------
+def _load_configured_extractor() -> str:
+    name = os.getenv("PDF_EXTRACTOR", AUTO_EXTRACTOR).strip().lower()
+
+    if name != AUTO_EXTRACTOR and name not in PDF_EXTRACTORS:
+        allowed = ", ".join([AUTO_EXTRACTOR, *sorted(PDF_EXTRACTORS)])
+        raise RuntimeError(f"PDF_EXTRACTOR must be one of: {allowed}")
+
+    return name
+
+
+PDF_EXTRACTOR = _load_configured_extractor()
+
+
+def _has_multi_column_layout(page) -> bool:
+    """
+    Narrow text blocks on both halves of the page indicate columns, which the
+    plain text layer does not put into reading order reliably.
+    """
+    width = page.rect.width
+    left = right = 0
+
+    for x0, _, x1, _, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0 or not text.strip() or (x1 - x0) > width * 0.45:
+            continue
+        if x1 <= width / 2:
+            left += 1
+        elif x0 >= width / 2:
+            right += 1
+
+    return left >= MIN_COLUMN_BLOCKS and right >= MIN_COLUMN_BLOCKS
+
+
+def _image_coverage(page) -> float:
+    page_area = abs(page.rect) or 1.0
+    image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    return image_area / page_area
+
+
+def choose_pdf_extractor(
+        pdf_path: str,
+        pages: Optional[List["PdfPageInfo"]] = None,
+        pages_to_check: int = LAYOUT_PAGES_TO_CHECK
+) -> str:
+    """
+    Pick an extractor from the page analysis (analyze_pdf_pages, run here if
+    pages is None) and cheap layout checks:
+
+    - no page with a usable text layer and without a table: Docling, which
+      OCRs or recognizes the table structure on exactly those pages
+    - large images, many vector drawings (charts) or multiple columns on the
+      first of the other pages: Docling layout analysis
+    - some pages without a text layer or with a table: the mixed extractor,
+      which reads the other pages with the fast path and converts only
+      those pages with Docling
+    - otherwise: the PyMuPDF fast path
+    """
+    from backend.parsers.pdf_parser import analyze_pdf_pages
+
+    try:
+        if pages is None:
+            pages = analyze_pdf_pages(pdf_path)
+        # Scanned and table pages go to Docling anyway; the layout is checked on the others
+        text_pages = [page.page_no for page in pages if not (page.needs_ocr or page.has_tables)]
+        if not text_pages:
+            return "docling"
+
+        with fitz.open(pdf_path) as doc:
+            for page in (doc.load_page(page_no - 1) for page_no in text_pages[:pages_to_check]):
+                if _image_coverage(page) > MAX_IMAGE_COVERAGE:
+                    return "docling"
+                if len(page.get_drawings()) > MAX_DRAWINGS_PER_PAGE:
+                    return "docling"
+                if _has_multi_column_layout(page):
+                    return "docling"
+
+        return "fast" if len(text_pages) == len(pages) else MIXED_EXTRACTOR
+
+    except Exception:
+        # Unreadable for PyMuPDF, let Docling decide
+        logger.warning(f"Layout check failed for {pdf_path}, using Docling", exc_info=True)
+        return "docling"
+
+
+def select_pdf_extractor(pdf_path: str, pages: Optional[List["PdfPageInfo"]] = None) -> str:
+    """PDF_EXTRACTOR forces an extractor, "auto" chooses per document."""
+    if PDF_EXTRACTOR != AUTO_EXTRACTOR:
+        return PDF_EXTRACTOR
+
+    name = choose_pdf_extractor(pdf_path, pages)
+    logger.info(f"Using {name} PDF extractor for {pdf_path}")
+    return name
@@ -0,0 +1,136 @@
+import hashlib
+import datetime
+import logging
+from typing import Optional
+
+from backend.models.document import Document
+from backend.models.document_block import DocumentBlock
+from backend.models.document_checkpoint import DocumentCheckpoint
+from backend.models.document_chunk import DocumentChunk
+from backend.models.document_parse import DocumentParse
+from backend.services.ingestion.content_dedup import PIPELINE_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def stage_fingerprint(stage: str, *inputs) -> str:
+    """SHA-256 over the name of a stage and the fingerprints or settings it depends on."""
+    digest = hashlib.sha256(stage.encode("utf-8"))
+    for value in inputs:
+        digest.update(b"\x00")
+        digest.update(repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def parse_fingerprint(document: Document) -> Optional[str]:
+    """
+    Fingerprint of the parse inputs: uploaded bytes, file type and pipeline
+    version. None for documents uploaded before content hashing, which are
+    always parsed again.
+    """
+    if not document.content_sha256:
+        return None
+    return stage_fingerprint("parse", document.content_sha256, document.file_type, PIPELINE_VERSION)
+
+
+def chunks_fingerprint(db, document_id: int) -> str:
+    """
+    Fingerprint of the stored chunks of a document. Chunk rows keep their text
+    for their whole life, so ids, positions and duplicate links identify the
+    chunk set without hashing the text again.
+    """
+    digest = hashlib.sha256()
+    for row in (
+        db.query(
+            DocumentChunk.id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.page_start,
+            DocumentChunk.page_end,
+            DocumentChunk.section_title,
+            DocumentChunk.duplicate_of_id,
+        )
+        .filter(DocumentChunk.document_id == document_id)
+        .order_by(DocumentChunk.chunk_index)
+    ):
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def blocks_fingerprint(db, document_id: int) -> str:
+    """Fingerprint of the blocks of a document; reused blocks keep their id."""
+    digest = hashlib.sha256()
+    for row in (
+        db.query(DocumentBlock.id, DocumentBlock.block_index)
+        .filter(DocumentBlock.document_id == document_id)
+        .order_by(DocumentBlock.block_index)
+    ):
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def has_stored_chunks(db, document_id: int) -> bool:
+    """
+    True if chunks of the document are stored. Only PDF parses leave a
+    DocumentParse row, so a completed parse is recognised by its chunks.
+    """
+    return db.query(DocumentChunk.id).filter(DocumentChunk.document_id == document_id).first() is not None
+
+
+def latest_parse_id(db, document_id: int) -> Optional[int]:
+    row = (
+        db.query(DocumentParse.id)
+        .filter(DocumentParse.document_id == document_id)
+        .order_by(DocumentParse.id.desc())
+        .first()
+    )
+    return row[0] if row else None
+
+
+def checkpoint_matches(db, document_id: int, stage: str, fingerprint: Optional[str]) -> bool:
+    """True if the stage completed for a document with exactly these inputs."""
+    if fingerprint is None:
+        return False
+
+    matches = (
+        db.query(DocumentCheckpoint.id)
+        .filter(
+            DocumentCheckpoint.document_id == document_id,
+            DocumentCheckpoint.stage == stage,
+            DocumentCheckpoint.fingerprint == fingerprint,
+        )
+        .first()
+        is not None
+    )
+    if matches:
+        logger.info(f"Document {document_id}: inputs of stage {stage} unchanged, skipping it")
+    return matches
+
+
+def save_checkpoint(db, document_id: int, stage: str, fingerprint: Optional[str]) -> None:
+    """Record that a stage completed with the given inputs and commit."""
+    if fingerprint is None:
+        return
+
+    checkpoint = (
+        db.query(DocumentCheckpoint)
+        .filter(DocumentCheckpoint.document_id == document_id, DocumentCheckpoint.stage == stage)
+        .first()
+    )
+    if checkpoint is None:
+        checkpoint = DocumentCheckpoint(document_id=document_id, stage=stage)
+
+    checkpoint.fingerprint = fingerprint
+    checkpoint.completed_at = datetime.datetime.utcnow()
+    db.add(checkpoint)
+    db.commit()
+
+
+def clear_checkpoints(db, document_id: int) -> int:
+    """Forget every completed stage of a document, so it is rebuilt from scratch. Commits."""
+    deleted = (
+        db.query(DocumentCheckpoint)
+        .filter(DocumentCheckpoint.document_id == document_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
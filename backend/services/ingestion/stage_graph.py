@@ -0,0 +1,80 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A pipeline stage that starts once every stage named in after has finished."""
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    after: Tuple[str, ...] = ()
+
+
+def _topological_order(stages: Sequence[Stage]) -> List[Stage]:
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+
+    for stage in stages:
+        unknown = [name for name in stage.after if name not in by_name]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+
+    ordered: List[Stage] = []
+    done = set()
+    remaining = list(stages)
+
+    while remaining:
+        ready = [stage for stage in remaining if all(name in done for name in stage.after)]
+        if not ready:
+            raise ValueError("Stage dependencies contain a cycle")
+
+        for stage in ready:
+            ordered.append(stage)
+            done.add(stage.name)
+            remaining.remove(stage)
+
+    return ordered
+
+
+async def run_stage_graph(
+        stages: Sequence[Stage],
+        timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Run every stage as soon as its dependencies are done, independent stages
+    concurrently. The seconds each stage ran are written to timings.
+
+    Returns the result of every stage by name. If a stage fails, the stages
+    still running are cancelled and the error is raised.
+    """
+    timings = timings if timings is not None else {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(stage: Stage) -> Any:
+        if stage.after:
+            await asyncio.gather(*(tasks[name] for name in stage.after))
+
+        started = time.perf_counter()
+        try:
+            return await stage.run()
+        finally:
+            timings[stage.name] = time.perf_counter() - started
+
+    for stage in _topological_order(stages):
+        tasks[stage.name] = asyncio.create_task(run(stage), name=f"stage-{stage.name}")
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,40 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from backend.services.ingestion.job_queue import load_positive_int_setting
+
+# Maximum number of documents that may run each pipeline stage at the same
+# time inside one worker process.
+STAGE_CONCURRENCY: Dict[str, int] = {
+    "parse": load_positive_int_setting("INGESTION_PARSE_CONCURRENCY", 2),
+    "embed": load_positive_int_setting("INGESTION_EMBED_CONCURRENCY", 4),
+    "structure": load_positive_int_setting("INGESTION_STRUCTURE_CONCURRENCY", 2),
+    "report": load_positive_int_setting("INGESTION_REPORT_CONCURRENCY", 2),
+}
+
+# asyncio semaphores belong to the event loop they are used on
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _stage_semaphore(stage: str) -> asyncio.Semaphore:
+    if stage not in STAGE_CONCURRENCY:
+        raise ValueError(f"Unknown ingestion stage: {stage}")
+
+    loop = asyncio.get_running_loop()
+    semaphores = _loop_semaphores.setdefault(loop, {})
+
+    if stage not in semaphores:
+        semaphores[stage] = asyncio.Semaphore(STAGE_CONCURRENCY[stage])
+
+    return semaphores[stage]
+
+
+@asynccontextmanager
+async def stage_slot(stage: str):
+    """Wait for a free slot of the given pipeline stage."""
+    async with _stage_semaphore(stage):
+        yield
@@ -125,7 +125,8 @@ async def structure_block_batch(blocks: List[DocumentBlock]) -> Dict[int, Dict]:
 # -------------------- MAIN ENTRY --------------------
 async def structure_blocks(document_id: int, parse_id: Optional[int]) -> List[Dict]:
     """
-    Structures all DocumentBlocks of a document using batched LLM calls.
+    Structures the DocumentBlocks of a document that are not structured yet
+    using batched LLM calls; blocks kept from a previous version are skipped.
     Each block receives semantic metadata such as section type, title, and a concise summary.
 
     Returns:
@@ -134,7 +135,8 @@ async def structure_blocks(document_id: int, parse_id: Optional[int]) -> List[Di
     db = SessionLocal()
     try:
         query = db.query(DocumentBlock).filter(
-            DocumentBlock.document_id == document_id
+            DocumentBlock.document_id == document_id,
+            DocumentBlock.semantic_label.is_(None),
         )
 
         if parse_id is None:
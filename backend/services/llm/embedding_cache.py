@@ -0,0 +1,273 @@
+"""
+Content-addressed cache of embedding vectors.
+
+Vectors are keyed by (model, sha256 of the text) and stored as float16 blobs
+in a separate SQLite file, so reprocessing an unchanged document or chunk
+never pays for the same embedding twice. The cache is bounded by
+EMBEDDING_CACHE_MAX_ENTRIES; the least recently used entries are evicted.
+
+Single search queries are also kept in an in-memory LRU with a TTL
+(QueryEmbeddingCache), in front of the SQLite file, so a repeated chat or
+report query skips the embedding round trip entirely.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.observability import metrics
+
+logger = logging.getLogger(__name__)
+
+_cache: Optional["EmbeddingCache"] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+_query_cache: Optional["QueryEmbeddingCache"] = None
+_query_cache_loaded = False
+
+# SQLite limits the number of host parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+# Eviction removes down to this share of the maximum, so it does not run on every write
+EVICTION_TARGET = 0.9
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_sha256 TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_sha256)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[int, List[float]]:
+        """
+        Bulk lookup. Returns the cached vectors by position in texts; hits
+        and misses are counted in the metrics.
+        """
+        hashes = [text_sha256(text) for text in texts]
+        unique_hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, bytes] = {}
+
+        with self._lock:
+            for start in range(0, len(unique_hashes), LOOKUP_BATCH_SIZE):
+                batch = unique_hashes[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_sha256, vector FROM embeddings "
+                    f"WHERE model = ? AND text_sha256 IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_sha256 = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+
+        hits = {
+            index: decode_vector(found[text_hash])
+            for index, text_hash in enumerate(hashes)
+            if text_hash in found
+        }
+
+        metrics.increment("embedding_cache.hits", len(hits))
+        metrics.increment("embedding_cache.misses", len(texts) - len(hits))
+        return hits
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        rows = [
+            (model, text_sha256(text), encode_vector(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_sha256, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+
+        excess = count - int(self.max_entries * EVICTION_TARGET)
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE (model, text_sha256) IN (
+                SELECT model, text_sha256 FROM embeddings ORDER BY last_used LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        metrics.increment("embedding_cache.evictions", excess)
+        logger.info(f"Evicted {excess} embeddings from the cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class QueryEmbeddingCache:
+    """
+    Process-wide, size-bounded LRU of query embeddings in memory. Entries
+    expire ttl_seconds after they were stored; expired entries count as misses.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            metrics.increment("query_embedding_cache.misses")
+            return None
+
+        metrics.increment("query_embedding_cache.hits")
+        # Callers get their own list; the cached one is never handed out
+        return list(entry[1])
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        key = (model, text)
+        expires_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (expires_at, list(vector))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.increment("query_embedding_cache.evictions")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def hit_ratio() -> float:
+    """Share of embedding lookups served from the cache since the process started."""
+    hits = metrics.get("embedding_cache.hits")
+    total = hits + metrics.get("embedding_cache.misses")
+    return hits / total if total else 0.0
+
+
+def _load_max_entries() -> int:
+    from backend.services.ingestion.job_queue import load_positive_int_setting
+
+    return load_positive_int_setting("EMBEDDING_CACHE_MAX_ENTRIES", 200_000)
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    """Open the cache configured by EMBEDDING_CACHE_PATH; an empty path disables it."""
+    path = os.getenv("EMBEDDING_CACHE_PATH", "./backend/database/embedding_cache.db").strip()
+    if not path:
+        return None
+
+    return EmbeddingCache(path, _load_max_entries())
+
+
+def _load_non_negative_int_setting(name: str, default: int) -> int:
+    raw_value = os.getenv(name, str(default))
+    try:
+        value = int(raw_value)
+    except ValueError as exc:
+        raise RuntimeError(f"{name} must be a non-negative integer") from exc
+
+    if value < 0:
+        raise RuntimeError(f"{name} must be a non-negative integer")
+
+    return value
+
+
+def create_query_embedding_cache() -> Optional[QueryEmbeddingCache]:
+    """
+    Query cache configured by QUERY_EMBEDDING_CACHE_MAX_ENTRIES and
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS; 0 entries disables it.
+    """
+    from backend.services.ingestion.job_queue import load_positive_int_setting
+
+    max_entries = _load_non_negative_int_setting("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", 2048)
+    if not max_entries:
+        return None
+
+    return QueryEmbeddingCache(max_entries, load_positive_int_setting("QUERY_EMBEDDING_CACHE_TTL_SECONDS", 3600))
+
+
+def get_query_embedding_cache() -> Optional[QueryEmbeddingCache]:
+    """Process-wide query cache, created on first use."""
+    global _query_cache, _query_cache_loaded
+
+    with _cache_lock:
+        if not _query_cache_loaded:
+            _query_cache = create_query_embedding_cache()
+            _query_cache_loaded = True
+        return _query_cache
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache, opened on first use."""
+    global _cache, _cache_loaded
+
+    with _cache_lock:
+        if not _cache_loaded:
+            _cache = create_embedding_cache()
+            _cache_loaded = True
+        return _cache
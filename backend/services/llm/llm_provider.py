@@ -1,13 +1,22 @@
 import os
 import json
 import time
+import random
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from openai import RateLimitError, APIConnectionError, APIError
 
+from backend.services.ingestion.job_queue import load_positive_int_setting
+from backend.services.llm.embedding_cache import get_embedding_cache, get_query_embedding_cache
 from backend.services.llm.gemini_client import generate_json as gemini_generate_json
+from backend.services.llm.rate_limiter import TokenBucketLimiter
+from backend.services.llm.tokenizer import EMBEDDING_MODEL, get_embedding_encoding
+from backend.services.observability import metrics
 from backend.services.observability.langfuse_client import langfuse
 from backend.services.observability.langfuse_helpers import (
     langfuse_span,
@@ -26,6 +35,23 @@ openai_client = OpenAI(
     max_retries=2
 )
 
+# Embedding batches in flight per call and the quota shared by all calls of the process
+EMBEDDING_CONCURRENCY = load_positive_int_setting("EMBEDDING_CONCURRENCY", 4)
+EMBEDDING_RPM = load_positive_int_setting("EMBEDDING_RPM", 3000)
+EMBEDDING_TPM = load_positive_int_setting("EMBEDDING_TPM", 1_000_000)
+EMBEDDING_RETRIES = 5
+
+# Batches are packed up to this many tokens; the provider limits are fixed
+EMBEDDING_BATCH_MAX_TOKENS = load_positive_int_setting("EMBEDDING_BATCH_MAX_TOKENS", 100_000)
+EMBEDDING_MAX_BATCH_TEXTS = 2048
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+
+embedding_rate_limiter = TokenBucketLimiter(EMBEDDING_RPM, EMBEDDING_TPM)
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+_embedding_loop: Optional[asyncio.AbstractEventLoop] = None
+
 # ------------------------
 # JSON / CHAT COMPLETION
 # ------------------------
@@ -253,79 +279,264 @@ def generate_json(
 # ------------------------
 # EMBEDDINGS
 # ------------------------
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def count_embedding_tokens(texts: Sequence[str], token_counts: Optional[Sequence[Optional[int]]] = None) -> List[int]:
+    """
+    Token count of every text; known counts (e.g. DocumentChunk.token_count,
+    counted with the same encoding when the chunks were built) are used as given.
+    """
+    counts = list(token_counts) if token_counts is not None else [None] * len(texts)
+    return [
+        count if count is not None else len(get_embedding_encoding().encode(text or ""))
+        for text, count in zip(texts, counts)
+    ]
+
+
+def truncate_to_input_limit(text: str) -> str:
+    """Cut a text above the provider's per-input limit, which would fail the whole request."""
+    tokens = get_embedding_encoding().encode(text or "")
+    if len(tokens) <= EMBEDDING_MAX_INPUT_TOKENS:
+        return text
+
+    logger.warning(
+        f"Embedding input of {len(tokens)} tokens truncated to {EMBEDDING_MAX_INPUT_TOKENS} tokens"
+    )
+    metrics.increment("embeddings.truncated_inputs")
+    return get_embedding_encoding().decode(tokens[:EMBEDDING_MAX_INPUT_TOKENS])
+
+
+def pack_embedding_batches(
+        token_counts: Sequence[int],
+        max_tokens: int,
+        max_texts: int = EMBEDDING_MAX_BATCH_TEXTS,
+) -> List[Tuple[int, int]]:
+    """
+    Split texts, in order, into (start, end) batches of at most max_tokens
+    tokens and max_texts texts. A text above max_tokens gets a batch of its own.
+    """
+    batches: List[Tuple[int, int]] = []
+    start = 0
+    total = 0
+
+    for index, count in enumerate(token_counts):
+        if index > start and (total + count > max_tokens or index - start >= max_texts):
+            batches.append((start, index))
+            start = index
+            total = 0
+        total += count
+
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+
+    return batches
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    AsyncOpenAI client of the running event loop. Its connection pool is
+    bound to the loop, so every loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=90.0, max_retries=0)
+            _async_clients[loop] = client
+        return client
+
+
+def _get_embedding_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop that runs embed_texts_async for synchronous callers."""
+    global _embedding_loop
+
+    with _async_clients_lock:
+        if _embedding_loop is None:
+            _embedding_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_embedding_loop.run_forever,
+                name="embedding-loop",
+                daemon=True,
+            ).start()
+        return _embedding_loop
+
+
+async def _embed_batch(batch: List[str], batch_index: int, batch_tokens: int) -> List[List[float]]:
+    """Embed one batch within the rate limits; 429s and transient errors are retried with jittered backoff."""
+    client = get_async_openai_client()
+    delay = 1.0
+
+    for attempt in range(EMBEDDING_RETRIES):
+        await embedding_rate_limiter.acquire(batch_tokens)
+
+        try:
+            start = now_ms()
+            with langfuse_generation(
+                    langfuse,
+                    name="openai.embeddings",
+                    model=EMBEDDING_MODEL,
+                    input={"batch_count": len(batch)},
+                    metadata={
+                        "batch_index": batch_index,
+                        "batch_chars": sum(len(t or "") for t in batch),
+                        "batch_tokens": batch_tokens,
+                    },
+            ) as gen:
+                response = await client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=batch,
+                )
+                embeddings = [item.embedding for item in response.data]
+                metrics.increment("embeddings.requests")
+                metrics.increment("embeddings.tokens", batch_tokens)
+
+                safe_gen_update(
+                    gen,
+                    output={"embeddings_count": len(embeddings)},
+                    metadata={"latency_ms": now_ms() - start},
+                )
+
+            return embeddings
+
+        except (RateLimitError, APIConnectionError, APIError) as e:
+            if attempt == EMBEDDING_RETRIES - 1:
+                raise
+            # Jitter keeps concurrent batches from retrying in lockstep
+            wait = delay * random.uniform(0.5, 1.5)
+            logger.warning(f"Embeddings failed ({type(e).__name__}), retrying in {wait:.1f}s")
+            metrics.increment("embeddings.retries")
+            await asyncio.sleep(wait)
+            delay *= 2
+
+    return []
+
+
+async def embed_texts_async(
+        texts: List[str],
+        concurrency: Optional[int] = None,
+        token_counts: Optional[Sequence[Optional[int]]] = None,
+) -> List[List[float]]:
     """
     Generate vector embeddings for a list of texts using OpenAI embeddings.
-    Texts are processed in batches to reduce API calls and improve throughput.
+    Texts are packed into batches of up to EMBEDDING_BATCH_MAX_TOKENS tokens,
+    up to EMBEDDING_CONCURRENCY batches are in flight at a time, and every
+    request waits for the shared requests/tokens per minute limiter.
+    token_counts may hold known token counts of the texts; missing ones are
+    counted here. Vectors of texts embedded before are read from the
+    embedding cache; only the misses are sent to the API.
 
     If Langfuse is enabled, only privacy-safe metadata is logged,
     including number of texts, character counts, and latency. Raw input texts are never logged.
 
     Returns:
-        A list of embedding vectors corresponding to the input texts.
+        A list of embedding vectors in the order of the input texts.
         Each embedding is a list of floats.
     """
-    batch_size = 64
-    out: List[List[float]] = []
-
-    total_chars = sum(len(t or "") for t in texts)
-    texts_hash = hash_text("||".join(texts[:10])) if texts else ""
+    vectors: Dict[int, List[float]] = {}
+
+    cache = get_embedding_cache() if texts else None
+    if cache is not None:
+        vectors.update(await asyncio.to_thread(cache.get_many, EMBEDDING_MODEL, texts))
+
+    missing = [i for i in range(len(texts)) if i not in vectors]
+    pending = [texts[i] for i in missing]
+    pending_counts = count_embedding_tokens(
+        pending, [token_counts[i] for i in missing] if token_counts is not None else None
+    )
+
+    # Inputs above the per-input limit are cut explicitly instead of failing their batch
+    inputs = [
+        truncate_to_input_limit(text) if count > EMBEDDING_MAX_INPUT_TOKENS else text
+        for text, count in zip(pending, pending_counts)
+    ]
+    pending_counts = [min(count, EMBEDDING_MAX_INPUT_TOKENS) for count in pending_counts]
+    batches = pack_embedding_batches(pending_counts, EMBEDDING_BATCH_MAX_TOKENS)
+    batch_tokens = [sum(pending_counts[start:end]) for start, end in batches]
+
+    total_chars = sum(len(t or "") for t in pending)
+    texts_hash = hash_text("||".join(pending[:10])) if pending else ""
+    semaphore = asyncio.Semaphore(concurrency or EMBEDDING_CONCURRENCY)
+
+    async def run_batch(batch_index: int) -> List[List[float]]:
+        start, end = batches[batch_index]
+        async with semaphore:
+            return await _embed_batch(inputs[start:end], batch_index, batch_tokens[batch_index])
 
     with langfuse_span(
         langfuse,
         name="llm.embed_texts",
-        input={"texts_count": len(texts)},
-        metadata={"batch_size": batch_size, "total_chars": total_chars, "sample_hash": texts_hash}
+        input={"texts_count": len(texts), "cached_count": len(vectors)},
+        metadata={
+            "batch_count": len(batches),
+            "batch_tokens": batch_tokens,
+            "total_chars": total_chars,
+            "sample_hash": texts_hash,
+        }
     ):
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        results = await asyncio.gather(*(run_batch(index) for index in range(len(batches))))
+    safe_flush(langfuse)
 
-            retries = 3
-            delay = 1.0
+    if batches:
+        logger.info(f"Embedded {len(pending)} texts in {len(batches)} requests, tokens per request: {batch_tokens}")
 
-            for attempt in range(retries):
-                try:
-                    start = now_ms()
-                    if langfuse:
-                        with langfuse_generation(
-                                langfuse,
-                                name="openai.embeddings",
-                                model="text-embedding-3-small",
-                                input={"batch_count": len(batch)},
-                                metadata={
-                                    "batch_index": i // batch_size,
-                                    "batch_chars": sum(len(t or "") for t in batch),
-                                },
-                        ) as gen:
-                            response = openai_client.embeddings.create(
-                                model="text-embedding-3-small",
-                                input=batch,
-                            )
-                            embeddings = [item.embedding for item in response.data]
-                            out.extend(embeddings)
+    out = [vector for batch in results for vector in batch]
 
-                            safe_gen_update(
-                                gen,
-                                output={"embeddings_count": len(embeddings)},
-                                metadata={"latency_ms": now_ms() - start},
-                            )
+    if cache is not None and out:
+        await asyncio.to_thread(cache.put_many, EMBEDDING_MODEL, pending, out)
 
-                        break
+    vectors.update(zip(missing, out))
+    return [vectors[i] for i in range(len(texts))]
 
-                    else:
-                        # (No Langfuse)
-                        response = openai_client.embeddings.create(
-                            model="text-embedding-3-small",
-                            input=batch,
-                        )
-                        out.extend([item.embedding for item in response.data])
-                        break
-
-                except (RateLimitError, APIConnectionError, APIError) as e:
-                    if attempt == retries - 1:
-                        raise
-                    logger.warning(f"Embeddings failed ({type(e).__name__}), retrying in {delay:.1f}s")
-                    time.sleep(delay)
-                    delay *= 2
-    safe_flush(langfuse)
-    return out
+
+def embed_texts(texts: List[str], token_counts: Optional[Sequence[Optional[int]]] = None) -> List[List[float]]:
+    """
+    Synchronous wrapper of embed_texts_async for worker threads and other
+    synchronous callers. The batches run on a shared background event loop
+    and the calling thread blocks until they are done, so coroutines must
+    await embed_texts_async instead.
+    """
+    if not texts:
+        return []
+
+    future = asyncio.run_coroutine_threadsafe(
+        embed_texts_async(texts, token_counts=token_counts),
+        _get_embedding_loop(),
+    )
+    return future.result()
+
+
+def embed_query(
+        query: str,
+        embed: Callable[[List[str]], List[List[float]]] = embed_texts
+) -> List[float]:
+    """
+    Embedding of a single search query. Repeated queries are served from the
+    in-memory query cache; a miss runs embed([query]), which reads the
+    persistent embedding cache before calling the API. Empty vectors are not
+    cached.
+    """
+    cache = get_query_embedding_cache()
+    if cache is not None:
+        vector = cache.get(EMBEDDING_MODEL, query)
+        if vector is not None:
+            return vector
+
+    vector = embed([query])[0]
+    if cache is not None and vector:
+        cache.put(EMBEDDING_MODEL, query, vector)
+    return vector
+
+
+async def embed_query_async(
+        query: str,
+        embed: Callable[[List[str]], Awaitable[List[List[float]]]] = embed_texts_async
+) -> List[float]:
+    """embed_query for coroutines: a cache miss awaits embed([query]) instead of blocking."""
+    cache = get_query_embedding_cache()
+    if cache is not None:
+        vector = cache.get(EMBEDDING_MODEL, query)
+        if vector is not None:
+            return vector
+
+    vector = (await embed([query]))[0]
+    if cache is not None and vector:
+        cache.put(EMBEDDING_MODEL, query, vector)
+    return vector
@@ -0,0 +1,63 @@
+"""
+Token bucket limiter for provider quotas (requests and tokens per minute).
+
+The bucket state is guarded by a thread lock and waiting happens with
+asyncio.sleep outside of it, so one limiter can be shared by coroutines of
+several event loops, e.g. worker threads that each run their own loop.
+"""
+
+import time
+import asyncio
+import threading
+from typing import Callable
+
+
+class TokenBucketLimiter:
+    def __init__(
+            self,
+            requests_per_minute: int,
+            tokens_per_minute: int,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Buckets start full, so a burst up to the quota goes out at once
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = clock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        Take one request and the given tokens if both buckets allow it.
+        Returns 0 on success, otherwise the seconds to wait before retrying.
+        """
+        # A single request larger than the token quota waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+
+        with self._lock:
+            self._refill(self._clock())
+
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+
+            request_wait = max(0.0, 1 - self._requests) * 60 / self.requests_per_minute
+            token_wait = max(0.0, tokens - self._tokens) * 60 / self.tokens_per_minute
+            return max(request_wait, token_wait)
+
+    async def acquire(self, tokens: int) -> None:
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
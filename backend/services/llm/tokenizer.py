@@ -0,0 +1,18 @@
+"""
+Tokenizer of the embedding model.
+
+Chunks are sized and counted with the same encoding that packs and truncates
+embedding requests, so the token counts stored with the chunks
+(DocumentChunk.token_count) can be used for the requests as they are.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+@lru_cache(maxsize=1)
+def get_embedding_encoding() -> tiktoken.Encoding:
+    return tiktoken.encoding_for_model(EMBEDDING_MODEL)
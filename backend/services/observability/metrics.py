@@ -0,0 +1,42 @@
+"""
+In-process counters for the ingestion pipeline.
+
+Values live for the lifetime of the process (API or worker) and are meant
+for logs, debugging endpoints and benchmarks; they are not persisted.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Dict, Mapping
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+
+
+def increment(name: str, value: float = 1.0) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def record(values: Mapping[str, float], prefix: str = "") -> None:
+    """Add every value of a mapping to the counter of the same name."""
+    with _lock:
+        for name, value in values.items():
+            _counters[f"{prefix}{name}"] += value
+
+
+def get(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0.0)
+
+
+def snapshot() -> Dict[str, float]:
+    with _lock:
+        return dict(_counters)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
@@ -8,7 +8,8 @@ from backend.database.database import SessionLocal
 from backend.services.llm.llm_provider import generate_json
 from backend.models.document import Document
 from backend.models.document_block import DocumentBlock
-from backend.services.vector.vector_store import query_similar_chunks
+from backend.services.vector.vector_store import query_similar_chunks_async
+from backend.services.ingestion.content_dedup import artifact_document_id
 from backend.services.reporting.report_schema import ReportModel, ReportSection, KeyFigure
 from backend.services.reporting.timeline_extractor import generate_timeline
 from backend.services.reporting.insight_extractor import generate_report_insights
@@ -330,7 +331,7 @@ async def generate_section(
             all_hits = []
 
             for q in queries:
-                hits = query_similar_chunks(
+                hits = await query_similar_chunks_async(
                     document_id=document_id,
                     query=q,
                     k=15,
@@ -539,6 +540,9 @@ async def generate_report_for_document(db: Session, document_id: int) -> Dict[st
     lang = document.language or "de"
     lang_rule = language_instruction(lang)
 
+    # Deduplicated uploads read the chunks and blocks of the document that owns their content
+    content_document_id = artifact_document_id(db, document)
+
     system_section = f"{SYSTEM_SECTION}\n\n{lang_rule}"
     system_keyfig = f"{SYSTEM_KEYFIGURES}\n\n{lang_rule}"
     system_final = f"{SYSTEM_FINAL}\n\n{lang_rule}"
@@ -562,7 +566,7 @@ async def generate_report_for_document(db: Session, document_id: int) -> Dict[st
             generate_section(
                 heading,
                 instruction,
-                document_id,
+                content_document_id,
                 system_section,
                 system_keyfig,
                 base_meta
@@ -21,6 +21,7 @@ SUPPORTED_CONTENT_TYPES = {
     ".md": "text/markdown",
     ".csv": "text/csv",
 }
+FILE_KINDS = {content_type: extension.lstrip(".") for extension, content_type in SUPPORTED_CONTENT_TYPES.items()}
 
 
 def _load_max_upload_size_bytes() -> int:
@@ -99,6 +100,20 @@ def validate_upload(filename: str | None, file_bytes: bytes) -> ValidatedUpload:
     )
 
 
+def document_file_kind(file_type: str | None, filename: str | None = None) -> str:
+    """
+    Short kind of a stored document, e.g. "pdf" or "csv", as kept in the payload
+    of its vectors. CSV wins for either a CSV content type or a .csv filename.
+    """
+    file_type = (file_type or "").lower()
+    extension = Path(filename or "").suffix.lower()
+
+    if file_type in ("text/csv", "application/csv") or extension == ".csv":
+        return "csv"
+
+    return FILE_KINDS.get(file_type) or extension.lstrip(".") or "unknown"
+
+
 def _normalize_filename(filename: str | None) -> str:
     raw_filename = (filename or "").strip()
     if not raw_filename or "\x00" in raw_filename:
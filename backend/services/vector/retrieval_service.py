@@ -1,12 +1,41 @@
-from backend.services.vector.vector_store import client, COLLECTION_NAME
-from backend.services.llm.llm_provider import embed_texts
+import os
+import asyncio
+
+from backend.services.vector.vector_store import client, COLLECTION_NAME, SPARSE_VECTOR_NAME, has_sparse_vectors
+from backend.services.vector.sparse_vectors import query_sparse_vector
+from backend.services.llm.llm_provider import embed_query, embed_query_async, embed_texts, embed_texts_async
 from backend.database.database import SessionLocal
 from backend.models.document_chunk import DocumentChunk
 from backend.models.document import Document
+from backend.database.fulltext import rank_chunks_by_keywords
+from backend.services.ingestion.content_dedup import map_artifact_documents
+from backend.services.ingestion.job_queue import load_positive_int_setting
+
+from qdrant_client.models import Filter, FieldCondition, MatchValue, Prefetch, Rrf, RrfQuery
+
+
+def _load_weight_setting(name: str, default: float) -> float:
+    raw_value = os.getenv(name, str(default))
+    try:
+        value = float(raw_value)
+    except ValueError as exc:
+        raise RuntimeError(f"{name} must be a non-negative number") from exc
+
+    if value < 0:
+        raise RuntimeError(f"{name} must be a non-negative number")
 
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+    return value
 
-from sqlalchemy import or_
+
+# -------------------- FUSION CONFIG --------------------
+# Dense and lexical rankings are merged by reciprocal rank fusion: a hit
+# scores weight / (RRF_K + rank) in every ranking it appears in. Ranks are
+# comparable where cosine similarities and BM25 scores are not
+RRF_K = load_positive_int_setting("RETRIEVAL_RRF_K", 60)
+DENSE_WEIGHT = _load_weight_setting("RETRIEVAL_DENSE_WEIGHT", 1.0)
+LEXICAL_WEIGHT = _load_weight_setting("RETRIEVAL_LEXICAL_WEIGHT", 1.0)
+# Candidates fetched from each ranking per requested result
+CANDIDATE_FACTOR = load_positive_int_setting("RETRIEVAL_CANDIDATE_FACTOR", 2)
 
 
 def is_csv_file_type(file_type: str | None, filename: str | None = None) -> bool:
@@ -16,22 +45,190 @@ def is_csv_file_type(file_type: str | None, filename: str | None = None) -> bool
     return file_type in ("text/csv", "application/csv") or filename.endswith(".csv")
 
 
+def reciprocal_rank_fusion(
+        rankings: list[list[dict]],
+        weights: list[float],
+        k: int = RRF_K
+) -> list[dict]:
+    """
+    Merge ranked result lists, best first, by weighted reciprocal rank.
+    Results with the same text are one hit; it keeps the fields of its first
+    occurrence, its fused "score", and "source" "hybrid" if more than one
+    ranking found it.
+    """
+    fused: dict[str, dict] = {}
+
+    for ranking, weight in zip(rankings, weights):
+        for rank, chunk in enumerate(ranking, start=1):
+            hit = fused.get(chunk["text"])
+            if hit is None:
+                hit = fused[chunk["text"]] = {**chunk, "score": 0.0}
+            elif hit["source"] != chunk["source"]:
+                hit["source"] = "hybrid"
+            hit["score"] += weight / (k + rank)
+
+    return sorted(fused.values(), key=lambda c: c["score"], reverse=True)
+
+
+def payload_document_ids(payload: dict) -> list[int]:
+    """document_id payload of a point; shared points store a list."""
+    value = payload.get("document_id")
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def duplicate_pages(db, chunk_ids: list[int]) -> dict[int, list[int]]:
+    """
+    Start pages of the near duplicates linked to each canonical chunk id, e.g.
+    the other pages a repeated disclaimer appears on.
+    """
+    pages: dict[int, list[int]] = {}
+    if not chunk_ids:
+        return pages
+
+    rows = (
+        db.query(DocumentChunk.duplicate_of_id, DocumentChunk.page_start)
+        .filter(
+            DocumentChunk.duplicate_of_id.in_(chunk_ids),
+            DocumentChunk.page_start.isnot(None),
+        )
+        .all()
+    )
+    for canonical_id, page in rows:
+        pages.setdefault(canonical_id, []).append(page)
+
+    return pages
+
+
+def with_duplicate_pages(chunk: dict, pages: dict[int, list[int]]) -> dict:
+    """Add the pages of the chunk and of its near duplicates, sorted, as "pages"."""
+    own_page = [chunk["page"]] if chunk["page"] is not None else []
+    chunk["pages"] = sorted(set(own_page + pages.get(chunk.pop("chunk_id", None), [])))
+    return chunk
+
+
+def searchable_documents(
+        db,
+        document_ids: set[int],
+        workspace_id: int,
+        document_id: int | None = None
+) -> dict[int, Document]:
+    """
+    The documents among document_ids that belong to the workspace (and are
+    document_id, if given) and are not CSV files, by id, in one IN query.
+    The vector payload alone is not trusted for workspace isolation.
+    """
+    if not document_ids:
+        return {}
+
+    query = db.query(Document).filter(
+        Document.id.in_(document_ids),
+        Document.workspace_id == workspace_id,
+    )
+    if document_id is not None:
+        query = query.filter(Document.id == document_id)
+
+    return {
+        document.id: document
+        for document in query.all()
+        if not is_csv_file_type(document.file_type, document.filename)
+    }
+
+
+def keyword_search(db, query: str, workspace_id: int, document_id: int | None, limit: int) -> list[dict]:
+    """
+    BM25-ranked chunks of the SQL full-text index for the words of the query
+    longer than three characters, best first. Only used for collections
+    without sparse vectors.
+    """
+    keywords = [w.strip() for w in query.split() if len(w) > 3]
+    if not keywords:
+        return []
+
+    documents_query = db.query(Document.id, Document.content_id, Document.filename).filter(
+        Document.workspace_id == workspace_id,
+        ~Document.filename.ilike("%.csv"),
+        Document.file_type.notin_(["text/csv", "application/csv"]),
+    )
+
+    if document_id is not None:
+        documents_query = documents_query.filter(Document.id == document_id)
+
+    keyword_documents = documents_query.all()
+    filenames = {doc.id: doc.filename for doc in keyword_documents}
+    # Chunks of shared content are stored under their owner document
+    artifact_documents = map_artifact_documents(
+        db, [(doc.id, doc.content_id) for doc in keyword_documents]
+    )
+
+    # BM25-ranked lookup in the full-text index instead of scanning every chunk
+    ranked = rank_chunks_by_keywords(db, list(artifact_documents), keywords, limit)
+    if not ranked:
+        return []
+
+    rows = {
+        r.id: r
+        for r in db.query(DocumentChunk).filter(DocumentChunk.id.in_([chunk_id for chunk_id, _ in ranked]))
+    }
+    keyword_chunks = []
+    for chunk_id, relevance in ranked:
+        r = rows[chunk_id]
+        keyword_chunks.append({
+            "chunk_id": r.id,
+            "text": r.text,
+            "document_id": artifact_documents[r.document_id],
+            "filename": filenames[artifact_documents[r.document_id]],
+            "page": r.page_start,
+            "section": r.section_title,
+            "score": relevance,
+            "source": "keyword"
+        })
+
+    return keyword_chunks
+
+
 def search_chunks(query: str, workspace_id: int, document_id: int | None = None, limit: int = 8):
     """
-    Hybrid Retrieval for text-based documents:
-    - Vector Search (Qdrant)
-    - Keyword Search (SQL)
+    Hybrid Retrieval for text-based documents in one Qdrant query:
+    - dense prefetch (embedding similarity)
+    - sparse prefetch (BM25 term weights, IDF applied by Qdrant)
+    - weighted reciprocal rank fusion of both on the server
+
+    Collections created before the sparse vectors fall back to the dense
+    search plus the SQL full-text index (BM25-ranked keyword search), fused
+    the same way in reciprocal_rank_fusion. Each ranking contributes
+    limit * CANDIDATE_FACTOR candidates.
 
     CSV files are excluded here because they use the separate
-    structured SQL-based CSV chat flow.
+    structured SQL-based CSV chat flow; the vector search excludes them in
+    the Qdrant filter. Every result carries the filename of its document,
+    and a search takes the same number of SQL queries for any number of hits.
+
+    Near-duplicate chunks are not indexed; every result lists the pages of its
+    linked duplicates in "pages".
+
+    Blocks until the query is embedded; coroutines await search_chunks_async.
     """
+    vector = embed_query(query, embed_texts)
+    return search_chunks_by_vector(query, vector, workspace_id, document_id, limit)
+
 
+async def search_chunks_async(query: str, workspace_id: int, document_id: int | None = None, limit: int = 8):
+    """
+    search_chunks for coroutines: the query embedding is awaited and the
+    searches run in a worker thread, so the event loop is never blocked.
+    """
+    vector = await embed_query_async(query, embed_texts_async)
+    return await asyncio.to_thread(search_chunks_by_vector, query, vector, workspace_id, document_id, limit)
+
+
+def search_chunks_by_vector(query: str, vector, workspace_id: int, document_id: int | None, limit: int):
+    """The searches and the fusion of search_chunks for an embedded query."""
     db = SessionLocal()
 
     try:
         # ------- VECTOR SEARCH -------
-        vector = embed_texts([query])[0]
-
         must_conditions = [
             FieldCondition(
                 key="workspace_id",
@@ -47,96 +244,92 @@ def search_chunks(query: str, workspace_id: int, document_id: int | None = None,
                 )
             )
 
-        results = client.query_points(
-            collection_name=COLLECTION_NAME,
-            query=vector,
-            limit=limit * 3,
-            with_payload=True,
-            query_filter=Filter(must=must_conditions)
+        query_filter = Filter(
+            must=must_conditions,
+            # Points stored before file_kind was added have no file_kind
+            # and pass; the document check below still drops CSV files
+            must_not=[FieldCondition(key="file_kind", match=MatchValue(value="csv"))],
         )
 
+        hybrid = has_sparse_vectors(client)
+        candidates = limit * CANDIDATE_FACTOR
+
+        if hybrid:
+            results = client.query_points(
+                collection_name=COLLECTION_NAME,
+                prefetch=[
+                    Prefetch(query=vector, filter=query_filter, limit=candidates),
+                    Prefetch(
+                        query=query_sparse_vector(query),
+                        using=SPARSE_VECTOR_NAME,
+                        filter=query_filter,
+                        limit=candidates,
+                    ),
+                ],
+                query=RrfQuery(rrf=Rrf(k=RRF_K, weights=[DENSE_WEIGHT, LEXICAL_WEIGHT])),
+                limit=candidates,
+                with_payload=True,
+                query_filter=query_filter,
+            )
+        else:
+            results = client.query_points(
+                collection_name=COLLECTION_NAME,
+                query=vector,
+                limit=candidates,
+                with_payload=True,
+                query_filter=query_filter,
+            )
+
         points = getattr(results, "points", [])
+
+        # Resolve every point to a document of this workspace with one query;
+        # shared points list every document that uses them
+        documents = searchable_documents(
+            db,
+            {doc_id for p in points for doc_id in payload_document_ids(p.payload or {})},
+            workspace_id,
+            document_id,
+        )
         vector_chunks = []
 
         for p in points:
             payload = p.payload or {}
-            payload_document_id = payload.get("document_id")
 
-            document = db.query(Document).filter(Document.id == payload_document_id).first()
-
-            if not document:
+            document_ids = [doc_id for doc_id in payload_document_ids(payload) if doc_id in documents]
+            if not document_ids or not payload.get("_text"):
                 continue
 
-            if is_csv_file_type(document.file_type, document.filename):
-                continue
+            document = documents[min(document_ids)]
 
             vector_chunks.append({
+                "chunk_id": payload.get("chunk_db_id"),
                 "text": payload.get("_text"),
-                "document_id": payload_document_id,
+                "document_id": document.id,
+                "filename": document.filename,
                 "page": payload.get("page_start"),
                 "section": payload.get("section_title"),
                 "score": p.score,
-                "source": "vector"
+                "source": "hybrid" if hybrid else "vector"
             })
 
-            if len(vector_chunks) >= limit:
-                break
-
-        # ------- KEYWORD SEARCH -------
-        keyword_chunks = []
-
-        keywords = [w.strip() for w in query.split() if len(w) > 3]
-
-        if keywords:
-            query_builder = (
-                db.query(DocumentChunk)
-                .join(Document, DocumentChunk.document_id == Document.id)
-                .filter(
-                    Document.workspace_id == workspace_id,
-                    ~Document.filename.ilike("%.csv"),
-                    Document.file_type.notin_(["text/csv", "application/csv"]),
-                    or_(
-                        *[
-                            DocumentChunk.text.ilike(f"%{kw}%")
-                            for kw in keywords
-                        ]
-                    )
-                )
-            )
-
-            if document_id is not None:
-                query_builder = query_builder.filter(
-                    DocumentChunk.document_id == document_id
-                )
+        # ------- FUSION -------
+        if hybrid:
+            # Fused by Qdrant, best first; copies of the same text count once
+            seen = set()
+            ranked = []
 
-            rows = query_builder.limit(limit).all()
+            for c in vector_chunks:
+                if c["text"] not in seen:
+                    ranked.append(c)
+                    seen.add(c["text"])
         else:
-            rows = []
-
-        for r in rows:
-            keyword_chunks.append({
-                "text": r.text,
-                "document_id": r.document_id,
-                "page": getattr(r, "page_start", None),
-                "section": getattr(r, "section_title", None),
-                "score": 0.65,
-                "source": "keyword"
-            })
-
-        # ------- MERGE RESULTS -------
-        combined = vector_chunks + keyword_chunks
-
-        seen = set()
-        unique_chunks = []
-
-        for c in combined:
-            if c["text"] and c["text"] not in seen:
-                unique_chunks.append(c)
-                seen.add(c["text"])
+            keyword_chunks = keyword_search(db, query, workspace_id, document_id, candidates)
+            ranked = reciprocal_rank_fusion([vector_chunks, keyword_chunks], [DENSE_WEIGHT, LEXICAL_WEIGHT])
 
-        unique_chunks.sort(key=lambda x: x["score"] or 0, reverse=True)
+        top_chunks = ranked[:limit]
+        pages = duplicate_pages(db, [c["chunk_id"] for c in top_chunks if c["chunk_id"] is not None])
 
-        return unique_chunks[:limit]
+        return [with_duplicate_pages(c, pages) for c in top_chunks]
 
     finally:
         db.close()
@@ -0,0 +1,49 @@
+import re
+import zlib
+from collections import Counter
+from typing import List
+
+from qdrant_client.http import models as qmodels
+
+# BM25 term-frequency saturation and document length normalization. The
+# inverse document frequency is applied by Qdrant (Modifier.IDF on the
+# sparse vector), so it follows the collection without a local corpus
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Average length of an 800-token chunk in terms
+AVERAGE_CHUNK_TERMS = 550
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def text_terms(text: str) -> List[str]:
+    """Casefolded word terms of a text, in order, with repetitions."""
+    return _TERM.findall(text.casefold())
+
+
+def term_index(term: str) -> int:
+    """Sparse dimension of a term: its CRC-32, stable across processes."""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _sparse_vector(weights: Counter) -> qmodels.SparseVector:
+    # Qdrant requires unique indices; colliding terms share their weight
+    indices = sorted(weights)
+    return qmodels.SparseVector(indices=indices, values=[float(weights[index]) for index in indices])
+
+
+def chunk_sparse_vector(text: str) -> qmodels.SparseVector:
+    """BM25 term weights of a chunk text over hashed term dimensions."""
+    terms = text_terms(text)
+    counts = Counter(terms)
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / AVERAGE_CHUNK_TERMS)
+
+    weights: Counter = Counter()
+    for term, count in counts.items():
+        weights[term_index(term)] += count * (BM25_K1 + 1) / (count + length_norm)
+    return _sparse_vector(weights)
+
+
+def query_sparse_vector(query: str) -> qmodels.SparseVector:
+    """Every distinct query term with weight 1; Qdrant scales them by IDF."""
+    return _sparse_vector(Counter({term_index(term): 1 for term in set(text_terms(query))}))
@@ -1,24 +1,37 @@
 import os
 import uuid
+import asyncio
 import logging
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
 
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
 
 # Keep embeddings consistent OpenAI only (no Gemini embedding fallback)
-from backend.services.llm.llm_provider import embed_texts as embed_texts_openai
+from backend.services.llm.llm_provider import (
+    embed_query,
+    embed_query_async,
+    embed_texts as embed_texts_openai,
+    embed_texts_async,
+)
+from backend.services.vector.sparse_vectors import chunk_sparse_vector
 
 logger = logging.getLogger(__name__)
 
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "insightai_chunks")
+# Named sparse vector with the BM25 term weights of each chunk; the dense
+# embedding stays the unnamed default vector
+SPARSE_VECTOR_NAME = "text-bm25"
 
 client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY,)
 
 # Cache: If the collection exists, stop calling get_collections()
 _COLLECTION_READY = False
+# Cache: whether the collection has the sparse vector (None = not checked yet)
+_SPARSE_VECTORS: Optional[bool] = None
 
 
 def ensure_collection(vector_size: int):
@@ -26,7 +39,7 @@ def ensure_collection(vector_size: int):
     Ensure the Qdrant collection exists.
     Uses a cached flag to avoid repeated GET /collections calls.
     """
-    global _COLLECTION_READY
+    global _COLLECTION_READY, _SPARSE_VECTORS
     if _COLLECTION_READY:
         return
 
@@ -39,7 +52,11 @@ def ensure_collection(vector_size: int):
                 size=vector_size,
                 distance=qmodels.Distance.COSINE,
             ),
+            sparse_vectors_config={
+                SPARSE_VECTOR_NAME: qmodels.SparseVectorParams(modifier=qmodels.Modifier.IDF),
+            },
         )
+        _SPARSE_VECTORS = True
         logger.info(f"[Qdrant] Created collection: {COLLECTION_NAME}")
 
     try:
@@ -55,26 +72,84 @@ def ensure_collection(vector_size: int):
             field_schema=qmodels.PayloadSchemaType.INTEGER,
         )
 
-        logger.info("[Qdrant] Ensured payload index for document_id")
+        # Lets searches exclude CSV documents inside the filter
+        client.create_payload_index(
+            collection_name=COLLECTION_NAME,
+            field_name="file_kind",
+            field_schema=qmodels.PayloadSchemaType.KEYWORD,
+        )
+
+        # Stale and moved chunks of a new version are selected by their row id
+        client.create_payload_index(
+            collection_name=COLLECTION_NAME,
+            field_name="chunk_db_id",
+            field_schema=qmodels.PayloadSchemaType.INTEGER,
+        )
+
+        logger.info("[Qdrant] Ensured payload indexes for document_id, workspace_id, file_kind and chunk_db_id")
     except Exception:
         pass
 
     _COLLECTION_READY = True
 
 
-def upsert_document_chunks(document_id: int, workspace_id: int, chunks: List[Dict], batch_size: int = 512):
-    if not chunks:
-        return
+def has_sparse_vectors(qdrant: Optional[QdrantClient] = None) -> bool:
+    """
+    True if the collection stores the sparse BM25 vectors next to the dense
+    ones. Collections created before them hold dense vectors only until they
+    are recreated. Checked once per process.
+    """
+    global _SPARSE_VECTORS
+    if _SPARSE_VECTORS is None:
+        info = (qdrant or client).get_collection(collection_name=COLLECTION_NAME)
+        _SPARSE_VECTORS = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+        if not _SPARSE_VECTORS:
+            logger.warning(
+                f"[Qdrant] Collection {COLLECTION_NAME} has no sparse vector {SPARSE_VECTOR_NAME}; "
+                "searches fall back to the SQL keyword index until it is recreated"
+            )
 
-    texts = [c["text"] for c in chunks]
-    vectors = embed_texts_openai(texts)
+    return _SPARSE_VECTORS
 
-    if not vectors or not vectors[0]:
-        logger.warning("[Qdrant] No embeddings generated")
-        return
 
-    ensure_collection(vector_size=len(vectors[0]))
+def reference_payload(references: Sequence[Tuple[int, int]]) -> Dict[str, List[int]]:
+    """
+    document_id and workspace_id payload of points shared by several documents.
+    Both are stored as lists; a MatchValue filter matches any element.
+    """
+    return {
+        "document_id": list(dict.fromkeys(document_id for document_id, _ in references)),
+        "workspace_id": list(dict.fromkeys(workspace_id for _, workspace_id in references)),
+    }
+
+
+def chunk_point_id(chunk_id: int) -> str:
+    """
+    Qdrant point id of a chunk; stable across reprocessing and when the chunk
+    moves to another document that takes over shared content.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"chunk{chunk_id}"))
+
 
+def _chunk_filter(chunk_ids: Sequence[int]) -> qmodels.Filter:
+    # Selects points by chunk row id, whatever point id they were stored under
+    return qmodels.Filter(
+        must=[qmodels.FieldCondition(key="chunk_db_id", match=qmodels.MatchAny(any=list(chunk_ids)))]
+    )
+
+
+def chunk_position_payload(chunk: Dict) -> Dict[str, Any]:
+    """Payload fields that describe where a chunk is in its document."""
+    md = chunk.get("metadata") or {}
+    return {
+        "chunk_index": md.get("chunk_index"),
+        "page_start": md.get("page_start"),
+        "page_end": md.get("page_end"),
+        "section_title": md.get("section_title"),
+    }
+
+
+def _delete_document_points(document_id: int):
     # Delete old chunks of this document to prevent mixing documents
     try:
         client.delete(
@@ -96,47 +171,101 @@ def upsert_document_chunks(document_id: int, workspace_id: int, chunks: List[Dic
             f"[Qdrant] Delete-by-filter failed for document_id={document_id}: {e}"
         )
 
-    ids = [
-        str(uuid.uuid5(uuid.NAMESPACE_URL, f"doc{document_id}_chunk{c['id']}"))
-        for c in chunks
-    ]
 
-    # Payloads
-    payloads: List[Dict[str, Any]] = []
-    for c in chunks:
-        md = c.get("metadata") or {}
-        payloads.append(
-            {
-                "document_id": document_id,
-                "workspace_id": workspace_id,
-                "chunk_db_id": c["id"],
-                "_text": c["text"],
-                "chunk_index": md.get("chunk_index"),
-                "page_start": md.get("page_start"),
-                "page_end": md.get("page_end"),
-                "section_title": md.get("section_title"),
-                "keywords": c.get("keywords", []),
-            }
-        )
+def upsert_document_chunks(
+        document_id: int,
+        workspace_id: int,
+        chunks: Iterable[Dict],
+        batch_size: int = 512,
+        references: Optional[Sequence[Tuple[int, int]]] = None,
+        replace: bool = True,
+        file_kind: Optional[str] = None
+):
+    """
+    Embed and store the chunks of a document. references lists further
+    (document_id, workspace_id) pairs that share the chunks. With replace
+    the document's previous points are deleted; without it they are kept,
+    e.g. when only the changed chunks of a new version are upserted.
+    file_kind (e.g. "pdf") is stored in the payload for search filters.
+    Every point also gets the sparse BM25 vector of its text, if the
+    collection has one.
+
+    chunks may be a generator: it is consumed batch by batch and every batch
+    is embedded and upserted before the next one is read, so only one batch
+    of texts, vectors and payloads is held in memory.
+    """
+    shared = reference_payload([(document_id, workspace_id), *(references or [])])
+    if file_kind is not None:
+        shared["file_kind"] = file_kind
+    chunk_iter = iter(chunks)
+    deleted_old = False
+    upserted = 0
+
+    while True:
+        batch = list(islice(chunk_iter, batch_size))
+        if not batch:
+            break
+
+        texts = [c["text"] for c in batch]
+        vectors = embed_texts_openai(texts, token_counts=[c.get("token_count") for c in batch])
+
+        if not vectors or not vectors[0]:
+            logger.warning("[Qdrant] No embeddings generated")
+            return
+
+        ensure_collection(vector_size=len(vectors[0]))
+
+        if replace and not deleted_old:
+            _delete_document_points(document_id)
+            deleted_old = True
+
+        ids = [chunk_point_id(c["id"]) for c in batch]
+
+        if has_sparse_vectors():
+            vectors = {"": vectors, SPARSE_VECTOR_NAME: [chunk_sparse_vector(text) for text in texts]}
+
+        # Payloads
+        payloads: List[Dict[str, Any]] = []
+        for c in batch:
+            payloads.append(
+                {
+                    **shared,
+                    "chunk_db_id": c["id"],
+                    "_text": c["text"],
+                    **chunk_position_payload(c),
+                    "keywords": c.get("keywords", []),
+                }
+            )
 
-    # Upsert in batches
-    for start in range(0, len(ids), batch_size):
-        end = start + batch_size
         client.upsert(
             collection_name=COLLECTION_NAME,
             points=qmodels.Batch(
-                ids=ids[start:end],
-                vectors=vectors[start:end],
-                payloads=payloads[start:end],
+                ids=ids,
+                vectors=vectors,
+                payloads=payloads,
             ),
         )
+        upserted += len(ids)
 
-    logger.info(f"[Qdrant] Upserted {len(ids)} chunks for document_id={document_id}")
+    if upserted:
+        logger.info(f"[Qdrant] Upserted {upserted} chunks for document_id={document_id}")
 
 
 def query_similar_chunks(document_id: int, query: str, k: int = 5) -> List[Dict]:
-    """Return top-k chunks (text + metadata) for a document_id."""
-    q_vec = embed_texts_openai([query])[0]
+    """
+    Return top-k chunks (text + metadata) for a document_id. Blocks until the
+    query is embedded; coroutines await query_similar_chunks_async.
+    """
+    return query_similar_chunks_by_vector(document_id, embed_query(query, embed_texts_openai), k)
+
+
+async def query_similar_chunks_async(document_id: int, query: str, k: int = 5) -> List[Dict]:
+    """query_similar_chunks for coroutines; the Qdrant query runs in a worker thread."""
+    q_vec = await embed_query_async(query, embed_texts_async)
+    return await asyncio.to_thread(query_similar_chunks_by_vector, document_id, q_vec, k)
+
+
+def query_similar_chunks_by_vector(document_id: int, q_vec: List[float], k: int = 5) -> List[Dict]:
     if not q_vec:
         return []
 
@@ -181,7 +310,7 @@ def query_similar_chunks(document_id: int, query: str, k: int = 5) -> List[Dict]
     return hits
 
 
-def delete_document_chunks(document_id: int):
+def _collection_exists() -> bool:
     global _COLLECTION_READY
 
     # Collection existence check without guessing vector size
@@ -189,9 +318,86 @@ def delete_document_chunks(document_id: int):
         existing = [c.name for c in client.get_collections().collections]
         if COLLECTION_NAME not in existing:
             logger.info(f"[Qdrant] Collection not found: {COLLECTION_NAME}")
-            return
+            return False
         _COLLECTION_READY = True
 
+    return True
+
+
+def set_document_references(owner_document_id: int, references: Sequence[Tuple[int, int]]):
+    """
+    Rewrite the document and workspace ids of the points of the owner's chunks
+    in place, without embedding anything again.
+    """
+    if not references or not _collection_exists():
+        return
+
+    client.set_payload(
+        collection_name=COLLECTION_NAME,
+        payload=reference_payload(references),
+        points=qmodels.Filter(
+            must=[
+                qmodels.FieldCondition(
+                    key="document_id",
+                    match=qmodels.MatchValue(value=owner_document_id),
+                )
+            ]
+        ),
+    )
+    logger.info(f"[Qdrant] Updated references of document_id={owner_document_id}: {len(references)} documents")
+
+
+def delete_chunk_points(document_id: int, chunk_ids: Sequence[int]):
+    """Delete the points of single chunks of a document by their chunk ids."""
+    if not chunk_ids or not _collection_exists():
+        return
+
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=qmodels.FilterSelector(filter=_chunk_filter(chunk_ids)),
+    )
+    logger.info(f"[Qdrant] Deleted {len(chunk_ids)} stale chunks for document_id={document_id}")
+
+
+def update_chunk_positions(document_id: int, chunks: Iterable[Dict], batch_size: int = 512):
+    """
+    Rewrite the chunk index, pages and section in the payload of existing
+    points, e.g. after pages were inserted before them, without embedding
+    anything again.
+    """
+    if not _collection_exists():
+        return
+
+    chunk_iter = iter(chunks)
+    updated = 0
+
+    while True:
+        batch = list(islice(chunk_iter, batch_size))
+        if not batch:
+            break
+
+        client.batch_update_points(
+            collection_name=COLLECTION_NAME,
+            update_operations=[
+                qmodels.SetPayloadOperation(
+                    set_payload=qmodels.SetPayload(
+                        payload=chunk_position_payload(c),
+                        filter=_chunk_filter([c["id"]]),
+                    )
+                )
+                for c in batch
+            ],
+        )
+        updated += len(batch)
+
+    if updated:
+        logger.info(f"[Qdrant] Updated positions of {updated} chunks for document_id={document_id}")
+
+
+def delete_document_chunks(document_id: int):
+    if not _collection_exists():
+        return
+
     client.delete(
         collection_name=COLLECTION_NAME,
         points_selector=qmodels.Filter(
@@ -0,0 +1,134 @@
+"""Ingestion worker that drains the persistent document processing queue.
+
+Usage:
+    python -m backend.worker
+
+The API only enqueues jobs. One or more worker processes claim them and run
+a fixed number of jobs concurrently (INGESTION_WORKER_CONCURRENCY), while each
+pipeline stage is additionally limited by its INGESTION_<STAGE>_CONCURRENCY setting.
+Parsing and chunking run in a pool of PARSE_POOL_SIZE warm parser processes so
+Docling's CPU work never blocks the worker's event loop; they are started and
+their Docling converters loaded (PDF_CONVERTER_WARMUP) before the first job.
+"""
+
+import os
+import socket
+import signal
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("backend.worker")
+
+
+async def run_job_slot(slot: int, worker_id: str, poll_interval: float, stop_event: asyncio.Event):
+    """Claim and process jobs one after another until the worker is stopped."""
+    from backend.database.database import SessionLocal
+    from backend.routers.document import process_document_logic
+    from backend.services.ingestion.job_queue import (
+        LEASE_SECONDS,
+        claim_next_job,
+        complete_job,
+        fail_job,
+        heartbeat_job,
+    )
+
+    async def heartbeat(job_id: int):
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            db = SessionLocal()
+            try:
+                await asyncio.to_thread(heartbeat_job, db, job_id, worker_id)
+            except Exception:
+                logger.exception(f"Heartbeat failed for ingestion job {job_id}")
+            finally:
+                db.close()
+
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            job = await asyncio.to_thread(claim_next_job, db, worker_id)
+
+            if job is None:
+                db.close()
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(
+                f"[slot {slot}] Running ingestion job {job.id} for document {job.document_id} "
+                f"(attempt {job.attempts}/{job.max_attempts})"
+            )
+
+            heartbeat_task = asyncio.create_task(heartbeat(job.id))
+            try:
+                await process_document_logic(job.document_id, raise_errors=True, force_rebuild=job.force_rebuild)
+            except Exception as e:
+                await asyncio.to_thread(fail_job, db, job, f"{type(e).__name__}: {e}")
+            else:
+                await asyncio.to_thread(complete_job, db, job)
+            finally:
+                heartbeat_task.cancel()
+
+        except Exception:
+            logger.exception(f"[slot {slot}] Ingestion worker loop error")
+            await asyncio.sleep(poll_interval)
+        finally:
+            db.close()
+
+
+async def run_worker(concurrency: int, poll_interval: float):
+    """Run a fixed-size pool of job slots until SIGINT or SIGTERM."""
+    import backend.database.init_db  # noqa: F401  # ensure tables exist
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    logger.info(f"Ingestion worker {worker_id} started with {concurrency} slots")
+
+    from backend.services.ingestion.parse_pool import warm_parse_pool
+
+    try:
+        await warm_parse_pool()
+    except Exception:
+        # Parser processes are started on first use instead
+        logger.exception("Warming the parser pool failed")
+
+    try:
+        await asyncio.gather(
+            *(
+                run_job_slot(slot, worker_id, poll_interval, stop_event)
+                for slot in range(concurrency)
+            )
+        )
+    finally:
+        from backend.services.ingestion.parse_pool import shutdown_parse_pool
+        shutdown_parse_pool()
+
+    logger.info(f"Ingestion worker {worker_id} stopped")
+
+
+def main():
+    from backend.services.ingestion.job_queue import load_positive_int_setting
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    concurrency = load_positive_int_setting("INGESTION_WORKER_CONCURRENCY", 4)
+    poll_interval = float(os.getenv("INGESTION_WORKER_POLL_SECONDS", "2"))
+
+    asyncio.run(run_worker(concurrency, poll_interval))
+
+
+if __name__ == "__main__":
+    main()
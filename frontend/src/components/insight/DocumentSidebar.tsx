@@ -104,6 +104,12 @@ const statusConfig: Record<DocumentStatus, StatusUI> = {
     label: "Structuring content",
     bgClass: "bg-purple-500/10",
   },
+  indexing: {
+    icon: Cpu,
+    className: "text-cyan-500 animate-pulse",
+    label: "Creating embeddings and structure",
+    bgClass: "bg-cyan-500/10",
+  },
   report_generating: {
     icon: Loader2,
     className: "text-purple-500 animate-spin",
@@ -6,6 +6,7 @@ export type DocumentStatus =
   | 'embedding'
   | 'blocking'
   | 'structuring'
+  | 'indexing'
   | 'report_generating'
   | 'completed'
   | 'parsed_empty'
@@ -4,6 +4,9 @@ from __future__ import annotations
 
 import os
 import tempfile
+from unittest.mock import patch
+
+import tiktoken
 
 
 TEST_DB_PATH = os.path.join(tempfile.gettempdir(), f"insightai_test_{os.getpid()}.db")
@@ -20,3 +23,21 @@ os.environ["R2_BUCKET"] = "test-bucket"
 os.environ["LANGFUSE_PUBLIC_KEY"] = ""
 os.environ["LANGFUSE_SECRET_KEY"] = ""
 os.environ["LANGFUSE_HOST"] = ""
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["QUERY_EMBEDDING_CACHE_MAX_ENTRIES"] = "0"
+
+# The production tokenizer downloads its vocabulary on first use.  Tests use a
+# deterministic byte-level tiktoken Encoding (one token per character) so the
+# suite stays fully offline; it is cached as the embedding encoding before any
+# test imports the chunking or embedding services.
+TEST_ENCODING = tiktoken.Encoding(
+    name="insightai_test_bytes",
+    pat_str=r"(?s).",
+    mergeable_ranks={bytes([value]): value for value in range(256)},
+    special_tokens={},
+)
+
+with patch("tiktoken.encoding_for_model", return_value=TEST_ENCODING):
+    from backend.services.llm.tokenizer import get_embedding_encoding
+
+    get_embedding_encoding()
@@ -10,6 +10,7 @@ from fastapi.testclient import TestClient
 from backend.database.database import SessionLocal
 from backend.main import app
 from backend.models.document import Document
+from backend.models.ingestion_job import IngestionJob
 from backend.models.report import Report
 from backend.models.user import User
 from backend.models.workspace import Workspace
@@ -476,9 +477,26 @@ class AuthWorkspaceApiTests(unittest.TestCase):
             ).one()
             self.assertEqual(document.filename, "notes.txt")
             self.assertEqual(document.file_type, "text/plain")
+
+            job = db.query(IngestionJob).filter(IngestionJob.document_id == document.id).one()
+            self.assertEqual(job.status, "queued")
         finally:
             db.close()
 
+    def test_process_route_queues_job_once_and_returns_immediately(self) -> None:
+        workspace_id = self._personal_workspace_id(self.alice_headers)
+        document = create_document(workspace_id, self._user_id("alice@example.test"), status="failed")
+
+        with patch("backend.routers.document.process_document_logic", new=AsyncMock()) as process:
+            first = self.client.post(f"/documents/{document.id}/process", headers=self.alice_headers)
+            second = self.client.post(f"/documents/{document.id}/process", headers=self.alice_headers)
+            forbidden = self.client.post(f"/documents/{document.id}/process", headers=self.bob_headers)
+
+        self.assertEqual(first.status_code, 200, first.text)
+        self.assertEqual(first.json()["job_id"], second.json()["job_id"])
+        self.assertEqual(forbidden.status_code, 403)
+        process.assert_not_awaited()
+
     def test_upload_cleans_r2_object_when_database_commit_fails(self) -> None:
         workspace_id = self._personal_workspace_id(self.alice_headers)
         filename = f"commit-failure-{uuid.uuid4().hex}.txt"
@@ -21,13 +21,13 @@ class ChatServiceTests(unittest.TestCase):
         )
 
     def test_missing_workspace_is_rejected_before_retrieval(self) -> None:
-        with patch.object(chat_service, "search_chunks") as search:
+        with patch.object(chat_service, "search_chunks_async") as search:
             answer = asyncio.run(chat_service.generate_chat_response(None, "Question", workspace_id=None))
         self.assertEqual(answer, "No workspace selected.")
         search.assert_not_called()
 
     def test_no_retrieval_results_returns_clear_message(self) -> None:
-        with patch.object(chat_service, "search_chunks", return_value=[]):
+        with patch.object(chat_service, "search_chunks_async", return_value=[]):
             answer = asyncio.run(
                 chat_service.generate_chat_response(
                     self.document.id,
@@ -56,11 +56,20 @@ class ChatServiceTests(unittest.TestCase):
                 "score": 0.8,
                 "source": "vector",
             },
+            {
+                "text": "Figures are unaudited.",
+                "document_id": self.document.id,
+                "page": 3,
+                "pages": [3, 7, 9],
+                "section": None,
+                "score": 0.7,
+                "source": "vector",
+            },
         ]
         fake_call = AsyncMock(return_value=chat_response("The revenue was EUR 10 million."))
 
         with (
-            patch.object(chat_service, "search_chunks", return_value=chunks) as search,
+            patch.object(chat_service, "search_chunks_async", return_value=chunks) as search,
             patch.object(chat_service, "_openai_call", fake_call),
             patch.object(chat_service, "langfuse", None),
         ):
@@ -84,6 +93,8 @@ class ChatServiceTests(unittest.TestCase):
         self.assertIn("How much revenue?", user_prompt)
         self.assertIn("Sources", answer)
         self.assertIn("annual-report.pdf – page 4", answer)
+        # Near duplicates of a chunk add the pages they appear on
+        self.assertIn("annual-report.pdf – pages 3, 7, 9", answer)
 
     def test_csv_document_uses_structured_sql_path(self) -> None:
         csv_document = create_document(
@@ -99,7 +110,7 @@ class ChatServiceTests(unittest.TestCase):
                 "answer_csv_question",
                 return_value={"answer": "There are 25 rows."},
             ) as csv_answer,
-            patch.object(chat_service, "search_chunks") as search,
+            patch.object(chat_service, "search_chunks_async") as search,
         ):
             answer = asyncio.run(
                 chat_service.generate_chat_response(
@@ -184,7 +195,7 @@ class ChatServiceTests(unittest.TestCase):
         fake_call = AsyncMock(return_value=chat_response("It was EUR 10 million."))
 
         with (
-            patch.object(chat_service, "search_chunks", return_value=chunks) as search,
+            patch.object(chat_service, "search_chunks_async", return_value=chunks) as search,
             patch.object(chat_service, "_openai_call", fake_call),
             patch.object(chat_service, "langfuse", None),
         ):
@@ -227,7 +238,7 @@ class ChatServiceTests(unittest.TestCase):
         fake_call = AsyncMock(return_value=chat_response("TLS 1.2 is required."))
 
         with (
-            patch.object(chat_service, "search_chunks", return_value=chunks) as search,
+            patch.object(chat_service, "search_chunks_async", return_value=chunks) as search,
             patch.object(chat_service, "_openai_call", fake_call),
             patch.object(chat_service, "langfuse", None),
         ):
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import random
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from backend.services.ingestion import parse_pool
+from backend.services.ingestion.chunking_service import ChunkRecord
+from backend.database.database import SessionLocal
+from backend.models.document_chunk import DocumentChunk
+from backend.routers import document as document_router
+from backend.services.ingestion.chunk_dedup import find_near_duplicates
+from backend.services.observability import metrics
+from backend.services.vector import retrieval_service
+from tests.support import create_document, create_user_workspace, reset_database
+
+DISCLAIMER = (
+    "This annual report contains forward-looking statements based on current "
+    "expectations of management. Actual results may differ materially from those "
+    "expressed. Annual Report 2024, page {page}."
+)
+
+
+class NearDuplicateDetectionTests(unittest.TestCase):
+    def test_repeated_boilerplate_links_to_first_occurrence(self) -> None:
+        texts = [
+            DISCLAIMER.format(page=1),
+            "Revenue grew by twelve percent, driven by cloud subscriptions in Europe.",
+            DISCLAIMER.format(page=2),
+            "Operating costs fell after the restructuring of the logistics network.",
+            DISCLAIMER.format(page=317),
+        ]
+
+        self.assertEqual(find_near_duplicates(texts), [None, None, 0, None, 0])
+
+    def test_distinct_and_empty_texts_are_not_linked(self) -> None:
+        texts = [
+            "Revenue grew by twelve percent, driven by cloud subscriptions in Europe.",
+            "Revenue fell by twelve percent, hurt by hardware sales in Asia and weak demand.",
+            "",
+            "   ",
+        ]
+
+        self.assertEqual(find_near_duplicates(texts), [None, None, None, None])
+
+    def test_texts_sharing_a_few_shingles_are_not_linked(self) -> None:
+        # Same small vocabulary, different word order: the texts share only a
+        # handful of shingles, which must not decide every MinHash minimum
+        vocabulary = (
+            "supplier customer delivery payment liability warranty termination notice audit invoice "
+            "service level penalty renewal licence hardware software support training update breach "
+            "remedy insurance indemnity dispute venue law schedule milestone acceptance defect"
+        ).split()
+        rng = random.Random(7)
+        texts = [" ".join(rng.choice(vocabulary) for _ in range(150)) for _ in range(100)]
+
+        self.assertEqual(find_near_duplicates(texts), [None] * len(texts))
+
+    def test_same_wording_with_different_figures_is_not_linked(self) -> None:
+        segment = (
+            "The Industrial segment reported revenue of EUR {revenue} million in fiscal year {year}, "
+            "with an operating margin of {margin} percent. Order intake remained stable across all "
+            "regions, and the segment continued to invest in automation, service contracts and the "
+            "expansion of its distribution network in Central and Eastern Europe."
+        )
+        texts = [
+            segment.format(revenue="412.5", year=2023, margin="11.2"),
+            segment.format(revenue="438.1", year=2024, margin="11.2"),
+            segment.format(revenue="412.5", year=2023, margin="11.2") + " Page 14 of 80",
+        ]
+
+        self.assertEqual(find_near_duplicates(texts), [None, None, 0])
+
+    def test_duplicates_point_at_canonical_chunk_not_at_other_duplicates(self) -> None:
+        texts = [DISCLAIMER.format(page=page) for page in range(1, 6)]
+
+        self.assertEqual(find_near_duplicates(texts), [None, 0, 0, 0, 0])
+
+
+class ChunkDedupIngestionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id)
+
+        texts = [
+            (DISCLAIMER.format(page=1), 1),
+            ("Revenue grew by twelve percent, driven by cloud subscriptions in Europe.", 1),
+            (DISCLAIMER.format(page=2), 2),
+            ("Operating costs fell after the restructuring of the logistics network.", 3),
+            (DISCLAIMER.format(page=3), 3),
+        ]
+        parsed = parse_pool.ParsedDocument(
+            full_text="",
+            chunks=[
+                ChunkRecord(chunk_index=index, text=text, token_count=len(text), page_start=page, page_end=page)
+                for index, (text, page) in enumerate(texts)
+            ],
+        )
+
+        db = SessionLocal()
+        try:
+            parse_pool.store_parsed_document(db, self.document.id, parsed)
+            db.commit()
+            self.chunks = db.query(DocumentChunk).order_by(DocumentChunk.chunk_index).all()
+            db.expunge_all()
+        finally:
+            db.close()
+
+    def test_duplicates_are_linked_and_counted(self) -> None:
+        canonical_id = self.chunks[0].id
+
+        self.assertEqual(
+            [chunk.duplicate_of_id for chunk in self.chunks],
+            [None, None, canonical_id, None, canonical_id],
+        )
+        self.assertEqual(metrics.get("chunk_dedup.chunks"), 5)
+        self.assertEqual(metrics.get("chunk_dedup.duplicates"), 2)
+
+    def test_duplicates_are_not_sent_to_the_vector_store(self) -> None:
+        db = SessionLocal()
+        try:
+            payloads = list(document_router.iter_chunk_payloads(db, self.document.id, batch_size=2))
+        finally:
+            db.close()
+
+        self.assertEqual([payload["metadata"]["chunk_index"] for payload in payloads], [0, 1, 3])
+
+    def test_search_reports_pages_of_linked_duplicates(self) -> None:
+        point = SimpleNamespace(
+            score=0.9,
+            payload={
+                "document_id": [self.document.id],
+                "chunk_db_id": self.chunks[0].id,
+                "_text": self.chunks[0].text,
+                "page_start": 1,
+            },
+        )
+        fake_client = MagicMock()
+        fake_client.query_points.return_value = SimpleNamespace(points=[point])
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "embed_texts", return_value=[[0.1]]),
+        ):
+            results = retrieval_service.search_chunks("forward-looking statements", workspace_id=self.workspace.id)
+
+        # Keyword search finds the disclaimer too, but none of its duplicates
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["page"], 1)
+        self.assertEqual(results[0]["pages"], [1, 2, 3])
+        self.assertNotIn("chunk_id", results[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,26 +6,17 @@ import unittest
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
-import tiktoken
-
-# The production tokenizer downloads its vocabulary on first use.  Tests use a
-# deterministic byte-level tiktoken Encoding so the suite stays fully offline.
-TEST_ENCODING = tiktoken.Encoding(
-    name="insightai_test_bytes",
-    pat_str=r"(?s).",
-    mergeable_ranks={bytes([value]): value for value in range(256)},
-    special_tokens={},
+from backend.services.ingestion.chunking_service import (
+    CHUNK_OVERLAP_TOKENS,
+    ENCODING,
+    MAX_TOKENS,
+    ChunkRecord,
+    build_pdf_chunks,
+    build_text_chunks,
+    chunk_text_from_text,
+    insert_chunk_records,
+    iter_pdf_chunks,
 )
-
-with patch("tiktoken.encoding_for_model", return_value=TEST_ENCODING):
-    from backend.services.ingestion.chunking_service import (
-        CHUNK_OVERLAP_TOKENS,
-        ENCODING,
-        MAX_TOKENS,
-        chunk_pdf,
-        chunk_text_from_text,
-    )
-
 from backend.database.database import SessionLocal
 from backend.models.document_block import DocumentBlock
 from backend.models.document_chunk import DocumentChunk
@@ -116,6 +107,27 @@ class TextChunkingTests(unittest.TestCase):
             db.close()
         self.assertEqual(reconstructed, "ä")
 
+    def test_given_tokens_are_windowed_without_encoding_or_decoding_again(self) -> None:
+        text = "ab" * 60 + "ä" * 10
+        tokens = ENCODING.encode(text)
+
+        with (
+            patch.object(ENCODING, "encode", side_effect=AssertionError("encoded twice")),
+            patch.object(ENCODING, "decode", side_effect=AssertionError("decoded per window")),
+        ):
+            records = build_text_chunks(text, max_tokens=25, overlap_tokens=5, tokens=tokens)
+            single = build_text_chunks(text, max_tokens=200, overlap_tokens=5, tokens=tokens)
+
+        self.assertEqual(single[0].text, text)
+        self.assertEqual(single[0].token_count, len(tokens))
+        self.assertTrue(all("\ufffd" not in record.text for record in records))
+        self.assertEqual(
+            [record.token_count for record in records],
+            [len(ENCODING.encode(record.text)) for record in records],
+        )
+        self.assertTrue(all(record.text in text for record in records))
+        self.assertTrue(text.startswith(records[0].text) and text.endswith(records[-1].text))
+
     def test_default_chunking_uses_800_tokens_with_80_token_overlap(self) -> None:
         text = "a" * 1700
         db = SessionLocal()
@@ -248,69 +260,86 @@ class PdfChunkingOrchestrationTests(unittest.TestCase):
     def test_pdf_chunks_keep_heading_and_page_context(self) -> None:
         heading = SimpleNamespace(title="Chapter")
         meta = SimpleNamespace(heading_context=[heading], page_start=4, page_end=5)
-        fake_chunk = SimpleNamespace(meta=meta)
         fake_chunker = MagicMock()
-        fake_chunker.chunk.return_value = [fake_chunk]
+        fake_chunker.chunk.return_value = [SimpleNamespace(meta=meta)]
         fake_chunker.contextualize.return_value = "Chapter\nEvidence"
-        fake_db = MagicMock()
 
-        with (
-            patch("backend.services.ingestion.chunking_service.SessionLocal", return_value=fake_db),
-            patch(
-                "backend.services.ingestion.chunking_service.parse_document",
-                return_value=(SimpleNamespace(id=91), object()),
-            ),
-            patch("backend.services.ingestion.chunking_service.PDF_CHUNKER", fake_chunker),
-            patch(
-                "backend.services.ingestion.chunking_service.chunk_text_from_text",
-                return_value=(1, 1),
-            ) as chunk_text,
-        ):
-            parse_id, total = chunk_pdf(
-                17,
-                "document.pdf",
-                max_tokens=800,
-                overlap_tokens=80,
-            )
+        with patch("backend.services.ingestion.chunking_service.PDF_CHUNKER", fake_chunker):
+            records = build_pdf_chunks(object(), max_tokens=800, overlap_tokens=80)
+
+        self.assertEqual(
+            records,
+            [
+                ChunkRecord(
+                    chunk_index=0,
+                    text="Chapter\nEvidence",
+                    token_count=len(ENCODING.encode("Chapter\nEvidence")),
+                    section_title="Chapter",
+                    page_start=4,
+                    page_end=5,
+                )
+            ],
+        )
 
-        self.assertEqual((parse_id, total), (91, 1))
-        chunk_text.assert_called_once()
-        kwargs = chunk_text.call_args.kwargs
-        self.assertEqual(kwargs["text"], "Chapter\nEvidence")
-        self.assertEqual(kwargs["max_tokens"], 800)
-        self.assertEqual(kwargs["overlap_tokens"], 80)
-        self.assertEqual(kwargs["section_title"], "Chapter")
-        self.assertEqual(kwargs["page_start"], 4)
-        self.assertEqual(kwargs["page_end"], 5)
-        fake_db.commit.assert_called_once()
-        fake_db.close.assert_called_once()
-
-    @unittest.expectedFailure
     def test_pdf_chunks_support_current_docling_headings_metadata_shape(self) -> None:
         provenance = SimpleNamespace(page_no=6)
         doc_item = SimpleNamespace(prov=[provenance])
         meta = SimpleNamespace(headings=["Current Heading"], doc_items=[doc_item])
-        fake_chunk = SimpleNamespace(meta=meta)
         fake_chunker = MagicMock()
-        fake_chunker.chunk.return_value = [fake_chunk]
+        fake_chunker.chunk.return_value = [SimpleNamespace(meta=meta)]
         fake_chunker.contextualize.return_value = "Current Heading\nEvidence"
-        fake_db = MagicMock()
+
+        with patch("backend.services.ingestion.chunking_service.PDF_CHUNKER", fake_chunker):
+            records = build_pdf_chunks(object())
+
+        self.assertEqual(records[0].section_title, "Current Heading")
+        self.assertEqual((records[0].page_start, records[0].page_end), (6, 6))
+
+    def test_pdf_chunk_records_are_streamed_with_continuous_indexes(self) -> None:
+        sections = [
+            SimpleNamespace(meta=SimpleNamespace(headings=[f"Section {index}"], doc_items=[]))
+            for index in range(3)
+        ]
+        fake_chunker = MagicMock()
+        fake_chunker.chunk.return_value = iter(sections)
+        fake_chunker.contextualize.side_effect = lambda chunk: "x" * 25
+
         with (
-            patch("backend.services.ingestion.chunking_service.SessionLocal", return_value=fake_db),
-            patch(
-                "backend.services.ingestion.chunking_service.parse_document",
-                return_value=(SimpleNamespace(id=1), object()),
-            ),
             patch("backend.services.ingestion.chunking_service.PDF_CHUNKER", fake_chunker),
-            patch(
-                "backend.services.ingestion.chunking_service.chunk_text_from_text",
-                return_value=(1, 1),
-            ) as chunk_text,
+            patch("backend.services.ingestion.chunking_service.PDF_ENCODE_BATCH_SIZE", 2),
         ):
-            chunk_pdf(1, "document.pdf")
-        kwargs = chunk_text.call_args.kwargs
-        self.assertEqual(kwargs["section_title"], "Current Heading")
-        self.assertEqual(kwargs["page_start"], 6)
+            records = iter_pdf_chunks(object(), max_tokens=10, overlap_tokens=0)
+            first = next(records)
+            # Later sections are only read one encoding batch at a time
+            self.assertEqual(fake_chunker.contextualize.call_count, 2)
+            rest = list(records)
+
+        self.assertEqual([record.chunk_index for record in [first, *rest]], list(range(9)))
+        self.assertEqual(rest[-1].section_title, "Section 2")
+
+    def test_chunk_records_are_bulk_inserted_and_return_ids_in_order(self) -> None:
+        reset_database()
+        user, workspace = create_user_workspace()
+        document = create_document(workspace.id, user.id)
+        records = (
+            ChunkRecord(chunk_index=index, text=f"text {index}", token_count=2, page_start=index)
+            for index in range(25)
+        )
+
+        db = SessionLocal()
+        try:
+            ids = insert_chunk_records(db, document.id, None, records, batch_size=10)
+            db.commit()
+
+            rows = db.query(DocumentChunk).filter(DocumentChunk.id.in_(ids)).all()
+            by_id = {row.id: row for row in rows}
+        finally:
+            db.close()
+
+        self.assertEqual(len(ids), 25)
+        self.assertEqual([by_id[chunk_id].chunk_index for chunk_id in ids], list(range(25)))
+        self.assertEqual(by_id[ids[7]].page_start, 7)
+        self.assertIsNotNone(by_id[ids[0]].created_at)
 
 
 class DocumentBlockTests(unittest.TestCase):
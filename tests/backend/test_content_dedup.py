@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
+import io
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import UploadFile
+
+from backend.database.database import SessionLocal
+from backend.models.document import Document
+from backend.models.document_chunk import DocumentChunk
+from backend.models.document_content import DocumentContent
+from backend.models.report import Report
+from backend.models.workspace_member import WorkspaceMember
+from backend.routers import document as document_router
+from backend.services.ingestion import content_dedup
+from backend.services.observability import metrics
+from backend.services.vector import retrieval_service
+from tests.support import create_document, create_user_workspace, reset_database
+
+REPORT_BYTES = b"Quarterly report: revenue grew by eight percent."
+
+
+class ContentDedupTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+        self.user, self.workspace = create_user_workspace()
+        self.team_user, self.team_workspace = create_user_workspace(
+            email="team@example.test", workspace_name="Team", workspace_type="team"
+        )
+        self.owner = create_document(self.workspace.id, self.user.id, filename="q3.txt")
+
+        db = SessionLocal()
+        try:
+            owner = db.query(Document).filter(Document.id == self.owner.id).one()
+            owner.content_sha256 = content_dedup.compute_content_sha256(REPORT_BYTES)
+            content_dedup.register_document_content(db, owner)
+            db.add(
+                DocumentChunk(
+                    document_id=owner.id,
+                    chunk_index=0,
+                    token_count=8,
+                    text="Revenue grew by eight percent.",
+                )
+            )
+            db.add(Report(document_id=owner.id, content={"title": "Q3"}))
+            db.commit()
+            self.content_id = owner.content_id
+        finally:
+            db.close()
+
+    def _upload(self, file_bytes: bytes, workspace_id: int, user) -> dict:
+        upload = UploadFile(file=io.BytesIO(file_bytes), filename="q3-copy.txt")
+
+        with patch.object(document_router, "upload_file", return_value="documents/q3-copy.txt"):
+            return asyncio.run(
+                document_router.upload_document(
+                    file=upload, language="de", workspace_id=workspace_id, current_user=user
+                )
+            )
+
+    def _shared_document(self) -> Document:
+        db = SessionLocal()
+        try:
+            document = Document(
+                filename="q3-copy.txt",
+                file_type="text/plain",
+                storage_path="documents/q3-copy.txt",
+                file_status="uploaded",
+                language="de",
+                workspace_id=self.team_workspace.id,
+                uploaded_by_user_id=self.team_user.id,
+                content_sha256=content_dedup.compute_content_sha256(REPORT_BYTES),
+                content_id=self.content_id,
+            )
+            db.add(document)
+            db.commit()
+            db.refresh(document)
+            db.expunge(document)
+            return document
+        finally:
+            db.close()
+
+    def test_upload_of_known_bytes_references_completed_content(self) -> None:
+        reused = self._upload(REPORT_BYTES, self.team_workspace.id, self.team_user)
+        fresh = self._upload(b"A different report.", self.team_workspace.id, self.team_user)
+
+        self.assertTrue(reused["reused_content"])
+        self.assertFalse(fresh["reused_content"])
+        self.assertEqual(metrics.get("dedup.hits"), 1)
+        self.assertEqual(metrics.get("dedup.misses"), 1)
+
+        db = SessionLocal()
+        try:
+            document = db.query(Document).filter(Document.id == reused["document_id"]).one()
+            self.assertEqual(document.content_id, self.content_id)
+            self.assertEqual(document.workspace_id, self.team_workspace.id)
+        finally:
+            db.close()
+
+    def test_other_language_or_unfinished_owner_is_not_reused(self) -> None:
+        sha256 = content_dedup.compute_content_sha256(REPORT_BYTES)
+
+        db = SessionLocal()
+        try:
+            self.assertIsNone(content_dedup.find_reusable_content(db, sha256, "en"))
+
+            db.query(Document).filter(Document.id == self.owner.id).update({"file_status": "processing"})
+            db.commit()
+            self.assertIsNone(content_dedup.find_reusable_content(db, sha256, "de"))
+        finally:
+            db.close()
+
+    def test_deduplicated_document_skips_every_processing_stage(self) -> None:
+        document = self._shared_document()
+        parse_in_pool = AsyncMock()
+        set_references = MagicMock()
+
+        with (
+            patch.object(document_router, "download_to_temp_file") as download,
+            patch.object(document_router, "get_parsing_services", return_value=(parse_in_pool, MagicMock())),
+            patch.object(document_router, "get_vector_reference_service", return_value=set_references),
+        ):
+            asyncio.run(document_router.process_document_logic(document.id))
+
+        download.assert_not_called()
+        parse_in_pool.assert_not_awaited()
+        set_references.assert_called_once_with(
+            self.owner.id,
+            [(self.owner.id, self.workspace.id), (document.id, self.team_workspace.id)],
+        )
+
+        db = SessionLocal()
+        try:
+            self.assertEqual(db.query(Document).filter(Document.id == document.id).one().file_status, "completed")
+            report = db.query(Report).filter(Report.document_id == document.id).one()
+            self.assertEqual(report.content, {"title": "Q3"})
+            self.assertEqual(db.query(DocumentChunk).count(), 1)
+        finally:
+            db.close()
+
+    def test_keyword_search_finds_shared_chunks_for_deduplicated_document(self) -> None:
+        document = self._shared_document()
+        fake_client = MagicMock()
+        fake_client.query_points.return_value = SimpleNamespace(points=[])
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "embed_texts", return_value=[[0.1]]),
+        ):
+            results = retrieval_service.search_chunks("Revenue", workspace_id=self.team_workspace.id)
+
+        self.assertEqual([result["document_id"] for result in results], [document.id])
+
+    def test_shared_vector_resolves_to_document_of_searched_workspace(self) -> None:
+        document = self._shared_document()
+        point = SimpleNamespace(
+            score=0.9,
+            payload={"document_id": [self.owner.id, document.id], "_text": "Revenue grew by eight percent."},
+        )
+        fake_client = MagicMock()
+        fake_client.query_points.return_value = SimpleNamespace(points=[point])
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "embed_texts", return_value=[[0.1]]),
+        ):
+            results = retrieval_service.search_chunks("grew", workspace_id=self.team_workspace.id)
+
+        self.assertEqual(results[0]["document_id"], document.id)
+        # The keyword search finds the shared chunk too; both are fused into one hit
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["source"], "hybrid")
+
+    def _transfer_to_team(self, document_id: int, mode: str = "copy"):
+        db = SessionLocal()
+        try:
+            db.add(WorkspaceMember(workspace_id=self.team_workspace.id, user_id=self.user.id, role="member"))
+            db.commit()
+        finally:
+            db.close()
+
+        set_references = MagicMock()
+        with (
+            patch.object(document_router, "copy_file", return_value="documents/copy.txt"),
+            patch.object(document_router, "get_vector_reference_service", return_value=set_references),
+            patch.object(document_router, "get_vector_services") as vector_services,
+        ):
+            response = document_router.transfer_document(
+                document_id,
+                document_router.DocumentTransferIn(target_workspace_id=self.team_workspace.id, mode=mode),
+                current_user=self.user,
+            )
+
+        # Neither embeds nor deletes vectors
+        vector_services.assert_not_called()
+        return response, set_references
+
+    def test_copy_references_shared_content_without_duplicating_rows(self) -> None:
+        response, set_references = self._transfer_to_team(self.owner.id)
+
+        copy_id = response["document_id"]
+        set_references.assert_called_once_with(
+            self.owner.id,
+            [(self.owner.id, self.workspace.id), (copy_id, self.team_workspace.id)],
+        )
+
+        db = SessionLocal()
+        try:
+            copied = db.query(Document).filter(Document.id == copy_id).one()
+            self.assertEqual(copied.content_id, self.content_id)
+            self.assertEqual(copied.file_status, "completed")
+            self.assertEqual(db.query(DocumentChunk).count(), 1)
+            self.assertEqual(db.query(Report).filter(Report.document_id == copy_id).one().content, {"title": "Q3"})
+        finally:
+            db.close()
+
+    def test_copy_of_unshared_document_shares_its_content(self) -> None:
+        source = create_document(self.workspace.id, self.user.id, filename="legacy.txt")
+
+        response, set_references = self._transfer_to_team(source.id)
+
+        db = SessionLocal()
+        try:
+            content = db.query(DocumentContent).filter(DocumentContent.owner_document_id == source.id).one()
+            self.assertIsNone(content.sha256)
+            copied = db.query(Document).filter(Document.id == response["document_id"]).one()
+            self.assertEqual(copied.content_id, content.id)
+        finally:
+            db.close()
+        self.assertEqual(set_references.call_args.args[0], source.id)
+
+    def test_move_rewrites_workspace_of_existing_vectors(self) -> None:
+        source = create_document(self.workspace.id, self.user.id, filename="plain.txt")
+
+        response, set_references = self._transfer_to_team(source.id, mode="move")
+
+        self.assertEqual(response["workspace_id"], self.team_workspace.id)
+        set_references.assert_called_once_with(source.id, [(source.id, self.team_workspace.id)])
+
+    def test_moving_shared_copy_keeps_owner_vectors(self) -> None:
+        document = self._shared_document()
+        db = SessionLocal()
+        try:
+            db.query(Document).filter(Document.id == document.id).update({"workspace_id": self.workspace.id})
+            db.commit()
+        finally:
+            db.close()
+
+        _, set_references = self._transfer_to_team(document.id, mode="move")
+
+        set_references.assert_called_once_with(
+            self.owner.id,
+            [(self.owner.id, self.workspace.id), (document.id, self.team_workspace.id)],
+        )
+
+    def test_deleting_owner_hands_content_to_remaining_document(self) -> None:
+        document = self._shared_document()
+        delete_vectors = MagicMock()
+        set_references = MagicMock()
+
+        with (
+            patch.object(document_router, "get_vector_services", return_value=(MagicMock(), delete_vectors)),
+            patch.object(document_router, "get_vector_reference_service", return_value=set_references),
+            patch.object(document_router, "delete_file"),
+        ):
+            document_router.delete_document(self.owner.id, current_user=self.user)
+
+        delete_vectors.assert_not_called()
+        set_references.assert_called_once_with(document.id, [(document.id, self.team_workspace.id)])
+
+        db = SessionLocal()
+        try:
+            self.assertEqual(db.query(DocumentChunk).one().document_id, document.id)
+            content = db.query(DocumentContent).one()
+            self.assertEqual(content.owner_document_id, document.id)
+        finally:
+            db.close()
+
+    def test_deleting_last_document_removes_content_and_vectors(self) -> None:
+        delete_vectors = MagicMock()
+
+        with (
+            patch.object(document_router, "get_vector_services", return_value=(MagicMock(), delete_vectors)),
+            patch.object(document_router, "delete_file"),
+        ):
+            document_router.delete_document(self.owner.id, current_user=self.user)
+
+        delete_vectors.assert_called_once_with(self.owner.id)
+
+        db = SessionLocal()
+        try:
+            self.assertEqual(db.query(DocumentContent).count(), 0)
+            self.assertEqual(db.query(DocumentChunk).count(), 0)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
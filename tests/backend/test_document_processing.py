@@ -3,20 +3,26 @@ from __future__ import annotations
 import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
 import asyncio
 import tempfile
+import threading
 import unittest
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from backend.database.database import SessionLocal
 from backend.models.document import Document
+from backend.models.document_chunk import DocumentChunk
 from backend.models.report import Report
 from backend.routers import document as document_router
+from backend.services.observability import metrics
 from tests.support import create_document, create_user_workspace, reset_database
 
 
 class DocumentProcessingTests(unittest.TestCase):
     def setUp(self) -> None:
         reset_database()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
         self.user, self.workspace = create_user_workspace()
 
     def _temp_file(self, suffix: str, content: str) -> Path:
@@ -32,6 +38,12 @@ class DocumentProcessingTests(unittest.TestCase):
         finally:
             db.close()
 
+    def _parsing_services(self, full_text: str = "Grounded document content", parse_id=None):
+        parsed = SimpleNamespace(full_text=full_text, chunks=[object()], is_pdf=False)
+        parse_in_pool = AsyncMock(return_value=parsed)
+        store_parsed = MagicMock(return_value=(parse_id, None))
+        return parse_in_pool, store_parsed
+
     def test_txt_pipeline_runs_all_stages_and_persists_report(self) -> None:
         document = create_document(
             self.workspace.id,
@@ -41,8 +53,7 @@ class DocumentProcessingTests(unittest.TestCase):
             status="uploaded",
         )
         local_file = self._temp_file(".txt", "Grounded document content")
-        chunk_text = MagicMock(return_value=(1, 1))
-        chunk_pdf = MagicMock()
+        parse_in_pool, store_parsed = self._parsing_services()
         create_blocks = MagicMock(return_value=1)
         structure_blocks = AsyncMock(return_value=[])
         generate_report = AsyncMock(return_value={"title": "Test", "sections": [], "conclusion": "Done"})
@@ -50,7 +61,7 @@ class DocumentProcessingTests(unittest.TestCase):
 
         with (
             patch.object(document_router, "download_to_temp_file", return_value=local_file),
-            patch.object(document_router, "get_chunking_services", return_value=(chunk_text, chunk_pdf, 800)),
+            patch.object(document_router, "get_parsing_services", return_value=(parse_in_pool, store_parsed)),
             patch.object(document_router, "get_block_services", return_value=(create_blocks, structure_blocks)),
             patch.object(document_router, "get_report_service", return_value=generate_report),
             patch.object(document_router, "get_vector_services", return_value=(MagicMock(), delete_vectors)),
@@ -60,15 +71,15 @@ class DocumentProcessingTests(unittest.TestCase):
 
         self.assertEqual(self._document_status(document.id), "completed")
         self.assertFalse(local_file.exists())
-        chunk_text.assert_called_once()
-        self.assertEqual(chunk_text.call_args.kwargs["max_tokens"], 800)
-        self.assertFalse(chunk_text.call_args.kwargs["split_markdown_headings"])
-        chunk_pdf.assert_not_called()
+        parse_in_pool.assert_awaited_once_with(str(local_file), "text/plain")
+        store_parsed.assert_called_once()
+        self.assertEqual(store_parsed.call_args.args[1], document.id)
         upsert.assert_called_once()
-        create_blocks.assert_called_once_with(document_id=document.id, parse_id=None)
+        create_blocks.assert_called_once_with(document_id=document.id, parse_id=None, reuse_structured=True)
         structure_blocks.assert_awaited_once_with(document_id=document.id, parse_id=None)
         generate_report.assert_awaited_once()
-        delete_vectors.assert_called_once_with(document.id)
+        # Vectors of a previous version are replaced through the chunk diff, not deleted up front
+        delete_vectors.assert_not_called()
 
         db = SessionLocal()
         try:
@@ -77,7 +88,86 @@ class DocumentProcessingTests(unittest.TestCase):
         finally:
             db.close()
 
-    def test_markdown_pipeline_enables_heading_boundaries(self) -> None:
+    def test_embedding_and_structuring_run_concurrently(self) -> None:
+        document = create_document(
+            self.workspace.id,
+            self.user.id,
+            filename="notes.txt",
+            file_type="text/plain",
+            status="uploaded",
+        )
+        local_file = self._temp_file(".txt", "Grounded document content")
+        parse_in_pool, store_parsed = self._parsing_services()
+        structuring_started = threading.Event()
+        overlapped = []
+
+        def upsert(db, upserted_document):
+            # Blocks the embed stage until block structuring has started next to it
+            overlapped.append(structuring_started.wait(timeout=5))
+            self.assertEqual(upserted_document.id, document.id)
+
+        async def structure_blocks(**kwargs):
+            structuring_started.set()
+
+        with (
+            patch.object(document_router, "download_to_temp_file", return_value=local_file),
+            patch.object(document_router, "get_parsing_services", return_value=(parse_in_pool, store_parsed)),
+            patch.object(
+                document_router,
+                "get_block_services",
+                return_value=(MagicMock(return_value=1), structure_blocks),
+            ),
+            patch.object(
+                document_router,
+                "get_report_service",
+                return_value=AsyncMock(return_value={"title": "Test", "sections": [], "conclusion": "Done"}),
+            ),
+            patch.object(document_router, "get_vector_services", return_value=(MagicMock(), MagicMock())),
+            patch.object(document_router, "upsert_chunks_to_vectorstore", side_effect=upsert),
+        ):
+            asyncio.run(document_router.process_document_logic(document.id))
+
+        self.assertEqual(overlapped, [True])
+        self.assertEqual(self._document_status(document.id), "completed")
+        for stage in ("parse", "embed", "structure", "report"):
+            self.assertGreater(metrics.get(f"ingestion.stage_seconds.{stage}"), 0)
+        self.assertEqual(metrics.get("ingestion.completed_documents"), 1)
+
+    def test_chunks_are_streamed_to_vector_store_in_batches(self) -> None:
+        document = create_document(self.workspace.id, self.user.id, filename="notes.txt")
+        db = SessionLocal()
+        try:
+            for index in range(5):
+                db.add(
+                    DocumentChunk(
+                        document_id=document.id,
+                        chunk_index=4 - index,
+                        token_count=3,
+                        text=f"chunk {4 - index}",
+                        page_start=1,
+                        keywords="revenue" if index == 0 else None,
+                    )
+                )
+            db.commit()
+
+            received = []
+
+            def upsert(**kwargs):
+                self.assertNotIsInstance(kwargs["chunks"], list)
+                received.extend(kwargs["chunks"])
+
+            with patch.object(document_router, "get_vector_services", return_value=(upsert, MagicMock())):
+                document_router.upsert_chunks_to_vectorstore(db, document)
+        finally:
+            db.close()
+
+        self.assertEqual([chunk["text"] for chunk in received], [f"chunk {index}" for index in range(5)])
+        self.assertEqual(received[0]["token_count"], 3)
+        self.assertEqual(received[0]["metadata"]["page_start"], 1)
+        self.assertEqual(received[4]["keywords"], "revenue")
+        self.assertEqual(received[0]["keywords"], [])
+
+    def test_markdown_pipeline_is_parsed_in_parser_pool(self) -> None:
         document = create_document(
             self.workspace.id,
             self.user.id,
@@ -86,14 +176,14 @@ class DocumentProcessingTests(unittest.TestCase):
             status="uploaded",
         )
         local_file = self._temp_file(".md", "# Heading\nGrounded content")
-        chunk_text = MagicMock(return_value=(1, 1))
+        parse_in_pool, store_parsed = self._parsing_services()
 
         with (
             patch.object(document_router, "download_to_temp_file", return_value=local_file),
             patch.object(
                 document_router,
-                "get_chunking_services",
-                return_value=(chunk_text, MagicMock(), 800),
+                "get_parsing_services",
+                return_value=(parse_in_pool, store_parsed),
             ),
             patch.object(
                 document_router,
@@ -118,10 +208,10 @@ class DocumentProcessingTests(unittest.TestCase):
 
         self.assertEqual(self._document_status(document.id), "completed")
         self.assertFalse(local_file.exists())
-        chunk_text.assert_called_once()
-        self.assertTrue(chunk_text.call_args.kwargs["split_markdown_headings"])
+        parse_in_pool.assert_awaited_once_with(str(local_file), "text/markdown")
+        store_parsed.assert_called_once()
 
-    def test_docx_pipeline_enables_heading_boundaries(self) -> None:
+    def test_docx_pipeline_is_parsed_in_parser_pool(self) -> None:
         document = create_document(
             self.workspace.id,
             self.user.id,
@@ -130,15 +220,14 @@ class DocumentProcessingTests(unittest.TestCase):
             status="uploaded",
         )
         local_file = self._temp_file(".docx", "placeholder")
-        chunk_text = MagicMock(return_value=(1, 1))
+        parse_in_pool, store_parsed = self._parsing_services()
 
         with (
             patch.object(document_router, "download_to_temp_file", return_value=local_file),
-            patch.object(document_router, "parse_docx", return_value="# Heading\n\nContent"),
             patch.object(
                 document_router,
-                "get_chunking_services",
-                return_value=(chunk_text, MagicMock(), 800),
+                "get_parsing_services",
+                return_value=(parse_in_pool, store_parsed),
             ),
             patch.object(
                 document_router,
@@ -163,9 +252,11 @@ class DocumentProcessingTests(unittest.TestCase):
 
         self.assertEqual(self._document_status(document.id), "completed")
         self.assertFalse(local_file.exists())
-        chunk_text.assert_called_once()
-        self.assertEqual(chunk_text.call_args.kwargs["text"], "# Heading\n\nContent")
-        self.assertTrue(chunk_text.call_args.kwargs["split_markdown_headings"])
+        parse_in_pool.assert_awaited_once_with(
+            str(local_file),
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        )
+        store_parsed.assert_called_once()
 
     def test_csv_pipeline_skips_embeddings_and_uses_structured_report(self) -> None:
         document = create_document(
@@ -181,15 +272,14 @@ class DocumentProcessingTests(unittest.TestCase):
             "profile": {"row_count": 1},
             "summary": {"row_count": 1},
         }
-        chunk_text = MagicMock()
-        chunk_pdf = MagicMock()
+        parse_in_pool, store_parsed = self._parsing_services()
         create_blocks = MagicMock()
         structure_blocks = AsyncMock()
         text_report = AsyncMock()
 
         with (
             patch.object(document_router, "download_to_temp_file", return_value=local_file),
-            patch.object(document_router, "get_chunking_services", return_value=(chunk_text, chunk_pdf, 800)),
+            patch.object(document_router, "get_parsing_services", return_value=(parse_in_pool, store_parsed)),
             patch.object(document_router, "get_block_services", return_value=(create_blocks, structure_blocks)),
             patch.object(document_router, "get_report_service", return_value=text_report),
             patch.object(document_router, "get_vector_services", return_value=(MagicMock(), MagicMock())),
@@ -210,8 +300,8 @@ class DocumentProcessingTests(unittest.TestCase):
 
         self.assertEqual(self._document_status(document.id), "completed")
         self.assertFalse(local_file.exists())
-        chunk_text.assert_not_called()
-        chunk_pdf.assert_not_called()
+        parse_in_pool.assert_not_awaited()
+        store_parsed.assert_not_called()
         create_blocks.assert_not_called()
         structure_blocks.assert_not_awaited()
         text_report.assert_not_awaited()
@@ -226,6 +316,32 @@ class DocumentProcessingTests(unittest.TestCase):
         finally:
             db.close()
 
+    def test_empty_parse_result_stops_before_embedding(self) -> None:
+        document = create_document(
+            self.workspace.id,
+            self.user.id,
+            filename="empty.txt",
+            file_type="text/plain",
+            status="uploaded",
+        )
+        local_file = self._temp_file(".txt", "   ")
+        parse_in_pool, store_parsed = self._parsing_services(full_text="   ")
+
+        with (
+            patch.object(document_router, "download_to_temp_file", return_value=local_file),
+            patch.object(document_router, "get_parsing_services", return_value=(parse_in_pool, store_parsed)),
+            patch.object(document_router, "get_block_services", return_value=(MagicMock(), AsyncMock())),
+            patch.object(document_router, "get_report_service", return_value=AsyncMock()),
+            patch.object(document_router, "get_vector_services", return_value=(MagicMock(), MagicMock())),
+            patch.object(document_router, "upsert_chunks_to_vectorstore") as upsert,
+        ):
+            asyncio.run(document_router.process_document_logic(document.id))
+
+        self.assertEqual(self._document_status(document.id), "parsed_empty")
+        self.assertFalse(local_file.exists())
+        store_parsed.assert_not_called()
+        upsert.assert_not_called()
+
     def test_failure_sets_failed_status_and_deletes_temp_file(self) -> None:
         document = create_document(
             self.workspace.id,
@@ -238,8 +354,11 @@ class DocumentProcessingTests(unittest.TestCase):
 
         with (
             patch.object(document_router, "download_to_temp_file", return_value=local_file),
-            patch.object(document_router, "parse_txt", side_effect=RuntimeError("parse failed")),
-            patch.object(document_router, "get_chunking_services", return_value=(MagicMock(), MagicMock(), 800)),
+            patch.object(
+                document_router,
+                "get_parsing_services",
+                return_value=(AsyncMock(side_effect=RuntimeError("parse failed")), MagicMock()),
+            ),
             patch.object(document_router, "get_block_services", return_value=(MagicMock(), AsyncMock())),
             patch.object(document_router, "get_report_service", return_value=AsyncMock()),
             patch.object(document_router, "get_vector_services", return_value=(MagicMock(), MagicMock())),
@@ -249,6 +368,33 @@ class DocumentProcessingTests(unittest.TestCase):
         self.assertEqual(self._document_status(document.id), "failed")
         self.assertFalse(local_file.exists())
 
+    def test_failure_is_reraised_for_job_queue_retries(self) -> None:
+        document = create_document(
+            self.workspace.id,
+            self.user.id,
+            filename="broken.txt",
+            file_type="text/plain",
+            status="uploaded",
+        )
+        local_file = self._temp_file(".txt", "broken")
+
+        with (
+            patch.object(document_router, "download_to_temp_file", return_value=local_file),
+            patch.object(
+                document_router,
+                "get_parsing_services",
+                return_value=(AsyncMock(side_effect=RuntimeError("parse failed")), MagicMock()),
+            ),
+            patch.object(document_router, "get_block_services", return_value=(MagicMock(), AsyncMock())),
+            patch.object(document_router, "get_report_service", return_value=AsyncMock()),
+            patch.object(document_router, "get_vector_services", return_value=(MagicMock(), MagicMock())),
+            self.assertRaisesRegex(RuntimeError, "parse failed"),
+        ):
+            asyncio.run(document_router.process_document_logic(document.id, raise_errors=True))
+
+        self.assertEqual(self._document_status(document.id), "failed")
+        self.assertFalse(local_file.exists())
+
 
 if __name__ == "__main__":
     unittest.main()
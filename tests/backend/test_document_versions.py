@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException, UploadFile
+
+from backend.services.ingestion import parse_pool
+from backend.services.ingestion.chunking_service import ChunkRecord
+from backend.database.database import SessionLocal
+from backend.models.document import Document
+from backend.models.document_block import DocumentBlock
+from backend.models.document_chunk import DocumentChunk
+from backend.models.document_parse import DocumentParse
+from backend.models.ingestion_job import IngestionJob
+from backend.routers import document as document_router
+from backend.services.ingestion.document_block_service import create_blocks_from_chunks, plan_blocks
+from backend.services.ingestion.content_dedup import compute_content_sha256, register_document_content
+from backend.services.ingestion.job_queue import enqueue_document_job
+from backend.services.observability import metrics
+from tests.support import create_document, create_user_workspace, reset_database
+
+CONTRACT = [
+    f"Clause {number}: the supplier delivers {subject} under the terms of this agreement."
+    for number, subject in enumerate(
+        ["hardware", "software", "support", "training", "spare parts", "updates", "audits"],
+        start=1,
+    )
+]
+
+
+def parsed_pages(texts, first_page: int = 1) -> parse_pool.ParsedDocument:
+    """One chunk per page, as a PDF parse would produce it."""
+    return parse_pool.ParsedDocument(
+        full_text="\n".join(texts),
+        chunks=[
+            ChunkRecord(
+                chunk_index=index,
+                text=text,
+                token_count=len(text),
+                page_start=first_page + index,
+                page_end=first_page + index,
+            )
+            for index, text in enumerate(texts)
+        ],
+        is_pdf=True,
+        page_count=len(texts),
+    )
+
+
+class ChunkDiffTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id, filename="contract.pdf")
+
+    def _store(self, parsed):
+        db = SessionLocal()
+        try:
+            parse_id, diff = parse_pool.store_parsed_document(db, self.document.id, parsed)
+            db.commit()
+            chunks = (
+                db.query(DocumentChunk)
+                .filter(DocumentChunk.document_id == self.document.id)
+                .order_by(DocumentChunk.chunk_index)
+                .all()
+            )
+            db.expunge_all()
+            return parse_id, diff, chunks
+        finally:
+            db.close()
+
+    def test_first_parse_embeds_every_chunk(self) -> None:
+        _, diff, chunks = self._store(parsed_pages(CONTRACT))
+
+        self.assertFalse(diff.incremental)
+        self.assertEqual(diff.upsert_ids, [chunk.id for chunk in chunks])
+        self.assertEqual((diff.stale_ids, diff.moved_ids), ([], []))
+
+    def test_amendment_only_embeds_changed_chunks(self) -> None:
+        _, _, before = self._store(parsed_pages(CONTRACT))
+        amended = [
+            CONTRACT[0],
+            "Amendment 1: the supplier also hosts the software in the EU.",
+            *CONTRACT[1:4],
+            "Clause 5: the supplier delivers spare parts within ten days.",
+            *CONTRACT[5:],
+        ]
+
+        parse_id, diff, after = self._store(parsed_pages(amended))
+
+        by_text = {chunk.text: chunk.id for chunk in before}
+        self.assertTrue(diff.incremental)
+        self.assertEqual((diff.kept, diff.inserted, diff.deleted), (6, 2, 1))
+        # Unchanged clauses keep their rows and therefore their vector ids
+        self.assertEqual(after[0].id, by_text[CONTRACT[0]])
+        self.assertEqual(after[2].id, by_text[CONTRACT[1]])
+        self.assertEqual(set(diff.upsert_ids), {after[1].id, after[5].id})
+        self.assertEqual(diff.stale_ids, [by_text[CONTRACT[4]]])
+        # Clauses after the inserted page moved one page back
+        self.assertEqual(diff.moved_ids, [chunk.id for chunk in after[2:] if chunk.id not in diff.upsert_ids])
+        self.assertEqual([chunk.page_start for chunk in after], list(range(1, 9)))
+        self.assertTrue(all(chunk.parse_id == parse_id for chunk in after))
+        self.assertEqual(metrics.get("ingestion.chunks_kept"), 6)
+
+        db = SessionLocal()
+        try:
+            self.assertEqual(db.query(DocumentParse.id).filter(DocumentParse.document_id == self.document.id).all(), [(parse_id,)])
+        finally:
+            db.close()
+
+    def test_blocks_are_only_recreated_where_chunks_changed(self) -> None:
+        texts = [f"Paragraph {index} of the contract body." for index in range(20)]
+        parse_id, _, _ = self._store(parsed_pages(texts))
+        create_blocks_from_chunks(self.document.id, parse_id)
+
+        db = SessionLocal()
+        try:
+            db.query(DocumentBlock).update({DocumentBlock.semantic_label: "paragraph"})
+            db.commit()
+            before = [block_id for (block_id,) in db.query(DocumentBlock.id).order_by(DocumentBlock.block_index)]
+        finally:
+            db.close()
+
+        amended = texts[:7] + ["A new paragraph inserted by the amendment."] + texts[7:]
+        parse_id, _, _ = self._store(parsed_pages(amended))
+        created = create_blocks_from_chunks(self.document.id, parse_id)
+
+        db = SessionLocal()
+        try:
+            blocks = db.query(DocumentBlock).order_by(DocumentBlock.block_index).all()
+        finally:
+            db.close()
+
+        self.assertEqual(created, len(blocks))
+        self.assertEqual("\n\n".join(block.content for block in blocks), "\n\n".join(amended))
+        self.assertTrue(all(block.parse_id == parse_id for block in blocks))
+        # Only the old block that held the insertion point is rebuilt (as 5 + 1 chunks);
+        # the blocks before and after it are reused
+        unstructured = [block for block in blocks if block.semantic_label is None]
+        self.assertEqual(len(unstructured), 2)
+        self.assertIn("amendment", unstructured[0].content)
+        self.assertEqual([block.id for block in blocks if block.semantic_label], [before[0], *before[2:]])
+
+
+class BlockPlanTests(unittest.TestCase):
+    def test_without_structured_blocks_chunks_are_grouped_by_five(self) -> None:
+        texts = [str(index) for index in range(12)]
+
+        self.assertEqual(plan_blocks(texts, {}), [(0, 5, None), (5, 10, None), (10, 12, None)])
+
+    def test_structured_block_is_reused_at_a_shifted_position(self) -> None:
+        texts = ["new", "a", "b", "c", "d", "e", "f"]
+
+        spans = plan_blocks(texts, {"a\n\nb\n\nc\n\nd\n\ne": [41]})
+
+        self.assertEqual(spans, [(0, 1, None), (1, 6, 41), (6, 7, None)])
+
+
+class VectorDiffTests(unittest.TestCase):
+    def test_only_changed_chunks_are_embedded_and_stale_points_deleted_by_id(self) -> None:
+        reset_database()
+        user, workspace = create_user_workspace()
+        document = create_document(workspace.id, user.id, filename="contract.pdf")
+
+        db = SessionLocal()
+        try:
+            _, first = parse_pool.store_parsed_document(db, document.id, parsed_pages(CONTRACT[:3]))
+            db.commit()
+            _, diff = parse_pool.store_parsed_document(
+                db, document.id, parsed_pages(["Cover page", CONTRACT[0], CONTRACT[2]])
+            )
+            db.commit()
+            document_row = db.query(Document).filter(Document.id == document.id).one()
+
+            upsert_chunks = MagicMock()
+            delete_points = MagicMock()
+            upserted, moved = [], []
+            upsert_chunks.side_effect = lambda **kwargs: upserted.extend(kwargs["chunks"])
+            update_positions = MagicMock(side_effect=lambda document_id, chunks: moved.extend(chunks))
+
+            with (
+                patch.object(document_router, "get_vector_services", return_value=(upsert_chunks, MagicMock())),
+                patch.object(document_router, "get_vector_diff_services", return_value=(delete_points, update_positions)),
+            ):
+                document_router.apply_chunk_diff_to_vectorstore(db, document_row, diff)
+        finally:
+            db.close()
+
+        self.assertEqual([chunk["text"] for chunk in upserted], ["Cover page"])
+        self.assertFalse(upsert_chunks.call_args.kwargs["replace"])
+        delete_points.assert_called_once_with(document.id, [first.upsert_ids[1]])
+        # Clause 1 moved behind the cover page; clause 3 stayed on page 3
+        self.assertEqual([chunk["metadata"]["page_start"] for chunk in moved], [2])
+
+
+class DocumentVersionUploadTests(unittest.TestCase):
+    def test_new_version_replaces_file_and_queues_processing(self) -> None:
+        reset_database()
+        user, workspace = create_user_workspace()
+        document = create_document(workspace.id, user.id, filename="contract.txt", status="completed")
+        upload = UploadFile(file=io.BytesIO(b"Amended contract text."), filename="contract-v2.txt")
+
+        with (
+            patch.object(document_router, "upload_file", return_value="documents/contract-v2.txt"),
+            patch.object(document_router, "delete_file") as delete_file,
+        ):
+            result = asyncio.run(
+                document_router.upload_document_version(document.id, file=upload, current_user=user)
+            )
+
+        self.assertEqual(result["version"], 2)
+        delete_file.assert_called_once_with(document.storage_path)
+
+        db = SessionLocal()
+        try:
+            stored = db.query(Document).filter(Document.id == document.id).one()
+            self.assertEqual(stored.storage_path, "documents/contract-v2.txt")
+            self.assertEqual(stored.filename, "contract-v2.txt")
+            self.assertEqual(stored.file_status, "uploaded")
+            self.assertEqual(db.query(IngestionJob).filter(IngestionJob.document_id == document.id).count(), 1)
+        finally:
+            db.close()
+
+    def _shared_document(self, user, workspace):
+        """An owner document and a copy that uses its processed content."""
+        owner = create_document(workspace.id, user.id, filename="contract.txt", status="completed")
+        copy = create_document(workspace.id, user.id, filename="contract-copy.txt", status="completed")
+        db = SessionLocal()
+        try:
+            owner_row = db.query(Document).filter(Document.id == owner.id).one()
+            owner_row.content_sha256 = compute_content_sha256(b"Contract text.")
+            register_document_content(db, owner_row)
+            db.query(Document).filter(Document.id == copy.id).update({Document.content_id: owner_row.content_id})
+            db.commit()
+        finally:
+            db.close()
+        return owner, copy
+
+    def test_shared_vectors_drop_the_document_before_its_job_is_committed(self) -> None:
+        reset_database()
+        user, workspace = create_user_workspace()
+        owner, copy = self._shared_document(user, workspace)
+        jobs_at_sync = []
+
+        def set_references(owner_document_id, references):
+            db = SessionLocal()
+            try:
+                jobs_at_sync.append(db.query(IngestionJob).count())
+            finally:
+                db.close()
+
+        upload = UploadFile(file=io.BytesIO(b"Amended contract text."), filename="contract-v2.txt")
+        with (
+            patch.object(document_router, "upload_file", return_value="documents/contract-v2.txt"),
+            patch.object(document_router, "delete_file"),
+            patch.object(document_router, "get_vector_reference_service", return_value=MagicMock(side_effect=set_references)) as service,
+        ):
+            asyncio.run(document_router.upload_document_version(owner.id, file=upload, current_user=user))
+
+        service.return_value.assert_called_once_with(copy.id, [(copy.id, workspace.id)])
+        self.assertEqual(jobs_at_sync, [0])
+
+    def test_failed_vector_sync_commits_nothing(self) -> None:
+        reset_database()
+        user, workspace = create_user_workspace()
+        owner, copy = self._shared_document(user, workspace)
+        set_references = MagicMock(side_effect=RuntimeError("Qdrant unavailable"))
+
+        upload = UploadFile(file=io.BytesIO(b"Amended contract text."), filename="contract-v2.txt")
+        with (
+            patch.object(document_router, "upload_file", return_value="documents/contract-v2.txt"),
+            patch.object(document_router, "delete_file") as delete_file,
+            patch.object(document_router, "get_vector_reference_service", return_value=set_references),
+        ):
+            with self.assertRaises(HTTPException) as raised:
+                asyncio.run(document_router.upload_document_version(owner.id, file=upload, current_user=user))
+
+        self.assertEqual(raised.exception.status_code, 500)
+        # Only the uploaded file of the new version is removed again
+        delete_file.assert_called_once_with("documents/contract-v2.txt")
+
+        db = SessionLocal()
+        try:
+            stored = db.query(Document).filter(Document.id == owner.id).one()
+            self.assertEqual((stored.version, stored.storage_path), (1, owner.storage_path))
+            self.assertIsNotNone(stored.content_id)
+            self.assertEqual(db.query(IngestionJob).count(), 0)
+        finally:
+            db.close()
+
+    def test_new_version_is_rejected_while_a_job_is_active(self) -> None:
+        reset_database()
+        user, workspace = create_user_workspace()
+        document = create_document(workspace.id, user.id, filename="contract.txt", status="processing")
+        db = SessionLocal()
+        try:
+            enqueue_document_job(db, document.id)
+        finally:
+            db.close()
+        upload = UploadFile(file=io.BytesIO(b"Amended contract text."), filename="contract-v2.txt")
+
+        with patch.object(document_router, "upload_file") as upload_file:
+            with self.assertRaises(HTTPException) as raised:
+                asyncio.run(document_router.upload_document_version(document.id, file=upload, current_user=user))
+
+        self.assertEqual(raised.exception.status_code, 409)
+        upload_file.assert_not_called()
+
+        db = SessionLocal()
+        try:
+            stored = db.query(Document).filter(Document.id == document.id).one()
+            self.assertEqual((stored.version, stored.storage_path), (1, document.storage_path))
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
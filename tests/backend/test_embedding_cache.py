@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.services.llm import embedding_cache, llm_provider
+from backend.services.observability import metrics
+from tests.support import embedding_response
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "embeddings.db")
+        self.cache = embedding_cache.EmbeddingCache(self.path, max_entries=10)
+        self.addCleanup(self.cache._conn.close)
+
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_vectors_round_trip_as_float16_per_model(self) -> None:
+        self.cache.put_many("model-a", ["alpha", "beta"], [[0.5, -0.25], [0.1, 0.2]])
+
+        hits = self.cache.get_many("model-a", ["beta", "gamma", "alpha"])
+
+        self.assertEqual(sorted(hits), [0, 2])
+        self.assertEqual(hits[2], [0.5, -0.25])
+        self.assertAlmostEqual(hits[0][0], 0.1, places=3)
+        self.assertEqual(self.cache.get_many("model-b", ["alpha"]), {})
+        self.assertEqual(metrics.get("embedding_cache.hits"), 2)
+        self.assertEqual(metrics.get("embedding_cache.misses"), 2)
+        self.assertAlmostEqual(embedding_cache.hit_ratio(), 0.5)
+
+    def test_completed_document_logs_the_hit_ratio(self) -> None:
+        from backend.routers import document as document_router
+
+        metrics.increment("embedding_cache.hits", 3)
+        metrics.increment("embedding_cache.misses", 1)
+
+        with self.assertLogs(document_router.logger, level="INFO") as logs:
+            document_router.record_stage_timings(7, {"embed": 0.5}, 1.0)
+
+        self.assertIn("embedding cache hit ratio 0.75", logs.output[0])
+
+    def test_cache_persists_across_connections(self) -> None:
+        self.cache.put_many("model-a", ["alpha"], [[1.0]])
+
+        reopened = embedding_cache.EmbeddingCache(self.path, max_entries=10)
+        self.addCleanup(reopened._conn.close)
+
+        self.assertEqual(reopened.get_many("model-a", ["alpha"]), {0: [1.0]})
+
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        texts = [f"text-{index}" for index in range(10)]
+        with patch.object(embedding_cache.time, "time", side_effect=range(100)):
+            for index, text in enumerate(texts):
+                self.cache.put_many("model-a", [text], [[float(index)]])
+            self.cache.get_many("model-a", ["text-0"])
+            self.cache.put_many("model-a", ["text-10"], [[10.0]])
+
+        self.assertEqual(len(self.cache), 9)
+        kept = self.cache.get_many("model-a", texts + ["text-10"])
+        self.assertIn(0, kept)
+        self.assertNotIn(1, kept)
+        self.assertNotIn(2, kept)
+        self.assertIn(10, kept)
+
+    def test_embed_texts_only_sends_misses_to_provider(self) -> None:
+        self.cache.put_many(llm_provider.EMBEDDING_MODEL, ["cached"], [[1.0, 0.0]])
+        fake_client = MagicMock()
+        fake_client.embeddings.create = AsyncMock(return_value=embedding_response([[0.0, 1.0]]))
+
+        with (
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
+            patch.object(llm_provider, "langfuse", None),
+            patch.object(llm_provider, "get_embedding_cache", return_value=self.cache),
+        ):
+            # Known token counts, so no tokenizer is needed
+            first = llm_provider.embed_texts(["cached", "new"], token_counts=[2, 1])
+            second = llm_provider.embed_texts(["new", "cached"], token_counts=[1, 2])
+
+        self.assertEqual(first, [[1.0, 0.0], [0.0, 1.0]])
+        self.assertEqual(second, [[0.0, 1.0], [1.0, 0.0]])
+        fake_client.embeddings.create.assert_called_once()
+        self.assertEqual(fake_client.embeddings.create.call_args.kwargs["input"], ["new"])
+
+    def test_empty_path_disables_cache(self) -> None:
+        with patch.dict(os.environ, {"EMBEDDING_CACHE_PATH": ""}):
+            self.assertIsNone(embedding_cache.create_embedding_cache())
+
+
+class QueryEmbeddingCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = embedding_cache.QueryEmbeddingCache(max_entries=2, ttl_seconds=60)
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_least_recently_used_query_is_evicted(self) -> None:
+        self.cache.put("model-a", "alpha", [1.0])
+        self.cache.put("model-a", "beta", [2.0])
+        self.assertEqual(self.cache.get("model-a", "alpha"), [1.0])
+        self.cache.put("model-a", "gamma", [3.0])
+
+        self.assertIsNone(self.cache.get("model-a", "beta"))
+        self.assertEqual(self.cache.get("model-a", "alpha"), [1.0])
+        self.assertIsNone(self.cache.get("model-b", "alpha"))
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(metrics.get("query_embedding_cache.hits"), 2)
+        self.assertEqual(metrics.get("query_embedding_cache.misses"), 2)
+        self.assertEqual(metrics.get("query_embedding_cache.evictions"), 1)
+
+    def test_entries_expire_after_the_ttl(self) -> None:
+        with patch.object(embedding_cache.time, "monotonic", side_effect=[0.0, 59.0, 61.0]):
+            self.cache.put("model-a", "alpha", [1.0])
+            self.assertEqual(self.cache.get("model-a", "alpha"), [1.0])
+            self.assertIsNone(self.cache.get("model-a", "alpha"))
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_callers_cannot_modify_cached_vectors(self) -> None:
+        vector = [1.0, 2.0]
+        self.cache.put("model-a", "alpha", vector)
+        vector.append(3.0)
+        self.cache.get("model-a", "alpha").append(4.0)
+
+        self.assertEqual(self.cache.get("model-a", "alpha"), [1.0, 2.0])
+
+    def test_repeated_query_is_embedded_once(self) -> None:
+        embed = MagicMock(side_effect=[[[]], [[0.5, 0.5]]])
+
+        with patch.object(llm_provider, "get_query_embedding_cache", return_value=self.cache):
+            # An empty vector of a failed request is not cached
+            self.assertEqual(llm_provider.embed_query("Revenue 2025?", embed), [])
+            self.assertEqual(llm_provider.embed_query("Revenue 2025?", embed), [0.5, 0.5])
+            self.assertEqual(llm_provider.embed_query("Revenue 2025?", embed), [0.5, 0.5])
+
+        self.assertEqual(embed.call_count, 2)
+        embed.assert_called_with(["Revenue 2025?"])
+        self.assertEqual(metrics.get("query_embedding_cache.hits"), 1)
+
+    def test_zero_entries_disable_query_cache(self) -> None:
+        with patch.dict(os.environ, {"QUERY_EMBEDDING_CACHE_MAX_ENTRIES": "0"}):
+            self.assertIsNone(embedding_cache.create_query_embedding_cache())
+        with patch.dict(os.environ, {"QUERY_EMBEDDING_CACHE_MAX_ENTRIES": "-1"}):
+            with self.assertRaises(RuntimeError):
+                embedding_cache.create_query_embedding_cache()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
+import datetime
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from backend import worker
+from backend.database.database import SessionLocal
+from backend.models.document import Document
+from backend.models.ingestion_job import IngestionJob
+from backend.services.ingestion import job_queue
+from tests.support import create_document, create_user_workspace, reset_database
+
+
+class JobQueueTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id, status="uploaded")
+
+    def _job(self, job_id: int) -> IngestionJob:
+        db = SessionLocal()
+        try:
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).one()
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def test_enqueue_is_idempotent_while_job_is_active(self) -> None:
+        db = SessionLocal()
+        try:
+            first = job_queue.enqueue_document_job(db, self.document.id)
+            second = job_queue.enqueue_document_job(db, self.document.id)
+            self.assertEqual(first.id, second.id)
+            self.assertEqual(db.query(IngestionJob).count(), 1)
+
+            job_queue.claim_next_job(db, "worker-a")
+            third = job_queue.enqueue_document_job(db, self.document.id)
+            self.assertEqual(third.id, first.id)
+        finally:
+            db.close()
+
+    def test_forced_enqueue_marks_the_active_job_for_a_full_rebuild(self) -> None:
+        db = SessionLocal()
+        try:
+            first = job_queue.enqueue_document_job(db, self.document.id)
+            self.assertFalse(first.force_rebuild)
+
+            forced = job_queue.enqueue_document_job(db, self.document.id, force_rebuild=True)
+
+            self.assertEqual(forced.id, first.id)
+            self.assertTrue(self._job(first.id).force_rebuild)
+        finally:
+            db.close()
+
+    def test_claim_is_exclusive_and_counts_attempts(self) -> None:
+        db = SessionLocal()
+        try:
+            job = job_queue.enqueue_document_job(db, self.document.id)
+            claimed = job_queue.claim_next_job(db, "worker-a")
+            self.assertEqual(claimed.id, job.id)
+            self.assertEqual(claimed.status, "running")
+            self.assertEqual(claimed.attempts, 1)
+            self.assertEqual(claimed.locked_by, "worker-a")
+            self.assertIsNone(job_queue.claim_next_job(db, "worker-b"))
+        finally:
+            db.close()
+
+    def test_failed_attempt_is_retried_with_exponential_backoff(self) -> None:
+        db = SessionLocal()
+        try:
+            job_queue.enqueue_document_job(db, self.document.id)
+            job = job_queue.claim_next_job(db, "worker-a")
+            before = datetime.datetime.utcnow()
+            job_queue.fail_job(db, job, "RuntimeError: boom")
+        finally:
+            db.close()
+
+        stored = self._job(job.id)
+        self.assertEqual(stored.status, "queued")
+        self.assertEqual(stored.last_error, "RuntimeError: boom")
+        self.assertGreaterEqual(
+            stored.run_after,
+            before + datetime.timedelta(seconds=job_queue.RETRY_BASE_SECONDS - 1),
+        )
+
+        db = SessionLocal()
+        try:
+            # Not due yet
+            self.assertIsNone(job_queue.claim_next_job(db, "worker-a"))
+        finally:
+            db.close()
+
+        self.assertEqual(job_queue.retry_delay_seconds(1), job_queue.RETRY_BASE_SECONDS)
+        self.assertEqual(job_queue.retry_delay_seconds(2), job_queue.RETRY_BASE_SECONDS * 2)
+        self.assertEqual(job_queue.retry_delay_seconds(50), job_queue.RETRY_MAX_SECONDS)
+
+    def test_last_attempt_failure_releases_document_for_new_jobs(self) -> None:
+        db = SessionLocal()
+        try:
+            job = job_queue.enqueue_document_job(db, self.document.id)
+            job.max_attempts = 1
+            db.commit()
+
+            claimed = job_queue.claim_next_job(db, "worker-a")
+            job_queue.fail_job(db, claimed, "boom")
+
+            stored = db.query(IngestionJob).filter(IngestionJob.id == job.id).one()
+            self.assertEqual(stored.status, "failed")
+            self.assertIsNone(stored.active_key)
+
+            new_job = job_queue.enqueue_document_job(db, self.document.id)
+            self.assertNotEqual(new_job.id, job.id)
+        finally:
+            db.close()
+
+    def test_abandoned_running_job_is_reclaimed_after_lease(self) -> None:
+        db = SessionLocal()
+        try:
+            job_queue.enqueue_document_job(db, self.document.id)
+            job = job_queue.claim_next_job(db, "crashed-worker")
+            job.locked_at = datetime.datetime.utcnow() - datetime.timedelta(
+                seconds=job_queue.LEASE_SECONDS + 1
+            )
+            db.commit()
+
+            reclaimed = job_queue.claim_next_job(db, "worker-b")
+            self.assertEqual(reclaimed.id, job.id)
+            self.assertEqual(reclaimed.locked_by, "worker-b")
+            self.assertEqual(reclaimed.attempts, 2)
+        finally:
+            db.close()
+
+    def test_reclaimed_final_attempt_fails_job_and_document(self) -> None:
+        db = SessionLocal()
+        try:
+            job = job_queue.enqueue_document_job(db, self.document.id)
+            job.max_attempts = 1
+            db.commit()
+
+            claimed = job_queue.claim_next_job(db, "crashed-worker")
+            claimed.locked_at = datetime.datetime.utcnow() - datetime.timedelta(
+                seconds=job_queue.LEASE_SECONDS + 1
+            )
+            db.query(Document).filter(Document.id == self.document.id).update({Document.file_status: "embedding"})
+            db.commit()
+
+            self.assertIsNone(job_queue.claim_next_job(db, "worker-b"))
+        finally:
+            db.close()
+
+        stored = self._job(job.id)
+        self.assertEqual(stored.status, "failed")
+        self.assertIsNone(stored.active_key)
+        db = SessionLocal()
+        try:
+            self.assertEqual(db.query(Document).filter(Document.id == self.document.id).one().file_status, "failed")
+        finally:
+            db.close()
+
+
+class WorkerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id, status="uploaded")
+
+    def _run_single_job(self, process_mock: AsyncMock) -> IngestionJob:
+        db = SessionLocal()
+        try:
+            job_id = job_queue.enqueue_document_job(db, self.document.id).id
+        finally:
+            db.close()
+
+        async def run() -> None:
+            stop_event = asyncio.Event()
+
+            async def process(document_id: int, raise_errors: bool = False, force_rebuild: bool = False) -> None:
+                try:
+                    await process_mock(document_id, raise_errors=raise_errors, force_rebuild=force_rebuild)
+                finally:
+                    stop_event.set()
+
+            with patch("backend.routers.document.process_document_logic", new=process):
+                await worker.run_job_slot(0, "test-worker", 0.01, stop_event)
+
+        asyncio.run(run())
+
+        db = SessionLocal()
+        try:
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).one()
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def test_worker_slot_processes_and_completes_job(self) -> None:
+        process = AsyncMock()
+        job = self._run_single_job(process)
+
+        process.assert_awaited_once_with(self.document.id, raise_errors=True, force_rebuild=False)
+        self.assertEqual(job.status, "succeeded")
+        self.assertIsNone(job.active_key)
+
+    def test_worker_slot_schedules_retry_on_failure(self) -> None:
+        process = AsyncMock(side_effect=RuntimeError("parser crashed"))
+        job = self._run_single_job(process)
+
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("parser crashed", job.last_error)
+
+
+if __name__ == "__main__":
+    unittest.main()
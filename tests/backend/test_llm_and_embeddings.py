@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
 import json
 import unittest
 from types import SimpleNamespace
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
-from openai import APIConnectionError
+from openai import APIConnectionError, RateLimitError
 
-from backend.services.llm import llm_provider
+from backend.services.ingestion import chunking_service
+from backend.services.llm import llm_provider, tokenizer
+from backend.services.llm.rate_limiter import TokenBucketLimiter
+from backend.services.observability import metrics
+from tests import TEST_ENCODING
 from tests.support import chat_response, embedding_response
 
 
@@ -62,58 +67,178 @@ class JsonGenerationTests(unittest.TestCase):
         sleep.assert_called_once_with(1.0)
 
 
+def fake_async_client(side_effect) -> MagicMock:
+    client = MagicMock()
+    client.embeddings.create = AsyncMock(side_effect=side_effect)
+    return client
+
+
+def echo_embeddings(*, model, input):
+    return embedding_response([[float(text.split("-")[1]), 0.0] for text in input])
+
+
 class EmbeddingTests(unittest.TestCase):
-    def test_embeddings_are_batched_in_groups_of_64(self) -> None:
+    def setUp(self) -> None:
+        encoding = patch.object(llm_provider, "get_embedding_encoding", return_value=TEST_ENCODING)
+        encoding.start()
+        self.addCleanup(encoding.stop)
+
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_batches_are_packed_by_token_budget(self) -> None:
         texts = [f"text-{index}" for index in range(65)]
-        first = [[float(index), 0.0] for index in range(64)]
-        second = [[64.0, 0.0]]
-        fake_client = MagicMock()
-        fake_client.embeddings.create.side_effect = [
-            embedding_response(first),
-            embedding_response(second),
-        ]
+        token_counts = [300] * 40 + [None] * 25
+        fake_client = fake_async_client(echo_embeddings)
 
         with (
-            patch.object(llm_provider, "openai_client", fake_client),
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
             patch.object(llm_provider, "langfuse", None),
+            patch.object(llm_provider, "EMBEDDING_BATCH_MAX_TOKENS", 6000),
         ):
-            result = llm_provider.embed_texts(texts)
+            result = llm_provider.embed_texts(texts, token_counts=token_counts)
 
-        self.assertEqual(result, first + second)
-        self.assertEqual(fake_client.embeddings.create.call_count, 2)
+        self.assertEqual(result, [[float(index), 0.0] for index in range(65)])
         calls = fake_client.embeddings.create.call_args_list
-        self.assertEqual(len(calls[0].kwargs["input"]), 64)
-        self.assertEqual(len(calls[1].kwargs["input"]), 1)
+        # 20 known chunks of 300 tokens fill a batch; the 25 short texts share one
+        self.assertEqual(sorted(len(call.kwargs["input"]) for call in calls), [20, 20, 25])
         self.assertTrue(all(call.kwargs["model"] == "text-embedding-3-small" for call in calls))
+        self.assertEqual(metrics.get("embeddings.requests"), 3)
+        self.assertEqual(metrics.get("embeddings.tokens"), 40 * 300 + sum(len(text) for text in texts[40:]))
+
+    def test_pack_embedding_batches_respects_token_and_text_limits(self) -> None:
+        self.assertEqual(
+            llm_provider.pack_embedding_batches([40, 40, 40, 200, 10], max_tokens=100),
+            [(0, 2), (2, 3), (3, 4), (4, 5)],
+        )
+        self.assertEqual(
+            llm_provider.pack_embedding_batches([1] * 5, max_tokens=100, max_texts=2),
+            [(0, 2), (2, 4), (4, 5)],
+        )
+        self.assertEqual(llm_provider.pack_embedding_batches([], max_tokens=100), [])
+
+    def test_stored_chunk_token_counts_match_the_embedding_count(self) -> None:
+        chunks = chunking_service.build_text_chunks(
+            "Revenue grew by twelve percent in every region. " * 60, max_tokens=200, overlap_tokens=20
+        )
+
+        # Chunks and embedding requests share one encoding, the embedding model's
+        self.assertIs(chunking_service.ENCODING, tokenizer.get_embedding_encoding())
+        with patch.object(llm_provider, "get_embedding_encoding", tokenizer.get_embedding_encoding):
+            counts = llm_provider.count_embedding_tokens([chunk.text for chunk in chunks])
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(counts, [chunk.token_count for chunk in chunks])
+
+    def test_oversize_input_is_truncated_to_provider_limit(self) -> None:
+        fake_client = fake_async_client(lambda *, model, input: embedding_response([[1.0] for _ in input]))
+
+        with (
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
+            patch.object(llm_provider, "langfuse", None),
+            patch.object(llm_provider, "EMBEDDING_MAX_INPUT_TOKENS", 8),
+        ):
+            llm_provider.embed_texts(["short", "a very long input text"])
+
+        sent = [text for call in fake_client.embeddings.create.call_args_list for text in call.kwargs["input"]]
+        self.assertEqual(sent, ["short", "a very l"])
+        self.assertEqual(metrics.get("embeddings.truncated_inputs"), 1)
+
+    def test_results_keep_input_order_when_batches_finish_out_of_order(self) -> None:
+        async def slow_first_batch(*, model, input):
+            if input[0] == "text-0":
+                await asyncio.sleep(0.05)
+            return echo_embeddings(model=model, input=input)
+
+        texts = [f"text-{index}" for index in range(200)]
+        fake_client = fake_async_client(slow_first_batch)
+
+        with (
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
+            patch.object(llm_provider, "langfuse", None),
+            patch.object(llm_provider, "EMBEDDING_BATCH_MAX_TOKENS", 50),
+        ):
+            result = asyncio.run(
+                llm_provider.embed_texts_async(texts, concurrency=4, token_counts=[1] * 200)
+            )
+
+        self.assertEqual([vector[0] for vector in result], [float(index) for index in range(200)])
+        self.assertEqual(fake_client.embeddings.create.call_count, 4)
 
     def test_embedding_retries_connection_errors(self) -> None:
         error = APIConnectionError(request=httpx.Request("POST", "https://example.test"))
-        fake_client = MagicMock()
-        fake_client.embeddings.create.side_effect = [
-            error,
-            embedding_response([[1.0, 2.0, 3.0]]),
-        ]
+        fake_client = fake_async_client([error, embedding_response([[1.0, 2.0, 3.0]])])
 
         with (
-            patch.object(llm_provider, "openai_client", fake_client),
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
             patch.object(llm_provider, "langfuse", None),
-            patch.object(llm_provider.time, "sleep") as sleep,
+            patch.object(llm_provider.random, "uniform", return_value=1.0),
+            patch.object(llm_provider.asyncio, "sleep", new=AsyncMock()) as sleep,
         ):
-            result = llm_provider.embed_texts(["retry me"])
+            result = asyncio.run(llm_provider.embed_texts_async(["retry me"]))
 
         self.assertEqual(result, [[1.0, 2.0, 3.0]])
         self.assertEqual(fake_client.embeddings.create.call_count, 2)
-        sleep.assert_called_once_with(1.0)
+        sleep.assert_awaited_once_with(1.0)
+
+    def test_rate_limited_batches_back_off_with_jitter(self) -> None:
+        response = httpx.Response(429, request=httpx.Request("POST", "https://example.test"))
+        error = RateLimitError("rate limited", response=response, body=None)
+        fake_client = fake_async_client([error, error, embedding_response([[1.0]])])
+
+        with (
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
+            patch.object(llm_provider, "langfuse", None),
+            patch.object(llm_provider.random, "uniform", side_effect=[0.5, 1.5]) as uniform,
+            patch.object(llm_provider.asyncio, "sleep", new=AsyncMock()) as sleep,
+        ):
+            result = asyncio.run(llm_provider.embed_texts_async(["busy"]))
+
+        self.assertEqual(result, [[1.0]])
+        self.assertEqual(uniform.call_args_list[0].args, (0.5, 1.5))
+        self.assertEqual([call.args[0] for call in sleep.await_args_list], [0.5, 3.0])
 
     def test_empty_input_does_not_call_provider(self) -> None:
-        fake_client = MagicMock()
+        fake_client = fake_async_client([])
         with (
-            patch.object(llm_provider, "openai_client", fake_client),
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
             patch.object(llm_provider, "langfuse", None),
         ):
             self.assertEqual(llm_provider.embed_texts([]), [])
         fake_client.embeddings.create.assert_not_called()
 
+    def test_sync_wrapper_works_inside_running_event_loop(self) -> None:
+        fake_client = fake_async_client(echo_embeddings)
+
+        async def call_sync_api():
+            return llm_provider.embed_texts(["text-7"])
+
+        with (
+            patch.object(llm_provider, "get_async_openai_client", return_value=fake_client),
+            patch.object(llm_provider, "langfuse", None),
+        ):
+            self.assertEqual(asyncio.run(call_sync_api()), [[7.0, 0.0]])
+
+
+class TokenBucketLimiterTests(unittest.TestCase):
+    def test_requests_wait_for_refill_of_request_and_token_buckets(self) -> None:
+        now = [0.0]
+        limiter = TokenBucketLimiter(requests_per_minute=2, tokens_per_minute=600, clock=lambda: now[0])
+
+        self.assertEqual(limiter.try_acquire(100), 0.0)
+        self.assertEqual(limiter.try_acquire(100), 0.0)
+        # Request bucket is empty: one request refills in 30 seconds
+        self.assertAlmostEqual(limiter.try_acquire(100), 30.0)
+
+        now[0] = 30.0
+        self.assertEqual(limiter.try_acquire(100), 0.0)
+
+        tokens = TokenBucketLimiter(requests_per_minute=100, tokens_per_minute=600, clock=lambda: now[0])
+        # A batch above the quota waits for a full bucket instead of forever
+        self.assertEqual(tokens.try_acquire(700), 0.0)
+        # Token bucket is empty: 100 tokens refill in 10 seconds
+        self.assertAlmostEqual(tokens.try_acquire(100), 10.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,577 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import fitz
+from docling_core.types.doc import (
+    BoundingBox,
+    DocItemLabel,
+    DoclingDocument,
+    ProvenanceItem,
+    Size,
+    TableCell,
+    TableData,
+)
+from backend.services.ingestion import parse_pool
+from backend.services.ingestion.chunking_service import ChunkRecord
+from backend.database.database import SessionLocal
+from backend.parsers import pdf_parser
+from backend.models.document_chunk import DocumentChunk
+from backend.models.document_parse import DocumentParse
+from backend.services.observability import metrics
+from tests.support import create_document, create_user_workspace, draw_table, reset_database
+
+
+class ParseAndChunkTests(unittest.TestCase):
+    def _temp_file(self, suffix: str, content: str) -> Path:
+        handle = tempfile.NamedTemporaryFile(mode="w", suffix=suffix, delete=False, encoding="utf-8")
+        handle.write(content)
+        handle.close()
+        self.addCleanup(Path(handle.name).unlink)
+        return Path(handle.name)
+
+    def test_markdown_is_chunked_at_heading_boundaries(self) -> None:
+        path = self._temp_file(".md", "# Intro\nFirst part\n\n# Details\nSecond part")
+
+        parsed = parse_pool.parse_and_chunk_document(str(path), "text/markdown")
+
+        self.assertFalse(parsed.is_pdf)
+        self.assertEqual([chunk.section_title for chunk in parsed.chunks], ["Intro", "Details"])
+        self.assertEqual([chunk.chunk_index for chunk in parsed.chunks], [0, 1])
+
+    def test_plain_text_ignores_markdown_headings(self) -> None:
+        path = self._temp_file(".txt", "# Not a heading\nplain text")
+
+        parsed = parse_pool.parse_and_chunk_document(str(path), "text/plain")
+
+        self.assertEqual(len(parsed.chunks), 1)
+        self.assertIsNone(parsed.chunks[0].section_title)
+        self.assertEqual(parsed.full_text, "# Not a heading\nplain text")
+
+    def test_docx_text_is_chunked_with_heading_boundaries(self) -> None:
+        with patch("backend.parsers.docx_parser.parse_docx", return_value="# Heading\n\nContent"):
+            parsed = parse_pool.parse_and_chunk_document("report.docx", parse_pool.DOCX_FILE_TYPE)
+
+        self.assertEqual(parsed.chunks[0].section_title, "Heading")
+
+    def test_pdf_result_carries_parse_fields(self) -> None:
+        records = [ChunkRecord(chunk_index=0, text="Page text", token_count=9, page_start=1, page_end=1)]
+        parse_fields = {"full_text": "Page text", "page_count": 3, "used_ocr": True, "warnings": None}
+
+        with (
+            patch("backend.parsers.pdf_parser.convert_pdf", return_value=(MagicMock(), True)),
+            patch("backend.parsers.pdf_parser.describe_docling_document", return_value=parse_fields),
+            patch(
+                "backend.services.ingestion.chunking_service.build_pdf_chunks",
+                return_value=records,
+            ),
+        ):
+            parsed = parse_pool.parse_and_chunk_document(
+                "document.pdf", "application/pdf", pdf_extractor="docling_ocr"
+            )
+
+        self.assertTrue(parsed.is_pdf)
+        self.assertEqual(parsed.page_count, 3)
+        self.assertTrue(parsed.used_ocr)
+        self.assertEqual(parsed.chunks, records)
+        # Results cross the process boundary
+        self.assertEqual(pickle.loads(pickle.dumps(parsed)), parsed)
+
+    def test_pool_size_zero_parses_in_thread(self) -> None:
+        path = self._temp_file(".txt", "inline text")
+
+        with (
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 0),
+            patch.object(parse_pool, "get_parse_executor") as get_executor,
+        ):
+            parsed = asyncio.run(parse_pool.parse_in_pool(str(path), "text/plain"))
+
+        get_executor.assert_not_called()
+        self.assertEqual(parsed.full_text, "inline text")
+
+    def test_executor_spawns_warm_parser_processes(self) -> None:
+        with (
+            patch.object(parse_pool, "_executor", None),
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 3),
+            patch.object(parse_pool, "ProcessPoolExecutor") as executor_cls,
+        ):
+            first = parse_pool.get_parse_executor()
+            second = parse_pool.get_parse_executor()
+
+        self.assertIs(first, second)
+        executor_cls.assert_called_once()
+        kwargs = executor_cls.call_args.kwargs
+        self.assertEqual(kwargs["max_workers"], 3)
+        self.assertEqual(kwargs["mp_context"].get_start_method(), "spawn")
+        self.assertIs(kwargs["initializer"], parse_pool._warm_parser_process)
+
+    def test_invalid_pool_size_fails_fast(self) -> None:
+        with patch.dict("os.environ", {"PARSE_POOL_SIZE": "-1"}):
+            with self.assertRaisesRegex(RuntimeError, "PARSE_POOL_SIZE"):
+                parse_pool._load_parse_pool_size()
+
+
+def docling_document(
+        pages: list[tuple[str | None, str]],
+        table: list[list[str]] | None = None
+) -> DoclingDocument:
+    """
+    Build a converted document with an optional heading and one paragraph per
+    page; a table is added to every page if given.
+    """
+    document = DoclingDocument(name="report")
+
+    for page_no, (heading, text) in enumerate(pages, start=1):
+        document.add_page(page_no=page_no, size=Size(width=600, height=800))
+        prov = ProvenanceItem(page_no=page_no, bbox=BoundingBox(l=0, t=0, r=10, b=10), charspan=(0, 1))
+        if heading:
+            document.add_heading(heading, prov=prov)
+        document.add_text(DocItemLabel.TEXT, text, prov=prov)
+        if table:
+            cells = [
+                TableCell(
+                    text=value,
+                    start_row_offset_idx=row,
+                    end_row_offset_idx=row + 1,
+                    start_col_offset_idx=col,
+                    end_col_offset_idx=col + 1,
+                    column_header=row == 0,
+                )
+                for row, values in enumerate(table)
+                for col, value in enumerate(values)
+            ]
+            document.add_table(
+                data=TableData(num_rows=len(table), num_cols=len(table[0]), table_cells=cells),
+                prov=prov,
+            )
+
+    return document
+
+
+PAGES = [
+    ("Introduction", "Scope of the annual report"),
+    (None, "Continued introduction"),
+    ("Results", "Revenue grew by eight percent"),
+    (None, "Costs stayed flat for the year"),
+    ("Outlook", "Guidance for next year"),
+]
+
+SCANNED = ("Appendix", "Scanned signature page")
+
+TABLE = [["Region", "Revenue"], ["North", "120"], ["South", "95"]]
+
+
+class PdfPageRangeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.converted_parts: list[tuple[int, bool]] = []
+        self.table_parts: list[int] = []
+
+    def _pdf(self, pages: list[tuple[str | None, str] | None], table_pages: tuple[int, ...] = ()) -> Path:
+        """
+        Text pages as (heading, text); None adds a scanned page without text
+        layer. Pages listed in table_pages (1-based) also get a ruled table.
+        """
+        handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        handle.close()
+        self.addCleanup(Path(handle.name).unlink)
+
+        with fitz.open() as pdf:
+            for index, page_content in enumerate(pages):
+                page = pdf.new_page()
+                if page_content is None:
+                    scan = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False)
+                    scan.clear_with(index * 20)
+                    page.insert_image(page.rect, pixmap=scan)
+                else:
+                    heading, text = page_content
+                    page.insert_text((72, 72), f"{heading or ''}|{text}")
+                if index + 1 in table_pages:
+                    draw_table(page, TABLE)
+            pdf.save(handle.name)
+
+        return Path(handle.name)
+
+    def _convert_range(self, part_path: str, do_ocr: bool, do_table_structure: bool = False):
+        # Stand-in for Docling: rebuild text pages from the PDF text layer,
+        # "OCR" returns the scanned appendix page, table structure the TABLE
+        with fitz.open(part_path) as part:
+            pages = [
+                SCANNED if do_ocr else tuple(value or None for value in page.get_text().splitlines()[0].split("|"))
+                for page in part
+            ]
+        self.converted_parts.append((len(pages), do_ocr))
+        if do_table_structure:
+            self.table_parts.append(len(pages))
+
+        document = docling_document(pages, TABLE if do_table_structure else None)
+        return document.export_to_dict(), {"converter_reuses": 1.0, "converter_saved_seconds": 2.0}
+
+    def _parse(self, path: Path, pages_per_range: int | None = None):
+        with (
+            ThreadPoolExecutor(max_workers=2) as executor,
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 2),
+            patch.object(parse_pool, "get_parse_executor", return_value=executor),
+            patch.object(parse_pool, "convert_pdf_range", side_effect=self._convert_range),
+        ):
+            return asyncio.run(
+                parse_pool.parse_pdf_with_docling(
+                    str(path), max_tokens=800, overlap_tokens=0, pages_per_range=pages_per_range
+                )
+            )
+
+    def test_page_ranges_cover_every_page_once(self) -> None:
+        self.assertEqual(pdf_parser.plan_page_ranges(5, 2), [(1, 2), (3, 4), (5, 5)])
+        self.assertEqual(pdf_parser.plan_page_ranges(4, 10), [(1, 4)])
+        with self.assertRaises(ValueError):
+            pdf_parser.plan_page_ranges(4, 0)
+
+    def test_scanned_pages_get_single_page_ocr_ranges(self) -> None:
+        pages = [
+            pdf_parser.PdfPageInfo(page_no=number, needs_ocr=number in (3, 5, 6), content_hash=str(number))
+            for number in range(1, 7)
+        ]
+
+        self.assertEqual(
+            pdf_parser.plan_conversion_ranges(pages, 2),
+            [
+                pdf_parser.PageRange(1, 2),
+                pdf_parser.PageRange(3, 3, ocr=True),
+                pdf_parser.PageRange(4, 4),
+                pdf_parser.PageRange(5, 5, ocr=True),
+                pdf_parser.PageRange(6, 6, ocr=True),
+            ],
+        )
+        self.assertTrue(all(page_range.ocr for page_range in pdf_parser.plan_conversion_ranges(pages, 2, True)))
+
+    def test_table_pages_get_their_own_table_structure_ranges(self) -> None:
+        pages = [
+            pdf_parser.PdfPageInfo(page_no=number, needs_ocr=number == 4, content_hash=str(number), has_tables=number == 2)
+            for number in range(1, 5)
+        ]
+
+        self.assertEqual(
+            pdf_parser.plan_conversion_ranges(pages, 10),
+            [
+                pdf_parser.PageRange(1, 1),
+                pdf_parser.PageRange(2, 2, tables=True),
+                pdf_parser.PageRange(3, 3),
+                pdf_parser.PageRange(4, 4, ocr=True),
+            ],
+        )
+
+    def test_tables_are_detected_on_text_pages_only(self) -> None:
+        path = self._pdf([PAGES[0], PAGES[1], None], table_pages=(2,))
+
+        pages = pdf_parser.analyze_pdf_pages(str(path))
+
+        self.assertEqual([page.has_tables for page in pages], [False, True, False])
+
+    def test_pages_are_classified_and_hashed_by_content(self) -> None:
+        path = self._pdf([PAGES[0], None, PAGES[0], None])
+
+        pages = pdf_parser.analyze_pdf_pages(str(path))
+
+        self.assertEqual([page.needs_ocr for page in pages], [False, True, False, True])
+        self.assertEqual(pages[0].content_hash, pages[2].content_hash)
+        self.assertNotEqual(pages[1].content_hash, pages[3].content_hash)
+
+    def test_rotated_or_resized_page_gets_its_own_hash(self) -> None:
+        path = self._pdf([PAGES[0], PAGES[0], PAGES[0], PAGES[0]])
+        with fitz.open(str(path)) as pdf:
+            pdf[1].set_rotation(90)
+            pdf[2].set_mediabox(fitz.Rect(0, 0, 800, 1000))
+            pdf.saveIncr()
+
+        hashes = [page.content_hash for page in pdf_parser.analyze_pdf_pages(str(path))]
+
+        self.assertEqual(hashes[0], hashes[3])
+        self.assertEqual(len(set(hashes)), 3)
+
+    def test_ranges_are_converted_one_at_a_time_without_a_pool(self) -> None:
+        path = self._pdf([PAGES[0], None, None, None])
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def convert(*args):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            try:
+                return self._convert_range(*args)
+            finally:
+                with lock:
+                    running[0] -= 1
+
+        with (
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 0),
+            patch.object(parse_pool, "convert_pdf_range", side_effect=convert),
+        ):
+            asyncio.run(parse_pool.parse_pdf_with_docling(str(path), max_tokens=800, overlap_tokens=0))
+
+        self.assertEqual(len(self.converted_parts), 4)
+        self.assertEqual(peak[0], 1)
+
+    def test_split_pdf_writes_ranges_in_page_order(self) -> None:
+        path = self._pdf(PAGES)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parts = pdf_parser.split_pdf(str(path), [(1, 2), (3, 5)], tmp_dir)
+
+            with fitz.open(parts[0]) as first, fitz.open(parts[1]) as second:
+                self.assertEqual(len(first), 2)
+                self.assertEqual(len(second), 3)
+                self.assertIn("Revenue grew", second[0].get_text())
+
+    def test_merged_ranges_chunk_like_the_whole_document(self) -> None:
+        whole = parse_pool.chunk_docling_document(docling_document(PAGES), False, 800, 0)
+        merged = parse_pool.merge_and_chunk_pdf_ranges(
+            [
+                docling_document(PAGES[:2]).export_to_dict(),
+                docling_document(PAGES[2:4]).export_to_dict(),
+                docling_document(PAGES[4:]).export_to_dict(),
+            ],
+            used_ocr=False,
+            max_tokens=800,
+            overlap_tokens=0,
+        )
+
+        self.assertEqual(merged.chunks, whole.chunks)
+        self.assertEqual(merged.full_text, whole.full_text)
+        self.assertEqual(merged.page_count, 5)
+
+    def test_large_pdf_is_converted_in_parallel_ranges(self) -> None:
+        parsed = self._parse(self._pdf(PAGES), pages_per_range=2)
+
+        self.assertEqual(sorted(self.converted_parts), [(1, False), (2, False), (2, False)])
+        whole = parse_pool.chunk_docling_document(docling_document(PAGES), False, 800, 0)
+        self.assertTrue(parsed.is_pdf)
+        self.assertFalse(parsed.used_ocr)
+        self.assertEqual(parsed.page_count, 5)
+        self.assertEqual(parsed.chunks, whole.chunks)
+        self.assertEqual(parsed.stats, {"converter_reuses": 3.0, "converter_saved_seconds": 6.0})
+
+    def test_only_scanned_pages_of_mixed_pdf_are_ocred(self) -> None:
+        parsed = self._parse(self._pdf([*PAGES[:3], None, None]))
+
+        self.assertEqual(sorted(self.converted_parts), [(1, True), (1, True), (3, False)])
+        self.assertTrue(parsed.used_ocr)
+        self.assertEqual(parsed.page_count, 5)
+        appendix = [chunk for chunk in parsed.chunks if chunk.section_title == "Appendix"]
+        self.assertEqual([(chunk.page_start, chunk.page_end) for chunk in appendix], [(4, 5)])
+
+    def test_only_table_pages_get_table_structure_as_markdown(self) -> None:
+        parsed = self._parse(self._pdf(PAGES, table_pages=(3,)))
+
+        self.assertEqual(self.table_parts, [1])
+        self.assertEqual(sorted(self.converted_parts), [(1, False), (2, False), (2, False)])
+        results = [chunk for chunk in parsed.chunks if chunk.section_title == "Results"]
+        self.assertIn("| North    |       120 |", results[0].text)
+        self.assertEqual((results[0].page_start, results[0].page_end), (3, 4))
+        self.assertIn("| Region   |   Revenue |", parsed.full_text)
+
+    def test_mixed_pdf_converts_only_table_and_scanned_pages_with_docling(self) -> None:
+        path = self._pdf([*PAGES[:4], None], table_pages=(3,))
+        plan = parse_pool.plan_pdf_pages(str(path), "mixed")
+
+        with (
+            ThreadPoolExecutor(max_workers=2) as executor,
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 2),
+            patch.object(parse_pool, "get_parse_executor", return_value=executor),
+            patch.object(parse_pool, "convert_pdf_range", side_effect=self._convert_range),
+        ):
+            parsed = asyncio.run(parse_pool.parse_pdf_by_pages(str(path), plan, max_tokens=800, overlap_tokens=0))
+
+        self.assertEqual(sorted(self.converted_parts), [(1, False), (1, True)])
+        self.assertEqual(self.table_parts, [1])
+        self.assertTrue(parsed.used_ocr)
+        self.assertEqual(parsed.page_count, 5)
+        # Text layer runs and converted pages follow each other in page order
+        self.assertEqual(
+            [(chunk.chunk_index, chunk.page_start, chunk.page_end) for chunk in parsed.chunks],
+            [(0, 1, 2), (1, 3, 3), (2, 4, 4), (3, 5, 5)],
+        )
+        self.assertIn("Continued introduction", parsed.chunks[0].text)
+        self.assertIn("| North    |       120 |", parsed.chunks[1].text)
+        self.assertEqual(parsed.chunks[3].section_title, "Appendix")
+
+    def test_parse_in_pool_analyzes_pdf_pages_once_in_the_pool(self) -> None:
+        path = self._pdf([*PAGES[:2], None])
+
+        with (
+            ThreadPoolExecutor(max_workers=2) as executor,
+            patch.object(executor, "submit", wraps=executor.submit) as submit,
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 2),
+            patch.object(parse_pool, "get_parse_executor", return_value=executor),
+            patch.object(parse_pool, "convert_pdf_range", side_effect=self._convert_range),
+            patch.object(pdf_parser, "analyze_pdf_pages", wraps=pdf_parser.analyze_pdf_pages) as analyze,
+            patch("backend.services.ingestion.pdf_extractors.PDF_EXTRACTOR", "auto"),
+        ):
+            parsed = asyncio.run(parse_pool.parse_in_pool(str(path), "application/pdf", 800, 0))
+
+        analyze.assert_called_once()
+        # Page analysis, extractor selection and splitting never run on the event loop's process
+        submitted = [call.args[0] for call in submit.call_args_list]
+        self.assertEqual(submitted[:2], [parse_pool.plan_pdf_pages, pdf_parser.split_pdf])
+        self.assertEqual(self.converted_parts, [(1, True)])
+        self.assertEqual([chunk.page_start for chunk in parsed.chunks], [1, 3])
+
+    def test_reprocessing_reuses_cached_ocr_pages(self) -> None:
+        path = self._pdf([PAGES[0], None, None])
+        first = self._parse(path)
+        self.converted_parts.clear()
+
+        second = self._parse(path)
+
+        self.assertEqual(self.converted_parts, [(1, False)])
+        self.assertEqual(second.chunks, first.chunks)
+
+    def test_small_text_pdf_is_converted_as_one_file(self) -> None:
+        path = self._pdf(PAGES[:2])
+
+        with (
+            ThreadPoolExecutor(max_workers=1) as executor,
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 2),
+            patch.object(parse_pool, "get_parse_executor", return_value=executor),
+            patch.object(pdf_parser, "split_pdf") as split,
+            patch.object(
+                parse_pool,
+                "parse_and_chunk_document",
+                return_value=parse_pool.ParsedDocument(full_text="x", is_pdf=True),
+            ) as parse,
+        ):
+            parsed = asyncio.run(parse_pool.parse_pdf_with_docling(str(path)))
+
+        split.assert_not_called()
+        self.assertEqual(parse.call_args.args[-1], "docling")
+        self.assertEqual(parsed.full_text, "x")
+
+
+class ConverterCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        pdf_parser.clear_converter_cache()
+        self.addCleanup(pdf_parser.clear_converter_cache)
+
+    def test_converter_is_built_once_per_pipeline_options(self) -> None:
+        first_stats, second_stats = {}, {}
+
+        with patch.object(pdf_parser, "build_converter", side_effect=lambda *args: MagicMock()) as build:
+            first = pdf_parser.get_converter(False, stats=first_stats)
+            second = pdf_parser.get_converter(False, stats=second_stats)
+            ocr = pdf_parser.get_converter(True)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, ocr)
+        self.assertEqual(build.call_count, 2)
+        first.initialize_pipeline.assert_called_once()
+        self.assertEqual(first_stats["converter_inits"], 1)
+        self.assertEqual(second_stats["converter_reuses"], 1)
+        self.assertEqual(second_stats["converter_saved_seconds"], first_stats["converter_init_seconds"])
+
+    def test_convert_pdf_reports_reused_converter(self) -> None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        path = Path(tmp_dir.name) / "report.pdf"
+        with fitz.open() as pdf:
+            pdf.new_page().insert_text((72, 72), "Revenue grew in every region this year.")
+            pdf.save(str(path))
+
+        stats = {}
+        with patch.object(pdf_parser, "build_converter", side_effect=lambda *args: MagicMock()) as build:
+            pdf_parser.warm_up_converters([(False, False)])
+            _, used_ocr = pdf_parser.convert_pdf(str(path), stats=stats)
+
+        build.assert_called_once_with(False, False)
+        self.assertFalse(used_ocr)
+        self.assertEqual(stats["converter_reuses"], 1)
+        self.assertIn("convert_seconds", stats)
+
+    def test_parse_in_pool_records_converter_metrics(self) -> None:
+        parsed = parse_pool.ParsedDocument(
+            full_text="x", is_pdf=True, stats={"converter_reuses": 1.0, "converter_saved_seconds": 2.5}
+        )
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+        with (
+            patch.object(parse_pool, "plan_pdf_pages", return_value=parse_pool.PdfPagePlan("fast")),
+            patch.object(parse_pool, "PARSE_POOL_SIZE", 0),
+            patch.object(parse_pool, "parse_and_chunk_document", return_value=parsed),
+        ):
+            asyncio.run(parse_pool.parse_in_pool("report.pdf", "application/pdf"))
+
+        self.assertEqual(metrics.get("parse.documents"), 1)
+        self.assertEqual(metrics.get("parse.converter_saved_seconds"), 2.5)
+
+    def test_unknown_warmup_option_fails_fast(self) -> None:
+        with patch.dict("os.environ", {"PDF_CONVERTER_WARMUP": "text,gpu"}):
+            with self.assertRaisesRegex(RuntimeError, "PDF_CONVERTER_WARMUP"):
+                parse_pool._load_converter_warmup()
+
+
+class StoreParsedDocumentTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id)
+
+    def test_pdf_result_creates_parse_row_and_linked_chunks(self) -> None:
+        parsed = parse_pool.ParsedDocument(
+            full_text="Page text",
+            chunks=[
+                ChunkRecord(chunk_index=0, text="first", token_count=5, page_start=1, page_end=1),
+                ChunkRecord(chunk_index=1, text="second", token_count=6, page_start=2, page_end=2),
+            ],
+            is_pdf=True,
+            page_count=2,
+        )
+
+        db = SessionLocal()
+        try:
+            parse_id, _ = parse_pool.store_parsed_document(db, self.document.id, parsed)
+            db.commit()
+
+            doc_parse = db.query(DocumentParse).filter(DocumentParse.id == parse_id).one()
+            self.assertEqual(doc_parse.page_count, 2)
+            chunks = (
+                db.query(DocumentChunk)
+                .filter(DocumentChunk.document_id == self.document.id)
+                .order_by(DocumentChunk.chunk_index)
+                .all()
+            )
+            self.assertEqual([chunk.text for chunk in chunks], ["first", "second"])
+            self.assertTrue(all(chunk.parse_id == parse_id for chunk in chunks))
+            self.assertEqual(chunks[1].page_start, 2)
+        finally:
+            db.close()
+
+    def test_text_result_stores_chunks_without_parse_row(self) -> None:
+        parsed = parse_pool.ParsedDocument(
+            full_text="text",
+            chunks=[ChunkRecord(chunk_index=0, text="text", token_count=4)],
+        )
+
+        db = SessionLocal()
+        try:
+            parse_id, _ = parse_pool.store_parsed_document(db, self.document.id, parsed)
+            db.commit()
+
+            self.assertIsNone(parse_id)
+            self.assertEqual(db.query(DocumentParse).count(), 0)
+            self.assertEqual(db.query(DocumentChunk).count(), 1)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import fitz
+from docling_core.types.doc import BoundingBox, DocItemLabel, DoclingDocument, ProvenanceItem, Size
+
+from backend.services.ingestion import chunking_service, parse_pool, pdf_extractors
+from backend.parsers import pdf_parser
+from backend.parsers.pdf_text_parser import PdfTextBlock, extract_pdf_text_blocks
+from tests.support import draw_table
+
+BODY = "The supplier delivers the goods within thirty days of the order date."
+
+
+class PdfExtractorTests(unittest.TestCase):
+    def _save(self, pdf) -> str:
+        handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        handle.close()
+        self.addCleanup(Path(handle.name).unlink)
+        pdf.save(handle.name)
+        pdf.close()
+        return handle.name
+
+    def _contract_pdf(self) -> str:
+        pdf = fitz.open()
+
+        page = pdf.new_page()
+        page.insert_text((72, 72), "Supply Agreement", fontsize=18)
+        page.insert_text((72, 110), "Definitions", fontsize=10, fontname="hebo")
+        page.insert_text((72, 140), BODY, fontsize=10)
+
+        page = pdf.new_page()
+        page.insert_text((72, 72), BODY, fontsize=10)
+        page.insert_text((72, 110), "Payment", fontsize=10, fontname="hebo")
+        page.insert_text((72, 140), BODY, fontsize=10)
+
+        return self._save(pdf)
+
+    def test_fast_path_recovers_heading_hierarchy_from_fonts(self) -> None:
+        blocks, page_count = extract_pdf_text_blocks(self._contract_pdf())
+
+        self.assertEqual(page_count, 2)
+        self.assertEqual(
+            [(block.page_no, block.heading_path) for block in blocks],
+            [
+                (1, ("Supply Agreement", "Definitions")),
+                (2, ("Supply Agreement", "Definitions")),
+                (2, ("Supply Agreement", "Payment")),
+            ],
+        )
+
+    def test_fast_path_emits_parse_fields_and_chunk_metadata(self) -> None:
+        parsed = pdf_extractors.extract_with_pymupdf(self._contract_pdf(), max_tokens=800, overlap_tokens=0)
+
+        self.assertTrue(parsed.is_pdf)
+        self.assertFalse(parsed.used_ocr)
+        self.assertEqual(parsed.page_count, 2)
+        self.assertIn("# Supply Agreement", parsed.full_text)
+        self.assertIn("## Payment", parsed.full_text)
+        self.assertEqual(
+            [(chunk.section_title, chunk.page_start, chunk.page_end) for chunk in parsed.chunks],
+            [
+                ("Supply Agreement > Definitions", 1, 2),
+                ("Supply Agreement > Payment", 2, 2),
+            ],
+        )
+        self.assertEqual([chunk.chunk_index for chunk in parsed.chunks], [0, 1])
+
+    def test_fast_path_matches_docling_chunk_shape(self) -> None:
+        pdf = fitz.open()
+        page = pdf.new_page()
+        page.insert_text((72, 72), "Results", fontsize=18)
+        page.insert_text((72, 110), BODY, fontsize=10)
+        fast = pdf_extractors.extract_with_pymupdf(self._save(pdf), max_tokens=800, overlap_tokens=0)
+
+        docling_doc = DoclingDocument(name="contract")
+        docling_doc.add_page(page_no=1, size=Size(width=595, height=842))
+        prov = ProvenanceItem(page_no=1, bbox=BoundingBox(l=0, t=0, r=10, b=10), charspan=(0, 1))
+        docling_doc.add_heading("Results", prov=prov)
+        docling_doc.add_text(DocItemLabel.TEXT, BODY, prov=prov)
+        docling = parse_pool.chunk_docling_document(docling_doc, False, 800, 0)
+
+        self.assertEqual(fast.chunks, docling.chunks)
+
+    def test_fast_path_windows_reuse_the_block_tokens(self) -> None:
+        blocks = [
+            PdfTextBlock(text=f"Clause {number}. {BODY}", page_no=number, heading_path=("Terms", "Delivery"))
+            for number in range(1, 6)
+        ] + [PdfTextBlock(text=BODY, page_no=6)]
+        encode_texts = MagicMock(wraps=chunking_service._encode_texts)
+
+        with patch.object(chunking_service, "_encode_texts", encode_texts):
+            chunks = chunking_service.build_pdf_text_chunks(blocks, max_tokens=200, overlap_tokens=0)
+
+        # Each heading group encodes its blocks once; the joined windows are not encoded again
+        self.assertEqual(
+            [call.args[0] for call in encode_texts.call_args_list],
+            [[block.text for block in blocks[:5]], [BODY]],
+        )
+        self.assertEqual([chunk.page_start for chunk in chunks], [1, 3, 5, 6])
+        self.assertEqual(
+            [chunk.token_count for chunk in chunks],
+            [len(chunking_service.ENCODING.encode(chunk.text)) for chunk in chunks],
+        )
+        self.assertTrue(all(chunk.token_count <= 200 for chunk in chunks))
+
+    def test_text_heavy_pdf_uses_fast_path(self) -> None:
+        self.assertEqual(pdf_extractors.choose_pdf_extractor(self._contract_pdf()), "fast")
+
+    def test_pdf_without_text_layer_uses_docling(self) -> None:
+        pdf = fitz.open()
+        pdf.new_page()
+
+        # Docling OCRs the pages without text layer
+        self.assertEqual(pdf_extractors.choose_pdf_extractor(self._save(pdf)), "docling")
+
+    def test_scanned_appendix_after_text_pages_uses_mixed_extractor(self) -> None:
+        pdf = fitz.open(self._contract_pdf())
+        for _ in range(3):
+            page = pdf.new_page()
+            page.insert_text((72, 72), BODY, fontsize=10)
+        pdf.new_page()
+
+        # Only the appendix page is OCRed by Docling
+        self.assertEqual(pdf_extractors.choose_pdf_extractor(self._save(pdf)), "mixed")
+
+    def test_pdf_with_tables_uses_docling(self) -> None:
+        pdf = fitz.open()
+        page = pdf.new_page()
+        page.insert_text((72, 72), BODY, fontsize=10)
+        for row in range(30):
+            y = 100 + row * 15
+            page.draw_line((72, y), (520, y))
+            page.draw_line((72 + row * 10, 100), (72 + row * 10, 545))
+
+        self.assertEqual(pdf_extractors.choose_pdf_extractor(self._save(pdf)), "docling")
+
+    def test_table_page_uses_mixed_extractor(self) -> None:
+        pdf = fitz.open()
+        page = pdf.new_page()
+        page.insert_text((72, 72), BODY, fontsize=10)
+        draw_table(page, [["Region", "Revenue"], ["North", "120"]])
+        pdf.insert_pdf(fitz.open(self._contract_pdf()))
+
+        # The table's drawings do not send the text pages to Docling as well
+        self.assertEqual(pdf_extractors.choose_pdf_extractor(self._save(pdf)), "mixed")
+
+    def test_given_page_analysis_is_not_repeated(self) -> None:
+        path = self._contract_pdf()
+        pages = pdf_parser.analyze_pdf_pages(path)
+        table_page = replace(pages[1], has_tables=True)
+
+        with patch.object(pdf_parser, "analyze_pdf_pages") as analyze:
+            self.assertEqual(pdf_extractors.choose_pdf_extractor(path, pages), "fast")
+            self.assertEqual(pdf_extractors.choose_pdf_extractor(path, [pages[0], table_page]), "mixed")
+
+        analyze.assert_not_called()
+
+    def test_mixed_extractor_converts_only_table_pages(self) -> None:
+        pdf = fitz.open(self._contract_pdf())
+        page = pdf.new_page()
+        page.insert_text((72, 72), "Revenue by region", fontsize=10)
+        draw_table(page, [["Region", "Revenue"], ["North", "120"]])
+        path = self._save(pdf)
+
+        table_doc = DoclingDocument(name="page")
+        table_doc.add_page(page_no=1, size=Size(width=595, height=842))
+        prov = ProvenanceItem(page_no=1, bbox=BoundingBox(l=0, t=0, r=10, b=10), charspan=(0, 1))
+        table_doc.add_text(DocItemLabel.TEXT, "Revenue by region", prov=prov)
+
+        with patch.object(parse_pool, "convert_pdf_range", return_value=(table_doc.export_to_dict(), {})) as convert:
+            parsed = pdf_extractors.extract_with_pymupdf_and_docling(path, max_tokens=800, overlap_tokens=0)
+
+        self.assertEqual(convert.call_count, 1)
+        self.assertEqual(convert.call_args.args[1:], (False, True))
+        self.assertEqual(
+            [(chunk.chunk_index, chunk.page_start, chunk.page_end) for chunk in parsed.chunks],
+            [(0, 1, 2), (1, 2, 2), (2, 3, 3)],
+        )
+        self.assertIn("# Supply Agreement", parsed.full_text)
+        self.assertTrue(parsed.full_text.endswith("Revenue by region"))
+
+    def test_multi_column_pdf_uses_docling(self) -> None:
+        pdf = fitz.open()
+        page = pdf.new_page()
+        for row in range(5):
+            y = 100 + row * 60
+            page.insert_textbox(fitz.Rect(50, y, 280, y + 40), BODY, fontsize=9)
+            page.insert_textbox(fitz.Rect(315, y, 545, y + 40), BODY, fontsize=9)
+
+        self.assertEqual(pdf_extractors.choose_pdf_extractor(self._save(pdf)), "docling")
+
+    def test_configured_extractor_overrides_heuristics(self) -> None:
+        with (
+            patch.object(pdf_extractors, "PDF_EXTRACTOR", "docling"),
+            patch.object(pdf_extractors, "choose_pdf_extractor") as choose,
+        ):
+            self.assertEqual(pdf_extractors.select_pdf_extractor("contract.pdf"), "docling")
+
+        choose.assert_not_called()
+
+    def test_unknown_configured_extractor_fails_fast(self) -> None:
+        with patch.dict("os.environ", {"PDF_EXTRACTOR": "magic"}):
+            with self.assertRaisesRegex(RuntimeError, "PDF_EXTRACTOR"):
+                pdf_extractors._load_configured_extractor()
+
+    def test_registered_extractor_is_used_for_pdfs(self) -> None:
+        custom = MagicMock(return_value=parse_pool.ParsedDocument(full_text="custom", is_pdf=True))
+
+        with patch.dict(pdf_extractors.PDF_EXTRACTORS, {"custom": custom}):
+            parsed = parse_pool.parse_and_chunk_document(
+                "contract.pdf", "application/pdf", 800, 0, pdf_extractor="custom"
+            )
+
+        custom.assert_called_once_with("contract.pdf", 800, 0)
+        self.assertEqual(parsed.full_text, "custom")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -74,7 +74,7 @@ class ChatPromptInjectionTests(unittest.TestCase):
         openai_call = AsyncMock(return_value=chat_response("I used only supplied evidence."))
 
         with (
-            patch.object(chat_service, "search_chunks", return_value=chunks),
+            patch.object(chat_service, "search_chunks_async", return_value=chunks),
             patch.object(chat_service, "_openai_call", openai_call),
             patch.object(chat_service, "langfuse", None),
         ):
@@ -110,7 +110,7 @@ class ChatPromptInjectionTests(unittest.TestCase):
         ]
 
         with (
-            patch.object(chat_service, "search_chunks", return_value=chunks) as search,
+            patch.object(chat_service, "search_chunks_async", return_value=chunks) as search,
             patch.object(
                 chat_service,
                 "_openai_call",
@@ -154,7 +154,7 @@ class ChatPromptInjectionTests(unittest.TestCase):
         ]
 
         with (
-            patch.object(chat_service, "search_chunks", return_value=chunks) as search,
+            patch.object(chat_service, "search_chunks_async", return_value=chunks) as search,
             patch.object(chat_service, "_openai_call", openai_call),
             patch.object(chat_service, "langfuse", None),
         ):
@@ -242,7 +242,7 @@ class ReportPromptInjectionTests(unittest.TestCase):
             }
 
         with (
-            patch.object(report_service, "query_similar_chunks", return_value=[hit]),
+            patch.object(report_service, "query_similar_chunks_async", return_value=[hit]),
             patch.object(report_service, "generate_json", side_effect=generate_json),
         ):
             section, _ = asyncio.run(
@@ -277,7 +277,7 @@ class ReportPromptInjectionTests(unittest.TestCase):
         with (
             patch.object(
                 report_service,
-                "query_similar_chunks",
+                "query_similar_chunks_async",
                 return_value=[hit],
             ) as query,
             patch.object(
@@ -103,7 +103,7 @@ class ReportGenerationTests(unittest.TestCase):
         ]
 
         with (
-            patch.object(report_service, "query_similar_chunks", return_value=hits),
+            patch.object(report_service, "query_similar_chunks_async", return_value=hits),
             patch.object(
                 report_service,
                 "generate_json",
@@ -130,7 +130,7 @@ class ReportGenerationTests(unittest.TestCase):
         hits = [{"id": "real", "text": "Evidence", "metadata": {}, "score": 0.9}]
         forged = [{"chunk_id": "fabricated", "page_start": None, "page_end": None, "section_title": None}]
         with (
-            patch.object(report_service, "query_similar_chunks", return_value=hits),
+            patch.object(report_service, "query_similar_chunks_async", return_value=hits),
             patch.object(
                 report_service,
                 "generate_json",
@@ -190,7 +190,7 @@ class ReportGenerationTests(unittest.TestCase):
         variants = {**report_service.SECTION_QUERY_VARIANTS, "Executive Summary": ["low", "high"]}
         with (
             patch.object(report_service, "SECTION_QUERY_VARIANTS", variants),
-            patch.object(report_service, "query_similar_chunks", side_effect=query),
+            patch.object(report_service, "query_similar_chunks_async", side_effect=query),
             patch.object(report_service, "generate_json", side_effect=generate_json),
         ):
             asyncio.run(
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
 import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
 import unittest
 from types import SimpleNamespace
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from backend.database.database import SessionLocal
+from sqlalchemy import event, text
+
+from backend.database import fulltext
+from backend.database.database import SessionLocal, engine
 from backend.models.document_chunk import DocumentChunk
-from backend.services.vector import retrieval_service
+from backend.services.vector import retrieval_service, vector_store
 from tests.support import create_document, create_user_workspace, reset_database
 
 
 class HybridRetrievalTests(unittest.TestCase):
     def setUp(self) -> None:
+        # Collection without sparse vectors: dense search plus SQL keyword search
+        sparse = patch.object(retrieval_service, "has_sparse_vectors", return_value=False)
+        sparse.start()
+        self.addCleanup(sparse.stop)
         reset_database()
         self.user, self.workspace = create_user_workspace()
         self.text_document = create_document(
@@ -80,15 +88,50 @@ class HybridRetrievalTests(unittest.TestCase):
 
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["document_id"], self.text_document.id)
-        self.assertEqual(results[0]["source"], "vector")
+        # Found by the vector and the keyword search
+        self.assertEqual(results[0]["source"], "hybrid")
         self.assertEqual(results[0]["page"], 2)
         self.assertNotIn("CSV revenue row", [item["text"] for item in results])
 
         kwargs = fake_client.query_points.call_args.kwargs
-        self.assertEqual(kwargs["limit"], 24)
+        self.assertEqual(kwargs["limit"], 8 * retrieval_service.CANDIDATE_FACTOR)
         workspace_condition = kwargs["query_filter"].must[0]
         self.assertEqual(workspace_condition.key, "workspace_id")
         self.assertEqual(workspace_condition.match.value, self.workspace.id)
+        csv_condition = kwargs["query_filter"].must_not[0]
+        self.assertEqual((csv_condition.key, csv_condition.match.value), ("file_kind", "csv"))
+        self.assertEqual(results[0]["filename"], "report.txt")
+
+    def test_document_lookups_do_not_grow_with_the_number_of_hits(self) -> None:
+        def statements_for(hits: int) -> int:
+            points = [
+                SimpleNamespace(
+                    score=1 - index / 100,
+                    payload={"document_id": self.text_document.id, "_text": f"Revenue fact {index}"},
+                )
+                for index in range(hits)
+            ]
+            fake_client = MagicMock()
+            fake_client.query_points.return_value = SimpleNamespace(points=points)
+            statements = []
+
+            def count(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(engine, "before_cursor_execute", count)
+            try:
+                with (
+                    patch.object(retrieval_service, "client", fake_client),
+                    patch.object(retrieval_service, "embed_texts", return_value=[[0.1]]),
+                ):
+                    results = retrieval_service.search_chunks("Revenue", self.workspace.id, limit=hits)
+            finally:
+                event.remove(engine, "before_cursor_execute", count)
+
+            self.assertEqual({item["filename"] for item in results}, {"report.txt"})
+            return len(statements)
+
+        self.assertEqual(statements_for(2), statements_for(20))
 
     def test_document_filter_is_added_to_vector_and_keyword_search(self) -> None:
         fake_client = MagicMock()
@@ -111,6 +154,24 @@ class HybridRetrievalTests(unittest.TestCase):
         self.assertEqual([condition.key for condition in conditions], ["workspace_id", "document_id"])
         self.assertEqual(conditions[1].match.value, self.text_document.id)
 
+    def test_async_search_awaits_the_query_embedding(self) -> None:
+        fake_client = MagicMock()
+        fake_client.query_points.return_value = SimpleNamespace(points=[])
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "embed_texts") as blocking_embed,
+            patch.object(retrieval_service, "embed_texts_async", AsyncMock(return_value=[[0.1]])) as embed,
+        ):
+            results = asyncio.run(
+                retrieval_service.search_chunks_async("Revenue", workspace_id=self.workspace.id, limit=3)
+            )
+
+        embed.assert_awaited_once_with(["Revenue"])
+        blocking_embed.assert_not_called()
+        self.assertEqual([result["text"] for result in results], ["Revenue increased strongly in 2025."])
+        self.assertEqual(fake_client.query_points.call_args.kwargs["query"], [0.1])
+
     def test_short_query_words_do_not_trigger_keyword_search(self) -> None:
         fake_client = MagicMock()
         fake_client.query_points.return_value = SimpleNamespace(points=[])
@@ -121,7 +182,6 @@ class HybridRetrievalTests(unittest.TestCase):
             results = retrieval_service.search_chunks("a to of", self.workspace.id)
         self.assertEqual(results, [])
 
-    @unittest.expectedFailure
     def test_qdrant_document_payload_is_rechecked_against_workspace_in_sql(self) -> None:
         other_user, other_workspace = create_user_workspace(email="other@example.test")
         other_document = create_document(other_workspace.id, other_user.id, filename="other.txt")
@@ -143,5 +203,193 @@ class HybridRetrievalTests(unittest.TestCase):
         self.assertEqual(results, [])
 
 
+class FullTextIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id, filename="annual.txt")
+        self.chunk_ids = self._add_chunks(
+            [
+                "Revenue, revenue and more revenue: revenues grew in every region.",
+                "The board approved the budget. Revenue is discussed later.",
+                "Operating costs fell after the restructuring.",
+            ]
+        )
+
+    def _add_chunks(self, texts):
+        db = SessionLocal()
+        try:
+            chunks = [
+                DocumentChunk(document_id=self.document.id, chunk_index=index, token_count=5, text=text)
+                for index, text in enumerate(texts)
+            ]
+            db.add_all(chunks)
+            db.commit()
+            return [chunk.id for chunk in chunks]
+        finally:
+            db.close()
+
+    def _rank(self, *keywords):
+        db = SessionLocal()
+        try:
+            return fulltext.rank_chunks_by_keywords(db, [self.document.id], keywords, limit=10)
+        finally:
+            db.close()
+
+    def test_hits_are_ranked_by_bm25_and_match_word_prefixes(self) -> None:
+        ranked = self._rank("revenue")
+
+        self.assertEqual([chunk_id for chunk_id, _ in ranked], self.chunk_ids[:2])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+
+    def test_query_punctuation_and_operators_are_not_fts_syntax(self) -> None:
+        self.assertEqual([chunk_id for chunk_id, _ in self._rank('"costs', "NOT*", "(fell)?")], [self.chunk_ids[2]])
+
+    def test_index_follows_deleted_and_updated_chunks(self) -> None:
+        db = SessionLocal()
+        try:
+            db.query(DocumentChunk).filter(DocumentChunk.id == self.chunk_ids[0]).delete()
+            db.query(DocumentChunk).filter(DocumentChunk.id == self.chunk_ids[2]).update(
+                {DocumentChunk.text: "Revenue recovered after the restructuring."}
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        self.assertEqual({chunk_id for chunk_id, _ in self._rank("revenue")}, {self.chunk_ids[1], self.chunk_ids[2]})
+        self.assertEqual(self._rank("costs"), [])
+
+    def test_missing_index_is_created_and_filled_from_stored_chunks(self) -> None:
+        with engine.begin() as connection:
+            fulltext.drop_chunk_fulltext_index(connection)
+            for suffix in ("ai", "ad", "au"):
+                connection.execute(text(f"DROP TRIGGER {fulltext.SQLITE_FTS_TABLE}_{suffix}"))
+
+        with engine.begin() as connection:
+            fulltext.ensure_chunk_fulltext_index(connection)
+
+        self.assertEqual([chunk_id for chunk_id, _ in self._rank("budget")], [self.chunk_ids[1]])
+
+    def test_keyword_hits_are_fused_with_vector_hits_by_rank(self) -> None:
+        # The dense search ranks a chunk without the keyword first; the chunk
+        # found by both searches wins, whatever the raw scores are
+        points = [
+            SimpleNamespace(score=0.95, payload={"document_id": self.document.id, "_text": "Operating costs fell after the restructuring."}),
+            SimpleNamespace(score=0.40, payload={"document_id": self.document.id, "_text": "The board approved the budget. Revenue is discussed later."}),
+        ]
+        fake_client = MagicMock()
+        fake_client.query_points.return_value = SimpleNamespace(points=points)
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "has_sparse_vectors", return_value=False),
+            patch.object(retrieval_service, "embed_texts", return_value=[[0.1]]),
+        ):
+            results = retrieval_service.search_chunks("revenue", self.workspace.id, limit=3)
+
+        self.assertEqual([item["source"] for item in results], ["hybrid", "vector", "keyword"])
+        self.assertEqual(results[0]["text"], points[1].payload["_text"])
+        self.assertEqual(results[1]["text"], points[0].payload["_text"])
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "has_sparse_vectors", return_value=False),
+            patch.object(retrieval_service, "embed_texts", return_value=[[0.1]]),
+            patch.object(retrieval_service, "LEXICAL_WEIGHT", 0.0),
+        ):
+            results = retrieval_service.search_chunks("revenue", self.workspace.id, limit=2)
+
+        self.assertEqual([item["text"] for item in results], [points[0].payload["_text"], points[1].payload["_text"]])
+
+
+class ReciprocalRankFusionTests(unittest.TestCase):
+    def test_hits_found_by_both_rankings_add_their_reciprocal_ranks(self) -> None:
+        dense = [{"text": "a", "source": "vector", "score": 0.9}, {"text": "b", "source": "vector", "score": 0.8}]
+        lexical = [{"text": "b", "source": "keyword", "score": 12.0}, {"text": "c", "source": "keyword", "score": 3.0}]
+
+        fused = retrieval_service.reciprocal_rank_fusion([dense, lexical], [1.0, 1.0], k=60)
+
+        self.assertEqual([(hit["text"], hit["source"]) for hit in fused], [("b", "hybrid"), ("a", "vector"), ("c", "keyword")])
+        self.assertAlmostEqual(fused[0]["score"], 1 / 62 + 1 / 61)
+        self.assertAlmostEqual(fused[2]["score"], 1 / 62)
+        # The inputs are not modified
+        self.assertEqual(dense[1]["score"], 0.8)
+
+    def test_weights_shift_the_fused_order(self) -> None:
+        dense = [{"text": "a", "source": "vector", "score": 0.9}]
+        lexical = [{"text": "c", "source": "keyword", "score": 3.0}]
+
+        fused = retrieval_service.reciprocal_rank_fusion([dense, lexical], [1.0, 2.0])
+
+        self.assertEqual([hit["text"] for hit in fused], ["c", "a"])
+
+
+class SparseVectorSearchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id, filename="annual.txt")
+        vector_store._COLLECTION_READY = False
+        vector_store._SPARSE_VECTORS = None
+        self.addCleanup(setattr, vector_store, "_COLLECTION_READY", False)
+        self.addCleanup(setattr, vector_store, "_SPARSE_VECTORS", None)
+
+    def test_one_fused_qdrant_query_replaces_the_sql_keyword_search(self) -> None:
+        point = SimpleNamespace(
+            score=0.5,
+            payload={"document_id": [self.document.id], "_text": "Revenue grew.", "page_start": 3},
+        )
+        fake_client = MagicMock()
+        fake_client.query_points.return_value = SimpleNamespace(points=[point])
+
+        with (
+            patch.object(retrieval_service, "client", fake_client),
+            patch.object(retrieval_service, "has_sparse_vectors", return_value=True),
+            patch.object(retrieval_service, "embed_texts", return_value=[[0.1, 0.2]]),
+            patch.object(retrieval_service, "rank_chunks_by_keywords") as rank,
+        ):
+            results = retrieval_service.search_chunks("Revenue growth", self.workspace.id, limit=4)
+
+        rank.assert_not_called()
+        fake_client.query_points.assert_called_once()
+        self.assertEqual([(item["source"], item["page"]) for item in results], [("hybrid", 3)])
+
+        kwargs = fake_client.query_points.call_args.kwargs
+        self.assertEqual(kwargs["query"].rrf.k, retrieval_service.RRF_K)
+        self.assertEqual(kwargs["query"].rrf.weights, [retrieval_service.DENSE_WEIGHT, retrieval_service.LEXICAL_WEIGHT])
+        dense, sparse = kwargs["prefetch"]
+        self.assertEqual(dense.query, [0.1, 0.2])
+        self.assertEqual(sparse.using, vector_store.SPARSE_VECTOR_NAME)
+        self.assertEqual(len(sparse.query.indices), 2)
+        for prefetch in (dense, sparse):
+            self.assertEqual(prefetch.limit, 4 * retrieval_service.CANDIDATE_FACTOR)
+            self.assertEqual(prefetch.filter.must[0].match.value, self.workspace.id)
+            self.assertEqual(prefetch.filter.must_not[0].match.value, "csv")
+
+    def test_sparse_vectors_rank_exact_terms_in_a_local_collection(self) -> None:
+        from qdrant_client import QdrantClient
+
+        local_client = QdrantClient(":memory:")
+        texts = [
+            "Operating costs fell after the restructuring.",
+            "The board approved the dividend for shareholders.",
+            "Headcount stayed flat across every region.",
+        ]
+        chunks = [{"id": index + 1, "text": text} for index, text in enumerate(texts)]
+
+        with (
+            patch.object(vector_store, "client", local_client),
+            patch.object(retrieval_service, "client", local_client),
+            # Identical embeddings: only the sparse vectors tell the chunks apart
+            patch.object(vector_store, "embed_texts_openai", return_value=[[1.0, 0.0]] * 3),
+            patch.object(retrieval_service, "embed_texts", return_value=[[1.0, 0.0]]),
+        ):
+            vector_store.upsert_document_chunks(self.document.id, self.workspace.id, chunks, file_kind="txt")
+            results = retrieval_service.search_chunks("dividend", self.workspace.id, limit=3)
+
+        self.assertEqual(results[0]["text"], texts[1])
+        self.assertEqual({item["source"] for item in results}, {"hybrid"})
+
+
 if __name__ == "__main__":
     unittest.main()
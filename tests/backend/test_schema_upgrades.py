@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+
+from backend.database.schema_upgrades import ensure_added_columns
+
+# Tables as created by the release before the added columns
+OLD_TABLES = [
+    """
+    CREATE TABLE documents (
+        id INTEGER PRIMARY KEY,
+        filename VARCHAR NOT NULL
+    )
+    """,
+    "INSERT INTO documents (id, filename) VALUES (1, 'annual.pdf')",
+    """
+    CREATE TABLE document_chunks (
+        id INTEGER PRIMARY KEY,
+        document_id INTEGER NOT NULL REFERENCES documents(id),
+        text TEXT NOT NULL
+    )
+    """,
+    "INSERT INTO document_chunks (id, document_id, text) VALUES (1, 1, 'Revenue grew.')",
+]
+
+
+class SchemaUpgradeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite://")
+        self.addCleanup(self.engine.dispose)
+        with self.engine.begin() as connection:
+            for statement in OLD_TABLES:
+                connection.execute(text(statement))
+
+    def _columns(self, table):
+        return {column["name"] for column in inspect(self.engine).get_columns(table)}
+
+    def _indexes(self, table):
+        return {index["name"] for index in inspect(self.engine).get_indexes(table)}
+
+    def test_missing_columns_are_added_with_their_index_and_repeat_is_a_no_op(self) -> None:
+        for _ in range(2):
+            with self.engine.begin() as connection:
+                ensure_added_columns(connection)
+
+        self.assertLessEqual({"content_sha256", "content_id", "version"}, self._columns("documents"))
+        self.assertLessEqual({"ix_documents_content_sha256", "ix_documents_content_id"}, self._indexes("documents"))
+
+        with self.engine.connect() as connection:
+            row = connection.execute(text("SELECT content_sha256, content_id, version FROM documents")).one()
+        # Rows stored before the upgrade are the first version of their document
+        self.assertEqual(tuple(row), (None, None, 1))
+
+        self.assertIn("duplicate_of_id", self._columns("document_chunks"))
+        self.assertIn("ix_document_chunks_duplicate_of_id", self._indexes("document_chunks"))
+        with self.engine.connect() as connection:
+            self.assertIsNone(connection.execute(text("SELECT duplicate_of_id FROM document_chunks")).scalar_one())
+
+    def test_tables_that_do_not_exist_are_left_to_create_all(self) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(text("DROP TABLE document_chunks"))
+            connection.execute(text("DROP TABLE documents"))
+            ensure_added_columns(connection)
+
+        self.assertEqual(inspect(self.engine).get_table_names(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
+import tempfile
+import unittest
+from contextlib import ExitStack
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.services.ingestion import parse_pool
+from backend.services.ingestion.chunking_service import ChunkRecord
+from backend.database.database import SessionLocal
+from backend.models.document import Document
+from backend.models.document_checkpoint import DocumentCheckpoint
+from backend.models.document_chunk import DocumentChunk
+from backend.models.ingestion_job import IngestionJob
+from backend.models.report import Report
+from backend.routers import document as document_router
+from tests.support import create_document, create_user_workspace, reset_database
+
+REPORT = {"title": "Test", "sections": [], "conclusion": "Done"}
+
+
+def store_parsed(db, document_id, parsed):
+    # Like a TXT parse: no DocumentParse row, and an unchanged chunk keeps its row
+    stored = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).first()
+    if stored is None:
+        db.add(DocumentChunk(document_id=document_id, chunk_index=0, token_count=3, text=parsed.full_text))
+        db.flush()
+    return None, None
+
+
+class StageCheckpointTests(unittest.TestCase):
+    def setUp(self) -> None:
+        reset_database()
+        self.user, self.workspace = create_user_workspace()
+        self.document = create_document(self.workspace.id, self.user.id, filename="notes.txt", status="uploaded")
+        self._set_content_sha256("a" * 64)
+
+        self.parse_in_pool = AsyncMock(
+            return_value=SimpleNamespace(full_text="Grounded document content", chunks=[object()], is_pdf=False)
+        )
+        self.create_blocks = MagicMock(return_value=1)
+        self.structure_blocks = AsyncMock(return_value=[])
+        self.generate_report = AsyncMock(return_value=REPORT)
+        self.upsert = MagicMock()
+        self.vector_services = (MagicMock(), MagicMock())
+        self.store_parsed = store_parsed
+
+    def _set_content_sha256(self, sha256: str) -> None:
+        db = SessionLocal()
+        try:
+            db.query(Document).filter(Document.id == self.document.id).update({Document.content_sha256: sha256})
+            db.commit()
+        finally:
+            db.close()
+
+    def _process(self, force_rebuild: bool = False) -> None:
+        handle = tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False, encoding="utf-8")
+        handle.write("Grounded document content")
+        handle.close()
+
+        with ExitStack() as stack:
+            stack.enter_context(patch.object(document_router, "download_to_temp_file", return_value=Path(handle.name)))
+            stack.enter_context(
+                patch.object(document_router, "get_parsing_services", return_value=(self.parse_in_pool, self.store_parsed))
+            )
+            stack.enter_context(
+                patch.object(
+                    document_router,
+                    "get_block_services",
+                    return_value=(self.create_blocks, self.structure_blocks),
+                )
+            )
+            stack.enter_context(patch.object(document_router, "get_report_service", return_value=self.generate_report))
+            stack.enter_context(patch.object(document_router, "get_vector_services", return_value=self.vector_services))
+            stack.enter_context(
+                patch.object(document_router, "get_vector_diff_services", return_value=(MagicMock(), MagicMock()))
+            )
+            stack.enter_context(patch.object(document_router, "upsert_chunks_to_vectorstore", self.upsert))
+            asyncio.run(document_router.process_document_logic(self.document.id, force_rebuild=force_rebuild))
+
+    def _status(self) -> str:
+        db = SessionLocal()
+        try:
+            return db.query(Document).filter(Document.id == self.document.id).one().file_status
+        finally:
+            db.close()
+
+    def test_failed_report_is_retried_without_parsing_or_embedding_again(self) -> None:
+        self.generate_report.side_effect = [RuntimeError("LLM unavailable"), REPORT]
+
+        self._process()
+        self.assertEqual(self._status(), "failed")
+
+        self._process()
+
+        self.assertEqual(self._status(), "completed")
+        self.parse_in_pool.assert_awaited_once()
+        self.upsert.assert_called_once()
+        self.create_blocks.assert_called_once()
+        self.structure_blocks.assert_awaited_once()
+        self.assertEqual(self.generate_report.await_count, 2)
+
+        db = SessionLocal()
+        try:
+            stages = {stage for (stage,) in db.query(DocumentCheckpoint.stage)}
+            self.assertEqual(stages, {"parse", "embed", "blocks", "structure", "report"})
+            self.assertEqual(db.query(Report).filter(Report.document_id == self.document.id).count(), 1)
+        finally:
+            db.close()
+
+    def test_concurrent_stages_share_one_status_and_use_their_own_sessions(self) -> None:
+        statuses, status_sessions, checkpoint_sessions = [], set(), {}
+        save_checkpoint = document_router.save_checkpoint
+
+        def set_status(db, document, status):
+            statuses.append(status)
+            status_sessions.add(db)
+
+        def record_checkpoint(db, document_id, stage, fingerprint):
+            checkpoint_sessions[stage] = db
+            save_checkpoint(db, document_id, stage, fingerprint)
+
+        with (
+            patch.object(document_router, "set_status", side_effect=set_status),
+            patch.object(document_router, "save_checkpoint", side_effect=record_checkpoint),
+        ):
+            self._process()
+
+        self.assertEqual(
+            statuses, ["processing", "parsing", "chunking", "indexing", "report_generating", "completed"]
+        )
+        (main_session,) = status_sessions
+        self.assertIs(checkpoint_sessions["report"], main_session)
+        self.assertIs(checkpoint_sessions["blocks"], checkpoint_sessions["structure"])
+        stage_sessions = {checkpoint_sessions["embed"], checkpoint_sessions["structure"], main_session}
+        self.assertEqual(len(stage_sessions), 3)
+
+    def test_unchanged_document_skips_every_stage(self) -> None:
+        self._process()
+        self._process()
+
+        self.assertEqual(self._status(), "completed")
+        self.parse_in_pool.assert_awaited_once()
+        self.generate_report.assert_awaited_once()
+
+    def test_parsed_chunks_are_stored_off_the_event_loop(self) -> None:
+        stored_on_loop = []
+
+        def store(db, document_id, parsed):
+            try:
+                asyncio.get_running_loop()
+                stored_on_loop.append(True)
+            except RuntimeError:
+                stored_on_loop.append(False)
+            return store_parsed(db, document_id, parsed)
+
+        self.store_parsed = store
+        self._process()
+
+        self.assertEqual(stored_on_loop, [False])
+        self.assertEqual(self._status(), "completed")
+
+    def test_parse_is_redone_if_its_chunks_are_gone(self) -> None:
+        self._process()
+        db = SessionLocal()
+        try:
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == self.document.id).delete()
+            db.commit()
+        finally:
+            db.close()
+
+        self._process()
+
+        self.assertEqual(self.parse_in_pool.await_count, 2)
+
+    def test_new_content_runs_every_stage_again(self) -> None:
+        self._process()
+        self._set_content_sha256("b" * 64)
+
+        self._process()
+
+        self.assertEqual(self.parse_in_pool.await_count, 2)
+        # The mocked parse keeps the unchanged chunk, so its fingerprint and the later stages are unchanged
+        self.upsert.assert_called_once()
+        self.generate_report.assert_awaited_once()
+
+    def test_forced_processing_rebuilds_unchanged_chunks_and_blocks(self) -> None:
+        texts = ["Revenue grew by twelve percent.", "Operating costs fell after the restructuring."]
+        self.parse_in_pool.return_value = parse_pool.ParsedDocument(
+            full_text="\n".join(texts),
+            chunks=[ChunkRecord(chunk_index=index, text=text, token_count=len(text)) for index, text in enumerate(texts)],
+        )
+        self.store_parsed = parse_pool.store_parsed_document
+        self.upsert = document_router.upsert_chunks_to_vectorstore
+        embedded = []
+        upsert_document_chunks = MagicMock(
+            side_effect=lambda **kwargs: embedded.append(
+                ([chunk["text"] for chunk in kwargs["chunks"]], kwargs.get("replace", True))
+            )
+        )
+        self.vector_services = (upsert_document_chunks, MagicMock())
+
+        self._process()
+        result = document_router.process_document_route(self.document.id, force=True, current_user=self.user)
+        db = SessionLocal()
+        try:
+            force_rebuild = db.query(IngestionJob).filter(IngestionJob.id == result["job_id"]).one().force_rebuild
+        finally:
+            db.close()
+        self._process(force_rebuild=force_rebuild)
+
+        self.assertTrue(force_rebuild)
+        self.assertEqual(self.parse_in_pool.await_count, 2)
+        # The re-parse keeps both chunk rows, yet all of them are embedded again
+        # and replace the previous points
+        self.assertEqual(embedded, [(texts, True), (texts, True)])
+        self.assertEqual(
+            [call.kwargs["reuse_structured"] for call in self.create_blocks.call_args_list], [True, False]
+        )
+        self.assertEqual(self.structure_blocks.await_count, 2)
+        self.assertEqual(self.generate_report.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
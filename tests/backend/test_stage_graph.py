@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
+import unittest
+
+from backend.services.ingestion.stage_graph import Stage, run_stage_graph
+
+
+class StageGraphTests(unittest.TestCase):
+    def test_independent_stages_overlap_and_dependents_wait(self) -> None:
+        events = []
+
+        def stage(name: str, seconds: float):
+            async def run():
+                events.append(f"{name} start")
+                await asyncio.sleep(seconds)
+                events.append(f"{name} end")
+                return name.upper()
+            return run
+
+        timings = {}
+        results = asyncio.run(
+            run_stage_graph(
+                [
+                    Stage("report", stage("report", 0), after=("embed", "structure")),
+                    Stage("embed", stage("embed", 0.02)),
+                    Stage("structure", stage("structure", 0.01)),
+                ],
+                timings,
+            )
+        )
+
+        self.assertEqual(results, {"embed": "EMBED", "structure": "STRUCTURE", "report": "REPORT"})
+        self.assertEqual(events[:2], ["embed start", "structure start"])
+        self.assertEqual(events[-2:], ["report start", "report end"])
+        self.assertEqual(set(timings), {"embed", "structure", "report"})
+        self.assertGreaterEqual(timings["embed"], 0.02)
+
+    def test_failure_cancels_running_stages_and_skips_dependents(self) -> None:
+        cancelled = []
+        reported = []
+
+        async def fail():
+            raise RuntimeError("embedding failed")
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def report():
+            reported.append(True)
+
+        with self.assertRaisesRegex(RuntimeError, "embedding failed"):
+            asyncio.run(
+                run_stage_graph(
+                    [
+                        Stage("embed", fail),
+                        Stage("structure", slow),
+                        Stage("report", report, after=("embed", "structure")),
+                    ]
+                )
+            )
+
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(reported, [])
+
+    def test_invalid_dependencies_are_rejected(self) -> None:
+        async def noop():
+            return None
+
+        with self.assertRaisesRegex(ValueError, "unknown"):
+            asyncio.run(run_stage_graph([Stage("report", noop, after=("embed",))]))
+
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            asyncio.run(
+                run_stage_graph([Stage("a", noop, after=("b",)), Stage("b", noop, after=("a",))])
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,7 @@ from fastapi import UploadFile
 from backend.services.storage.upload_validation import (
     SUPPORTED_CONTENT_TYPES,
     UploadValidationError,
+    document_file_kind,
     read_upload_with_limit,
     validate_upload,
 )
@@ -100,6 +101,13 @@ class UploadValidationTests(unittest.TestCase):
         validated = validate_upload("../../folder\\notes.txt", b"Valid text")
         self.assertEqual(validated.filename, "notes.txt")
 
+    def test_file_kind_follows_content_type_and_csv_filenames(self) -> None:
+        self.assertEqual(document_file_kind("application/pdf", "scan.PDF"), "pdf")
+        self.assertEqual(document_file_kind("text/markdown", "notes.md"), "md")
+        self.assertEqual(document_file_kind("application/csv", "export"), "csv")
+        self.assertEqual(document_file_kind("text/plain", "data.csv"), "csv")
+        self.assertEqual(document_file_kind(None, "legacy.rtf"), "rtf")
+
     def test_streamed_reader_rejects_empty_and_oversized_uploads(self) -> None:
         empty = UploadFile(file=io.BytesIO(b""), filename="empty.txt")
         with self.assertRaises(UploadValidationError) as empty_error:
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
 import tests as _test_bootstrap  # noqa: F401  # configure isolated services first
+import asyncio
 import unittest
 import uuid
 from types import SimpleNamespace
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from backend.services.vector import vector_store
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from backend.services.llm import embedding_cache, llm_provider
+from backend.services.vector import sparse_vectors, vector_store
 
 
 class VectorStoreTests(unittest.TestCase):
     def setUp(self) -> None:
         vector_store._COLLECTION_READY = False
+        vector_store._SPARSE_VECTORS = None
 
     def test_collection_created_with_cosine_and_payload_indexes(self) -> None:
         fake_client = MagicMock()
@@ -26,7 +32,12 @@ class VectorStoreTests(unittest.TestCase):
         self.assertEqual(create_kwargs["collection_name"], vector_store.COLLECTION_NAME)
         self.assertEqual(create_kwargs["vectors_config"].size, 1536)
         self.assertEqual(str(create_kwargs["vectors_config"].distance), "Cosine")
-        self.assertEqual(fake_client.create_payload_index.call_count, 2)
+        self.assertEqual(
+            [call.kwargs["field_name"] for call in fake_client.create_payload_index.call_args_list],
+            ["document_id", "workspace_id", "file_kind", "chunk_db_id"],
+        )
+        sparse_config = create_kwargs["sparse_vectors_config"][vector_store.SPARSE_VECTOR_NAME]
+        self.assertEqual(str(sparse_config.modifier), "idf")
 
     def test_upsert_deletes_old_points_and_batches_payloads(self) -> None:
         fake_client = MagicMock()
@@ -45,15 +56,23 @@ class VectorStoreTests(unittest.TestCase):
             }
             for index in range(513)
         ]
-        vectors = [[float(index), 1.0, 2.0] for index in range(513)]
+        texts = [chunk["text"] for chunk in chunks]
+
+        def embed_batch(batch_texts, token_counts):
+            return [[float(texts.index(text)), 1.0, 2.0] for text in batch_texts]
 
         with (
             patch.object(vector_store, "client", fake_client),
-            patch.object(vector_store, "embed_texts_openai", return_value=vectors) as embed,
+            patch.object(vector_store, "embed_texts_openai", side_effect=embed_batch) as embed,
         ):
-            vector_store.upsert_document_chunks(7, 3, chunks)
+            # A generator is consumed and embedded batch by batch
+            vector_store.upsert_document_chunks(7, 3, iter(chunks))
 
-        embed.assert_called_once_with([chunk["text"] for chunk in chunks])
+        self.assertEqual(
+            [call.args[0] for call in embed.call_args_list],
+            [texts[:512], texts[512:]],
+        )
+        self.assertEqual(embed.call_args_list[1].kwargs["token_counts"], [None])
         fake_client.delete.assert_called_once()
         self.assertEqual(fake_client.upsert.call_count, 2)
 
@@ -61,12 +80,140 @@ class VectorStoreTests(unittest.TestCase):
         second_batch = fake_client.upsert.call_args_list[1].kwargs["points"]
         self.assertEqual(len(first_batch.ids), 512)
         self.assertEqual(len(second_batch.ids), 1)
-        self.assertEqual(first_batch.payloads[0]["workspace_id"], 3)
-        self.assertEqual(first_batch.payloads[0]["document_id"], 7)
+        self.assertEqual(first_batch.payloads[0]["workspace_id"], [3])
+        self.assertEqual(first_batch.payloads[0]["document_id"], [7])
         self.assertEqual(first_batch.payloads[0]["_text"], "chunk-0")
-        expected_id = str(uuid.uuid5(uuid.NAMESPACE_URL, "doc7_chunk10"))
+        expected_id = str(uuid.uuid5(uuid.NAMESPACE_URL, "chunk10"))
         self.assertEqual(str(first_batch.ids[0]), expected_id)
 
+    def test_shared_chunks_list_every_referencing_document(self) -> None:
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(collections=[])
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai", return_value=[[0.1]]),
+        ):
+            vector_store.upsert_document_chunks(7, 3, [{"id": 1, "text": "x"}], references=[(9, 4), (11, 3)])
+
+        payload = fake_client.upsert.call_args.kwargs["points"].payloads[0]
+        self.assertEqual(payload["document_id"], [7, 9, 11])
+        self.assertEqual(payload["workspace_id"], [3, 4])
+
+    def test_file_kind_is_stored_in_every_payload(self) -> None:
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(collections=[])
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai", return_value=[[0.1], [0.2]]),
+        ):
+            vector_store.upsert_document_chunks(
+                7, 3, [{"id": 1, "text": "x"}, {"id": 2, "text": "y"}], file_kind="pdf"
+            )
+
+        payloads = fake_client.upsert.call_args.kwargs["points"].payloads
+        self.assertEqual([payload["file_kind"] for payload in payloads], ["pdf", "pdf"])
+
+    def test_points_carry_the_sparse_vector_of_their_text(self) -> None:
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(collections=[])
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai", return_value=[[0.1], [0.2]]),
+        ):
+            vector_store.upsert_document_chunks(7, 3, [{"id": 1, "text": "x"}, {"id": 2, "text": "y y"}])
+
+        vectors = fake_client.upsert.call_args.kwargs["points"].vectors
+        self.assertEqual(vectors[""], [[0.1], [0.2]])
+        self.assertEqual(
+            vectors[vector_store.SPARSE_VECTOR_NAME],
+            [sparse_vectors.chunk_sparse_vector("x"), sparse_vectors.chunk_sparse_vector("y y")],
+        )
+
+    def test_collection_without_sparse_vector_keeps_dense_points_and_is_checked_once(self) -> None:
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(
+            collections=[SimpleNamespace(name=vector_store.COLLECTION_NAME)]
+        )
+        fake_client.get_collection.return_value = SimpleNamespace(
+            config=SimpleNamespace(params=SimpleNamespace(sparse_vectors=None))
+        )
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai", return_value=[[0.1]]),
+        ):
+            vector_store.upsert_document_chunks(7, 3, [{"id": 1, "text": "x"}])
+            vector_store.upsert_document_chunks(8, 3, [{"id": 2, "text": "y"}])
+
+        fake_client.get_collection.assert_called_once()
+        self.assertEqual(fake_client.upsert.call_args.kwargs["points"].vectors, [[0.1]])
+
+    def test_sparse_weights_saturate_with_term_frequency(self) -> None:
+        vector = sparse_vectors.chunk_sparse_vector("Revenue revenue REVENUE costs")
+        weights = dict(zip(vector.indices, vector.values))
+
+        revenue = weights[sparse_vectors.term_index("revenue")]
+        costs = weights[sparse_vectors.term_index("costs")]
+        self.assertEqual(len(weights), 2)
+        self.assertGreater(revenue, costs)
+        self.assertLess(revenue, 3 * costs)
+        self.assertLess(revenue, sparse_vectors.BM25_K1 + 1)
+
+        query = sparse_vectors.query_sparse_vector("revenue Revenue costs")
+        self.assertEqual(sorted(query.indices), sorted(weights))
+        self.assertEqual(query.values, [1.0, 1.0])
+
+    def test_set_document_references_rewrites_payload_without_embedding(self) -> None:
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(
+            collections=[SimpleNamespace(name=vector_store.COLLECTION_NAME)]
+        )
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai") as embed,
+        ):
+            vector_store.set_document_references(7, [(7, 3), (9, 4)])
+
+        embed.assert_not_called()
+        kwargs = fake_client.set_payload.call_args.kwargs
+        self.assertEqual(kwargs["payload"], {"document_id": [7, 9], "workspace_id": [3, 4]})
+        self.assertEqual(kwargs["points"].must[0].key, "document_id")
+        self.assertEqual(kwargs["points"].must[0].match.value, 7)
+
+    def test_chunk_points_are_found_after_their_chunks_moved_to_another_document(self) -> None:
+        local_client = QdrantClient(":memory:")
+        chunks = [{"id": chunk_id, "text": f"clause {chunk_id}", "metadata": {"chunk_index": chunk_id}} for chunk_id in (1, 2, 3)]
+
+        with (
+            patch.object(vector_store, "client", local_client),
+            patch.object(vector_store, "embed_texts_openai", side_effect=lambda texts, **kwargs: [[1.0, 0.5]] * len(texts)),
+        ):
+            vector_store.upsert_document_chunks(7, 3, chunks)
+            # Point stored under the id scheme that included the document id
+            local_client.upsert(
+                collection_name=vector_store.COLLECTION_NAME,
+                points=[
+                    qmodels.PointStruct(
+                        id=str(uuid.uuid5(uuid.NAMESPACE_URL, "doc7_chunk4")),
+                        vector={"": [1.0, 0.5]},
+                        payload={"document_id": [7], "chunk_db_id": 4},
+                    )
+                ],
+            )
+
+            # Document 9 took over the chunks of document 7
+            vector_store.delete_chunk_points(9, [2, 4])
+            vector_store.update_chunk_positions(9, [{"id": 3, "metadata": {"chunk_index": 1, "page_start": 2}}])
+
+        points, _ = local_client.scroll(collection_name=vector_store.COLLECTION_NAME, with_payload=True)
+        positions = {point.payload["chunk_db_id"]: point.payload["chunk_index"] for point in points}
+        self.assertEqual(positions, {1: 1, 3: 1})
+        self.assertEqual({str(point.id) for point in points}, {vector_store.chunk_point_id(1), vector_store.chunk_point_id(3)})
+
     def test_upsert_skips_empty_chunks_and_empty_embeddings(self) -> None:
         fake_client = MagicMock()
         with patch.object(vector_store, "client", fake_client):
@@ -115,6 +262,41 @@ class VectorStoreTests(unittest.TestCase):
         self.assertEqual(condition.key, "document_id")
         self.assertEqual(condition.match.value, 42)
 
+    def test_repeated_report_query_is_embedded_once(self) -> None:
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(collections=[])
+        fake_client.query_points.return_value = SimpleNamespace(points=[])
+        query_cache = embedding_cache.QueryEmbeddingCache(max_entries=8, ttl_seconds=60)
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai", return_value=[[0.1]]) as embed,
+            patch.object(llm_provider, "get_query_embedding_cache", return_value=query_cache),
+        ):
+            vector_store.query_similar_chunks(1, "Key risks", k=3)
+            vector_store.query_similar_chunks(2, "Key risks", k=3)
+
+        embed.assert_called_once_with(["Key risks"])
+        self.assertEqual(fake_client.query_points.call_count, 2)
+
+    def test_async_query_awaits_the_embedding_instead_of_blocking(self) -> None:
+        point = SimpleNamespace(id="p", score=0.9, payload={"_text": "Relevant evidence"})
+        fake_client = MagicMock()
+        fake_client.get_collections.return_value = SimpleNamespace(collections=[])
+        fake_client.query_points.return_value = SimpleNamespace(points=[point])
+
+        with (
+            patch.object(vector_store, "client", fake_client),
+            patch.object(vector_store, "embed_texts_openai") as blocking_embed,
+            patch.object(vector_store, "embed_texts_async", AsyncMock(return_value=[[0.1]])) as embed,
+        ):
+            hits = asyncio.run(vector_store.query_similar_chunks_async(42, "question", k=3))
+
+        embed.assert_awaited_once_with(["question"])
+        blocking_embed.assert_not_called()
+        self.assertEqual([hit["text"] for hit in hits], ["Relevant evidence"])
+        self.assertEqual(fake_client.query_points.call_args.kwargs["query"], [0.1])
+
     @unittest.expectedFailure
     def test_empty_query_embedding_returns_no_hits(self) -> None:
         with patch.object(vector_store, "embed_texts_openai", return_value=[]):
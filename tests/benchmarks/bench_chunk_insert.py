@@ -0,0 +1,94 @@
+"""Compare per-object ORM inserts with bulk inserts of document chunks.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_chunk_insert.py [--chunks 10000] [--database-url postgresql://...]
+
+Inserts the same synthetic chunks once as one ORM DocumentChunk object per
+chunk (the previous path) and once with the bulk INSERT ... RETURNING path,
+and prints the wall-clock time of both. Uses the isolated SQLite test
+database unless --database-url points at a scratch Postgres database; the
+tables of that database are dropped and recreated.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+CHUNK_TEXT = "Revenue, costs and guidance are described in this paragraph. " * 50
+
+
+def insert_orm_objects(db, document_id: int, records) -> None:
+    from backend.models.document_chunk import DocumentChunk
+
+    for record in records:
+        db.add(
+            DocumentChunk(
+                document_id=document_id,
+                chunk_index=record.chunk_index,
+                token_count=record.token_count,
+                text=record.text,
+                page_start=record.page_start,
+            )
+        )
+    db.flush()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from backend.database.database import Base, SessionLocal, engine
+    from backend.services.ingestion.chunking_service import ChunkRecord, insert_chunk_records
+    from tests.support import create_document, create_user_workspace, reset_database
+
+    if args.database_url:
+        # reset_database only accepts the isolated SQLite file
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    else:
+        reset_database()
+    user, workspace = create_user_workspace()
+    document = create_document(workspace.id, user.id)
+
+    records = [
+        ChunkRecord(chunk_index=index, text=f"{index}. {CHUNK_TEXT}", token_count=800, page_start=index // 3)
+        for index in range(args.chunks)
+    ]
+
+    results = {}
+    for label, insert in (
+        ("orm objects", lambda db: insert_orm_objects(db, document.id, records)),
+        ("bulk insert", lambda db: insert_chunk_records(db, document.id, None, records)),
+    ):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            insert(db)
+            db.commit()
+            results[label] = time.perf_counter() - started
+        finally:
+            db.close()
+
+    print(f"{args.chunks} chunks on {engine.dialect.name}")
+    for label, seconds in results.items():
+        print(f"{label}: {seconds:8.2f} s")
+    print(f"speedup:     {results['orm objects'] / results['bulk insert']:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""Measure chunking throughput in tokens per second before and after reusing token ids.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_chunk_tokenization.py [--corpus docs/] [--sections 2000] [--rounds 3]
+
+Chunks a Markdown corpus (every *.md file below --corpus, or a generated one)
+and a set of PDF-sized sections (the contextualized HybridChunker output that
+build_pdf_chunks windows) twice: with the previous windowing, which encoded every
+section, computed character offsets with decode_with_offsets and decoded each
+window again, and with build_text_chunks, which encodes sections in batches
+once and reuses the token ids. Prints the best of --rounds per variant.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+WORDS = (
+    "revenue margin guidance quarter segment growth outlook customers cloud "
+    "inventory Umsatz Prognose résumé naïve 收入 增长 📈 liquidity capital"
+).split()
+
+
+def generated_markdown(sections: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for index in range(sections):
+        words = rng.randint(150, 1400)
+        parts.append(f"## Section {index}\n\n{' '.join(rng.choice(WORDS) for _ in range(words))}\n")
+    return "\n".join(parts)
+
+
+def chunk_texts_previous(encoding, texts, max_tokens, overlap_tokens) -> int:
+    """The windowing before token ids were reused; returns the number of chunks."""
+    chunks = 0
+    for text in texts:
+        tokens = encoding.encode(text)
+        if not tokens:
+            continue
+        _, text_offsets = encoding.decode_with_offsets(tokens)
+        total_tokens = len(tokens)
+        start = 0
+        while start < total_tokens:
+            end = min(start + max_tokens, total_tokens)
+            while end > start and end < total_tokens and text_offsets[end] == text_offsets[end - 1]:
+                end -= 1
+            if end == start:
+                end = min(start + max_tokens, total_tokens)
+                while end < total_tokens and text_offsets[end] == text_offsets[end - 1]:
+                    end += 1
+            encoding.decode(tokens[start:end])
+            chunks += 1
+            if end >= total_tokens:
+                break
+            next_start = max(start + 1, end - overlap_tokens)
+            while next_start < end and text_offsets[next_start] == text_offsets[next_start - 1]:
+                next_start += 1
+            start = next_start
+    return chunks
+
+
+def best_of(rounds: int, run) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path)
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    from backend.services.ingestion import chunking_service
+    from backend.services.ingestion.chunking_service import (
+        CHUNK_OVERLAP_TOKENS,
+        ENCODING,
+        MAX_TOKENS,
+        _split_markdown_sections,
+        build_text_chunks,
+    )
+
+    if args.corpus:
+        markdown = "\n".join(path.read_text(encoding="utf-8") for path in sorted(args.corpus.rglob("*.md")))
+    else:
+        markdown = generated_markdown(args.sections)
+
+    corpus_tokens = len(ENCODING.encode(markdown))
+    markdown_sections = [section[2] for section in _split_markdown_sections(markdown) if section[2].strip()]
+
+    # PDF sections: HybridChunker output already fits into MAX_TOKENS
+    pdf_sections = []
+    for section in markdown_sections:
+        tokens = ENCODING.encode(section)
+        for start in range(0, len(tokens), MAX_TOKENS):
+            pdf_sections.append(ENCODING.decode(tokens[start:start + MAX_TOKENS]))
+    pdf_tokens = sum(len(tokens) for tokens in ENCODING.encode_batch(pdf_sections))
+
+    def pdf_current():
+        for start in range(0, len(pdf_sections), chunking_service.PDF_ENCODE_BATCH_SIZE):
+            batch = pdf_sections[start:start + chunking_service.PDF_ENCODE_BATCH_SIZE]
+            for text, tokens in zip(batch, chunking_service._encode_texts(batch)):
+                build_text_chunks(text, tokens=tokens)
+
+    cases = [
+        (
+            "markdown",
+            corpus_tokens,
+            lambda: chunk_texts_previous(ENCODING, markdown_sections, MAX_TOKENS, CHUNK_OVERLAP_TOKENS),
+            lambda: build_text_chunks(markdown, split_markdown_headings=True),
+        ),
+        (
+            "pdf sections",
+            pdf_tokens,
+            lambda: chunk_texts_previous(ENCODING, pdf_sections, MAX_TOKENS, CHUNK_OVERLAP_TOKENS),
+            pdf_current,
+        ),
+    ]
+
+    print(f"{'corpus':<14} {'tokens':>10} {'previous tok/s':>15} {'current tok/s':>14} {'speedup':>8}")
+    for label, tokens, previous, current in cases:
+        previous_seconds = best_of(args.rounds, previous)
+        current_seconds = best_of(args.rounds, current)
+        print(
+            f"{label:<14} {tokens:>10} {tokens / previous_seconds:>15,.0f} "
+            f"{tokens / current_seconds:>14,.0f} {previous_seconds / current_seconds:>7.2f}x"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
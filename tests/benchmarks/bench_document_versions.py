@@ -0,0 +1,121 @@
+"""Compare full reprocessing with chunk-diffed reprocessing of a new document version.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_document_versions.py [--pages 400] [--amended-pages 2] [--chunks-per-page 2]
+
+Stores a synthetic contract in the isolated test database, structures its
+blocks, then stores a version with a few inserted amendment pages. Prints
+how many chunks each approach sends to the embedding API and how many blocks
+it sends to the LLM: reprocessing from scratch embeds and structures
+everything, the chunk diff only what changed. It also prints the time the
+diff itself takes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+WORDS = (
+    "supplier customer delivery payment liability warranty termination notice audit invoice "
+    "service level penalty renewal licence hardware software support training update breach "
+    "remedy insurance indemnity dispute venue law schedule milestone acceptance defect"
+).split()
+
+
+def clause(page: int, part: int, amended: bool = False) -> str:
+    # Distinct word order per clause so near-duplicate detection leaves them alone
+    rng = random.Random(f"{'amendment' if amended else 'section'}-{page}-{part}")
+    return " ".join(rng.choice(WORDS) for _ in range(180)) + "."
+
+
+def contract(pages: int, chunks_per_page: int, amended_after: int = -1, amended_pages: int = 0):
+    from backend.services.ingestion.chunking_service import ChunkRecord
+    from backend.services.ingestion.parse_pool import ParsedDocument
+
+    layout = []
+    for page in range(pages):
+        layout.extend((page, part, False) for part in range(chunks_per_page))
+        if page == amended_after:
+            for extra in range(amended_pages):
+                layout.extend((page * 1000 + extra, part, True) for part in range(chunks_per_page))
+
+    chunks = []
+    for index, (page, part, amended) in enumerate(layout):
+        page_no = index // chunks_per_page + 1
+        text = clause(page, part, amended)
+        chunks.append(ChunkRecord(index, text, len(text) // 4, page_start=page_no, page_end=page_no))
+
+    return ParsedDocument(full_text="", chunks=chunks, is_pdf=True, page_count=len(chunks) // chunks_per_page)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--amended-pages", type=int, default=2)
+    parser.add_argument("--chunks-per-page", type=int, default=2)
+    args = parser.parse_args()
+
+    from backend.database.database import SessionLocal
+    from backend.models.document_block import DocumentBlock
+    from backend.services.ingestion import document_block_service, parse_pool
+    from tests.support import create_document, create_user_workspace, reset_database
+
+    reset_database()
+    user, workspace = create_user_workspace()
+    document = create_document(workspace.id, user.id, filename="contract.pdf")
+
+    def store(parsed):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            parse_id, diff = parse_pool.store_parsed_document(db, document.id, parsed)
+            db.commit()
+            seconds = time.perf_counter() - started
+        finally:
+            db.close()
+
+        document_block_service.create_blocks_from_chunks(document.id, parse_id)
+
+        db = SessionLocal()
+        try:
+            unstructured = db.query(DocumentBlock).filter(DocumentBlock.semantic_label.is_(None)).count()
+            # Stand-in for structure_blocks
+            db.query(DocumentBlock).update({DocumentBlock.semantic_label: "paragraph"})
+            db.commit()
+            blocks = db.query(DocumentBlock).count()
+        finally:
+            db.close()
+
+        return diff, unstructured, blocks, seconds
+
+    with patch.object(document_block_service, "SessionLocal", SessionLocal):
+        first = contract(args.pages, args.chunks_per_page)
+        diff, structured, blocks, _ = store(first)
+        print(f"version 1: {len(first.chunks)} chunks, {blocks} blocks")
+
+        second = contract(args.pages, args.chunks_per_page, args.pages // 2, args.amended_pages)
+        diff, structured, blocks, seconds = store(second)
+
+    print(f"version 2: {len(second.chunks)} chunks, {blocks} blocks ({args.amended_pages} pages inserted)")
+    print(f"{'':<18} {'embedded chunks':>16} {'structured blocks':>18}")
+    print(f"{'full reprocess':<18} {len(second.chunks):>16} {blocks:>18}")
+    print(f"{'chunk diff':<18} {len(diff.upsert_ids):>16} {structured:>18}")
+    print(
+        f"diff: kept {diff.kept}, inserted {diff.inserted}, deleted {diff.deleted}, "
+        f"{len(diff.moved_ids)} payload updates, {seconds:.2f} s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Compare serial and concurrent embedding batches against a fake server.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_embedding_concurrency.py [--chunks 2000] [--latency-ms 300] [--concurrency 8] [--dimensions 256]
+
+Starts a local HTTP server that answers OpenAI embedding requests after a
+fixed latency, embeds the same synthetic chunks once with one batch in flight
+and once with --concurrency batches in flight, and prints the wall-clock time
+and throughput of both. The embedding cache is disabled, so every run calls
+the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+
+def start_fake_server(latency_seconds: float, dimensions: int) -> ThreadingHTTPServer:
+    payloads = {}
+
+    def build_payload(model: str, count: int) -> bytes:
+        data = [
+            {"object": "embedding", "index": index, "embedding": [0.001 * (index % 7)] * dimensions}
+            for index in range(count)
+        ]
+        return json.dumps({
+            "object": "list",
+            "data": data,
+            "model": model,
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency_seconds)
+
+            # Responses only depend on the batch size; build each once so the server is not the bottleneck
+            key = (body["model"], len(body["input"]))
+            if key not in payloads:
+                payloads[key] = build_payload(*key)
+            payload = payloads[key]
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--dimensions", type=int, default=256)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.latency_ms / 1000, args.dimensions)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    # The fake server has no quota; keep the limiter out of the measurement
+    os.environ["EMBEDDING_RPM"] = str(10**6)
+    os.environ["EMBEDDING_TPM"] = str(10**9)
+
+    from backend.services.llm import llm_provider
+
+    # Chunk-sized texts (about 600 tokens), so batches are packed like real documents
+    sentence = " Revenue, costs and guidance are described in detail."
+    texts = [f"Chunk {index}." + sentence * 60 for index in range(args.chunks)]
+    token_counts = llm_provider.count_embedding_tokens(texts)
+
+    results = {}
+    for label, concurrency in (("serial", 1), ("concurrent", args.concurrency)):
+        started = time.perf_counter()
+        vectors = asyncio.run(llm_provider.embed_texts_async(texts, concurrency=concurrency, token_counts=token_counts))
+        seconds = time.perf_counter() - started
+        results[label] = seconds
+        assert len(vectors) == len(texts)
+        print(f"{label:<11} {concurrency:>3} in flight: {seconds:8.2f} s  ({len(texts) / seconds:8.0f} chunks/s)")
+
+    server.shutdown()
+    print(f"speedup: {results['serial'] / results['concurrent']:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
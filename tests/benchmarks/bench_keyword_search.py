@@ -0,0 +1,149 @@
+"""Compare the ILIKE OR-scan keyword search with the full-text index.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_keyword_search.py [--chunks 1000000] [--documents 200] [--queries 20] [--database-url postgresql://...]
+
+Fills a workspace with synthetic chunks of a Zipf-like vocabulary, then runs
+the same keyword queries through the previous OR(text ILIKE '%kw%') scan and
+through rank_chunks_by_keywords (FTS5 / tsvector), for rare and for absent
+terms, and prints the median and worst latency of both. Uses the isolated SQLite test database unless
+--database-url points at a scratch Postgres database; the tables of that
+database are dropped and recreated.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+VOCABULARY_SIZE = 20_000
+WORDS_PER_CHUNK = 60
+INSERT_BATCH = 10_000
+LIMIT = 8
+
+
+def vocabulary(rng: random.Random):
+    # Random letters, so a term rarely occurs inside another word
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))))
+    return sorted(words)
+
+
+def ilike_scan(db, document_ids, keywords):
+    from sqlalchemy import or_
+
+    from backend.models.document_chunk import DocumentChunk
+
+    return (
+        db.query(DocumentChunk.id)
+        .filter(
+            DocumentChunk.document_id.in_(document_ids),
+            DocumentChunk.duplicate_of_id.is_(None),
+            or_(*[DocumentChunk.text.ilike(f"%{kw}%") for kw in keywords]),
+        )
+        .limit(LIMIT)
+        .all()
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from backend.database.database import Base, SessionLocal, engine
+    from backend.database.fulltext import rank_chunks_by_keywords
+    from backend.services.ingestion.chunking_service import ChunkRecord, insert_chunk_records
+    from tests.support import create_document, create_user_workspace, reset_database
+
+    if args.database_url:
+        # reset_database only accepts the isolated SQLite file
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    else:
+        reset_database()
+    user, workspace = create_user_workspace()
+    document_ids = [
+        create_document(workspace.id, user.id, filename=f"document-{index}.txt").id
+        for index in range(args.documents)
+    ]
+
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    # Zipf-like: a few words are everywhere, most are rare
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    per_document = -(-args.chunks // args.documents)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        pending = []
+        for index in range(args.chunks):
+            text = " ".join(rng.choices(words, cum_weights=cum_weights, k=WORDS_PER_CHUNK))
+            pending.append((document_ids[index // per_document], ChunkRecord(index % per_document, text, WORDS_PER_CHUNK)))
+            if len(pending) == INSERT_BATCH or index == args.chunks - 1:
+                for document_id in dict.fromkeys(document_id for document_id, _ in pending):
+                    insert_chunk_records(db, document_id, None, [r for d, r in pending if d == document_id])
+                db.commit()
+                pending = []
+    finally:
+        db.close()
+    insert_seconds = time.perf_counter() - started
+
+    # Rare terms stop the scan at the first LIMIT matches, in storage order and
+    # unranked; terms that occur nowhere (typos, question words) scan every chunk
+    query_sets = {
+        "rare terms": [rng.sample(words[2000:], 2) for _ in range(args.queries)],
+        "absent terms": [
+            ["".join(rng.choices(string.ascii_lowercase, k=12)) for _ in range(2)]
+            for _ in range(args.queries)
+        ],
+    }
+
+    results = {}
+    db = SessionLocal()
+    try:
+        for query_set, queries in query_sets.items():
+            for label, search in (
+                ("ilike scan", lambda keywords: ilike_scan(db, document_ids, keywords)),
+                ("full-text index", lambda keywords: rank_chunks_by_keywords(db, document_ids, keywords, LIMIT)),
+            ):
+                latencies = []
+                for keywords in queries:
+                    query_started = time.perf_counter()
+                    search(keywords)
+                    latencies.append(time.perf_counter() - query_started)
+                results[query_set, label] = latencies
+    finally:
+        db.close()
+
+    print(f"{args.chunks} chunks in {args.documents} documents on {engine.dialect.name}, inserted in {insert_seconds:.1f} s")
+    for (query_set, label), latencies in results.items():
+        print(
+            f"{query_set:<13} {label:<16} median {statistics.median(latencies) * 1000:9.1f} ms   "
+            f"max {max(latencies) * 1000:9.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
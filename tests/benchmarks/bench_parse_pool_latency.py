@@ -0,0 +1,133 @@
+"""Measure event-loop lag while documents are parsed and chunked.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_parse_pool_latency.py [--documents 4] [--pages 20] [--format pdf]
+
+Generates a synthetic PDF with PyMuPDF (or a Markdown file with --format md,
+which needs no Docling models) and parses it several times
+concurrently, once directly on the event loop (the old behaviour) and once
+through the parser process pool. A probe task sleeps 10 ms in a loop and
+records how late it wakes up; p50/p99/max of that lag is printed per mode.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+PROBE_INTERVAL = 0.01
+
+
+FILE_TYPES = {"pdf": "application/pdf", "md": "text/markdown"}
+
+
+def build_markdown(path: Path, pages: int) -> None:
+    sections = []
+    for page_number in range(pages):
+        body = " ".join(f"Sentence {i} on page {page_number + 1} about quarterly revenue." for i in range(400))
+        sections.append(f"# Section {page_number + 1}\n\n{body}")
+    path.write_text("\n\n".join(sections), encoding="utf-8")
+
+
+def build_pdf(path: Path, pages: int) -> None:
+    import fitz
+
+    pdf = fitz.open()
+    for page_number in range(pages):
+        page = pdf.new_page()
+        page.insert_text((72, 72), f"Section {page_number + 1}", fontsize=18)
+        body = " ".join(f"Sentence {i} on page {page_number + 1} about quarterly revenue." for i in range(40))
+        page.insert_textbox(fitz.Rect(72, 100, 540, 760), body, fontsize=10)
+    pdf.save(str(path))
+    pdf.close()
+
+
+async def probe(stop: asyncio.Event, lags: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def run_mode(mode: str, path: Path, file_type: str, documents: int) -> tuple[float, list[float]]:
+    from backend.services.ingestion import parse_pool
+
+    async def parse_once() -> None:
+        if mode == "inline":
+            # Blocking call on the loop, as before the parser pool existed
+            parse_pool.parse_and_chunk_document(str(path), file_type)
+        else:
+            await parse_pool.parse_in_pool(str(path), file_type)
+
+    stop = asyncio.Event()
+    lags: list[float] = []
+    probe_task = asyncio.create_task(probe(stop, lags))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(parse_once() for _ in range(documents)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe_task
+    return elapsed, lags
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--format", choices=sorted(FILE_TYPES), default="pdf")
+    args = parser.parse_args()
+
+    from backend.services.ingestion import parse_pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"synthetic.{args.format}"
+        file_type = FILE_TYPES[args.format]
+        (build_pdf if args.format == "pdf" else build_markdown)(path, args.pages)
+
+        # Start the pool and load the models before measuring
+        asyncio.run(parse_pool.parse_in_pool(str(path), file_type))
+        parse_pool.parse_and_chunk_document(str(path), file_type)
+
+        print(
+            f"{args.documents} {args.format} documents x {args.pages} pages, "
+            f"pool size {parse_pool.PARSE_POOL_SIZE}"
+        )
+        print(f"{'mode':<8} {'wall s':>8} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+        for mode in ("inline", "pool"):
+            elapsed, lags = asyncio.run(run_mode(mode, path, file_type, args.documents))
+            print(
+                f"{mode:<8} {elapsed:>8.2f} "
+                f"{statistics.median(lags or [0.0]) * 1000:>11.1f} "
+                f"{percentile(lags, 0.99) * 1000:>11.1f} "
+                f"{max(lags or [0.0]) * 1000:>11.1f}"
+            )
+
+        parse_pool.shutdown_parse_pool()
+
+    return 0
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PARSE_POOL_SIZE", "2")
+    raise SystemExit(main())
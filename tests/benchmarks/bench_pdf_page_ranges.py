@@ -0,0 +1,110 @@
+"""Compare single-converter and page-range parallel PDF parsing.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_pdf_page_ranges.py [--pages 300] [--pool-size 4] [--pages-per-range 25]
+
+Generates a synthetic text PDF with headings on every tenth page, parses it
+once with a single Docling converter and once split into page ranges that are
+converted in parallel parser processes, and prints the wall-clock time of
+both. Chunk output of the two paths is compared as a sanity check.
+Needs the Docling layout models (downloaded on first use).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+
+def build_pdf(path: Path, pages: int) -> None:
+    import fitz
+
+    pdf = fitz.open()
+    for page_number in range(1, pages + 1):
+        page = pdf.new_page()
+        if page_number % 10 == 1:
+            page.insert_text((72, 72), f"Chapter {page_number // 10 + 1}", fontsize=18)
+        body = " ".join(
+            f"Paragraph {i} on page {page_number} describes revenue, costs and guidance."
+            for i in range(25)
+        )
+        page.insert_textbox(fitz.Rect(72, 100, 540, 760), body, fontsize=10)
+    pdf.save(str(path))
+    pdf.close()
+
+
+async def run_single(path: Path):
+    from backend.services.ingestion import parse_pool
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        parse_pool.get_parse_executor(),
+        parse_pool.parse_and_chunk_document,
+        str(path),
+        "application/pdf",
+        parse_pool.MAX_TOKENS,
+        parse_pool.CHUNK_OVERLAP_TOKENS,
+        "docling",
+    )
+
+
+async def run_ranges(path: Path, pages_per_range: int):
+    from backend.services.ingestion import parse_pool
+
+    return await parse_pool.parse_pdf_with_docling(str(path), pages_per_range=pages_per_range)
+
+
+async def warm_up() -> None:
+    from backend.services.ingestion import parse_pool
+
+    # Start every parser process and load its converters before timing
+    await parse_pool.warm_parse_pool()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--pool-size", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--pages-per-range", type=int, default=25)
+    args = parser.parse_args()
+
+    os.environ["PARSE_POOL_SIZE"] = str(args.pool_size)
+
+    from backend.services.ingestion import parse_pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic.pdf"
+        build_pdf(path, args.pages)
+
+        asyncio.run(warm_up())
+
+        started = time.perf_counter()
+        single = asyncio.run(run_single(path))
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ranged = asyncio.run(run_ranges(path, args.pages_per_range))
+        ranged_seconds = time.perf_counter() - started
+
+        parse_pool.shutdown_parse_pool()
+
+    print(f"{args.pages} pages, {args.pool_size} parser processes, {args.pages_per_range} pages per range")
+    print(f"single converter: {single_seconds:8.2f} s  ({len(single.chunks)} chunks)")
+    print(f"page ranges:      {ranged_seconds:8.2f} s  ({len(ranged.chunks)} chunks)")
+    print(f"speedup:          {single_seconds / ranged_seconds:8.2f}x")
+    print(f"identical chunks: {single.chunks == ranged.chunks}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+"""Compare query embedding latency with and without the in-memory query cache.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_query_embedding_cache.py [--queries 300] [--distinct 60] [--latency-ms 150]
+
+Starts a local HTTP server that answers OpenAI embedding requests after a
+fixed latency and sends a stream of chat queries, drawn with Zipf-like
+weights from --distinct different questions (retries and repeated report
+sections), through embed_query once without and once with the query cache.
+Prints the median and mean latency per query, the number of embedding
+requests and the cache hit ratio. The persistent embedding cache is
+disabled, so every miss calls the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+DIMENSIONS = 1536
+
+
+def start_fake_server(latency_seconds: float) -> ThreadingHTTPServer:
+    payload = json.dumps({
+        "object": "list",
+        "data": [{"object": "embedding", "index": 0, "embedding": [0.001] * DIMENSIONS}],
+        "model": "text-embedding-3-small",
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latency_seconds)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--distinct", type=int, default=60)
+    parser.add_argument("--latency-ms", type=int, default=150)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.latency_ms / 1000)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["EMBEDDING_RPM"] = str(10**6)
+    os.environ["EMBEDDING_TPM"] = str(10**9)
+
+    from backend.services.llm import embedding_cache, llm_provider
+    from backend.services.observability import metrics
+
+    rng = random.Random(42)
+    questions = [f"What does the report say about topic {index}?" for index in range(args.distinct)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(args.distinct)))
+    stream = rng.choices(questions, cum_weights=cum_weights, k=args.queries)
+
+    for label, query_cache in (
+        ("no cache", None),
+        ("query cache", embedding_cache.QueryEmbeddingCache(max_entries=2048, ttl_seconds=3600)),
+    ):
+        metrics.reset()
+        latencies = []
+        with patch.object(llm_provider, "get_query_embedding_cache", return_value=query_cache):
+            for query in stream:
+                started = time.perf_counter()
+                vector = llm_provider.embed_query(query)
+                latencies.append(time.perf_counter() - started)
+                assert len(vector) == DIMENSIONS
+
+        hits = metrics.get("query_embedding_cache.hits")
+        print(
+            f"{label:<12} median {statistics.median(latencies) * 1000:8.2f} ms   "
+            f"mean {statistics.mean(latencies) * 1000:8.2f} ms   "
+            f"requests {metrics.get('embeddings.requests'):4.0f}   hit ratio {hits / len(stream):.2f}"
+        )
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,228 @@
+"""Measure retrieval quality and latency of the fusion modes over the goldset.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_retrieval_fusion.py [--limit 5] [--factors 1 2 3] [--dense-weight 1.0] [--lexical-weight 1.0] [--openai]
+
+Stores the goldset v1 documents (tests/evaluation/goldset/v1) in the
+isolated test database, one chunk per paragraph, and indexes them in an
+in-memory Qdrant collection with dense and sparse vectors. Every answerable
+question is then run through search_chunks with its document or workspace
+scope, for every candidate factor (over-fetch per requested result) and
+fusion mode:
+
+- score sort: the previous merge, cosine scores and keyword scores scaled
+  to 0.65 sorted together
+- rrf fallback: dense search plus the SQL full-text index, fused in Python
+- rrf in qdrant: dense and sparse prefetch fused by the Query API
+
+Prints Recall@limit (share of gold sources whose quote is in a returned
+chunk), MRR and the median and p95 latency per search. Embeddings come from
+a local hashed character n-gram model, so the benchmark runs offline; with
+--openai the OpenAI key from the environment is used instead and the
+latency includes the embedding request.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# The test bootstrap replaces the key with a dummy one
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+DIMENSIONS = 256
+NGRAM = 4
+FILE_TYPES = {"markdown": "text/markdown", "text": "text/plain"}
+
+
+def hashed_embeddings(texts, token_counts=None):
+    """Normalised counts of hashed character n-grams; a lexical stand-in for the embedding model."""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * DIMENSIONS
+        padded = f" {text.casefold()} "
+        for start in range(len(padded) - NGRAM + 1):
+            digest = hashlib.blake2b(padded[start:start + NGRAM].encode("utf-8"), digest_size=4).digest()
+            vector[int.from_bytes(digest, "big") % DIMENSIONS] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        vectors.append([value / norm for value in vector])
+    return vectors
+
+
+def paragraphs(text: str):
+    return [paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()]
+
+
+def score_sort_merge(rankings, weights, k=None):
+    """The merge before fusion: raw scores sorted together, keyword hits scaled to at most 0.65."""
+    vector_chunks, keyword_chunks = rankings
+    best = keyword_chunks[0]["score"] if keyword_chunks else 0.0
+    merged, seen = [], set()
+    for chunk in vector_chunks + [
+        {**c, "score": 0.65 * c["score"] / best if best > 0 else 0.65} for c in keyword_chunks
+    ]:
+        if chunk["text"] not in seen:
+            merged.append(chunk)
+            seen.add(chunk["text"])
+    return sorted(merged, key=lambda c: c["score"] or 0, reverse=True)
+
+
+def index_goldset(dataset):
+    from backend.database.database import SessionLocal
+    from backend.services.ingestion.chunking_service import ChunkRecord, insert_chunk_records
+    from backend.services.vector import vector_store
+    from tests.support import create_document, create_user_workspace, reset_database
+
+    reset_database()
+    user, workspace = create_user_workspace()
+    document_ids = {}
+
+    db = SessionLocal()
+    try:
+        for document in dataset["manifest"]["documents"]:
+            path = dataset["root"] / document["path"]
+            row = create_document(
+                workspace.id,
+                user.id,
+                filename=path.name,
+                file_type=FILE_TYPES[document["format"]],
+                storage_path=f"documents/{path.name}",
+            )
+            texts = paragraphs(path.read_text(encoding="utf-8"))
+            records = [ChunkRecord(index, text, len(text) // 4) for index, text in enumerate(texts)]
+            chunk_ids = insert_chunk_records(db, row.id, None, records)
+            db.commit()
+
+            vector_store.upsert_document_chunks(
+                row.id,
+                workspace.id,
+                [
+                    {"id": chunk_id, "text": text, "metadata": {"chunk_index": index}}
+                    for index, (chunk_id, text) in enumerate(zip(chunk_ids, texts))
+                ],
+                file_kind=path.suffix.lstrip("."),
+            )
+            document_ids[document["id"]] = row.id
+    finally:
+        db.close()
+
+    return workspace.id, document_ids
+
+
+def evaluate(questions, quotes, workspace_id, document_ids, limit):
+    from backend.services.vector import retrieval_service
+
+    recalls, reciprocal_ranks, latencies = [], [], []
+    for question in questions:
+        scope = document_ids[question["document_ids"][0]] if question["scope"] == "document" else None
+
+        started = time.perf_counter()
+        results = retrieval_service.search_chunks(question["question"], workspace_id, scope, limit=limit)
+        latencies.append(time.perf_counter() - started)
+
+        texts = [result["text"] for result in results]
+        found = [source for source in question["source_ids"] if any(quotes[source] in text for text in texts)]
+        recalls.append(len(found) / len(question["source_ids"]))
+        first = next(
+            (rank for rank, text in enumerate(texts, start=1) if any(quotes[s] in text for s in question["source_ids"])),
+            None,
+        )
+        reciprocal_ranks.append(1 / first if first else 0.0)
+
+    return statistics.mean(recalls), statistics.mean(reciprocal_ranks), latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--dense-weight", type=float, default=1.0)
+    parser.add_argument("--lexical-weight", type=float, default=1.0)
+    parser.add_argument("--openai", action="store_true")
+    args = parser.parse_args()
+
+    if args.openai:
+        if not OPENAI_API_KEY:
+            raise SystemExit("--openai needs OPENAI_API_KEY in the environment")
+        os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
+
+    from qdrant_client import QdrantClient
+
+    from backend.services.vector import retrieval_service, vector_store
+    from tests.evaluation.validate_goldset import load_goldset
+
+    dataset = load_goldset()
+    quotes = {source["id"]: source["quote"] for source in dataset["sources"]}
+    questions = [question for question in dataset["questions"] if question["answerable"]]
+
+    local_client = QdrantClient(":memory:")
+    vector_store._COLLECTION_READY = False
+    vector_store._SPARSE_VECTORS = None
+    patches = [
+        patch.object(vector_store, "client", local_client),
+        patch.object(retrieval_service, "client", local_client),
+        patch.object(retrieval_service, "DENSE_WEIGHT", args.dense_weight),
+        patch.object(retrieval_service, "LEXICAL_WEIGHT", args.lexical_weight),
+    ]
+    if not args.openai:
+        patches += [
+            patch.object(vector_store, "embed_texts_openai", hashed_embeddings),
+            patch.object(retrieval_service, "embed_texts", hashed_embeddings),
+        ]
+
+    modes = {
+        "score sort": [
+            patch.object(retrieval_service, "has_sparse_vectors", return_value=False),
+            patch.object(retrieval_service, "reciprocal_rank_fusion", score_sort_merge),
+        ],
+        "rrf fallback": [patch.object(retrieval_service, "has_sparse_vectors", return_value=False)],
+        "rrf in qdrant": [],
+    }
+
+    for active in patches:
+        active.start()
+    try:
+        workspace_id, document_ids = index_goldset(dataset)
+
+        print(
+            f"{len(questions)} answerable questions, {len(quotes)} gold sources, limit {args.limit}, "
+            f"weights dense {args.dense_weight} / lexical {args.lexical_weight}, "
+            f"{'OpenAI' if args.openai else 'hashed n-gram'} embeddings"
+        )
+        for mode, mode_patches in modes.items():
+            for factor in args.factors:
+                for active in mode_patches:
+                    active.start()
+                try:
+                    with patch.object(retrieval_service, "CANDIDATE_FACTOR", factor):
+                        recall, mrr, latencies = evaluate(questions, quotes, workspace_id, document_ids, args.limit)
+                finally:
+                    for active in mode_patches:
+                        active.stop()
+
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                print(
+                    f"{mode:<14} factor {factor}   recall@{args.limit} {recall:.3f}   MRR {mrr:.3f}   "
+                    f"median {statistics.median(latencies) * 1000:6.2f} ms   p95 {p95 * 1000:6.2f} ms"
+                )
+    finally:
+        for active in reversed(patches):
+            active.stop()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,138 @@
+"""Compare peak memory of materialised and streaming chunk upserts.
+
+Usage:
+    .venv/bin/python tests/benchmarks/bench_vector_memory.py [--chunks 1000 4000 8000] [--dimensions 1536]
+
+Stores synthetic 800-token chunks for a document in the isolated test
+database and sends them to a stub vector store with fake embeddings, once the
+way the vector stage used to work (load every chunk, embed all texts, then
+upsert) and once with the streaming pipeline (read, embed and upsert one
+batch at a time). Prints the peak traced Python memory of both per document
+size: the streaming peak stays flat while the materialised one grows with
+the document.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import tests as _test_bootstrap  # noqa: E402,F401  # isolated services, no network writes
+
+CHUNK_TEXT = "Revenue, costs and guidance are described in this paragraph. " * 60
+
+
+class StubQdrant:
+    """Accepts points and keeps nothing, like a remote vector store."""
+
+    def get_collections(self):
+        from backend.services.vector import vector_store
+
+        return SimpleNamespace(collections=[SimpleNamespace(name=vector_store.COLLECTION_NAME)])
+
+    def create_payload_index(self, **kwargs):
+        pass
+
+    def delete(self, **kwargs):
+        pass
+
+    def upsert(self, **kwargs):
+        pass
+
+
+def store_chunks(document_id: int, count: int) -> None:
+    from backend.database.database import SessionLocal
+    from backend.services.ingestion.chunking_service import ChunkRecord, store_chunk_records
+
+    db = SessionLocal()
+    try:
+        records = (
+            ChunkRecord(chunk_index=index, text=f"{index}. {CHUNK_TEXT}", token_count=800)
+            for index in range(count)
+        )
+        store_chunk_records(db, document_id, None, records)
+        db.commit()
+    finally:
+        db.close()
+
+
+def upsert_materialised(db, document) -> None:
+    """The vector stage before streaming: every chunk, text and vector at once."""
+    from backend.models.document_chunk import DocumentChunk
+    from backend.services.vector import vector_store
+
+    chunks = (
+        db.query(DocumentChunk)
+        .filter(DocumentChunk.document_id == document.id)
+        .order_by(DocumentChunk.chunk_index)
+        .all()
+    )
+    payload = [
+        {"id": chunk.id, "text": chunk.text, "metadata": {"chunk_index": chunk.chunk_index}}
+        for chunk in chunks
+    ]
+    vectors = vector_store.embed_texts_openai([c["text"] for c in payload])
+    payloads = [{"_text": c["text"], "chunk_db_id": c["id"]} for c in payload]
+    for start in range(0, len(payload), 512):
+        vector_store.client.upsert(points=(vectors[start:start + 512], payloads[start:start + 512]))
+
+
+def measure(run) -> float:
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 4000, 8000])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+
+    from backend.database.database import SessionLocal
+    from backend.routers import document as document_router
+    from backend.services.vector import vector_store
+    from tests.support import create_document, create_user_workspace, reset_database
+
+    def fake_embeddings(texts, token_counts=None):
+        return [[0.001 * index] * args.dimensions for index in range(len(texts))]
+
+    print(f"{'chunks':>8} {'materialised MB':>16} {'streaming MB':>13}")
+
+    for count in args.chunks:
+        reset_database()
+        user, workspace = create_user_workspace()
+        document = create_document(workspace.id, user.id)
+        store_chunks(document.id, count)
+
+        with (
+            patch.object(vector_store, "client", StubQdrant()),
+            # A plain function: a mock would keep every batch alive in its call list
+            patch.object(vector_store, "embed_texts_openai", fake_embeddings),
+            patch.object(vector_store, "_COLLECTION_READY", True),
+        ):
+            db = SessionLocal()
+            try:
+                materialised = measure(lambda: upsert_materialised(db, document))
+                db.expunge_all()
+                streaming = measure(lambda: document_router.upsert_chunks_to_vectorstore(db, document))
+            finally:
+                db.close()
+
+        print(f"{count:>8} {materialised:>16.1f} {streaming:>13.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,6 +12,10 @@ from backend.models.document_parse import DocumentParse  # noqa: F401
 from backend.models.report import Report  # noqa: F401
 from backend.models.chat_conversation import ChatConversation  # noqa: F401
 from backend.models.chat_message import ChatMessage  # noqa: F401
+from backend.models.ingestion_job import IngestionJob  # noqa: F401
+from backend.models.pdf_page_cache import PdfPageCache  # noqa: F401
+from backend.models.document_content import DocumentContent  # noqa: F401
+from backend.models.document_checkpoint import DocumentCheckpoint  # noqa: F401
 from backend.models.user import User
 from backend.models.workspace import Workspace
 from backend.models.workspace_member import WorkspaceMember
@@ -110,3 +114,16 @@ def chat_response(content: str, *, prompt_tokens: int = 3, completion_tokens: in
     )
     message = SimpleNamespace(content=content)
     return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def draw_table(page: Any, rows: list[list[str]]) -> None:
+    """Draw a ruled PyMuPDF table with cell text below the page text."""
+    top, left, row_height, col_width = 300, 72, 30, 150
+
+    for row in range(len(rows) + 1):
+        page.draw_line((left, top + row * row_height), (left + len(rows[0]) * col_width, top + row * row_height))
+    for col in range(len(rows[0]) + 1):
+        page.draw_line((left + col * col_width, top), (left + col * col_width, top + len(rows) * row_height))
+    for row, values in enumerate(rows):
+        for col, value in enumerate(values):
+            page.insert_text((left + col * col_width + 8, top + row * row_height + 20), value)